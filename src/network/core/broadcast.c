@@ -8,6 +8,92 @@
 
 broadcast_manager_t* g_broadcast_manager = NULL;
 
+// ==================== INTERNAL HELPERS ====================
+
+static void manager_lock(void) {
+#ifdef _WIN32
+    EnterCriticalSection(&g_broadcast_manager->lock);
+#else
+    pthread_mutex_lock(&g_broadcast_manager->lock);
+#endif
+}
+
+static void manager_unlock(void) {
+#ifdef _WIN32
+    LeaveCriticalSection(&g_broadcast_manager->lock);
+#else
+    pthread_mutex_unlock(&g_broadcast_manager->lock);
+#endif
+}
+
+static int topic_is_valid(const char* topic) {
+    if (!topic || topic[0] == '\0') {
+        return 0;
+    }
+    return strlen(topic) < BROADCAST_TOPIC_MAX;
+}
+
+// FNV-1a string hash
+static unsigned int topic_hash(const char* topic) {
+    unsigned int hash = 2166136261u;
+    for (const unsigned char* p = (const unsigned char*)topic; *p; p++) {
+        hash ^= *p;
+        hash *= 16777619u;
+    }
+    return hash % BROADCAST_TOPIC_BUCKETS;
+}
+
+// Caller holds the lock
+static broadcast_topic_t* find_topic(const char* topic) {
+    broadcast_topic_t* current = g_broadcast_manager->buckets[topic_hash(topic)];
+    while (current) {
+        if (strcmp(current->name, topic) == 0) {
+            return current;
+        }
+        current = current->next;
+    }
+    return NULL;
+}
+
+// Caller holds the lock; unlinks and frees a topic without subscribers
+static void remove_topic_if_empty(broadcast_topic_t* topic) {
+    if (topic->subscriber_count > 0) {
+        return;
+    }
+    
+    broadcast_topic_t** link = &g_broadcast_manager->buckets[topic_hash(topic->name)];
+    while (*link) {
+        if (*link == topic) {
+            *link = topic->next;
+            free(topic);
+            g_broadcast_manager->topic_count--;
+            return;
+        }
+        link = &(*link)->next;
+    }
+}
+
+// Caller holds the lock; returns 1 if the socket was removed from the topic
+static int remove_subscriber(broadcast_topic_t* topic, int socket) {
+    broadcast_subscriber_t** link = &topic->subscribers;
+    while (*link) {
+        if ((*link)->socket == socket) {
+            broadcast_subscriber_t* node = *link;
+            *link = node->next;
+            free(node);
+            topic->subscriber_count--;
+            g_broadcast_manager->subscription_count--;
+            return 1;
+        }
+        link = &(*link)->next;
+    }
+    return 0;
+}
+
+static void room_topic(int room_id, char* buffer) {
+    snprintf(buffer, BROADCAST_TOPIC_MAX, "room:%d", room_id);
+}
+
 // ==================== INITIALIZATION ====================
 
 void broadcast_init() {
@@ -15,14 +101,11 @@ void broadcast_init() {
         return;  // Already initialized
     }
     
-    g_broadcast_manager = (broadcast_manager_t*)malloc(sizeof(broadcast_manager_t));
+    g_broadcast_manager = (broadcast_manager_t*)calloc(1, sizeof(broadcast_manager_t));
     if (!g_broadcast_manager) {
         return;
     }
     
-    g_broadcast_manager->clients = NULL;
-    g_broadcast_manager->client_count = 0;
-    
 #ifdef _WIN32
     InitializeCriticalSection(&g_broadcast_manager->lock);
 #else
@@ -35,25 +118,29 @@ void broadcast_destroy() {
         return;
     }
     
-#ifdef _WIN32
-    EnterCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_lock(&g_broadcast_manager->lock);
-#endif
+    manager_lock();
     
-    // Free all client nodes
-    broadcast_client_t* current = g_broadcast_manager->clients;
-    while (current) {
-        broadcast_client_t* next = current->next;
-        free(current);
-        current = next;
+    // Free all topics and their subscriber nodes
+    for (int i = 0; i < BROADCAST_TOPIC_BUCKETS; i++) {
+        broadcast_topic_t* topic = g_broadcast_manager->buckets[i];
+        while (topic) {
+            broadcast_topic_t* next_topic = topic->next;
+            broadcast_subscriber_t* sub = topic->subscribers;
+            while (sub) {
+                broadcast_subscriber_t* next_sub = sub->next;
+                free(sub);
+                sub = next_sub;
+            }
+            free(topic);
+            topic = next_topic;
+        }
     }
     
+    manager_unlock();
+
 #ifdef _WIN32
-    LeaveCriticalSection(&g_broadcast_manager->lock);
     DeleteCriticalSection(&g_broadcast_manager->lock);
 #else
-    pthread_mutex_unlock(&g_broadcast_manager->lock);
     pthread_mutex_destroy(&g_broadcast_manager->lock);
 #endif
     
@@ -61,171 +148,191 @@ void broadcast_destroy() {
     g_broadcast_manager = NULL;
 }
 
-// ==================== CLIENT MANAGEMENT ====================
+// ==================== TOPIC SUBSCRIPTIONS ====================
 
-int broadcast_register(int socket, int room_id) {
-    if (!g_broadcast_manager) {
+int broadcast_subscribe(int socket, const char* topic) {
+    if (!g_broadcast_manager || !topic_is_valid(topic)) {
         return -1;
     }
     
-#ifdef _WIN32
-    EnterCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_lock(&g_broadcast_manager->lock);
-#endif
+    manager_lock();
     
-    // Check if (socket + room_id) already registered
-    broadcast_client_t* current = g_broadcast_manager->clients;
-    while (current) {
-        if (current->socket == socket && current->room_id == room_id) {
-            // Already registered for this room, OK
-#ifdef _WIN32
-            LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-            pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    broadcast_topic_t* entry = find_topic(topic);
+    if (!entry) {
+        // First subscriber: create topic
+        entry = (broadcast_topic_t*)calloc(1, sizeof(broadcast_topic_t));
+        if (!entry) {
+            manager_unlock();
+            return -1;
+        }
+        strcpy(entry->name, topic);
+        
+        unsigned int bucket = topic_hash(topic);
+        entry->next = g_broadcast_manager->buckets[bucket];
+        g_broadcast_manager->buckets[bucket] = entry;
+        g_broadcast_manager->topic_count++;
+    }
+    
+    // Already subscribed, OK
+    for (broadcast_subscriber_t* sub = entry->subscribers; sub; sub = sub->next) {
+        if (sub->socket == socket) {
+            manager_unlock();
             return 0;
         }
-        current = current->next;
     }
     
-    // Create new client node
-    broadcast_client_t* new_client = (broadcast_client_t*)malloc(sizeof(broadcast_client_t));
-    if (!new_client) {
-#ifdef _WIN32
-        LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-        pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    broadcast_subscriber_t* new_sub = (broadcast_subscriber_t*)malloc(sizeof(broadcast_subscriber_t));
+    if (!new_sub) {
+        remove_topic_if_empty(entry);
+        manager_unlock();
         return -1;
     }
     
-    new_client->socket = socket;
-    new_client->room_id = room_id;
-    new_client->next = g_broadcast_manager->clients;
-    g_broadcast_manager->clients = new_client;
-    g_broadcast_manager->client_count++;
-    
-#ifdef _WIN32
-    LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    new_sub->socket = socket;
+    new_sub->next = entry->subscribers;
+    entry->subscribers = new_sub;
+    entry->subscriber_count++;
+    g_broadcast_manager->subscription_count++;
     
+    manager_unlock();
     return 0;
 }
+    
+int broadcast_unsubscribe(int socket, const char* topic) {
+    if (!g_broadcast_manager || !topic_is_valid(topic)) {
+        return -1;
+    }
+    
+    manager_lock();
+    
+    int removed = 0;
+    broadcast_topic_t* entry = find_topic(topic);
+    if (entry) {
+        removed = remove_subscriber(entry, socket);
+        remove_topic_if_empty(entry);
+    }
+    
+    manager_unlock();
+    return removed ? 0 : -1;
+}
 
 void broadcast_unregister(int socket) {
     if (!g_broadcast_manager) {
         return;
     }
     
-#ifdef _WIN32
-    EnterCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_lock(&g_broadcast_manager->lock);
-#endif
-    
-    broadcast_client_t* current = g_broadcast_manager->clients;
-    broadcast_client_t* prev = NULL;
+    manager_lock();
     
-    while (current) {
-        if (current->socket == socket) {
-            if (prev) {
-                prev->next = current->next;
-            } else {
-                g_broadcast_manager->clients = current->next;
+    // A socket can be in any number of topics: scan them all
+    for (int i = 0; i < BROADCAST_TOPIC_BUCKETS; i++) {
+        broadcast_topic_t* topic = g_broadcast_manager->buckets[i];
+        while (topic) {
+            broadcast_topic_t* next = topic->next;
+            if (remove_subscriber(topic, socket)) {
+                remove_topic_if_empty(topic);
             }
-            
-            free(current);
-            g_broadcast_manager->client_count--;
-            
-#ifdef _WIN32
-            LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-            pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
-            return;
+            topic = next;
         }
+    }
+            
+    manager_unlock();
+}
         
-        prev = current;
-        current = current->next;
+int broadcast_subscriber_count(const char* topic) {
+    if (!g_broadcast_manager || !topic_is_valid(topic)) {
+        return 0;
     }
     
-#ifdef _WIN32
-    LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    manager_lock();
+    broadcast_topic_t* entry = find_topic(topic);
+    int count = entry ? entry->subscriber_count : 0;
+    manager_unlock();
+    
+    return count;
 }
 
-int broadcast_update_room(int socket, int room_id) {
-    if (!g_broadcast_manager) {
-        return -1;
+// ==================== BROADCAST OPERATIONS ====================
+
+int broadcast_publish(const char* topic, int msg_type, const char* json_data) {
+    if (!g_broadcast_manager || !topic_is_valid(topic)) {
+        return 0;
     }
     
-#ifdef _WIN32
-    EnterCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_lock(&g_broadcast_manager->lock);
-#endif
+    // Snapshot subscribers under the lock
+    manager_lock();
     
-    broadcast_client_t* current = g_broadcast_manager->clients;
-    while (current) {
-        if (current->socket == socket) {
-            current->room_id = room_id;
-#ifdef _WIN32
-            LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-            pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
-            return 0;
+    broadcast_topic_t* entry = find_topic(topic);
+    int count = entry ? entry->subscriber_count : 0;
+    int* sockets = NULL;
+    
+    if (count > 0) {
+        sockets = (int*)malloc(sizeof(int) * count);
+        if (sockets) {
+            int i = 0;
+            for (broadcast_subscriber_t* sub = entry->subscribers; sub && i < count; sub = sub->next) {
+                sockets[i++] = sub->socket;
+            }
         }
-        current = current->next;
     }
     
-#ifdef _WIN32
-    LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    manager_unlock();
+    
+    if (!sockets) {
+        return 0;
+    }
+    
+    // Send without the lock (protocol layer handles header, byte order, timeout)
+    int sent_count = 0;
+    for (int i = 0; i < count; i++) {
+        int result = protocol_send_message(sockets[i], msg_type, json_data, NULL);
+        if (result > 0) {
+            sent_count++;
+        }
+    }
     
-    return -1;
+    free(sockets);
+    return sent_count;
 }
 
-// ==================== BROADCAST OPERATIONS ====================
+// ==================== ROOM SHORTCUTS ====================
 
-int broadcast_to_room(int room_id, int msg_type, const char* json_data) {
+int broadcast_register(int socket, int room_id) {
+    char topic[BROADCAST_TOPIC_MAX];
+    room_topic(room_id, topic);
+    return broadcast_subscribe(socket, topic);
+}
+
+int broadcast_update_room(int socket, int room_id) {
     if (!g_broadcast_manager) {
-        return 0;
+        return -1;
     }
     
-    int sent_count = 0;
+    manager_lock();
     
-#ifdef _WIN32
-    EnterCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_lock(&g_broadcast_manager->lock);
-#endif
-    
-    // Iterate through all clients and send to matching room
-    broadcast_client_t* current = g_broadcast_manager->clients;
-    while (current) {
-        if (current->room_id == room_id) {
-            // Send using protocol layer (handles header, byte order, timeout)
-            int result = protocol_send_message(current->socket, msg_type, json_data, NULL);
-            if (result > 0) {
-                sent_count++;
+    // Leave every room topic
+    int found = 0;
+    for (int i = 0; i < BROADCAST_TOPIC_BUCKETS; i++) {
+        broadcast_topic_t* topic = g_broadcast_manager->buckets[i];
+        while (topic) {
+            broadcast_topic_t* next = topic->next;
+            if (strncmp(topic->name, "room:", 5) == 0 && remove_subscriber(topic, socket)) {
+                found = 1;
+                remove_topic_if_empty(topic);
             }
+            topic = next;
         }
-        current = current->next;
     }
     
-#ifdef _WIN32
-    LeaveCriticalSection(&g_broadcast_manager->lock);
-#else
-    pthread_mutex_unlock(&g_broadcast_manager->lock);
-#endif
+    manager_unlock();
     
-    return sent_count;
+    if (!found) {
+        return -1;
+    }
+    return broadcast_register(socket, room_id);
+}
+
+int broadcast_to_room(int room_id, int msg_type, const char* json_data) {
+    char topic[BROADCAST_TOPIC_MAX];
+    room_topic(room_id, topic);
+    return broadcast_publish(topic, msg_type, json_data);
 }
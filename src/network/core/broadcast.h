@@ -10,23 +10,38 @@
     #include <pthread.h>
 #endif
 
+// ==================== CONSTANTS ====================
+
+#define BROADCAST_TOPIC_MAX 64        // Max topic name length including '\0' (e.g. "room:42")
+#define BROADCAST_TOPIC_BUCKETS 256   // Hash buckets for topic lookup
+
 // ==================== DATA STRUCTURES ====================
 
 /**
- * @brief Broadcast client entry (linked list node)
+ * @brief Subscriber entry (linked list node per topic)
+ */
+typedef struct broadcast_subscriber {
+    int socket;                          // Client socket descriptor
+    struct broadcast_subscriber* next;   // Next subscriber of the same topic
+} broadcast_subscriber_t;
+
+/**
+ * @brief Topic with its subscribers (hash bucket chain node)
  */
-typedef struct broadcast_client {
-    int socket;                      // Client socket descriptor
-    int room_id;                     // Room ID client belongs to
-    struct broadcast_client* next;   // Next node in linked list
-} broadcast_client_t;
+typedef struct broadcast_topic {
+    char name[BROADCAST_TOPIC_MAX];      // Topic name, e.g. "room:42", "lobby", "teacher:7"
+    broadcast_subscriber_t* subscribers; // Head of subscriber list
+    int subscriber_count;                // Number of subscribers
+    struct broadcast_topic* next;        // Next topic in the same bucket
+} broadcast_topic_t;
 
 /**
  * @brief Broadcast manager (thread-safe singleton)
  */
 typedef struct {
-    broadcast_client_t* clients;     // Head of client linked list
-    int client_count;                // Total number of registered clients
+    broadcast_topic_t* buckets[BROADCAST_TOPIC_BUCKETS];  // Topic hash table
+    int topic_count;                 // Topics with at least one subscriber
+    int subscription_count;          // Total (socket, topic) pairs
     
 #ifdef _WIN32
     CRITICAL_SECTION lock;           // Windows mutex for thread safety
@@ -46,7 +61,7 @@ extern broadcast_manager_t* g_broadcast_manager;
  * @brief Initialize broadcast manager
  * 
  * Must be called once at server startup before any broadcast operations.
- * Creates global broadcast_manager_t instance with empty client list.
+ * Creates global broadcast_manager_t instance with an empty topic table.
  * Thread-safe: Uses mutex for concurrent access protection.
  */
 void broadcast_init(void);
@@ -55,17 +70,76 @@ void broadcast_init(void);
  * @brief Destroy broadcast manager and free all resources
  * 
  * Must be called at server shutdown after all clients disconnected.
- * Frees all client nodes and destroys mutex.
+ * Frees all topics and subscriber nodes and destroys mutex.
  */
 void broadcast_destroy(void);
 
-// ==================== CLIENT MANAGEMENT ====================
+// ==================== TOPIC SUBSCRIPTIONS ====================
+
+/**
+ * @brief Subscribe a client socket to a topic
+ *
+ * Thread-safe. A socket can subscribe to any number of topics;
+ * subscribing twice to the same topic is a no-op.
+ *
+ * @param socket Client socket descriptor
+ * @param topic Topic name (1 to BROADCAST_TOPIC_MAX - 1 characters)
+ * @return 0 on success, -1 on error (invalid topic, out of memory, not initialized)
+ */
+int broadcast_subscribe(int socket, const char* topic);
+
+/**
+ * @brief Unsubscribe a client socket from a topic
+ *
+ * Thread-safe. Topics without subscribers are freed.
+ *
+ * @param socket Client socket descriptor
+ * @param topic Topic name
+ * @return 0 on success, -1 if the socket was not subscribed
+ */
+int broadcast_unsubscribe(int socket, const char* topic);
+
+/**
+ * @brief Unsubscribe a client socket from all topics
+ *
+ * Thread-safe: Call when the client disconnects.
+ *
+ * @param socket Client socket descriptor to unregister
+ */
+void broadcast_unregister(int socket);
+
+/**
+ * @brief Number of sockets subscribed to a topic
+ *
+ * @param topic Topic name
+ * @return Subscriber count (0 if topic unknown)
+ */
+int broadcast_subscriber_count(const char* topic);
+
+/**
+ * @brief Publish a message to every subscriber of a topic
+ *
+ * Thread-safe: Can be called from any thread.
+ * Subscribers are copied under the lock and messages are sent after it is
+ * released, so a slow client never blocks subscribe/unsubscribe or other
+ * publishers. Uses protocol_send_message() for each subscriber.
+ *
+ * Network Programming Concept: Server-initiated push notification.
+ * Server actively sends data to clients without client request.
+ *
+ * @param topic Target topic
+ * @param msg_type Protocol message type (e.g., MSG_EVENT)
+ * @param json_data JSON payload string
+ * @return Number of clients that successfully received the message
+ */
+int broadcast_publish(const char* topic, int msg_type, const char* json_data);
+
+// ==================== ROOM SHORTCUTS ====================
 
 /**
  * @brief Register a client socket with a room ID
  * 
- * Thread-safe: Can be called from multiple client handler threads.
- * If socket already registered, updates room_id instead of creating duplicate.
+ * Same as broadcast_subscribe(socket, "room:<room_id>").
  * 
  * @param socket Client socket descriptor
  * @param room_id Room ID to associate with client
@@ -74,37 +148,20 @@ void broadcast_destroy(void);
 int broadcast_register(int socket, int room_id);
 
 /**
- * @brief Unregister a client socket
+ * @brief Move a client socket to another room
  * 
- * Thread-safe: Can be called from multiple client handler threads.
- * Removes client from broadcast list and frees memory.
- * 
- * @param socket Client socket descriptor to unregister
- */
-void broadcast_unregister(int socket);
-
-/**
- * @brief Update room ID for an existing client
- * 
- * Thread-safe: Can be called from multiple threads.
+ * Unsubscribes the socket from all "room:" topics and subscribes it to the new one.
  * 
  * @param socket Client socket descriptor
  * @param room_id New room ID to assign
- * @return 0 on success, -1 if socket not found
+ * @return 0 on success, -1 if socket was in no room
  */
 int broadcast_update_room(int socket, int room_id);
 
-// ==================== BROADCAST OPERATIONS ====================
-
 /**
  * @brief Broadcast message to all clients in a room
  * 
- * Thread-safe: Can be called from any thread.
- * Iterates through all registered clients and sends message to those
- * in the specified room. Uses protocol_send_message() for each client.
- * 
- * Network Programming Concept: Server-initiated push notification.
- * Server actively sends data to clients without client request.
+ * Same as broadcast_publish("room:<room_id>", ...).
  * 
  * @param room_id Target room ID
  * @param msg_type Protocol message type (e.g., MSG_ROOM_STATUS)
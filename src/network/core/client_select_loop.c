@@ -1,238 +1,428 @@
 #include "client_select_loop.h"
 #include "protocol.h"
 #include "socket_ops.h"
+#include "thread_pool.h"
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 
 #ifndef _WIN32
     #include <unistd.h>
+    #include <fcntl.h>
+    #include <poll.h>
 #endif
 
-// ==================== GLOBAL STATE ====================
+// ==================== CONSTANTS ====================
 
-select_loop_context_t* g_select_context = NULL;
-
-// ==================== REQUEST QUEUE HELPERS ====================
-
-static void add_request_to_queue(request_node_t* req) {
-#ifdef _WIN32
-    EnterCriticalSection(&g_select_context->lock);
-#else
-    pthread_mutex_lock(&g_select_context->lock);
-#endif
-    
-    req->next = g_select_context->request_queue;
-    g_select_context->request_queue = req;
-    
 #ifdef _WIN32
-    LeaveCriticalSection(&g_select_context->lock);
+    // select() on Windows takes at most FD_SETSIZE sockets; no wake-up pipe,
+    // so attach/stop are noticed within one short timeout
+    #define SELECT_LOOP_MAX_CONNECTIONS FD_SETSIZE
+    #define SELECT_LOOP_TIMEOUT_MS 50
 #else
-    pthread_mutex_unlock(&g_select_context->lock);
+    // poll() has no FD_SETSIZE limit on descriptor numbers (thousands of sockets)
+    #define SELECT_LOOP_MAX_CONNECTIONS 65536
+    #define SELECT_LOOP_TIMEOUT_MS 1000
 #endif
-}
 
-static request_node_t* get_next_unsent_request() {
+// ==================== DATA STRUCTURES ====================
+
+/**
+ * @brief Request queue node (for pending client requests)
+ */
+typedef struct request_node {
+    char* response_buf;              // Buffer for response (owned by caller)
+    int response_buf_size;           // Size of response buffer
+    int completed;                   // 1 if request completed, 0 otherwise
+    int result;                      // Result code (0 = success, -1 = error)
+
 #ifdef _WIN32
-    EnterCriticalSection(&g_select_context->lock);
+    HANDLE event;                    // Windows event for blocking wait
 #else
-    pthread_mutex_lock(&g_select_context->lock);
+    pthread_cond_t cond;             // POSIX condition variable
+    pthread_mutex_t mutex;           // POSIX mutex for condition variable
 #endif
+
+    struct request_node* next;       // Next node in linked list
+} request_node_t;
+
+struct select_loop_conn {
+    int socket;                      // Client socket descriptor
+    volatile int running;            // 0 once stopped or the connection is lost
+    int closing;                     // Stop requested (loop thread drops it)
+    int attached;                    // 1 while the loop thread may use it
+    int owns_loop;                   // Loop created by client_select_loop_start
+    broadcast_callback_t callback;   // Callback for broadcasts
+    char session_token[33];          // Session token (32 chars + null terminator)
+    select_loop_t* loop;             // Loop this connection is attached to
     
-    request_node_t* current = g_select_context->request_queue;
-    while (current) {
-        if (!current->sent && !current->completed) {
+    mutex_t lock;                    // Protects the request queue and callers
+    mutex_t send_lock;               // Queue order == send order (FIFO matching)
+    request_node_t* request_queue;   // Requests sent and waiting for a response
+    int callers;                     // Threads inside client_select_loop_send_request
+
 #ifdef _WIN32
-            LeaveCriticalSection(&g_select_context->lock);
+    CONDITION_VARIABLE idle;         // Signalled when callers drops to 0
 #else
-            pthread_mutex_unlock(&g_select_context->lock);
+    pthread_cond_t idle;             // Signalled when callers drops to 0
 #endif
-            return current;
-        }
-        current = current->next;
-    }
     
+    struct select_loop_conn* next;   // Next connection on the same loop
+};
+
+struct select_loop {
+    volatile int running;            // 1 if loop is running, 0 to stop
+    thread_t thread;                 // Loop thread
+    mutex_t lock;                    // Protects the connection list
+    select_loop_conn_t* conns;       // Attached connections
+    int conn_count;                  // Number of attached connections
+    char* payload;                   // Receive buffer (MAX_PAYLOAD_SIZE)
+
+#ifndef _WIN32
+    int wake_pipe[2];                // Written to interrupt poll()
+#endif
+};
+
+// ==================== HELPERS ====================
+
+static void sleep_ms(int ms) {
 #ifdef _WIN32
-    LeaveCriticalSection(&g_select_context->lock);
+    Sleep(ms);
 #else
-    pthread_mutex_unlock(&g_select_context->lock);
+    usleep(ms * 1000);
 #endif
-    
-    return NULL;
 }
 
-static request_node_t* get_next_sent_request() {
-#ifdef _WIN32
-    EnterCriticalSection(&g_select_context->lock);
+static void wake_loop(select_loop_t* loop) {
+#ifndef _WIN32
+    char byte = 1;
+    // Non-blocking: a full pipe already guarantees a wake-up
+    if (write(loop->wake_pipe[1], &byte, 1) < 0) {
+        return;
+    }
 #else
-    pthread_mutex_lock(&g_select_context->lock);
+    (void)loop;
 #endif
+}
+
+// ==================== REQUEST QUEUE HELPERS ====================
+
+static int add_request_to_queue(select_loop_conn_t* conn, request_node_t* req) {
+    mutex_lock(&conn->lock);
     
-    request_node_t* current = g_select_context->request_queue;
-    while (current) {
-        if (current->sent && !current->completed) {
-#ifdef _WIN32
-            LeaveCriticalSection(&g_select_context->lock);
-#else
-            pthread_mutex_unlock(&g_select_context->lock);
-#endif
-            return current;
-        }
-        current = current->next;
+    // Connection lost or stopping: nobody would complete this request
+    if (!conn->running) {
+        mutex_unlock(&conn->lock);
+        return -1;
     }
     
-#ifdef _WIN32
-    LeaveCriticalSection(&g_select_context->lock);
-#else
-    pthread_mutex_unlock(&g_select_context->lock);
-#endif
+    // Append at tail: responses arrive in send order, so the queue must be FIFO
+    req->next = NULL;
+    if (!conn->request_queue) {
+        conn->request_queue = req;
+    } else {
+        request_node_t* tail = conn->request_queue;
+        while (tail->next) {
+            tail = tail->next;
+        }
+        tail->next = req;
+    }
     
-    return NULL;
+    mutex_unlock(&conn->lock);
+    return 0;
 }
 
 static void complete_request(request_node_t* req, int result) {
-    req->completed = 1;
-    req->result = result;
-    
 #ifdef _WIN32
+    req->result = result;
+    req->completed = 1;
     SetEvent(req->event);
 #else
     pthread_mutex_lock(&req->mutex);
+    req->result = result;
+    req->completed = 1;
     pthread_cond_signal(&req->cond);
     pthread_mutex_unlock(&req->mutex);
 #endif
 }
 
-static void cleanup_completed_requests() {
-#ifdef _WIN32
-    EnterCriticalSection(&g_select_context->lock);
-#else
-    pthread_mutex_lock(&g_select_context->lock);
-#endif
+/**
+ * Complete the oldest waiting request with a response payload.
+ * Runs under the queue lock, so a request failed by its sender is never
+ * completed twice and its waiter cannot free it meanwhile.
+ */
+static void complete_next_request(select_loop_conn_t* conn, const char* payload, int length) {
+    mutex_lock(&conn->lock);
     
-    request_node_t* current = g_select_context->request_queue;
-    request_node_t* prev = NULL;
+    request_node_t* req = conn->request_queue;
+    while (req && req->completed) {
+        req = req->next;
+    }
     
+    if (req) {
+        int copy_len = length;
+        if (copy_len > req->response_buf_size - 1) {
+            copy_len = req->response_buf_size - 1;
+        }
+        memcpy(req->response_buf, payload, copy_len);
+        req->response_buf[copy_len] = '\0';
+        complete_request(req, 0);
+    }
+    
+    mutex_unlock(&conn->lock);
+}
+
+/**
+ * Unlink a request from the queue (called by its waiting thread, which then frees it).
+ * The select loop never frees nodes, so a woken waiter can always read its result.
+ */
+static void remove_request_from_queue(select_loop_conn_t* conn, request_node_t* req) {
+    mutex_lock(&conn->lock);
+    
+    request_node_t* current = conn->request_queue;
+    request_node_t* prev = NULL;
     while (current) {
-        if (current->completed) {
-            request_node_t* to_free = current;
-            
+        if (current == req) {
             if (prev) {
                 prev->next = current->next;
-                current = current->next;
             } else {
-                g_select_context->request_queue = current->next;
-                current = g_select_context->request_queue;
-            }
-            
-            if (to_free->json_data) {
-                free(to_free->json_data);
+                conn->request_queue = current->next;
             }
+            break;
+        }
+        prev = current;
+        current = current->next;
+    }
+    
+    mutex_unlock(&conn->lock);
+}
+
+/**
+ * Register a thread about to use the connection in client_select_loop_send_request.
+ * Fails once the connection is lost or stopping; otherwise client_select_loop_stop()
+ * waits for the matching leave_connection() before freeing anything.
+ */
+static int enter_connection(select_loop_conn_t* conn) {
+    mutex_lock(&conn->lock);
+    if (!conn->running) {
+        mutex_unlock(&conn->lock);
+        return -1;
+    }
+    conn->callers++;
+    mutex_unlock(&conn->lock);
+    return 0;
+}
+
+static void leave_connection(select_loop_conn_t* conn) {
+    mutex_lock(&conn->lock);
+    if (--conn->callers == 0) {
 #ifdef _WIN32
-            CloseHandle(to_free->event);
+        WakeAllConditionVariable(&conn->idle);
 #else
-            pthread_cond_destroy(&to_free->cond);
-            pthread_mutex_destroy(&to_free->mutex);
+        pthread_cond_broadcast(&conn->idle);
 #endif
-            free(to_free);
-        } else {
-            prev = current;
-            current = current->next;
-        }
     }
-    
+    mutex_unlock(&conn->lock);
+}
+
+static void free_request(request_node_t* req) {
 #ifdef _WIN32
-    LeaveCriticalSection(&g_select_context->lock);
+    CloseHandle(req->event);
 #else
-    pthread_mutex_unlock(&g_select_context->lock);
+    pthread_cond_destroy(&req->cond);
+    pthread_mutex_destroy(&req->mutex);
 #endif
+    free(req);
+}
+
+/**
+ * Mark a connection dead and fail every request still waiting (connection
+ * lost or stopping), so callers get an error instead of blocking forever.
+ */
+static void fail_pending_requests(select_loop_conn_t* conn) {
+    mutex_lock(&conn->lock);
+    
+    conn->running = 0;
+    request_node_t* current = conn->request_queue;
+    while (current) {
+        if (!current->completed) {
+            complete_request(current, -1);
+        }
+        current = current->next;
+    }
+    
+    mutex_unlock(&conn->lock);
 }
 
 // ==================== SELECT LOOP THREAD ====================
 
+/**
+ * Receive one message from a readable connection: pushes go to its callback,
+ * anything else answers its oldest waiting request.
+ */
+static void handle_readable(select_loop_t* loop, select_loop_conn_t* conn) {
+    protocol_header_t header;
+    
+    int recv_ret = protocol_receive_message(conn->socket, &header, loop->payload, MAX_PAYLOAD_SIZE);
+    if (recv_ret < 0) {
+        // Connection error: requests in flight will never be answered
+        fail_pending_requests(conn);
+        return;
+    }
+    
+    // Convert header fields to host byte order for comparison
+    uint16_t msg_type = ntohs(header.message_type);
+    
+    // Classify message: server push or response
+    if (protocol_is_push_message(msg_type)) {
+        if (conn->callback) {
+            conn->callback(msg_type, loop->payload);
+        }
+    } else {
+        // Response - complete sent request (FIFO order)
+        complete_next_request(conn, loop->payload, recv_ret);
+    }
+}
+
+/**
+ * Drop connections being stopped and collect the live ones.
+ * Returns the number collected, or -1 if the array could not grow.
+ */
+static int collect_connections(select_loop_t* loop, select_loop_conn_t*** active, int* capacity) {
+    mutex_lock(&loop->lock);
+    
+    select_loop_conn_t** link = &loop->conns;
+    while (*link) {
+        select_loop_conn_t* conn = *link;
+        if (conn->closing) {
+            *link = conn->next;
+            conn->next = NULL;
+            conn->attached = 0;
+            loop->conn_count--;
+        } else {
+            link = &conn->next;
+        }
+    }
+    
+    if (loop->conn_count > *capacity) {
+        int new_capacity = loop->conn_count * 2;
+        select_loop_conn_t** grown = (select_loop_conn_t**)realloc(*active, new_capacity * sizeof(select_loop_conn_t*));
+        if (!grown) {
+            mutex_unlock(&loop->lock);
+            return -1;
+        }
+        *active = grown;
+        *capacity = new_capacity;
+    }
+    
+    // Lost connections stay attached until stopped but are no longer watched
+    int count = 0;
+    for (select_loop_conn_t* conn = loop->conns; conn; conn = conn->next) {
+        if (conn->running) {
+            (*active)[count++] = conn;
+        }
+    }
+    
+    mutex_unlock(&loop->lock);
+    return count;
+}
+
 #ifdef _WIN32
 static DWORD WINAPI select_loop_thread_func(LPVOID arg) {
 #else
 static void* select_loop_thread_func(void* arg) {
 #endif
-    while (g_select_context->running) {
+    select_loop_t* loop = (select_loop_t*)arg;
+    select_loop_conn_t** active = NULL;
+    int capacity = 0;
+#ifndef _WIN32
+    struct pollfd* fds = NULL;
+    int fds_capacity = 0;
+#endif
+
+    while (loop->running) {
+        // Connections collected here cannot be freed before the next pass:
+        // client_select_loop_stop() waits for this thread to drop them
+        int count = collect_connections(loop, &active, &capacity);
+        if (count < 0) {
+            sleep_ms(SELECT_LOOP_TIMEOUT_MS);
+            continue;
+        }
+
+#ifdef _WIN32
+        if (count == 0) {
+            Sleep(SELECT_LOOP_TIMEOUT_MS);
+            continue;
+        }
+        
         // Setup select() parameters
         fd_set read_fds;
         FD_ZERO(&read_fds);
-        FD_SET(g_select_context->socket, &read_fds);
+        for (int i = 0; i < count; i++) {
+            FD_SET(active[i]->socket, &read_fds);
+        }
         
         struct timeval timeout;
-        timeout.tv_sec = 1;
-        timeout.tv_usec = 0;
+        timeout.tv_sec = 0;
+        timeout.tv_usec = SELECT_LOOP_TIMEOUT_MS * 1000;
         
-        // Wait for socket to become readable (I/O multiplexing)
-        int ret = select(g_select_context->socket + 1, &read_fds, NULL, NULL, &timeout);
+        // Wait for any socket to become readable (I/O multiplexing)
+        int ret = select(0, &read_fds, NULL, NULL, &timeout);
+        if (ret <= 0) {
+            continue;
+        }
         
-        if (ret > 0 && FD_ISSET(g_select_context->socket, &read_fds)) {
-            // Socket readable - receive message
-            protocol_header_t header;
-            char payload[MAX_PAYLOAD_SIZE];
-            
-            int recv_ret = protocol_receive_message(
-                g_select_context->socket, 
-                &header, 
-                payload, 
-                MAX_PAYLOAD_SIZE
-            );
-            
-            if (recv_ret >= 0) {
-                // Convert header fields to host byte order for comparison
-                uint16_t msg_type = ntohs(header.message_type);
-                
-                // Classify message: broadcast or response
-                if (msg_type == MSG_ROOM_STATUS) {
-                    // Broadcast - call Python callback
-                    if (g_select_context->callback) {
-                        g_select_context->callback(msg_type, payload);
-                    }
-                } else {
-                    // Response - complete sent request (FIFO order)
-                    request_node_t* req = get_next_sent_request();
-                    if (req) {
-                        int copy_len = recv_ret;  // recv_ret is payload length
-                        if (copy_len > req->response_buf_size - 1) {
-                            copy_len = req->response_buf_size - 1;
-                        }
-                        memcpy(req->response_buf, payload, copy_len);
-                        req->response_buf[copy_len] = '\0';
-                        complete_request(req, 0);
-                    }
-                }
-            } else {
-                // Connection error
-                g_select_context->running = 0;
-                break;
+        for (int i = 0; i < count && loop->running; i++) {
+            if (FD_ISSET(active[i]->socket, &read_fds)) {
+                handle_readable(loop, active[i]);
+            }
+        }
+#else
+        if (count + 1 > fds_capacity) {
+            struct pollfd* grown = (struct pollfd*)realloc(fds, (count + 1) * 2 * sizeof(struct pollfd));
+            if (!grown) {
+                sleep_ms(SELECT_LOOP_TIMEOUT_MS);
+                continue;
             }
+            fds = grown;
+            fds_capacity = (count + 1) * 2;
         }
         
-        // Process unsent requests
-        request_node_t* req = get_next_unsent_request();
-        if (req) {
-            // Send with session token for authenticated requests
-            int send_ret = protocol_send_message(
-                g_select_context->socket, 
-                req->msg_type, 
-                req->json_data, 
-                g_select_context->session_token
-            );
-            if (send_ret > 0) {
-                // Mark as sent, wait for response
-                req->sent = 1;
-            } else {
-                // Send failed
-                complete_request(req, -1);
+        // Slot 0 is the wake-up pipe, then one slot per connection
+        fds[0].fd = loop->wake_pipe[0];
+        fds[0].events = POLLIN;
+        fds[0].revents = 0;
+        for (int i = 0; i < count; i++) {
+            fds[i + 1].fd = active[i]->socket;
+            fds[i + 1].events = POLLIN;
+            fds[i + 1].revents = 0;
+        }
+        
+        // Wait for any socket to become readable (I/O multiplexing)
+        int ret = poll(fds, count + 1, SELECT_LOOP_TIMEOUT_MS);
+        if (ret <= 0) {
+            continue;
+        }
+        
+        if (fds[0].revents) {
+            char drain[64];
+            while (read(loop->wake_pipe[0], drain, sizeof(drain)) > 0) {
             }
         }
         
-        // Cleanup completed requests
-        cleanup_completed_requests();
+        for (int i = 0; i < count && loop->running; i++) {
+            if (fds[i + 1].revents) {
+                handle_readable(loop, active[i]);
+            }
+        }
+#endif
     }
     
+    free(active);
+#ifndef _WIN32
+    free(fds);
+#endif
+
 #ifdef _WIN32
     return 0;
 #else
@@ -242,125 +432,276 @@ static void* select_loop_thread_func(void* arg) {
 
 // ==================== PUBLIC API ====================
 
-int client_select_loop_start(int socket, const char* session_token, broadcast_callback_t callback) {
-    if (g_select_context != NULL) {
-        return -1;  // Already running
+select_loop_t* client_select_loop_create(void) {
+    select_loop_t* loop = (select_loop_t*)calloc(1, sizeof(select_loop_t));
+    if (!loop) {
+        return NULL;
     }
     
-    g_select_context = (select_loop_context_t*)malloc(sizeof(select_loop_context_t));
-    if (!g_select_context) {
-        return -1;
+    loop->payload = (char*)malloc(MAX_PAYLOAD_SIZE);
+    if (!loop->payload) {
+        free(loop);
+        return NULL;
+    }
+
+#ifndef _WIN32
+    if (pipe(loop->wake_pipe) != 0) {
+        free(loop->payload);
+        free(loop);
+        return NULL;
+    }
+    fcntl(loop->wake_pipe[0], F_SETFL, fcntl(loop->wake_pipe[0], F_GETFL) | O_NONBLOCK);
+    fcntl(loop->wake_pipe[1], F_SETFL, fcntl(loop->wake_pipe[1], F_GETFL) | O_NONBLOCK);
+#endif
+
+    mutex_init(&loop->lock);
+    loop->running = 1;
+
+#ifdef _WIN32
+    loop->thread = CreateThread(NULL, 0, select_loop_thread_func, loop, 0, NULL);
+    if (!loop->thread) {
+#else
+    if (pthread_create(&loop->thread, NULL, select_loop_thread_func, loop) != 0) {
+        close(loop->wake_pipe[0]);
+        close(loop->wake_pipe[1]);
+#endif
+        mutex_destroy(&loop->lock);
+        free(loop->payload);
+        free(loop);
+        return NULL;
     }
     
-    g_select_context->socket = socket;
-    g_select_context->running = 1;
-    g_select_context->callback = callback;
-    g_select_context->request_queue = NULL;
-    
-    // Store session token for authenticated requests
-    if (session_token) {
-        strncpy(g_select_context->session_token, session_token, 32);
-        g_select_context->session_token[32] = '\0';
-    } else {
-        g_select_context->session_token[0] = '\0';
+    return loop;
+}
+
+void client_select_loop_destroy(select_loop_t* loop) {
+    if (!loop) {
+        return;
     }
     
+    loop->running = 0;
+    wake_loop(loop);
+
 #ifdef _WIN32
-    InitializeCriticalSection(&g_select_context->lock);
-    g_select_context->thread = CreateThread(NULL, 0, select_loop_thread_func, NULL, 0, NULL);
-    if (!g_select_context->thread) {
-        DeleteCriticalSection(&g_select_context->lock);
-        free(g_select_context);
-        g_select_context = NULL;
-        return -1;
-    }
+    WaitForSingleObject(loop->thread, 5000);
+    CloseHandle(loop->thread);
 #else
-    pthread_mutex_init(&g_select_context->lock, NULL);
-    if (pthread_create(&g_select_context->thread, NULL, select_loop_thread_func, NULL) != 0) {
-        pthread_mutex_destroy(&g_select_context->lock);
-        free(g_select_context);
-        g_select_context = NULL;
-        return -1;
+    pthread_join(loop->thread, NULL);
+#endif
+
+    // Connections nobody stopped: fail their requests and release them from the loop
+    mutex_lock(&loop->lock);
+    select_loop_conn_t* conn = loop->conns;
+    while (conn) {
+        select_loop_conn_t* next = conn->next;
+        fail_pending_requests(conn);
+        conn->next = NULL;
+        conn->loop = NULL;
+        conn->attached = 0;
+        conn = next;
     }
+    loop->conns = NULL;
+    loop->conn_count = 0;
+    mutex_unlock(&loop->lock);
+
+#ifndef _WIN32
+    close(loop->wake_pipe[0]);
+    close(loop->wake_pipe[1]);
 #endif
+    mutex_destroy(&loop->lock);
+    free(loop->payload);
+    free(loop);
+}
+
+int client_select_loop_connection_count(select_loop_t* loop) {
+    if (!loop) {
+        return 0;
+    }
     
-    return 0;
+    mutex_lock(&loop->lock);
+    int count = loop->conn_count;
+    mutex_unlock(&loop->lock);
+    return count;
 }
 
-void client_select_loop_stop() {
-    if (!g_select_context) {
-        return;
+select_loop_conn_t* client_select_loop_attach(select_loop_t* loop, int socket,
+                                              const char* session_token,
+                                              broadcast_callback_t callback) {
+    if (!loop) {
+        return NULL;
     }
     
-    g_select_context->running = 0;
+    select_loop_conn_t* conn = (select_loop_conn_t*)calloc(1, sizeof(select_loop_conn_t));
+    if (!conn) {
+        return NULL;
+    }
     
+    conn->socket = socket;
+    conn->running = 1;
+    conn->callback = callback;
+    conn->loop = loop;
+    
+    // Store session token for authenticated requests
+    if (session_token) {
+        strncpy(conn->session_token, session_token, 32);
+        conn->session_token[32] = '\0';
+    } else {
+        conn->session_token[0] = '\0';
+    }
+    
+    mutex_init(&conn->lock);
+    mutex_init(&conn->send_lock);
 #ifdef _WIN32
-    WaitForSingleObject(g_select_context->thread, 5000);
-    CloseHandle(g_select_context->thread);
-    DeleteCriticalSection(&g_select_context->lock);
+    InitializeConditionVariable(&conn->idle);
 #else
-    pthread_join(g_select_context->thread, NULL);
-    pthread_mutex_destroy(&g_select_context->lock);
+    pthread_cond_init(&conn->idle, NULL);
 #endif
     
-    // Free all remaining requests
-    request_node_t* current = g_select_context->request_queue;
-    while (current) {
-        request_node_t* next = current->next;
-        if (current->json_data) {
-            free(current->json_data);
+    mutex_lock(&loop->lock);
+    if (!loop->running || loop->conn_count >= SELECT_LOOP_MAX_CONNECTIONS) {
+        mutex_unlock(&loop->lock);
+        mutex_destroy(&conn->lock);
+        mutex_destroy(&conn->send_lock);
+#ifndef _WIN32
+        pthread_cond_destroy(&conn->idle);
+#endif
+        free(conn);
+        return NULL;
+    }
+    conn->next = loop->conns;
+    conn->attached = 1;
+    loop->conns = conn;
+    loop->conn_count++;
+    mutex_unlock(&loop->lock);
+    
+    // Start watching the new socket now rather than after the poll timeout
+    wake_loop(loop);
+    return conn;
+}
+
+select_loop_conn_t* client_select_loop_start(int socket, const char* session_token,
+                                             broadcast_callback_t callback) {
+    select_loop_t* loop = client_select_loop_create();
+    if (!loop) {
+        return NULL;
+    }
+    
+    select_loop_conn_t* conn = client_select_loop_attach(loop, socket, session_token, callback);
+    if (!conn) {
+        client_select_loop_destroy(loop);
+        return NULL;
+    }
+    
+    conn->owns_loop = 1;
+    return conn;
+}
+
+void client_select_loop_stop(select_loop_conn_t* conn) {
+    if (!conn) {
+        return;
+    }
+    
+    select_loop_t* loop = conn->loop;
+    if (loop) {
+        // Ask the loop thread to drop the connection and wait until it has
+        mutex_lock(&loop->lock);
+        conn->closing = 1;
+        mutex_unlock(&loop->lock);
+        wake_loop(loop);
+        
+        for (;;) {
+            mutex_lock(&loop->lock);
+            int attached = conn->attached;
+            mutex_unlock(&loop->lock);
+            if (!attached) {
+                break;
+            }
+            sleep_ms(1);
         }
+    }
+    
+    fail_pending_requests(conn);
+    
+    // No new caller gets in once running is 0; wait for the ones inside
+    // (woken waiters still unlink their nodes under the lock) before freeing it
+    mutex_lock(&conn->lock);
+    while (conn->callers > 0) {
 #ifdef _WIN32
-        CloseHandle(current->event);
+        SleepConditionVariableCS(&conn->idle, &conn->lock, INFINITE);
 #else
-        pthread_cond_destroy(&current->cond);
-        pthread_mutex_destroy(&current->mutex);
+        pthread_cond_wait(&conn->idle, &conn->lock);
 #endif
-        free(current);
-        current = next;
     }
+    mutex_unlock(&conn->lock);
     
-    free(g_select_context);
-    g_select_context = NULL;
+    mutex_destroy(&conn->lock);
+    mutex_destroy(&conn->send_lock);
+#ifndef _WIN32
+    pthread_cond_destroy(&conn->idle);
+#endif
+    
+    if (conn->owns_loop) {
+        client_select_loop_destroy(loop);
+    }
+    free(conn);
 }
 
-int client_select_loop_send_request(int msg_type, const char* json_data, 
+int client_select_loop_send_request(select_loop_conn_t* conn, int msg_type, const char* json_data,
                                     char* response_buf, int response_buf_size) {
-    if (!g_select_context || !g_select_context->running) {
+    if (!conn || enter_connection(conn) != 0) {
         return -1;
     }
     
     // Create request node
     request_node_t* req = (request_node_t*)malloc(sizeof(request_node_t));
     if (!req) {
+        leave_connection(conn);
         return -1;
     }
     
-    req->msg_type = msg_type;
-    req->json_data = strdup(json_data);
     req->response_buf = response_buf;
     req->response_buf_size = response_buf_size;
-    req->sent = 0;
     req->completed = 0;
     req->result = -1;
     req->next = NULL;
-    
+
 #ifdef _WIN32
     req->event = CreateEvent(NULL, FALSE, FALSE, NULL);
     if (!req->event) {
-        free(req->json_data);
         free(req);
+        leave_connection(conn);
         return -1;
     }
 #else
     pthread_mutex_init(&req->mutex, NULL);
     pthread_cond_init(&req->cond, NULL);
 #endif
+
+    // Queue and send under one lock: another thread's request cannot be sent
+    // in between, so responses arrive in queue order
+    mutex_lock(&conn->send_lock);
     
-    // Add to queue
-    add_request_to_queue(req);
+    if (add_request_to_queue(conn, req) != 0) {
+        mutex_unlock(&conn->send_lock);
+        free_request(req);
+        leave_connection(conn);
+        return -1;
+    }
     
-    // Block until completed
+    // Sent from this thread: no wait for the loop thread to pick it up
+    int send_ret = protocol_send_message(conn->socket, msg_type, json_data, conn->session_token);
+    if (send_ret <= 0) {
+        // Nothing to wait for (the loop notices the broken connection itself)
+        mutex_lock(&conn->lock);
+        if (!req->completed) {
+            complete_request(req, -1);
+        }
+        mutex_unlock(&conn->lock);
+    }
+    
+    mutex_unlock(&conn->send_lock);
+    
+    // Block until completed (response, send failure or connection loss)
 #ifdef _WIN32
     WaitForSingleObject(req->event, INFINITE);
 #else
@@ -370,11 +711,14 @@ int client_select_loop_send_request(int msg_type, const char* json_data,
     }
     pthread_mutex_unlock(&req->mutex);
 #endif
-    
+
     int result = req->result;
+    remove_request_from_queue(conn, req);
+    free_request(req);
+    leave_connection(conn);
     return result;
 }
 
-int client_select_loop_is_running() {
-    return g_select_context != NULL && g_select_context->running;
+int client_select_loop_is_running(select_loop_conn_t* conn) {
+    return conn != NULL && conn->running;
 }
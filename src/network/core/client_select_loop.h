@@ -8,7 +8,6 @@
     #include <windows.h>
 #else
     #include <pthread.h>
-    #include <sys/select.h>
 #endif
 
 // ==================== CALLBACK TYPE ====================
@@ -24,121 +23,133 @@
  */
 typedef void (*broadcast_callback_t)(int msg_type, const char* json_data);
 
-// ==================== DATA STRUCTURES ====================
+// ==================== HANDLES ====================
 
 /**
- * @brief Request queue node (for pending client requests)
+ * @brief Select loop: one background thread multiplexing any number of connections
+ * 
+ * Opaque; create with client_select_loop_create() (or implicitly with
+ * client_select_loop_start()).
  */
-typedef struct request_node {
-    int msg_type;                    // Protocol message type
-    char* json_data;                 // JSON payload (owned by this struct)
-    char* response_buf;              // Buffer for response (owned by caller)
-    int response_buf_size;           // Size of response buffer
-    int sent;                        // 1 if request already sent, 0 otherwise
-    int completed;                   // 1 if request completed, 0 otherwise
-    int result;                      // Result code (0 = success, -1 = error)
-    
-#ifdef _WIN32
-    HANDLE event;                    // Windows event for blocking wait
-#else
-    pthread_cond_t cond;             // POSIX condition variable
-    pthread_mutex_t mutex;           // POSIX mutex for condition variable
-#endif
-    
-    struct request_node* next;       // Next node in linked list
-} request_node_t;
+typedef struct select_loop select_loop_t;
 
 /**
- * @brief Select loop context (global singleton)
+ * @brief One authenticated connection driven by a select loop
+ * 
+ * Opaque; returned by client_select_loop_start()/client_select_loop_attach()
+ * and passed to every other call. A process can hold as many as it likes.
  */
-typedef struct {
-    int socket;                      // Client socket descriptor
-    int running;                     // 1 if loop is running, 0 to stop
-    broadcast_callback_t callback;   // Python callback for broadcasts
-    char session_token[33];          // Session token (32 chars + null terminator)
-    
-#ifdef _WIN32
-    HANDLE thread;                   // Windows thread handle
-    CRITICAL_SECTION lock;           // Windows mutex for queue
-#else
-    pthread_t thread;                // POSIX thread handle
-    pthread_mutex_t lock;            // POSIX mutex for queue
-#endif
-    
-    request_node_t* request_queue;   // Head of request queue linked list
-} select_loop_context_t;
+typedef struct select_loop_conn select_loop_conn_t;
+
+// ==================== LOOP CONTROL ====================
 
 /**
- * @brief Global select loop context instance
+ * @brief Create a select loop thread with no connections
+ * 
+ * Network Programming Concept: I/O Multiplexing
+ * - One thread waits on every attached socket at once (poll() on POSIX,
+ *   select() on Windows) plus a wake-up pipe used when connections are
+ *   attached or stopped
+ * - Responses are matched to waiting requests; pushes go to the callback
+ * - Thousands of clients can share a handful of loops (in-process load
+ *   tests, multi-account tools)
+ * 
+ * @return Loop handle, or NULL on error
  */
-extern select_loop_context_t* g_select_context;
-
-// ==================== SELECT LOOP CONTROL ====================
+select_loop_t* client_select_loop_create(void);
 
 /**
- * @brief Start select loop in a background thread
+ * @brief Stop a loop thread and free it
  * 
- * Creates a C thread that uses select() to multiplex between:
- * - Incoming broadcast messages from server (non-blocking receive)
- * - Pending requests to send (queued by client_select_loop_send_request)
+ * Stop its connections first. Any still attached are failed (their pending
+ * requests return -1) and must still be released with client_select_loop_stop().
  * 
- * Network Programming Concept: I/O Multiplexing with select()
- * - Single socket monitored for readability
- * - Non-blocking architecture: UI thread never blocks on network I/O
- * - Broadcasts handled asynchronously via callback
- * - Requests queued and processed sequentially
+ * @param loop Loop handle (NULL is ignored)
+ */
+void client_select_loop_destroy(select_loop_t* loop);
+
+/**
+ * @brief Number of connections attached to a loop
+ * @param loop Loop handle
+ * @return Connection count
+ */
+int client_select_loop_connection_count(select_loop_t* loop);
+
+// ==================== CONNECTION CONTROL ====================
+
+/**
+ * @brief Hand a connected, logged-in socket to an existing loop
  * 
+ * @param loop Loop handle (from client_select_loop_create)
+ * @param socket Client socket descriptor (already connected)
+ * @param session_token Session token from login (for authenticated requests)
+ * @param callback Callback for broadcast messages on this connection (may be NULL)
+ * @return Connection handle, or NULL on error (loop full or stopping)
+ */
+select_loop_conn_t* client_select_loop_attach(select_loop_t* loop, int socket,
+                                              const char* session_token,
+                                              broadcast_callback_t callback);
+
+/**
+ * @brief Start a select loop thread of its own for one connection
+ * 
+ * Same as client_select_loop_attach() on a private loop, which
+ * client_select_loop_stop() destroys with the connection.
  * Python calls this once after successful login.
  * 
  * @param socket Client socket descriptor (already connected)
  * @param session_token Session token from login (for authenticated requests)
- * @param callback Python callback function for broadcast messages
- * @return 0 on success, -1 on error
+ * @param callback Callback for broadcast messages
+ * @return Connection handle, or NULL on error
  */
-int client_select_loop_start(int socket, const char* session_token, broadcast_callback_t callback);
+select_loop_conn_t* client_select_loop_start(int socket, const char* session_token,
+                                             broadcast_callback_t callback);
 
 /**
- * @brief Stop select loop thread and cleanup resources
+ * @brief Detach a connection from its loop and free it
  * 
- * Signals thread to stop, waits for thread to finish (pthread_join),
- * destroys mutex, frees all queued requests, and frees context.
+ * Waits until the loop thread no longer uses the connection, fails any
+ * request still waiting (its caller gets -1), waits for every
+ * client_select_loop_send_request() in progress to return, and frees the
+ * handle. The socket itself is not closed. Must not be called from the
+ * broadcast callback, nor concurrently with a send_request that has not
+ * started yet (the handle is gone once this returns).
  * 
  * Python calls this when disconnecting or closing application.
+ * 
+ * @param conn Connection handle (NULL is ignored)
  */
-void client_select_loop_stop(void);
+void client_select_loop_stop(select_loop_conn_t* conn);
 
 // ==================== REQUEST HANDLING ====================
 
 /**
  * @brief Send request and wait for response (blocking, thread-safe)
  * 
- * Queues request in select loop thread and blocks until response arrives.
- * Select loop thread will:
- * 1. Send request to server
- * 2. Wait for response via select()
- * 3. Copy response to caller's buffer
- * 4. Wake up this waiting thread
- * 
- * Thread-safe: Multiple Python threads can call this concurrently.
+ * The calling thread queues the request and sends it at once (no wait for
+ * the loop thread), then blocks until the loop thread receives the response:
+ * 1. Queue request and send it to server (in queue order)
+ * 2. Loop thread receives the response via poll()/select()
+ * 3. Loop thread copies it to caller's buffer
+ * 4. Loop thread wakes up this waiting thread
  * 
- * Network Programming Concept: Asynchronous send with synchronous wait
- * - Actual send() happens in select loop thread
- * - Caller blocks on condition variable/event
- * - Avoids race conditions between send/recv
+ * Thread-safe: Multiple threads can call this concurrently on one connection.
  * 
+ * @param conn Connection handle
  * @param msg_type Protocol message type
  * @param json_data JSON payload string
  * @param response_buf Buffer to store response (caller-owned)
  * @param response_buf_size Size of response buffer
- * @return 0 on success, -1 on error
+ * @return 0 on success, -1 on error (including connection lost while waiting)
  */
-int client_select_loop_send_request(int msg_type, const char* json_data,
+int client_select_loop_send_request(select_loop_conn_t* conn, int msg_type, const char* json_data,
                                     char* response_buf, int response_buf_size);
 
 /**
- * @brief Check if select loop is currently running
- * @return 1 if running, 0 otherwise
+ * @brief Check if a connection is still usable
+ * @param conn Connection handle
+ * @return 1 if running, 0 if stopped or the connection was lost
  */
-int client_select_loop_is_running(void);
+int client_select_loop_is_running(select_loop_conn_t* conn);
 
 #endif // CLIENT_SELECT_LOOP_H
@@ -1,8 +1,46 @@
 #include "protocol.h"
 #include "utils.h"
+#include "thread_pool.h"
 #include <string.h>
 #include <time.h>
 
+// ==================== PER-SOCKET SEND LOCKS ====================
+
+// Striped locks: sockets hash onto a fixed set of mutexes (no per-socket allocation)
+#define SEND_LOCK_STRIPES 64
+
+static mutex_t g_send_locks[SEND_LOCK_STRIPES];
+
+#ifdef _WIN32
+static INIT_ONCE g_send_locks_once = INIT_ONCE_STATIC_INIT;
+
+static BOOL CALLBACK init_send_locks(PINIT_ONCE once, PVOID param, PVOID* context) {
+    (void)once; (void)param; (void)context;
+    for (int i = 0; i < SEND_LOCK_STRIPES; i++) {
+        mutex_init(&g_send_locks[i]);
+    }
+    return TRUE;
+}
+
+static mutex_t* get_send_lock(socket_t socket) {
+    InitOnceExecuteOnce(&g_send_locks_once, init_send_locks, NULL, NULL);
+    return &g_send_locks[(size_t)socket % SEND_LOCK_STRIPES];
+}
+#else
+static pthread_once_t g_send_locks_once = PTHREAD_ONCE_INIT;
+
+static void init_send_locks(void) {
+    for (int i = 0; i < SEND_LOCK_STRIPES; i++) {
+        mutex_init(&g_send_locks[i]);
+    }
+}
+
+static mutex_t* get_send_lock(socket_t socket) {
+    pthread_once(&g_send_locks_once, init_send_locks);
+    return &g_send_locks[(unsigned int)socket % SEND_LOCK_STRIPES];
+}
+#endif
+
 void protocol_init_header(protocol_header_t* header, uint16_t msg_type,
                           uint32_t length, const char* session_token) {
     // Zero out entire header first
@@ -51,33 +89,47 @@ int protocol_validate_header(protocol_header_t* header) {
     return 0;  // Header is valid
 }
 
+int protocol_is_push_message(uint16_t msg_type) {
+    return msg_type == MSG_ROOM_STATUS ||
+           msg_type == MSG_ROOM_PROGRESS ||
+           msg_type == MSG_EVENT;
+}
+
 int protocol_send_message(socket_t socket, uint16_t msg_type, 
                           const char* payload, const char* session_token) {
     protocol_header_t header;
     uint32_t payload_length = (payload != NULL) ? strlen(payload) : 0;
+    int result;
     
     // Step 1: Initialize header
     protocol_init_header(&header, msg_type, payload_length, session_token);
     
+    // Header and payload are two sends: hold the socket's lock across both
+    // so a concurrent push cannot land between them
+    mutex_t* send_lock = get_send_lock(socket);
+    mutex_lock(send_lock);
+    
     // Step 2: Send header
     // Network Programming Note:
     // We send the header as-is since multi-byte fields are already
     // in network byte order (big-endian) from init_header()
     int header_sent = socket_send_data(socket, (char*)&header, sizeof(protocol_header_t));
     if (header_sent != sizeof(protocol_header_t)) {
-        return -1;  // Header send failed
-    }
-    
-    // Step 3: Send payload if exists
-    if (payload_length > 0) {
+        result = -1;  // Header send failed
+    } else if (payload_length > 0) {
+        // Step 3: Send payload if exists
         int payload_sent = socket_send_data(socket, payload, payload_length);
         if (payload_sent != (int)payload_length) {
-            return -2;  // Payload send failed
+            result = -2;  // Payload send failed
+        } else {
+            result = header_sent + payload_sent;  // Total bytes sent
         }
-        return header_sent + payload_sent;  // Total bytes sent
+    } else {
+        result = header_sent;  // Only header sent
     }
     
-    return header_sent;  // Only header sent
+    mutex_unlock(send_lock);
+    return result;
 }
 
 int protocol_receive_message(socket_t socket, protocol_header_t* header,
@@ -17,6 +17,8 @@
 #define MSG_LOGIN_RES 0x0004
 #define MSG_LOGOUT_REQ 0x0005
 #define MSG_LOGOUT_RES 0x0006
+#define MSG_RESUME_REQ 0x0007
+#define MSG_RESUME_RES 0x0008
 
 // Message Types - Test Flow (Legacy)
 #define MSG_TEST_CONFIG 0x0010
@@ -65,6 +67,40 @@
 #define MSG_AUTO_SAVE_REQ        0x004E
 #define MSG_AUTO_SAVE_RES        0x004F
 
+// Message Types - Question Bank
+#define MSG_BULK_ADD_QUESTIONS_REQ 0x0050
+#define MSG_BULK_ADD_QUESTIONS_RES 0x0051
+#define MSG_CLONE_ROOM_REQ         0x0052
+#define MSG_CLONE_ROOM_RES         0x0053
+#define MSG_SEARCH_QUESTIONS_REQ   0x0054
+#define MSG_SEARCH_QUESTIONS_RES   0x0055
+
+// Message Types - Live Monitoring (server push)
+#define MSG_ROOM_PROGRESS 0x0058
+
+// Message Types - Exam Prefetch (encrypted questions before start)
+#define MSG_PREFETCH_EXAM_REQ 0x005A
+#define MSG_PREFETCH_EXAM_RES 0x005B
+
+// Message Types - Topic Subscriptions (publish/subscribe)
+#define MSG_SUBSCRIBE_REQ    0x0060
+#define MSG_SUBSCRIBE_RES    0x0061
+#define MSG_UNSUBSCRIBE_REQ  0x0062
+#define MSG_UNSUBSCRIBE_RES  0x0063
+#define MSG_EVENT            0x0064
+
+// Message Types - Server Monitoring (teacher/admin)
+#define MSG_SERVER_STATS_REQ 0x0070
+#define MSG_SERVER_STATS_RES 0x0071
+#define MSG_PROFILE_START_REQ 0x0072
+#define MSG_PROFILE_START_RES 0x0073
+#define MSG_PROFILE_STOP_REQ  0x0074
+#define MSG_PROFILE_STOP_RES  0x0075
+#define MSG_MEMORY_SNAPSHOT_REQ 0x0076
+#define MSG_MEMORY_SNAPSHOT_RES 0x0077
+#define MSG_SQL_TIMING_REQ    0x0078
+#define MSG_SQL_TIMING_RES    0x0079
+
 // Message Types - Control
 #define MSG_ERROR     0x00FF
 #define MSG_HEARTBEAT 0x00FE
@@ -81,6 +117,7 @@
 #define ERR_CONFLICT        5000
 #define ERR_USERNAME_EXISTS 5001
 #define ERR_INTERNAL        6000
+#define ERR_SERVER_BUSY     6003
 
 // Force struct to be packed without padding (cross-platform)
 #ifdef _WIN32
@@ -122,8 +159,19 @@ void protocol_init_header(protocol_header_t* header, uint16_t msg_type,
  */
 int protocol_validate_header(protocol_header_t* header);
 
+/**
+ * @brief Check if a message type is a server push (not a response to a request)
+ * @param msg_type Message type code
+ * @return 1 for push messages (ROOM_STATUS, ROOM_PROGRESS, EVENT), 0 otherwise
+ */
+int protocol_is_push_message(uint16_t msg_type);
+
 /**
  * @brief Send protocol message (header + payload)
+ * 
+ * Thread-safe per socket: header and payload are sent under a per-socket
+ * lock, so pushes from one thread never interleave with responses from another.
+ * 
  * @param socket Socket descriptor
  * @param msg_type Message type code
  * @param payload Payload data (NULL if none)
@@ -25,6 +25,10 @@ void socket_cleanup_network(void) {
 // ==================== SERVER OPERATIONS ====================
 
 socket_t socket_create_server(int port) {
+    return socket_create_server_on(NULL, port);
+}
+
+socket_t socket_create_server_on(const char* host, int port) {
     socket_t server_socket;
     struct sockaddr_in server_addr;
     int opt = 1;
@@ -47,6 +51,15 @@ socket_t socket_create_server(int port) {
     memset(&server_addr, 0, sizeof(server_addr));
     server_addr.sin_family = AF_INET;           // IPv4
     server_addr.sin_addr.s_addr = INADDR_ANY;   // Bind to all interfaces (0.0.0.0)
+    if (host && *host) {
+        // Only accept connections on one interface (e.g. 127.0.0.1 behind a proxy)
+        unsigned long addr = inet_addr(host);
+        if (addr == INADDR_NONE) {
+            closesocket(server_socket);
+            return INVALID_SOCKET;
+        }
+        server_addr.sin_addr.s_addr = addr;
+    }
     server_addr.sin_port = htons(port);         // Convert port to network byte order
 
     // Step 4: Bind socket to local address and port
@@ -45,6 +45,14 @@ void socket_cleanup_network(void);
  */
 socket_t socket_create_server(int port);
 
+/**
+ * @brief Create and configure TCP server socket on one local address
+ * @param host IPv4 address to bind (NULL or "" for all interfaces)
+ * @param port Port number to bind
+ * @return Socket descriptor on success, INVALID_SOCKET on failure
+ */
+socket_t socket_create_server_on(const char* host, int port);
+
 /**
  * @brief Accept incoming client connection (blocking)
  * @param server_socket Server socket descriptor
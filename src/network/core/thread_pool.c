@@ -182,7 +182,13 @@ void server_context_destroy(server_context_t* ctx) {
         
         // Step 2: Close server socket to unblock accept()
         // This causes accept() to fail immediately, allowing graceful shutdown
+        // (on Linux close() alone does not wake a thread blocked in accept())
         if (ctx->server_socket != INVALID_SOCKET) {
+#ifdef _WIN32
+            shutdown(ctx->server_socket, SD_BOTH);
+#else
+            shutdown(ctx->server_socket, SHUT_RDWR);
+#endif
             socket_close(ctx->server_socket);
             ctx->server_socket = INVALID_SOCKET;
         }
@@ -14,6 +14,10 @@ socket_t py_create_server(int port) {
     return socket_create_server(port);
 }
 
+socket_t py_create_server_on(const char* host, int port) {
+    return socket_create_server_on(host, port);
+}
+
 socket_t py_accept_client(socket_t server_socket) {
     return socket_accept_client(server_socket);
 }
@@ -109,21 +113,56 @@ int py_broadcast_to_room(int room_id, int msg_type, const char* json_data) {
     return broadcast_to_room(room_id, msg_type, json_data);
 }
 
+int py_broadcast_subscribe(socket_t socket, const char* topic) {
+    return broadcast_subscribe(socket, topic);
+}
+
+int py_broadcast_unsubscribe(socket_t socket, const char* topic) {
+    return broadcast_unsubscribe(socket, topic);
+}
+
+int py_broadcast_publish(const char* topic, int msg_type, const char* json_data) {
+    return broadcast_publish(topic, msg_type, json_data);
+}
+
+int py_broadcast_subscriber_count(const char* topic) {
+    return broadcast_subscriber_count(topic);
+}
+
 // ==================== CLIENT SELECT LOOP API ====================
 
-int py_client_select_loop_start(socket_t socket, const char* session_token, py_broadcast_callback_t callback) {
+void* py_client_select_loop_create(void) {
+    return client_select_loop_create();
+}
+
+void py_client_select_loop_destroy(void* loop) {
+    client_select_loop_destroy((select_loop_t*)loop);
+}
+
+int py_client_select_loop_connection_count(void* loop) {
+    return client_select_loop_connection_count((select_loop_t*)loop);
+}
+
+void* py_client_select_loop_attach(void* loop, socket_t socket, const char* session_token,
+                                   py_broadcast_callback_t callback) {
+    return client_select_loop_attach((select_loop_t*)loop, socket, session_token,
+                                     (broadcast_callback_t)callback);
+}
+
+void* py_client_select_loop_start(socket_t socket, const char* session_token, py_broadcast_callback_t callback) {
     return client_select_loop_start(socket, session_token, (broadcast_callback_t)callback);
 }
 
-void py_client_select_loop_stop(void) {
-    client_select_loop_stop();
+void py_client_select_loop_stop(void* conn) {
+    client_select_loop_stop((select_loop_conn_t*)conn);
 }
 
-int py_client_select_loop_send_request(int msg_type, const char* json_data,
+int py_client_select_loop_send_request(void* conn, int msg_type, const char* json_data,
                                         char* response_buf, int response_buf_size) {
-    return client_select_loop_send_request(msg_type, json_data, response_buf, response_buf_size);
+    return client_select_loop_send_request((select_loop_conn_t*)conn, msg_type, json_data,
+                                           response_buf, response_buf_size);
 }
 
-int py_client_select_loop_is_running(void) {
-    return client_select_loop_is_running();
+int py_client_select_loop_is_running(void* conn) {
+    return client_select_loop_is_running((select_loop_conn_t*)conn);
 }
\ No newline at end of file
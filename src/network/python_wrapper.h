@@ -21,6 +21,14 @@ void py_cleanup_network(void);
  */
 socket_t py_create_server(int port);
 
+/**
+ * @brief Create server socket bound to one local address
+ * @param host IPv4 address (NULL or "" for all interfaces)
+ * @param port Port number
+ * @return Socket descriptor or INVALID_SOCKET
+ */
+socket_t py_create_server_on(const char* host, int port);
+
 /**
  * @brief Accept client connection
  * @param server_socket Server socket descriptor
@@ -194,6 +202,38 @@ int py_broadcast_update_room(socket_t socket, int room_id);
  */
 int py_broadcast_to_room(int room_id, int msg_type, const char* json_data);
 
+/**
+ * @brief Subscribe a client socket to a topic
+ * @param socket Client socket descriptor
+ * @param topic Topic name (e.g. "lobby", "room:42", "teacher:7")
+ * @return 0 on success, -1 on error
+ */
+int py_broadcast_subscribe(socket_t socket, const char* topic);
+
+/**
+ * @brief Unsubscribe a client socket from a topic
+ * @param socket Client socket descriptor
+ * @param topic Topic name
+ * @return 0 on success, -1 if not subscribed
+ */
+int py_broadcast_unsubscribe(socket_t socket, const char* topic);
+
+/**
+ * @brief Publish message to all subscribers of a topic
+ * @param topic Topic name
+ * @param msg_type Message type
+ * @param json_data JSON payload
+ * @return Number of clients that received the message
+ */
+int py_broadcast_publish(const char* topic, int msg_type, const char* json_data);
+
+/**
+ * @brief Number of sockets subscribed to a topic
+ * @param topic Topic name
+ * @return Subscriber count
+ */
+int py_broadcast_subscriber_count(const char* topic);
+
 // ==================== CLIENT SELECT LOOP API ====================
 
 /**
@@ -204,34 +244,67 @@ int py_broadcast_to_room(int room_id, int msg_type, const char* json_data);
 typedef void (*py_broadcast_callback_t)(int msg_type, const char* json_data);
 
 /**
- * @brief Start client select loop in background thread
+ * @brief Create a select loop thread that can drive many connections
+ * @return Loop handle, or NULL on error
+ */
+void* py_client_select_loop_create(void);
+
+/**
+ * @brief Stop a select loop thread (stop its connections first)
+ * @param loop Loop handle
+ */
+void py_client_select_loop_destroy(void* loop);
+
+/**
+ * @brief Number of connections attached to a loop
+ * @param loop Loop handle
+ * @return Connection count
+ */
+int py_client_select_loop_connection_count(void* loop);
+
+/**
+ * @brief Drive a logged-in connection from an existing loop
+ * @param loop Loop handle
  * @param socket Client socket descriptor
  * @param session_token Session token for authenticated requests
  * @param callback Python callback for broadcast messages
- * @return 0 on success, -1 on error
+ * @return Connection handle, or NULL on error
+ */
+void* py_client_select_loop_attach(void* loop, socket_t socket, const char* session_token,
+                                   py_broadcast_callback_t callback);
+
+/**
+ * @brief Start client select loop in background thread (one connection)
+ * @param socket Client socket descriptor
+ * @param session_token Session token for authenticated requests
+ * @param callback Python callback for broadcast messages
+ * @return Connection handle, or NULL on error
  */
-int py_client_select_loop_start(socket_t socket, const char* session_token, py_broadcast_callback_t callback);
+void* py_client_select_loop_start(socket_t socket, const char* session_token, py_broadcast_callback_t callback);
 
 /**
- * @brief Stop client select loop thread
+ * @brief Stop a connection's select loop (detach it and free the handle)
+ * @param conn Connection handle
  */
-void py_client_select_loop_stop(void);
+void py_client_select_loop_stop(void* conn);
 
 /**
  * @brief Send request and wait for response (blocking, thread-safe)
+ * @param conn Connection handle
  * @param msg_type Message type
  * @param json_data JSON payload
  * @param response_buf Buffer for response
  * @param response_buf_size Buffer size
  * @return 0 on success, -1 on error
  */
-int py_client_select_loop_send_request(int msg_type, const char* json_data,
+int py_client_select_loop_send_request(void* conn, int msg_type, const char* json_data,
                                         char* response_buf, int response_buf_size);
 
 /**
- * @brief Check if select loop is running
+ * @brief Check if a connection's select loop is running
+ * @param conn Connection handle
  * @return 1 if running, 0 otherwise
  */
-int py_client_select_loop_is_running(void);
+int py_client_select_loop_is_running(void* conn);
 
 #endif // PYTHON_WRAPPER_H
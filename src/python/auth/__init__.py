@@ -5,6 +5,9 @@ Auth and session management only (database moved to database package)
 
 from .auth import AuthManager
 from .session import SessionManager
+from .tokens import SessionTokenSigner
+from .session_store import SQLiteSessionStore
+from .hash_pool import HashWorkerPool, PoolBusyError
 
-__all__ = ['AuthManager', 'SessionManager']
+__all__ = ['AuthManager', 'SessionManager', 'SessionTokenSigner', 'SQLiteSessionStore', 'HashWorkerPool', 'PoolBusyError']
 
@@ -0,0 +1,161 @@
+"""
+Password Hash Pool
+Bounded worker pool for PBKDF2 hashing with a FIFO admission queue
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from .auth import AuthManager
+
+
+class PoolBusyError(Exception):
+    """Admission queue is full (or the wait deadline passed)"""
+
+
+class _Job:
+    """One queued hash call"""
+    
+    __slots__ = ('func', 'args', 'enqueued_at', 'done', 'result', 'error', 'cancelled')
+    
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+
+class HashWorkerPool:
+    """
+    Run password hashing on a fixed number of worker threads
+    
+    hashlib.pbkdf2_hmac releases the GIL while it runs, so threads give real
+    parallelism here without the cost of a process pool. Capping the workers
+    leaves cores free for other requests during a login storm; extra logins
+    wait in a FIFO queue, and are refused with PoolBusyError once the queue
+    is full instead of piling up without bound.
+    """
+    
+    def __init__(self, workers=None, max_queue=256, wait_timeout=20):
+        """
+        Initialize pool and start workers
+        
+        Args:
+            workers: Worker threads (default: half the CPU cores, at least 1)
+            max_queue: Max hash calls waiting for a worker
+            wait_timeout: Max seconds a caller waits in queue + hashing
+        """
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._recent_waits = deque(maxlen=500)  # Queue wait of recent jobs (seconds)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_depth = 0
+        
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"hash-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def _worker(self):
+        """Take jobs from the queue in order and run them"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            
+            if job.cancelled:
+                continue
+            
+            with self._stats_lock:
+                self._recent_waits.append(time.monotonic() - job.enqueued_at)
+            
+            try:
+                job.result = job.func(*job.args)
+            except Exception as e:
+                job.error = e
+            finally:
+                with self._stats_lock:
+                    self.completed += 1
+                job.done.set()
+    
+    def submit(self, func, *args):
+        """
+        Run func(*args) on a worker and wait for the result
+        
+        Raises:
+            PoolBusyError: Queue full, or no result within wait_timeout
+        """
+        job = _Job(func, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise PoolBusyError("Server is busy verifying logins, please retry shortly")
+        
+        with self._stats_lock:
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        
+        if not job.done.wait(self.wait_timeout):
+            job.cancelled = True  # Worker skips it if it has not started yet
+            with self._stats_lock:
+                self.timed_out += 1
+            raise PoolBusyError("Login verification timed out, please retry shortly")
+        
+        if job.error:
+            raise job.error
+        return job.result
+    
+    def hash_password(self, password):
+        """Pooled AuthManager.hash_password"""
+        return self.submit(AuthManager.hash_password, password)
+    
+    def verify_password(self, password, hash_with_salt):
+        """Pooled AuthManager.verify_password"""
+        return self.submit(AuthManager.verify_password, password, hash_with_salt)
+    
+    def get_stats(self):
+        """
+        Get queue metrics
+        
+        Returns:
+            dict: depth, max_depth, workers, completed, rejected, timed_out,
+                  avg_wait_ms and p95_wait_ms over recent jobs
+        """
+        with self._stats_lock:
+            waits = sorted(self._recent_waits)
+            stats = {
+                'depth': self._queue.qsize(),
+                'max_depth': self.max_depth,
+                'max_queue': self.max_queue,
+                'workers': self.workers,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out
+            }
+        
+        if waits:
+            stats['avg_wait_ms'] = round(sum(waits) / len(waits) * 1000, 1)
+            stats['p95_wait_ms'] = round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1)
+        else:
+            stats['avg_wait_ms'] = 0.0
+            stats['p95_wait_ms'] = 0.0
+        return stats
+    
+    def shutdown(self):
+        """Stop workers after queued jobs finish"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
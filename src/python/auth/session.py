@@ -2,21 +2,168 @@
 Session Management
 Handles user sessions and authentication tokens
 """
-import secrets
-from datetime import datetime, timedelta
+import heapq
+import threading
+import time
+from .tokens import SessionTokenSigner
+
+
+class SessionRecord:
+    """
+    One logged-in session
+    
+    Times are time.monotonic() floats so wall-clock changes cannot expire or
+    revive sessions. Supports session['field'] access like the old dicts;
+    'expires_at' reads as a Unix timestamp (the value signed into the token).
+    """
+    
+    __slots__ = ('user_id', 'username', 'role', 'full_name',
+                 'created_at', 'expires', 'last_activity', 'expires_at')
+    
+    def __init__(self, user_id, username, role, full_name, expires_at):
+        now = time.monotonic()
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.full_name = full_name
+        self.created_at = now
+        self.last_activity = now
+        self.expires_at = expires_at
+        self.expires = now + (expires_at - time.time())
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+class _Stripe:
+    """One lock and the sessions / revoked tokens hashed to it"""
+    
+    __slots__ = ('lock', 'sessions', 'revoked')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}  # {token: SessionRecord}
+        self.revoked = {}   # {token: monotonic expiry} for logged-out tokens until they expire
+
 
 class SessionManager:
-    """Manage user sessions"""
+    """
+    Manage user sessions
+    
+    Sessions are spread over lock stripes by token hash, so client threads
+    rarely contend. A user_id index makes per-user lookups O(1), and a
+    min-heap of expiries lets a background sweeper drop expired sessions
+    and revoked tokens without scanning everything. With a store, sessions
+    and signing keys survive a restart.
+    """
     
-    def __init__(self, session_duration_hours=24):
+    def __init__(self, session_duration_hours=24, signer=None, user_loader=None,
+                 stripes=16, sweep_interval=30, store=None):
         """
         Initialize session manager
         
         Args:
             session_duration_hours (int): Session expiration time in hours
+            signer (SessionTokenSigner): Token signer (random key if None)
+            user_loader (callable): user_id -> user dict, used to rebuild sessions
+                for valid tokens issued by another process (or before a restart)
+            stripes (int): Number of lock stripes (rounded up to a power of two)
+            sweep_interval (float): Seconds between expiry sweeps (None: no sweeper thread)
+            store (SQLiteSessionStore): Optional persistence; keys and sessions are loaded from it
         """
-        self.sessions = {}  # {token: session_data}
-        self.session_duration = timedelta(hours=session_duration_hours)
+        self.session_duration = session_duration_hours * 3600
+        self.user_loader = user_loader
+        self.store = store
+        
+        if store is not None and signer is None:
+            keys, active_kid = store.load_keys()
+            if keys:
+                signer = SessionTokenSigner(keys, active_kid)
+        self.signer = signer or SessionTokenSigner()
+        
+        size = 1
+        while size < stripes:
+            size *= 2
+        self._stripes = [_Stripe() for _ in range(size)]
+        self._mask = size - 1
+        
+        self._user_lock = threading.Lock()
+        self._user_tokens = {}  # {user_id: set(tokens)}
+        
+        self._heap_lock = threading.Lock()
+        self._expiry_heap = []  # [(monotonic expiry, token)], may hold stale entries
+        
+        if store is not None:
+            store.save_keys(self.signer.keys, self.signer.active_kid)
+            self._load_from_store()
+        
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                             name="session-sweeper", daemon=True)
+            self._sweeper.start()
+    
+    def _stripe(self, token):
+        return self._stripes[hash(token) & self._mask]
+    
+    def _schedule_expiry(self, expires, token):
+        with self._heap_lock:
+            heapq.heappush(self._expiry_heap, (expires, token))
+    
+    def _add(self, token, record):
+        """Store a record and index it"""
+        stripe = self._stripe(token)
+        with stripe.lock:
+            stripe.sessions[token] = record
+        with self._user_lock:
+            self._user_tokens.setdefault(record.user_id, set()).add(token)
+        self._schedule_expiry(record.expires, token)
+        if self.store is not None:
+            self.store.put(token, record)
+    
+    def _remove(self, token):
+        """Drop a record and its index entry, returns the record or None"""
+        stripe = self._stripe(token)
+        with stripe.lock:
+            record = stripe.sessions.pop(token, None)
+        if record is not None:
+            self._unindex(record.user_id, token)
+            if self.store is not None:
+                self.store.delete(token)
+        return record
+    
+    def _load_from_store(self):
+        """Bulk load saved sessions at startup (before any other thread runs)"""
+        sessions, revoked = self.store.load_sessions()
+        now_mono, now_wall = time.monotonic(), time.time()
+        
+        for token, user_id, username, role, full_name, expires_at in sessions:
+            record = SessionRecord(user_id, username, role, full_name, expires_at)
+            self._stripe(token).sessions[token] = record
+            self._user_tokens.setdefault(user_id, set()).add(token)
+            self._expiry_heap.append((record.expires, token))
+        
+        for token, expires_at in revoked:
+            expires = now_mono + (expires_at - now_wall)
+            self._stripe(token).revoked[token] = expires
+            self._expiry_heap.append((expires, token))
+        
+        heapq.heapify(self._expiry_heap)
+    
+    def _unindex(self, user_id, token):
+        with self._user_lock:
+            tokens = self._user_tokens.get(user_id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._user_tokens[user_id]
     
     def create_session(self, user_id, username, role, full_name):
         """
@@ -27,50 +174,70 @@ class SessionManager:
             username (str): Username
             role (str): User role (student/teacher)
             full_name (str): User's full name
-            
-        Returns:
-            str: Session token
-        """
-        # Generate secure random token
-        token = secrets.token_urlsafe(32)
-        
-        # Store session data
-        self.sessions[token] = {
-            'user_id': user_id,
-            'username': username,
-            'role': role,
-            'full_name': full_name,
-            'created_at': datetime.now(),
-            'expires_at': datetime.now() + self.session_duration,
-            'last_activity': datetime.now()
-        }
         
+        Returns:
+            str: Signed session token (31 chars, fits the protocol header)
+        """
+        expires_at = int(time.time() + self.session_duration)
+        token = self.signer.issue(user_id, role, expires_at)
+        self._add(token, SessionRecord(user_id, username, role, full_name, expires_at))
         return token
     
+    def verify_token(self, token):
+        """
+        Check a token's signature and expiry without a session lookup
+        
+        Args:
+            token (str): Session token
+        
+        Returns:
+            dict or None: Token claims (user_id, role, expires_at, kid) if valid
+        """
+        claims = self.signer.verify(token)
+        if claims is None or token in self._stripe(token).revoked:
+            return None
+        return claims
+    
     def validate_session(self, token):
         """
         Validate session token
         
         Args:
             token (str): Session token
-            
+        
         Returns:
-            dict or None: Session data if valid, None if invalid
+            SessionRecord or None: Session data if valid, None if invalid
         """
-        if token not in self.sessions:
+        claims = self.verify_token(token)
+        if claims is None:
+            # Bad signature, expired or logged out
+            self._remove(token)
             return None
         
-        session = self.sessions[token]
+        session = self._stripe(token).sessions.get(token)
+        if session is None:
+            # Valid token this process has not seen: rebuild the session from the user record
+            session = self._restore_session(token, claims)
+            if session is None:
+                return None
+        
+        # Update last activity
+        session.last_activity = time.monotonic()
         
-        # Check if session expired
-        if datetime.now() > session['expires_at']:
-            # Remove expired session
-            del self.sessions[token]
+        return session
+    
+    def _restore_session(self, token, claims):
+        """Create session data for a verified token from the user record"""
+        if not self.user_loader:
             return None
         
-        # Update last activity
-        session['last_activity'] = datetime.now()
+        user = self.user_loader(claims['user_id'])
+        if not user or user['role'] != claims['role']:
+            return None
         
+        session = SessionRecord(user['id'], user['username'], user['role'],
+                                user['full_name'], claims['expires_at'])
+        self._add(token, session)
         return session
     
     def get_session(self, token):
@@ -79,11 +246,11 @@ class SessionManager:
         
         Args:
             token (str): Session token
-            
+        
         Returns:
-            dict or None: Session data if exists
+            SessionRecord or None: Session data if exists
         """
-        return self.sessions.get(token)
+        return self._stripe(token).sessions.get(token)
     
     def destroy_session(self, token):
         """
@@ -91,14 +258,24 @@ class SessionManager:
         
         Args:
             token (str): Session token
-            
+        
         Returns:
             bool: True if session was destroyed
         """
-        if token in self.sessions:
-            del self.sessions[token]
-            return True
-        return False
+        record = self._remove(token)
+        
+        claims = self.signer.verify(token)
+        if claims:
+            # Signed tokens stay valid until expiry, so remember it as revoked
+            expires = time.monotonic() + (claims['expires_at'] - time.time())
+            stripe = self._stripe(token)
+            with stripe.lock:
+                stripe.revoked[token] = expires
+            self._schedule_expiry(expires, token)
+            if self.store is not None:
+                self.store.revoke(token, claims['expires_at'])
+        
+        return record is not None or claims is not None
     
     def get_user_sessions(self, user_id):
         """
@@ -106,15 +283,12 @@ class SessionManager:
         
         Args:
             user_id (int): User ID
-            
+        
         Returns:
             list: List of session tokens
         """
-        tokens = []
-        for token, session in self.sessions.items():
-            if session['user_id'] == user_id:
-                tokens.append(token)
-        return tokens
+        with self._user_lock:
+            return list(self._user_tokens.get(user_id, ()))
     
     def destroy_user_sessions(self, user_id):
         """
@@ -122,42 +296,108 @@ class SessionManager:
         
         Args:
             user_id (int): User ID
-            
+        
         Returns:
             int: Number of sessions destroyed
         """
         tokens = self.get_user_sessions(user_id)
         for token in tokens:
-            del self.sessions[token]
+            self.destroy_session(token)
         return len(tokens)
     
     def cleanup_expired_sessions(self):
         """
-        Remove all expired sessions
+        Remove sessions and revoked tokens whose expiry has passed
+        
+        Only due heap entries are touched, so this is cheap to call often.
         
         Returns:
             int: Number of sessions removed
         """
-        now = datetime.now()
-        expired_tokens = []
+        now = time.monotonic()
+        removed = 0
         
-        for token, session in self.sessions.items():
-            if now > session['expires_at']:
-                expired_tokens.append(token)
+        while True:
+            with self._heap_lock:
+                if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                    break
+                expires, token = heapq.heappop(self._expiry_heap)
+            
+            # Entries are not removed from the heap on logout or extend, so
+            # check the stored expiry before dropping anything
+            stripe = self._stripe(token)
+            with stripe.lock:
+                record = stripe.sessions.get(token)
+                if record is not None and record.expires <= now:
+                    del stripe.sessions[token]
+                else:
+                    record = None
+                if token in stripe.revoked and stripe.revoked[token] <= now:
+                    del stripe.revoked[token]
+            
+            if record is not None:
+                self._unindex(record.user_id, token)
+                removed += 1
         
-        for token in expired_tokens:
-            del self.sessions[token]
+        self._compact_heap()
+        return removed
+    
+    def _compact_heap(self):
+        """Rebuild the heap when stale entries (logged out, extended) outnumber live ones"""
+        live = self.get_session_count() + sum(len(s.revoked) for s in self._stripes)
+        with self._heap_lock:
+            if len(self._expiry_heap) <= 2 * live + 1024:
+                return
         
-        return len(expired_tokens)
+        entries = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                entries.extend((r.expires, t) for t, r in stripe.sessions.items())
+                entries.extend((e, t) for t, e in stripe.revoked.items())
+        heapq.heapify(entries)
+        with self._heap_lock:
+            self._expiry_heap = entries
+    
+    def _sweep_loop(self, interval):
+        """Background sweeper: drain due expiries until shutdown"""
+        while not self._stop.wait(interval):
+            try:
+                self.cleanup_expired_sessions()
+            except Exception:
+                pass
+    
+    def rotate_signing_key(self):
+        """
+        Sign new tokens with a fresh key (existing tokens stay valid)
+        
+        Returns:
+            int: New key id
+        """
+        kid = self.signer.rotate_key()
+        if self.store is not None:
+            self.store.save_keys(self.signer.keys, self.signer.active_kid)
+        return kid
+    
+    def shutdown(self):
+        """Stop the sweeper thread and flush the store"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+        if self.store is not None:
+            self.store.close()
     
     def get_all_active_sessions(self):
         """
         Get all active sessions
         
         Returns:
-            dict: All active sessions
+            dict: All active sessions {token: SessionRecord}
         """
-        return self.sessions.copy()
+        sessions = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                sessions.update(stripe.sessions)
+        return sessions
     
     def get_session_count(self):
         """
@@ -166,21 +406,31 @@ class SessionManager:
         Returns:
             int: Number of active sessions
         """
-        return len(self.sessions)
+        return sum(len(stripe.sessions) for stripe in self._stripes)
     
     def extend_session(self, token, hours=24):
         """
         Extend session expiration time
         
+        The expiry is signed into the token, so extending issues a new token
+        for the same session and revokes the old one.
+        
         Args:
             token (str): Session token
             hours (int): Hours to extend
-            
+        
         Returns:
-            bool: True if successful
+            str or None: New session token if successful
         """
-        if token in self.sessions:
-            self.sessions[token]['expires_at'] = datetime.now() + timedelta(hours=hours)
-            return True
-        return False
-
+        session = self.validate_session(token)
+        if not session:
+            return None
+        
+        expires_at = int(time.time() + hours * 3600)
+        new_token = self.signer.issue(session.user_id, session.role, expires_at)
+        self.destroy_session(token)
+        
+        session.expires_at = expires_at
+        session.expires = time.monotonic() + (expires_at - time.time())
+        self._add(new_token, session)
+        return new_token
@@ -0,0 +1,224 @@
+"""
+Session Store
+SQLite persistence for sessions and signing keys with write-behind flushing
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteSessionStore:
+    """
+    Keep sessions on disk so a restarted server accepts existing tokens
+    
+    Writes never happen on the request path: put/delete/revoke only record
+    the latest change per token in memory, and a flusher thread writes the
+    batch in one transaction every flush_interval seconds. A crash loses at
+    most that window, which only means those users log in again.
+    """
+    
+    def __init__(self, db_path="data/sessions.db", flush_interval=1.0, purge_interval=60):
+        """
+        Initialize store and start the flusher
+        
+        Args:
+            db_path: SQLite file (separate from app.db to keep writes off its lock)
+            flush_interval: Seconds between write-behind flushes
+            purge_interval: Seconds between deleting expired rows
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        
+        # Tokens and signing keys can forge any session: create the file
+        # private, SQLite gives the -wal/-shm files the same mode
+        if not os.path.exists(db_path):
+            os.close(os.open(db_path, os.O_WRONLY | os.O_CREAT, 0o600))
+        
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._restrict_files()
+        self._init_tables()
+        
+        self._pending = {}  # {token: ('put', row) | ('delete', None) | ('revoke', expires_at)}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_purge = 0.0
+        self.flushed = 0
+        
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="session-store", daemon=True)
+        self._thread.start()
+    
+    def _restrict_files(self):
+        """Make the database and its -wal/-shm files owner-only (files from older runs)"""
+        for path in (self.db_path, self.db_path + '-wal', self.db_path + '-shm'):
+            try:
+                os.chmod(path, 0o600)
+            except OSError:
+                pass
+    
+    def _init_tables(self):
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                full_name TEXT NOT NULL,
+                expires_at INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                token TEXT PRIMARY KEY,
+                expires_at INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS signing_keys (
+                kid INTEGER PRIMARY KEY,
+                secret BLOB NOT NULL,
+                active INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_revoked_expires ON revoked_tokens(expires_at)')
+        self._conn.commit()
+    
+    # ==================== Write-behind ====================
+    
+    def put(self, token, record):
+        """Queue a session insert/update"""
+        row = (token, record.user_id, record.username, record.role, record.full_name, int(record.expires_at))
+        with self._pending_lock:
+            self._pending[token] = ('put', row)
+    
+    def delete(self, token):
+        """Queue a session delete"""
+        with self._pending_lock:
+            self._pending[token] = ('delete', None)
+    
+    def revoke(self, token, expires_at):
+        """Queue a session delete plus a revocation entry"""
+        with self._pending_lock:
+            self._pending[token] = ('revoke', int(expires_at))
+    
+    def flush(self):
+        """
+        Write all queued changes in one transaction
+        
+        Returns:
+            int: Number of changes written
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        
+        now = time.time()
+        purge = now - self._last_purge >= self.purge_interval
+        if not pending and not purge:
+            return 0
+        
+        puts = [op[1] for op in pending.values() if op[0] == 'put']
+        deletes = [(token,) for token, op in pending.items() if op[0] != 'put']
+        revokes = [(token, op[1]) for token, op in pending.items() if op[0] == 'revoke']
+        
+        with self._write_lock:
+            try:
+                cursor = self._conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO sessions (token, user_id, username, role, full_name, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', puts)
+                cursor.executemany('DELETE FROM sessions WHERE token = ?', deletes)
+                cursor.executemany('INSERT OR REPLACE INTO revoked_tokens (token, expires_at) VALUES (?, ?)', revokes)
+                
+                if purge:
+                    cursor.execute('DELETE FROM sessions WHERE expires_at <= ?', (int(now),))
+                    cursor.execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (int(now),))
+                    self._last_purge = now
+                
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                # Put the batch back (newer changes win) so the next flush retries it
+                with self._pending_lock:
+                    for token, op in pending.items():
+                        self._pending.setdefault(token, op)
+                raise
+        
+        self.flushed += len(pending)
+        return len(pending)
+    
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[SESSION STORE] Flush failed: {e}")
+    
+    def close(self):
+        """Stop the flusher, write what is left and close the file"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._conn.close()
+    
+    # ==================== Startup load ====================
+    
+    def load_sessions(self):
+        """
+        Read all unexpired sessions and revoked tokens
+        
+        Returns:
+            tuple: (sessions rows (token, user_id, username, role, full_name, expires_at),
+                    revoked rows (token, expires_at))
+        """
+        now = int(time.time())
+        with self._write_lock:
+            cursor = self._conn.cursor()
+            cursor.execute('''
+                SELECT token, user_id, username, role, full_name, expires_at
+                FROM sessions WHERE expires_at > ?
+            ''', (now,))
+            sessions = cursor.fetchall()
+            cursor.execute('SELECT token, expires_at FROM revoked_tokens WHERE expires_at > ?', (now,))
+            revoked = cursor.fetchall()
+        return sessions, revoked
+    
+    # ==================== Signing keys ====================
+    
+    def load_keys(self):
+        """
+        Read signing keys
+        
+        Returns:
+            tuple: ({kid: secret}, active_kid), or ({}, None) if none saved
+        """
+        with self._write_lock:
+            cursor = self._conn.cursor()
+            cursor.execute('SELECT kid, secret, active FROM signing_keys')
+            rows = cursor.fetchall()
+        
+        keys = {row[0]: bytes(row[1]) for row in rows}
+        active = next((row[0] for row in rows if row[2]), None)
+        return keys, active
+    
+    def save_keys(self, keys, active_kid):
+        """Replace saved signing keys (written immediately, not write-behind)"""
+        with self._write_lock:
+            cursor = self._conn.cursor()
+            cursor.execute('DELETE FROM signing_keys')
+            cursor.executemany(
+                'INSERT INTO signing_keys (kid, secret, active) VALUES (?, ?, ?)',
+                [(kid, secret, 1 if kid == active_kid else 0) for kid, secret in keys.items()]
+            )
+            self._conn.commit()
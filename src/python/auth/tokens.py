@@ -0,0 +1,127 @@
+"""
+Session Tokens
+Compact HMAC-signed tokens that fit the 32-byte TAP header field
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import struct
+import time
+
+
+# kid(1) user_id(4) role(1) expires_at(4) nonce(3) -> 13 signed bytes, + 10 byte MAC
+_CLAIMS = struct.Struct('>BIBI3s')
+MAC_SIZE = 10
+TOKEN_BYTES = _CLAIMS.size + MAC_SIZE      # 23 bytes
+TOKEN_LENGTH = 31                          # base64url without padding; header keeps 31 chars + NUL
+
+ROLE_CODES = {'student': 0, 'teacher': 1}
+ROLE_NAMES = {code: name for name, code in ROLE_CODES.items()}
+
+
+class SessionTokenSigner:
+    """
+    Issue and verify signed session tokens
+    
+    A token carries user id, role, expiry and key id, so any server process
+    holding the keys can check it without a session lookup. Several keys can
+    be active for verification while only the newest signs, which allows
+    rotating keys without logging everyone out.
+    """
+    
+    def __init__(self, keys=None, active_kid=None):
+        """
+        Initialize signer
+        
+        Args:
+            keys: Dict {kid (0-255): secret bytes}; a random key is generated if None
+            active_kid: Key used for new tokens (default: highest kid)
+        """
+        self.keys = dict(keys) if keys else {1: secrets.token_bytes(32)}
+        self.active_kid = active_kid if active_kid is not None else max(self.keys)
+    
+    def rotate_key(self):
+        """
+        Start signing with a new random key (old keys still verify)
+        
+        Returns:
+            int: New key id
+        """
+        kid = (self.active_kid % 255) + 1
+        self.keys[kid] = secrets.token_bytes(32)
+        self.active_kid = kid
+        return kid
+    
+    def retire_key(self, kid):
+        """Stop accepting tokens signed with a key"""
+        if kid != self.active_kid:
+            self.keys.pop(kid, None)
+    
+    def issue(self, user_id, role, expires_at):
+        """
+        Create a token
+        
+        Args:
+            user_id (int): User ID
+            role (str): 'student' or 'teacher'
+            expires_at (int): Unix timestamp
+        
+        Returns:
+            str: 31-character token
+        """
+        claims = _CLAIMS.pack(self.active_kid, user_id, ROLE_CODES[role],
+                              int(expires_at), secrets.token_bytes(3))
+        mac = self._mac(self.keys[self.active_kid], claims)
+        return base64.urlsafe_b64encode(claims + mac).decode('ascii').rstrip('=')
+    
+    def verify(self, token, now=None):
+        """
+        Check signature and expiry of a token (no session lookup)
+        
+        Args:
+            token (str): Token from header or payload
+            now (float): Current Unix time (default: time.time())
+        
+        Returns:
+            dict or None: {'user_id', 'role', 'expires_at', 'kid'} if valid
+        """
+        if not token or len(token) != TOKEN_LENGTH:
+            return None
+        
+        try:
+            raw = base64.urlsafe_b64decode(token + '=')
+        except (ValueError, TypeError):
+            return None
+        if len(raw) != TOKEN_BYTES:
+            return None
+        # The last character carries 2 unused bits: accept only the canonical
+        # spelling, or a revoked token could be reused with other padding bits
+        if base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=') != token:
+            return None
+        
+        claims, mac = raw[:_CLAIMS.size], raw[_CLAIMS.size:]
+        kid, user_id, role_code, expires_at, _nonce = _CLAIMS.unpack(claims)
+        
+        key = self.keys.get(kid)
+        if key is None or not hmac.compare_digest(mac, self._mac(key, claims)):
+            return None
+        
+        if expires_at <= (now if now is not None else time.time()):
+            return None
+        
+        role = ROLE_NAMES.get(role_code)
+        if role is None:
+            return None
+        
+        return {
+            'user_id': user_id,
+            'role': role,
+            'expires_at': expires_at,
+            'kid': kid
+        }
+    
+    @staticmethod
+    def _mac(key, claims):
+        """Truncated HMAC-SHA256 over the claim bytes"""
+        return hmac.new(key, claims, hashlib.sha256).digest()[:MAC_SIZE]
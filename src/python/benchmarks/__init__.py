@@ -0,0 +1,8 @@
+"""
+Benchmarks Module
+Offline microbenchmarks for the protocol, repository and grading hot paths
+
+Usage (from src/python):
+    python -m benchmarks.run
+    python -m benchmarks.run protocol -k json --json -o after.json --baseline before.json
+"""
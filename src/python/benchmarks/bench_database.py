@@ -0,0 +1,133 @@
+"""
+Database Benchmarks
+Every RoomRepository and TestRepository method against a seeded database
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from .fixtures import SeededDatabase, make_question, make_answers
+
+GROUP = 'database'
+
+
+def run(runner, args):
+    if args.db:
+        runner.log(f"Using seeded database {args.db} (write benchmarks add rows to it)")
+        seeded = SeededDatabase(args.db, seed=args.seed, existing=True)
+        _bench_rooms(runner, seeded)
+        _bench_tests(runner, seeded)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        runner.log(f"Seeding database (scale {args.scale})...")
+        seeded = SeededDatabase(os.path.join(tmp, 'bench.db'), scale=args.scale, seed=args.seed)
+        _bench_rooms(runner, seeded)
+        _bench_tests(runner, seeded)
+
+
+def _bench_rooms(runner, s):
+    rooms = s.db.rooms
+    rng = random.Random(2)
+    names = count()
+    
+    def bench(name, func, setup=None):
+        runner.bench(GROUP, f"rooms.{name}", func, setup=setup)
+    
+    def new_room(status='waiting', questions=0):
+        created = rooms.create_test_room(f"Bench {next(names)}", s.pick_teacher(), 50, 45)
+        if questions:
+            rooms.add_room_questions_bulk(created['room_id'], [make_question(rng, i) for i in range(questions)])
+        if status == 'active':
+            rooms.start_test_room(created['room_id'])
+        return created
+    
+    active_room = s.pick_room('active')
+    ended_room = s.pick_room('ended')
+    question_id = rooms.get_room_questions(active_room)[0]['id']
+    
+    # Reads
+    bench('get_room_by_id', lambda: rooms.get_room_by_id(s.pick_room('active')))
+    bench('get_room_by_code', lambda: rooms.get_room_by_code(s.room_codes[s.pick_room('waiting')]))
+    bench('get_teacher_rooms', lambda: rooms.get_teacher_rooms(s.pick_teacher()))
+    bench('get_scheduled_rooms', lambda: rooms.get_scheduled_rooms())
+    bench('get_room_participants', lambda: rooms.get_room_participants(s.pick_room('active')))
+    bench('get_participant_status', lambda: rooms.get_participant_status(active_room, s.pick_student()))
+    bench('get_student_rooms', lambda: rooms.get_student_rooms(s.pick_student()))
+    bench('get_available_rooms', lambda: rooms.get_available_rooms(s.pick_student()))
+    bench('get_available_rooms_page', lambda: rooms.get_available_rooms_page(s.pick_student(), limit=20))
+    bench('get_available_rooms_page(name_filter)',
+          lambda: rooms.get_available_rooms_page(s.pick_student(), limit=20, name_filter='Phòng thi 1'))
+    bench('get_room_questions', lambda: rooms.get_room_questions(s.pick_room('active')))
+    bench('get_room_question_count', lambda: rooms.get_room_question_count(s.pick_room('active')))
+    bench('get_question_by_id', lambda: rooms.get_question_by_id(question_id))
+    
+    # Writes (setup creates what each call consumes, outside the timing)
+    bench('create_test_room', lambda: rooms.create_test_room(f"Bench {next(names)}", s.pick_teacher(), 50, 45))
+    bench('start_test_room', lambda room: rooms.start_test_room(room['room_id']), setup=new_room)
+    bench('end_test_room(force)', lambda room: rooms.end_test_room(room['room_id'], force=True),
+          setup=lambda: new_room('active'))
+    bench('ensure_exam_key', lambda room: rooms.ensure_exam_key(room['room_id'], 'k' * 44), setup=new_room)
+    bench('join_room', lambda room: rooms.join_room(room['room_code'], s.pick_student()), setup=new_room)
+    bench('update_participant_status',
+          lambda: rooms.update_participant_status(active_room, s.pick_student(), 'testing'))
+    bench('add_room_question',
+          lambda room: rooms.add_room_question(room['room_id'], *_question_fields(make_question(rng, 0))),
+          setup=new_room)
+    bench('add_room_questions_bulk(50)',
+          lambda args: rooms.add_room_questions_bulk(*args),
+          setup=lambda: (new_room()['room_id'], [make_question(rng, i) for i in range(50)]))
+    bench('update_room_question',
+          lambda: rooms.update_room_question(question_id, *_question_fields(make_question(rng, 0))))
+    bench('delete_room_question', lambda qid: rooms.delete_room_question(qid),
+          setup=lambda: rooms.add_room_question(new_room()['room_id'], *_question_fields(make_question(rng, 0))))
+    bench('delete_all_room_questions(50)', lambda room: rooms.delete_all_room_questions(room['room_id']),
+          setup=lambda: new_room(questions=50))
+    bench('clone_room(50)', lambda: rooms.clone_room(ended_room, s.pick_teacher()))
+
+
+def _bench_tests(runner, s):
+    tests = s.db.tests
+    rooms = s.db.rooms
+    rng = random.Random(3)
+    questions = [{'id': i} for i in range(1, 51)]
+    answers_json = json.dumps(make_answers(rng, questions))
+    
+    def bench(name, func, setup=None):
+        runner.bench(GROUP, f"tests.{name}", func, setup=setup)
+    
+    # Reads
+    bench('get_user_results', lambda: tests.get_user_results(s.pick_student()))
+    bench('get_all_results', lambda: tests.get_all_results())
+    bench('get_room_progress', lambda: tests.get_room_progress(s.pick_room('active')))
+    bench('get_student_progress', lambda: tests.get_student_progress(s.pick_student()))
+    bench('get_unsubmitted_progress', lambda: tests.get_unsubmitted_progress(s.pick_room('active')))
+    
+    # Writes
+    bench('save_test_result',
+          lambda: tests.save_test_result(s.pick_student(), rng.randint(0, 50), 50, answers_json, 1800))
+    bench('save_test_progress',
+          lambda: tests.save_test_progress(s.pick_room('active'), s.pick_student(), answers_json))
+    
+    def room_to_finalize():
+        room_id = rooms.create_test_room("Bench final", s.pick_teacher(), 50, 45)['room_id']
+        students = rng.sample(s.student_ids, 30)
+        conn = s.db.get_connection()
+        conn.executemany("INSERT INTO room_participants (room_id, student_id, status) VALUES (?, ?, 'testing')",
+                         [(room_id, student) for student in students])
+        conn.commit()
+        conn.close()
+        return room_id, [{'student_id': student, 'score': rng.randint(0, 50), 'total_questions': 50,
+                          'answers': make_answers(rng, questions, 0.8)} for student in students]
+    
+    bench('save_final_results(30)', lambda args: tests.save_final_results(*args), setup=room_to_finalize)
+
+
+def _question_fields(question):
+    return (question['question_text'], question['option_a'], question['option_b'],
+            question['option_c'], question['option_d'], question['correct_answer'])
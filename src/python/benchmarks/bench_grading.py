@@ -0,0 +1,56 @@
+"""
+Grading Benchmarks
+Scoring a 50-question submission, alone and through handle_submit_room_test
+"""
+import os
+import random
+import socket
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import ProtocolWrapper
+from auth import AuthManager, SessionManager
+from server.handlers import RequestHandlers
+from server.event_log import EventLog, ERROR
+from server.room_scheduler import grade_answers
+from .fixtures import SeededDatabase, make_answers
+
+GROUP = 'grading'
+
+
+def run(runner, args):
+    if not runner.wants('grading.'):
+        return
+    
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        runner.log("Seeding grading database...")
+        seeded = SeededDatabase(os.path.join(tmp, 'grading.db'), scale=0.05, seed=args.seed)
+        db = seeded.db
+        
+        room_id = seeded.exam_room('active', 50)
+        questions = db.get_room_questions(room_id)
+        student = db.get_user_by_id(seeded.pick_student())
+        answers = make_answers(rng, questions, 0.9)
+        
+        runner.bench(GROUP, f"grading.grade_answers({len(questions)})", lambda: grade_answers(questions, answers))
+        
+        proto = ProtocolWrapper()
+        proto.init_network()
+        handlers = RequestHandlers(proto, db, AuthManager(), SessionManager(), EventLog(level=ERROR))
+        session = {'username': student['username'], 'user_id': student['id'], 'role': 'student'}
+        request = {'payload': {'room_id': room_id, 'answers': answers}}
+        
+        server_end, client_end = socket.socketpair()
+        try:
+            def submit():
+                handlers.handle_submit_room_test(server_end.fileno(), session, request)
+                proto.receive_message(client_end.fileno())
+            
+            runner.bench(GROUP, f"grading.handle_submit_room_test({len(questions)})", submit)
+        finally:
+            handlers.hash_pool.shutdown()
+            server_end.close()
+            client_end.close()
@@ -0,0 +1,171 @@
+"""
+Protocol Benchmarks
+TAP send/receive over a socketpair, ctypes call overhead of the C entry
+points, header encode/decode and JSON of realistic payloads
+"""
+import ctypes
+import json
+import os
+import random
+import socket
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import (
+    ProtocolWrapper, ProtocolHeader,
+    MSG_AUTO_SAVE_REQ, MSG_START_ROOM_TEST_RES, MSG_SUBMIT_ROOM_TEST_REQ, MSG_HEARTBEAT,
+    PROTOCOL_MAGIC, PROTOCOL_VERSION
+)
+from .fixtures import make_exam_questions, make_answers, make_results
+
+GROUP = 'protocol'
+
+# Network byte order layout of protocol_header_t (80 bytes, packed)
+HEADER_STRUCT = struct.Struct('!IHHI16sq32s12s')
+
+
+def run(runner, args):
+    proto = ProtocolWrapper()
+    proto.init_network()
+    proto.set_session_token('S' * 32)
+    rng = random.Random(args.seed)
+    
+    questions = make_exam_questions(rng, 50)
+    payloads = {
+        'heartbeat': (MSG_HEARTBEAT, None),
+        'autosave_50': (MSG_AUTO_SAVE_REQ, {'room_id': 7, 'answers': make_answers(rng, questions, 0.6),
+                                            'is_final': False}),
+        'submit_50': (MSG_SUBMIT_ROOM_TEST_REQ, {'room_id': 7, 'answers': make_answers(rng, questions),
+                                                 'request_id': 'r' * 32}),
+        'exam_50': (MSG_START_ROOM_TEST_RES, {'code': 1000, 'message': 'Test started',
+                                              'data': {'room_id': 7, 'questions': questions}})
+    }
+    
+    a, b = socket.socketpair()
+    try:
+        _bench_send_receive(runner, proto, a.fileno(), b.fileno(), payloads)
+        _bench_entry_points(runner, proto, a.fileno(), b.fileno())
+    finally:
+        a.close()
+        b.close()
+    
+    _bench_header(runner)
+    _bench_json(runner, rng, payloads)
+
+
+def _bench_send_receive(runner, proto, sender, receiver, payloads):
+    """Full ProtocolWrapper path: json.dumps + C send, C receive + json.loads"""
+    for label, (msg_type, payload) in payloads.items():
+        def round_trip(msg_type=msg_type, payload=payload):
+            proto.send_message(sender, msg_type, payload)
+            proto.receive_message(receiver, 1024 * 1024)
+        runner.bench(GROUP, f"protocol.send_receive.{label}", round_trip)
+
+
+def _bench_entry_points(runner, proto, sender, receiver):
+    """
+    Cost of crossing into libnetwork for each python_wrapper.c entry point
+    
+    Uses cheap arguments so the call overhead dominates. Entry points that
+    block or start threads per call (accept, connect, server loop) are left
+    out; the select loop is measured as create/destroy.
+    """
+    lib = proto.lib
+    message_id = ctypes.create_string_buffer(17)
+    ip_buffer = ctypes.create_string_buffer(16)
+    header = ProtocolHeader()
+    payload_buffer = ctypes.create_string_buffer(64 * 1024)
+    raw_payload = b'{"room_id": 7}'
+    token = b'S' * 32
+    
+    def send_receive_raw():
+        lib.py_send_protocol_message(sender, MSG_HEARTBEAT, raw_payload, token)
+        lib.py_receive_protocol_message(receiver, ctypes.byref(header), payload_buffer, 64 * 1024)
+    
+    def select_loop_create_destroy():
+        lib.py_client_select_loop_destroy(lib.py_client_select_loop_create())
+    
+    proto.broadcast_init()
+    calls = [
+        ('py_get_unix_timestamp', lambda: lib.py_get_unix_timestamp()),
+        ('py_generate_message_id', lambda: lib.py_generate_message_id(message_id)),
+        ('py_socket_is_alive', lambda: lib.py_socket_is_alive(sender)),
+        ('py_socket_get_client_ip', lambda: lib.py_socket_get_client_ip(sender, ip_buffer)),
+        ('py_socket_set_recv_timeout', lambda: lib.py_socket_set_recv_timeout(sender, 30)),
+        ('py_socket_set_send_timeout', lambda: lib.py_socket_set_send_timeout(sender, 30)),
+        ('py_socket_set_timeout', lambda: lib.py_socket_set_timeout(sender, 30)),
+        ('py_send+receive_protocol_message', send_receive_raw),
+        ('py_broadcast_subscribe+unsubscribe', lambda: (lib.py_broadcast_subscribe(sender, b'bench:1'),
+                                                        lib.py_broadcast_unsubscribe(sender, b'bench:1'))),
+        ('py_broadcast_register+unregister', lambda: (lib.py_broadcast_register(sender, 1),
+                                                      lib.py_broadcast_unregister(sender))),
+        ('py_broadcast_update_room', lambda: lib.py_broadcast_update_room(sender, 2)),
+        ('py_broadcast_publish(no subscribers)', lambda: lib.py_broadcast_publish(b'bench:none', MSG_HEARTBEAT,
+                                                                                  raw_payload)),
+        ('py_broadcast_to_room(empty room)', lambda: lib.py_broadcast_to_room(999999, MSG_HEARTBEAT, raw_payload)),
+        ('py_broadcast_subscriber_count', lambda: lib.py_broadcast_subscriber_count(b'bench:none')),
+        ('py_client_select_loop_is_running(NULL)', lambda: lib.py_client_select_loop_is_running(None)),
+        ('py_client_select_loop_create+destroy', select_loop_create_destroy)
+    ]
+    try:
+        for name, func in calls:
+            runner.bench(GROUP, f"ctypes.{name}", func)
+    finally:
+        lib.py_broadcast_unregister(sender)
+        proto.broadcast_destroy()
+    
+    # Reference point: a Python call that does no work
+    runner.bench(GROUP, "ctypes.(python no-op call)", lambda: None)
+
+
+def _bench_header(runner):
+    """The 80-byte header: ctypes Structure (used by receive_message) vs struct module"""
+    token = b'S' * 32
+    message_id = b'0123456789abcdef'
+    
+    def encode_ctypes():
+        header = ProtocolHeader()
+        header.magic = socket.htonl(PROTOCOL_MAGIC)
+        header.version = socket.htons(PROTOCOL_VERSION)
+        header.message_type = socket.htons(MSG_AUTO_SAVE_REQ)
+        header.length = socket.htonl(512)
+        header.message_id = message_id
+        header.timestamp = 1765000000
+        header.session_token = token
+        return bytes(header)
+    
+    def encode_struct():
+        return HEADER_STRUCT.pack(PROTOCOL_MAGIC, PROTOCOL_VERSION, MSG_AUTO_SAVE_REQ, 512,
+                                  message_id, 1765000000, token, b'')
+    
+    raw = encode_ctypes()
+    
+    def decode_ctypes():
+        # Same steps as ProtocolWrapper.receive_message
+        header = ProtocolHeader.from_buffer_copy(raw)
+        raw_type = header.message_type
+        msg_type = ((raw_type & 0xFF) << 8) | ((raw_type >> 8) & 0xFF) if sys.byteorder == 'little' else raw_type
+        return (msg_type, header.message_id.decode('utf-8', errors='ignore'), header.timestamp,
+                header.session_token.decode('utf-8', errors='ignore').rstrip('\x00'))
+    
+    def decode_struct():
+        return HEADER_STRUCT.unpack(raw)
+    
+    runner.bench(GROUP, "header.encode.ctypes", encode_ctypes)
+    runner.bench(GROUP, "header.encode.struct", encode_struct)
+    runner.bench(GROUP, "header.decode.ctypes", decode_ctypes)
+    runner.bench(GROUP, "header.decode.struct", decode_struct)
+
+
+def _bench_json(runner, rng, payloads):
+    """json.dumps/loads of the payloads that dominate exam traffic"""
+    documents = {name: payload for name, (_, payload) in payloads.items() if payload}
+    documents['results_200'] = {'code': 1000, 'data': {'results': make_results(rng, 200)}}
+    
+    for name, document in documents.items():
+        text = json.dumps(document)
+        encoded = text.encode('utf-8')
+        runner.bench(GROUP, f"json.dumps.{name}", lambda d=document: json.dumps(d).encode('utf-8'))
+        runner.bench(GROUP, f"json.loads.{name}", lambda e=encoded: json.loads(e.decode('utf-8')))
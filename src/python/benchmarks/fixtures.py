@@ -0,0 +1,166 @@
+"""
+Benchmark Fixtures
+Realistic payloads and a seeded database for the benchmarks
+"""
+import contextlib
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from tools.seed_dataset import DatasetSeeder
+
+SUBJECTS = ('Mạng máy tính', 'Hệ điều hành', 'Cơ sở dữ liệu', 'Lập trình C', 'Giải tích', 'Vật lý')
+TOPICS = ('giao thức TCP', 'bắt tay ba bước', 'địa chỉ IP', 'socket', 'select()', 'luồng', 'khóa mutex',
+          'chỉ mục B-tree', 'giao dịch', 'con trỏ', 'đạo hàm', 'tích phân', 'định luật Ohm')
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Send prints of the code under test to stderr (stdout may carry the JSON report)"""
+    with contextlib.redirect_stdout(sys.stderr):
+        yield
+
+
+def make_question(rng, index):
+    """One question dict as stored in a room (question_text, option_a..d, correct_answer)"""
+    subject = rng.choice(SUBJECTS)
+    topic = rng.choice(TOPICS)
+    return {
+        'question_text': f"Câu {index + 1} ({subject}): Phát biểu nào sau đây đúng về {topic}? "
+                         f"Chọn đáp án chính xác nhất trong bốn lựa chọn dưới đây.",
+        'option_a': f"{topic.capitalize()} đảm bảo dữ liệu đến đúng thứ tự (phương án {rng.randint(1, 999)})",
+        'option_b': f"{topic.capitalize()} chỉ hoạt động trên mạng cục bộ (phương án {rng.randint(1, 999)})",
+        'option_c': f"{topic.capitalize()} không cần cấp phát tài nguyên (phương án {rng.randint(1, 999)})",
+        'option_d': f"Cả ba phát biểu trên đều sai (phương án {rng.randint(1, 999)})",
+        'correct_answer': rng.randint(0, 3)
+    }
+
+
+def make_exam_questions(rng, count, first_id=1):
+    """Questions as a student receives them (START_ROOM_TEST_RES: ids, no correct answers)"""
+    questions = []
+    for i in range(count):
+        q = make_question(rng, i)
+        del q['correct_answer']
+        q['id'] = first_id + i
+        q['question_order'] = i
+        questions.append(q)
+    return questions
+
+
+def make_answers(rng, questions, answered=1.0):
+    """Submitted answers [{'question_id', 'selected'}] for a share of the questions"""
+    return [{'question_id': q['id'], 'selected': rng.randint(0, 3)}
+            for q in questions if rng.random() < answered]
+
+
+def make_results(rng, count):
+    """Result rows as the teacher's result list shows them"""
+    base = datetime(2025, 12, 1, 8, 0, 0)
+    results = []
+    for i in range(count):
+        total = 50
+        score = rng.randint(10, total)
+        results.append({
+            'id': i + 1,
+            'username': f"sv{20220000 + i}",
+            'full_name': f"Sinh viên {i + 1}",
+            'test_date': (base + timedelta(minutes=i)).isoformat(sep=' '),
+            'score': score,
+            'total_questions': total,
+            'duration_seconds': rng.randint(600, 3600),
+            'percentage': round(score / total * 100, 2)
+        })
+    return results
+
+
+class SeededDatabase:
+    """
+    Database filled by tools.seed_dataset with a small exam day
+    
+    Volumes scale linearly with `scale` (1.0: 40 teachers, 2000 students,
+    200 rooms with 50 questions each, about 30 participants per room).
+    With existing=True an already seeded file is used as is (benchmarks
+    that write add rows to it).
+    """
+    
+    def __init__(self, path, scale=1.0, seed=1, existing=False):
+        self.path = path
+        self.rng = random.Random(seed)
+        if not existing:
+            rooms = max(8, int(200 * scale))
+            DatasetSeeder(path, {
+                'teachers': max(2, int(40 * scale)),
+                'students': max(60, int(2000 * scale)),
+                'rooms': rooms,
+                'room_questions': rooms * 50,
+                'bank': max(200, int(4000 * scale)),
+                'results': int(rooms * 0.85 * 30)
+            }, seed=seed).run()
+        
+        with quiet_stdout():
+            self.db = DatabaseManager(path)
+        self._load_ids()
+    
+    def _load_ids(self):
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, role FROM users ORDER BY id")
+        self.teacher_ids = []
+        self.student_ids = []
+        for user_id, role in cursor.fetchall():
+            (self.teacher_ids if role == 'teacher' else self.student_ids).append(user_id)
+        
+        # Only rooms with questions (an exam to start, grade or clone)
+        cursor.execute('''
+            SELECT id, room_code, status FROM test_rooms r
+            WHERE EXISTS (SELECT 1 FROM room_questions q WHERE q.room_id = r.id)
+            ORDER BY id
+        ''')
+        self.room_ids = {'waiting': [], 'active': [], 'ended': []}
+        self.room_codes = {}
+        for room_id, room_code, status in cursor.fetchall():
+            self.room_ids[status].append(room_id)
+            self.room_codes[room_id] = room_code
+        conn.close()
+        
+        missing = [status for status, ids in self.room_ids.items() if not ids]
+        if missing or not self.teacher_ids or not self.student_ids:
+            raise ValueError(f"{self.path} needs teachers, students and rooms of every status "
+                             f"(missing: {', '.join(missing) or 'users'})")
+    
+    def pick_room(self, status):
+        return self.rng.choice(self.room_ids[status])
+    
+    def exam_room(self, status, questions=50):
+        """
+        A room of the given status holding exactly `questions` questions
+        
+        Seeded rooms get a varying number of questions (around 50), so the
+        picked room's set is replaced by `questions` bank questions: results
+        stay comparable across seeds and scales.
+        """
+        room_id = self.pick_room(status)
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM question_bank ORDER BY id")
+        bank_ids = self.rng.sample([row[0] for row in cursor.fetchall()], questions)
+        cursor.execute("DELETE FROM room_questions WHERE room_id = ?", (room_id,))
+        cursor.executemany(
+            "INSERT INTO room_questions (room_id, bank_id, question_order) VALUES (?, ?, ?)",
+            [(room_id, bank_id, order) for order, bank_id in enumerate(bank_ids)]
+        )
+        cursor.execute("UPDATE test_rooms SET num_questions = ? WHERE id = ?", (questions, room_id))
+        conn.commit()
+        conn.close()
+        return room_id
+    
+    def pick_student(self):
+        return self.rng.choice(self.student_ids)
+    
+    def pick_teacher(self):
+        return self.rng.choice(self.teacher_ids)
@@ -0,0 +1,202 @@
+"""
+Benchmark Harness
+Times a callable, measures its Python allocations and collects the results
+"""
+import gc
+import time
+import tracemalloc
+
+
+class BenchmarkRunner:
+    """
+    Runs benchmarks and keeps their results
+    
+    Timing: the callable runs in batches sized so one batch takes about
+    min_time seconds; the best of `repeat` batches counts (least disturbed
+    by other processes). GC is disabled while a batch runs.
+    
+    Allocations: a separate, shorter pass under tracemalloc (which slows
+    everything down, so it never overlaps the timing) reports the peak
+    Python memory one call needs and how much stays allocated per call.
+    Memory allocated inside C (libnetwork, SQLite) is not traced.
+    """
+    
+    def __init__(self, min_time=0.2, repeat=3, alloc_calls=20, filters=None, log=None):
+        """
+        Initialize runner
+        
+        Args:
+            min_time: Target seconds per timed batch
+            repeat: Timed batches per benchmark (best one counts)
+            alloc_calls: Calls in the tracemalloc pass
+            filters: Substrings; only benchmarks whose name contains one run (None: all)
+            log: Progress callback function(message), or None
+        """
+        self.min_time = min_time
+        self.repeat = repeat
+        self.alloc_calls = alloc_calls
+        self.filters = filters or None
+        self.log = log or (lambda message: None)
+        self.results = []
+    
+    def wants(self, name):
+        """True if a benchmark name passes the filters (lets callers skip costly fixtures)"""
+        return self.filters is None or any(f in name for f in self.filters)
+    
+    def bench(self, group, name, func, setup=None, number=None):
+        """
+        Measure one benchmark
+        
+        Args:
+            group: Suite name ('protocol', 'database', 'grading')
+            name: Benchmark name, unique within the run
+            func: Callable to measure; called with setup()'s return value if setup is given
+            setup: Callable run before every call and not timed (e.g. to create
+                   the row a delete removes), or None
+            number: Calls per batch (None: calibrate to min_time)
+        
+        Returns:
+            dict or None: Result, or None if filtered out
+        """
+        if not self.wants(name):
+            return None
+        
+        if setup is None:
+            run_batch = lambda n: _time_loop(func, n)
+        else:
+            run_batch = lambda n: _time_each(func, setup, n)
+        
+        run_batch(1)  # Warm-up (imports, caches, first-query planning)
+        if number is None:
+            number = self._calibrate(run_batch)
+        
+        times = [run_batch(number) for _ in range(self.repeat)]
+        best = min(times)
+        peak, retained = self._allocations(func, setup)
+        
+        result = {
+            'group': group,
+            'name': name,
+            'number': number,
+            'repeat': self.repeat,
+            'ops_per_sec': round(number / best, 1) if best > 0 else None,
+            'us_per_op': round(best / number * 1e6, 3),
+            'us_per_op_median': round(sorted(times)[len(times) // 2] / number * 1e6, 3),
+            'alloc_peak_bytes': peak,
+            'alloc_retained_bytes': retained
+        }
+        self.results.append(result)
+        self.log(f"{name}: {_format_rate(result['ops_per_sec'])} ops/s, {result['us_per_op']} us/op")
+        return result
+    
+    def _calibrate(self, run_batch):
+        """Calls per batch so that one batch takes about min_time"""
+        number = 1
+        while True:
+            elapsed = run_batch(number)
+            if elapsed >= self.min_time / 4 or number >= 1_000_000:
+                break
+            number *= 4 if elapsed < self.min_time / 40 else 2
+        if elapsed <= 0:
+            return number
+        return max(1, min(int(number * self.min_time / elapsed), 10_000_000))
+    
+    def _allocations(self, func, setup):
+        """(peak bytes of one call, bytes retained per call) under tracemalloc"""
+        args = [setup() if setup else None for _ in range(self.alloc_calls + 1)]
+        call = (lambda a: func(a)) if setup else (lambda a: func())
+        
+        gc.collect()
+        tracemalloc.start()
+        try:
+            # Peak of a single call
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call(args[0])
+            _, peak = tracemalloc.get_traced_memory()
+            
+            # Growth over several calls (results kept alive by caches, leaks)
+            base, _ = tracemalloc.get_traced_memory()
+            for a in args[1:]:
+                call(a)
+            current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        return max(0, peak - base), round(max(0, current - base) / self.alloc_calls, 1)
+    
+    # ==================== Reporting ====================
+    
+    def compare(self, baseline):
+        """
+        Add the change against an earlier run to each result
+        
+        Args:
+            baseline: Report dict from an earlier run (same JSON format)
+        """
+        previous = {r['name']: r for r in baseline.get('results', [])}
+        for result in self.results:
+            old = previous.get(result['name'])
+            if old and old.get('ops_per_sec') and result['ops_per_sec']:
+                result['baseline_ops_per_sec'] = old['ops_per_sec']
+                result['speedup'] = round(result['ops_per_sec'] / old['ops_per_sec'], 3)
+    
+    def format_table(self):
+        """Results as a text table"""
+        header = f"{'benchmark':<48} {'ops/s':>12} {'us/op':>11} {'peak KiB':>9} {'kept B/op':>10}"
+        has_baseline = any('speedup' in r for r in self.results)
+        if has_baseline:
+            header += f" {'vs base':>8}"
+        lines = [header, '-' * len(header)]
+        
+        group = None
+        for r in self.results:
+            if r['group'] != group:
+                group = r['group']
+                lines.append(f"[{group}]")
+            line = (f"{r['name']:<48} {_format_rate(r['ops_per_sec']):>12} {r['us_per_op']:>11.2f} "
+                    f"{r['alloc_peak_bytes'] / 1024:>9.1f} {r['alloc_retained_bytes']:>10.0f}")
+            if has_baseline:
+                line += f" {'x%.2f' % r['speedup'] if 'speedup' in r else '-':>8}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def _time_loop(func, number):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _time_each(func, setup, number):
+    """Time calls one by one so the per-call setup stays outside the measurement"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        total = 0.0
+        for _ in range(number):
+            arg = setup()
+            start = time.perf_counter()
+            func(arg)
+            total += time.perf_counter() - start
+        return total
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _format_rate(ops):
+    if ops is None:
+        return '-'
+    if ops >= 1e6:
+        return f"{ops / 1e6:.2f}M"
+    if ops >= 1e3:
+        return f"{ops / 1e3:.1f}k"
+    return f"{ops:.1f}"
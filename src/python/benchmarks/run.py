@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark Runner
+Runs the microbenchmarks offline (no server needed) and reports ops/sec and allocations
+
+Suites:
+    protocol   TAP send/receive over a socketpair, ctypes overhead of each
+               python_wrapper.c entry point, header encode/decode, JSON
+    database   Every RoomRepository and TestRepository method on a seeded database
+    grading    grade_answers and handle_submit_room_test with 50 questions
+
+Usage (from src/python, after building lib/):
+    python -m benchmarks.run                          # all suites, text table
+    python -m benchmarks.run database -k rooms.get_   # one suite, filtered
+    python -m benchmarks.run --json -o before.json    # save a baseline
+    python -m benchmarks.run -o after.json --baseline before.json   # before/after
+    python -m benchmarks.run database --db data/seed_large.db       # tools.seed_dataset volumes
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import BenchmarkRunner
+from benchmarks import bench_protocol, bench_database, bench_grading
+
+SUITES = {
+    'protocol': bench_protocol.run,
+    'database': bench_database.run,
+    'grading': bench_grading.run
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the TAP protocol, database and grading")
+    parser.add_argument('suites', nargs='*', metavar='suite',
+                        help=f"Suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument('-k', '--filter', action='append', help="Only benchmarks whose name contains this (repeatable)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Target seconds per timed batch")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed batches per benchmark (best counts)")
+    parser.add_argument('--alloc-calls', type=int, default=20, help="Calls in the tracemalloc pass")
+    parser.add_argument('--scale', type=float, default=1.0, help="Seeded database volume (1.0: 2000 students, 200 rooms)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for payloads and the database")
+    parser.add_argument('--db', help="Run the database suite on a file from tools.seed_dataset instead")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--json', action='store_true', help="Print the JSON report instead of the table")
+    parser.add_argument('-o', '--output', help="Also write the JSON report to this file")
+    parser.add_argument('-q', '--quiet', action='store_true', help="No progress lines on stderr")
+    args = parser.parse_args(argv)
+    
+    unknown = [s for s in args.suites if s not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(unknown)}")
+    if args.db and not os.path.exists(args.db):
+        parser.error(f"--db: {args.db} does not exist")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    runner = BenchmarkRunner(min_time=args.min_time, repeat=args.repeat, alloc_calls=args.alloc_calls,
+                             filters=args.filter, log=log)
+    
+    started = time.time()
+    for name in args.suites or SUITES:
+        SUITES[name](runner, args)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            runner.compare(json.load(f))
+    
+    report = {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+            'duration_s': round(time.time() - started, 1),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'sqlite': sqlite3.sqlite_version,
+            'min_time': args.min_time,
+            'repeat': args.repeat,
+            'scale': args.scale,
+            'seed': args.seed,
+            'db': args.db,
+            'baseline': args.baseline
+        },
+        'results': runner.results
+    }
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text if args.json else runner.format_table())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ Test Client Application
 Clean modular architecture matching server structure
 """
 import customtkinter as ctk
+import random
 import sys
 import os
 
@@ -13,11 +14,14 @@ from ui import LoginWindow, RegisterWindow, StudentWindow, TeacherWindow
 from auth import AuthManager
 from client.connection import ConnectionManager
 from client.handlers import TeacherHandler, StudentHandler
+from client.question_import import load_questions_file
 
 
 class TestClientApp(ctk.CTk):
     """Test Client Application"""
     
+    EVENT_REFRESH_DELAY_MS = 300  # Coalesce event bursts (e.g. a class joining) into one refresh
+    
     def __init__(self):
         super().__init__()
         
@@ -33,6 +37,9 @@ class TestClientApp(ctk.CTk):
         # Set broadcast callback for real-time updates (before login)
         self.conn.set_broadcast_callback(self._handle_broadcast)
         
+        # Refresh room state after an automatic reconnect
+        self.conn.set_resume_callback(self._handle_resumed)
+        
         # UI state
         self.current_user = None
         self.current_role = None
@@ -40,6 +47,7 @@ class TestClientApp(ctk.CTk):
         self.register_window = None
         self.teacher_window = None
         self.student_window = None
+        self._event_refresh_pending = False
         
         # Main frame
         self.main_frame = ctk.CTkFrame(self)
@@ -70,8 +78,8 @@ class TestClientApp(ctk.CTk):
         })
         self.register_window.show()
     
-    def handle_login(self, username, password, role):
-        """Handle login attempt"""
+    def handle_login(self, username, password, role, attempt=0):
+        """Handle login attempt (retries with jitter while the server is busy)"""
         try:
             # Connect to server
             if not self.conn.connected:
@@ -90,8 +98,18 @@ class TestClientApp(ctk.CTk):
                     self.show_teacher_dashboard(full_name)
                 else:
                     self.show_student_test(full_name)
+                
+                # Room lists are refreshed by server events instead of polling
+                self._subscribe_events(result.get('user_id'))
                     
                 return True
+            elif result.get('retry_after') and attempt < 5:
+                # Server login queue is full: back off with jitter so retries spread out
+                delay = result['retry_after'] * (attempt + 1) + random.uniform(0, 1)
+                if self.login_window:
+                    self.login_window.show_status(f"⏳ Server busy, retrying in {delay:.0f}s...", "orange")
+                self.after(int(delay * 1000), lambda: self.handle_login(username, password, role, attempt + 1))
+                return False
             else:
                 if self.login_window:
                     self.login_window.show_status(f"✗ {result['message']}", "red")
@@ -150,10 +168,14 @@ class TestClientApp(ctk.CTk):
             self.teacher_window = TeacherWindow(self.main_frame, {
                 'on_logout': self.handle_logout,
                 'on_create_room': self.handle_create_room,
+                'on_clone_room': self.handle_clone_room,
                 'on_refresh_rooms': self.handle_refresh_rooms,
                 'on_start_room': self.handle_start_room,
                 'on_end_room': self.handle_end_room,
                 'on_add_question': self.handle_add_question,
+                'on_import_questions': self.handle_import_questions,
+                'on_search_questions': self.handle_search_questions,
+                'on_add_bank_question': self.handle_add_bank_question,
                 'on_load_questions': self.handle_load_questions
             })
             
@@ -179,11 +201,12 @@ class TestClientApp(ctk.CTk):
             # Store full name for later use
             self.student_full_name = full_name
             self.current_room_id = None
+            self.available_search = ''
             
             # Create handler first
             self.student_handler = StudentHandler(self.conn, {
                 'show_ready': lambda fn, nq, d: self.student_window.show_ready_screen(fn, nq, d),
-                'show_test': lambda q, d, r=None, c=None, server_timestamp=None: self.student_window.show_test_screen(q, d, r, c, server_timestamp=server_timestamp, username=self.current_user),
+                'show_test': lambda q, d, r=None, c=None, server_timestamp=None, deadline=None: self.student_window.show_test_screen(q, d, r, c, server_timestamp=server_timestamp, username=self.current_user, deadline=deadline),
                 'show_result': lambda r: self.student_window.show_result_screen(r, full_name)
             })
             
@@ -195,6 +218,7 @@ class TestClientApp(ctk.CTk):
                 'on_enter_room': self.handle_enter_room,
                 'on_refresh_rooms': self.handle_refresh_student_rooms,
                 'on_refresh_available': self.handle_refresh_available_rooms,
+                'on_load_more_available': self.handle_load_more_available_rooms,
                 'on_logout': self.handle_logout,
                 'on_auto_save': self.handle_auto_save,
                 'on_back_to_lobby': lambda: self.show_student_test(self.student_full_name),
@@ -246,6 +270,24 @@ class TestClientApp(ctk.CTk):
         except Exception as e:
             self.show_error("Create Room Error", str(e))
     
+    def handle_clone_room(self, room_id):
+        """Handle clone room"""
+        try:
+            result = self.teacher_handler.clone_room(room_id)
+            
+            if result['success']:
+                from tkinter import messagebox
+                messagebox.showinfo(
+                    "Success",
+                    f"Room cloned! New code: {result['room_code']}\n"
+                    f"{result['question_count']} questions copied."
+                )
+                self.handle_refresh_rooms()
+            else:
+                self.show_error("Clone Room Error", result.get('message', 'Unknown error'))
+        except Exception as e:
+            self.show_error("Clone Room Error", str(e))
+    
     def handle_refresh_rooms(self):
         """Handle refresh rooms"""
         try:
@@ -304,6 +346,53 @@ class TestClientApp(ctk.CTk):
         except Exception as e:
             self.show_error("Add Question Error", str(e))
     
+    def handle_import_questions(self, room_id, file_path):
+        """Handle CSV/JSON question import"""
+        try:
+            questions = load_questions_file(file_path)
+            if not questions:
+                self.show_error("Import Questions Error", "File contains no questions")
+                return
+            
+            result = self.teacher_handler.bulk_add_questions(room_id, questions)
+            
+            if result['success']:
+                from tkinter import messagebox
+                messagebox.showinfo("Success", f"Imported {result['inserted']} questions!")
+                self.handle_load_questions(room_id)
+            else:
+                # Show per-row errors (1-based row numbers for the user)
+                lines = [f"Row {err['index'] + 1}: {err['error']}" for err in result.get('errors', [])[:15]]
+                if len(result.get('errors', [])) > 15:
+                    lines.append(f"... and {len(result['errors']) - 15} more")
+                message = result.get('message', 'Unknown error')
+                if lines:
+                    message += "\n\n" + "\n".join(lines)
+                self.show_error("Import Questions Error", message)
+        except Exception as e:
+            self.show_error("Import Questions Error", str(e))
+    
+    def handle_search_questions(self, query, offset=0, mine_only=False):
+        """Handle question bank search"""
+        try:
+            result = self.teacher_handler.search_questions(query, offset=offset, mine_only=mine_only)
+            if hasattr(self.teacher_window, 'update_search_results'):
+                self.teacher_window.update_search_results(result['results'], result['offset'], result['has_more'])
+        except Exception as e:
+            self.show_error("Search Questions Error", str(e))
+    
+    def handle_add_bank_question(self, room_id, bank_id):
+        """Handle adding a search result to the selected room"""
+        try:
+            result = self.teacher_handler.add_bank_question(room_id, bank_id)
+            
+            if result['success']:
+                self.handle_load_questions(room_id)
+            else:
+                self.show_error("Add Question Error", result.get('message', 'Unknown error'))
+        except Exception as e:
+            self.show_error("Add Question Error", str(e))
+    
     def handle_load_questions(self, room_id):
         """Handle load questions"""
         try:
@@ -340,16 +429,36 @@ class TestClientApp(ctk.CTk):
         except Exception as e:
             self.show_error("Refresh Rooms Error", str(e))
     
-    def handle_refresh_available_rooms(self):
-        """Handle refresh available rooms"""
+    def handle_refresh_available_rooms(self, search=None):
+        """Handle refresh available rooms (first page, keeps last search if none given)"""
         try:
-            rooms = self.student_handler.get_available_rooms()
+            if search is not None:
+                self.available_search = search.strip()
+            page = self.student_handler.get_available_rooms(search=self.available_search)
             # Update UI with available rooms
             if hasattr(self.student_window, 'update_available_rooms'):
-                self.student_window.update_available_rooms(rooms)
+                self.student_window.update_available_rooms(
+                    page['rooms'],
+                    next_cursor=page['next_cursor'],
+                    total_hint=page['total_hint'],
+                    total_capped=page['total_capped']
+                )
         except Exception as e:
             self.show_error("Refresh Available Rooms Error", str(e))
     
+    def handle_load_more_available_rooms(self, cursor):
+        """Handle loading the next page of available rooms"""
+        try:
+            page = self.student_handler.get_available_rooms(cursor=cursor, search=self.available_search)
+            if hasattr(self.student_window, 'update_available_rooms'):
+                self.student_window.update_available_rooms(
+                    page['rooms'],
+                    append=True,
+                    next_cursor=page['next_cursor']
+                )
+        except Exception as e:
+            self.show_error("Load Available Rooms Error", str(e))
+    
     def handle_enter_room(self, room_id):
         """Handle student entering an active room to take test"""
         try:
@@ -428,13 +537,27 @@ class TestClientApp(ctk.CTk):
             msg_type: Message type (int)
             data: Parsed JSON data (dict)
         """
-        from protocol_wrapper import MSG_ROOM_STATUS
+        from protocol_wrapper import MSG_ROOM_STATUS, MSG_ROOM_PROGRESS, MSG_EVENT
         
-        if msg_type == MSG_ROOM_STATUS:
+        if msg_type == MSG_ROOM_PROGRESS:
+            # Live class progress (teachers only)
+            self.after(0, self._update_room_progress_ui, data)
+        
+        elif msg_type == MSG_EVENT:
+            # Room created/started/ended or student joined: refresh the lists once
+            if not self._event_refresh_pending:
+                self._event_refresh_pending = True
+                self.after(self.EVENT_REFRESH_DELAY_MS, self._refresh_from_events)
+        
+        elif msg_type == MSG_ROOM_STATUS:
             room_id = data.get('room_id')
             status = data.get('status')
             action = data.get('action')
             
+            # Room started: keep the released key for the prefetched exam
+            if data.get('exam_key') and getattr(self, 'student_handler', None):
+                self.student_handler.set_exam_key(room_id, data['exam_key'], data.get('exam_version'))
+            
             # Schedule UI update in main thread
             self.after(0, self._update_room_status_ui, room_id, status, action)
     
@@ -447,6 +570,53 @@ class TestClientApp(ctk.CTk):
             except Exception as e:
                 print(f"[ERROR] Failed to refresh UI: {e}")
     
+    def _subscribe_events(self, user_id):
+        """Subscribe to the lobby (students) or to the teacher's own rooms"""
+        if self.current_role == 'teacher':
+            topics = [f"teacher:{user_id}"] if user_id else []
+        else:
+            topics = ['lobby']
+        
+        try:
+            if topics:
+                self.conn.subscribe(topics)
+        except Exception as e:
+            print(f"[ERROR] Event subscription failed: {e}")
+    
+    def _refresh_from_events(self):
+        """Refresh room lists after a burst of events (runs in main thread)"""
+        self._event_refresh_pending = False
+        try:
+            if self.current_role == 'teacher' and self.teacher_window:
+                self.handle_refresh_rooms()
+            elif self.current_role == 'student' and self.student_window and not self.current_room_id:
+                self.handle_refresh_student_rooms()
+                self.handle_refresh_available_rooms()
+        except Exception as e:
+            print(f"[ERROR] Failed to refresh UI: {e}")
+    
+    def _update_room_progress_ui(self, snapshot):
+        """Show a live progress snapshot (runs in main thread)"""
+        if self.teacher_window:
+            try:
+                self.teacher_window.update_room_progress(snapshot)
+            except Exception as e:
+                print(f"[ERROR] Failed to update room progress: {e}")
+    
+    def _handle_resumed(self, data):
+        """
+        Handle automatic session resume after a dropped connection
+        Room subscriptions are restored server-side; refresh the lobby if it is shown
+        
+        Args:
+            data: RESUME_RES data (rooms with saved answers, server_timestamp)
+        """
+        rooms = data.get('rooms', [])
+        print(f"[RESUME] Reconnected, {len(rooms)} unfinished rooms restored")
+        
+        if self.student_window and not self.current_room_id:
+            self.after(0, self._update_room_status_ui, None, None, 'resumed')
+    
     def on_closing(self):
         """Handle window close"""
         self.conn.cleanup()
@@ -6,14 +6,26 @@ from protocol_wrapper import (
     ProtocolWrapper, 
     MSG_LOGIN_REQ, MSG_LOGIN_RES, 
     MSG_REGISTER_REQ, MSG_REGISTER_RES,
+    MSG_RESUME_REQ, MSG_RESUME_RES,
+    MSG_SUBSCRIBE_REQ, MSG_UNSUBSCRIBE_REQ,
     MSG_ERROR
 )
+import threading
+import time
 
 
 class ConnectionManager:
-    """Manages connection to server"""
+    """
+    Manages connection to server
     
-    def __init__(self, host="127.0.0.1", port=5555):
+    Each manager is one independent connection, so a process can hold many
+    (e.g. several accounts). By default each gets a C select loop thread of
+    its own after login; pass select_loop (from
+    ProtocolWrapper.client_select_loop_create()) to let many managers share
+    one loop thread instead.
+    """
+    
+    def __init__(self, host="127.0.0.1", port=5555, select_loop=None):
         self.host = host
         self.port = port
         self.proto = ProtocolWrapper()
@@ -21,7 +33,11 @@ class ConnectionManager:
         self.connected = False
         self.session_token = None
         self.broadcast_callback = None
-        self.select_loop_running = False
+        self.shared_loop = select_loop  # Shared C loop handle, or None for an own thread
+        self.select_conn = None  # C select loop connection handle (after login)
+        self.resume_callback = None
+        self._resume_lock = threading.Lock()
+        self.topics = set()  # Event topics to restore after a resume
         
     def init_network(self):
         """Initialize network"""
@@ -117,27 +133,118 @@ class ConnectionManager:
                 # Start C select loop for I/O multiplexing
                 # From this point, all requests must use send_request()
                 if self.broadcast_callback:
-                    success = self.proto.client_select_loop_start(
+                    self.select_conn = self.proto.client_select_loop_start(
                         self.socket, 
                         self.session_token,  # Pass session token to C
-                        self.broadcast_callback
+                        self.broadcast_callback,
+                        loop=self.shared_loop
                     )
-                    if success:
-                        self.select_loop_running = True
                 
                 return {
                     'success': True,
+                    'user_id': payload.get('user_id'),
                     'role': payload.get('role'),
                     'full_name': payload.get('full_name'),
                     'session_token': self.session_token
                 }
             else:
                 self.disconnect()
-                return {'success': False, 'message': payload.get('message', 'Login failed')}
+                return {
+                    'success': False,
+                    'message': payload.get('message', 'Login failed'),
+                    'retry_after': payload.get('retry_after')  # Set when server is busy
+                }
         
         self.disconnect()
         return {'success': False, 'message': 'Unexpected response'}
     
+    def resume(self):
+        """
+        Reconnect and resume the current session without the password
+        
+        Returns:
+            dict or None: Resume data ({'rooms': [...], 'server_timestamp'}),
+                          or None if the session is gone and a new login is needed
+        """
+        session_token = self.session_token
+        if not session_token:
+            return None
+        
+        # Drop the dead socket and select loop (keeps the session token)
+        if self.select_conn:
+            self.proto.client_select_loop_stop(self.select_conn)
+            self.select_conn = None
+        if self.socket:
+            try:
+                self.proto.close_socket(self.socket)
+            except:
+                pass
+            self.socket = None
+        
+        self.connect()
+        
+        # Send resume request (direct protocol, before select loop starts)
+        self.proto.send_message(self.socket, MSG_RESUME_REQ, {
+            'session_token': session_token
+        }, use_session=False)
+        
+        response = self.proto.receive_message(self.socket)
+        payload = response['payload']
+        
+        if response['message_type'] != MSG_RESUME_RES or payload.get('code') != 1000:  # ERR_SUCCESS
+            self.disconnect()
+            return None
+        
+        # Restart C select loop on the new socket with the same session
+        if self.broadcast_callback:
+            self.select_conn = self.proto.client_select_loop_start(
+                self.socket,
+                session_token,
+                self.broadcast_callback,
+                loop=self.shared_loop
+            )
+        
+        # Subscriptions belong to the old socket: restore them (called directly,
+        # send_request would try to resume again if this fails)
+        if self.topics and self.select_conn:
+            try:
+                self.proto.client_select_loop_send_request(
+                    self.select_conn, MSG_SUBSCRIBE_REQ, {'topics': sorted(self.topics)})
+            except RuntimeError as e:
+                print(f"[RESUME] Failed to restore subscriptions: {e}")
+        
+        data = payload.get('data', {})
+        if self.resume_callback:
+            self.resume_callback(data)
+        return data
+    
+    def set_resume_callback(self, callback):
+        """
+        Set callback run after an automatic session resume
+        
+        Args:
+            callback: function(data) with the RESUME_RES data (rooms, server_timestamp)
+        """
+        self.resume_callback = callback
+    
+    def _try_resume(self, attempts=3):
+        """Resume after a dropped connection, backing off between attempts"""
+        with self._resume_lock:
+            # Another thread hit the same drop and already resumed
+            if self.proto.client_select_loop_is_running(self.select_conn):
+                return True
+            
+            for attempt in range(attempts):
+                try:
+                    if self.resume() is not None:
+                        print("[RESUME] Session resumed after connection loss")
+                        return True
+                    return False  # Session expired: retrying will not help
+                except Exception as e:
+                    print(f"[RESUME] Attempt {attempt + 1} failed: {e}")
+                    time.sleep(0.5 * (2 ** attempt))
+            return False
+    
     def set_broadcast_callback(self, callback):
         """
         Set callback for broadcast messages (MSG_ROOM_STATUS)
@@ -172,10 +279,16 @@ class ConnectionManager:
             Response payload as dict
         """
         try:
-            if self.select_loop_running:
+            if self.select_conn:
                 # Use C select loop (thread-safe, multiplexed)
-                response = self.proto.client_select_loop_send_request(msg_type, payload)
-                return response
+                try:
+                    return self.proto.client_select_loop_send_request(self.select_conn, msg_type, payload)
+                except RuntimeError:
+                    # Select loop exits when the connection drops: resume and retry once
+                    # (mutating requests carry a request_id, so the retry is not applied twice)
+                    if not self._try_resume():
+                        raise
+                    return self.proto.client_select_loop_send_request(self.select_conn, msg_type, payload)
             else:
                 # Fallback: direct protocol (for requests before login)
                 self.proto.send_message(self.socket, msg_type, payload)
@@ -187,6 +300,27 @@ class ConnectionManager:
             traceback.print_exc()
             raise
     
+    def subscribe(self, topics):
+        """
+        Subscribe to event topics (pushes arrive at the broadcast callback)
+        
+        Args:
+            topics: Topic names, e.g. ['lobby'] or ['teacher:7']
+            
+        Returns:
+            list: Topics the server accepted
+        """
+        response = self.send_request(MSG_SUBSCRIBE_REQ, {'topics': list(topics)})
+        subscribed = response.get('data', {}).get('subscribed', [])
+        self.topics.update(subscribed)
+        return subscribed
+    
+    def unsubscribe(self, topics):
+        """Unsubscribe from event topics"""
+        self.topics.difference_update(topics)
+        response = self.send_request(MSG_UNSUBSCRIBE_REQ, {'topics': list(topics)})
+        return response.get('data', {}).get('unsubscribed', [])
+    
     def receive_message(self):
         """
         Receive message from server (deprecated when select loop is running)
@@ -204,9 +338,9 @@ class ConnectionManager:
     def disconnect(self):
         """Disconnect from server and stop select loop"""
         # Stop C select loop first
-        if self.select_loop_running:
-            self.proto.client_select_loop_stop()
-            self.select_loop_running = False
+        if self.select_conn:
+            self.proto.client_select_loop_stop(self.select_conn)
+            self.select_conn = None
         
         # Close socket
         if self.socket:
@@ -217,6 +351,7 @@ class ConnectionManager:
         
         self.connected = False
         self.session_token = None
+        self.topics.clear()
     
     def cleanup(self):
         """Cleanup network resources"""
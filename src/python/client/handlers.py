@@ -13,13 +13,45 @@ from protocol_wrapper import (
     MSG_ADD_QUESTION_REQ, MSG_ADD_QUESTION_RES,
     MSG_GET_QUESTIONS_REQ, MSG_GET_QUESTIONS_RES,
     MSG_DELETE_QUESTION_REQ, MSG_DELETE_QUESTION_RES,
+    MSG_BULK_ADD_QUESTIONS_REQ, MSG_BULK_ADD_QUESTIONS_RES,
+    MSG_CLONE_ROOM_REQ, MSG_CLONE_ROOM_RES,
+    MSG_SEARCH_QUESTIONS_REQ, MSG_SEARCH_QUESTIONS_RES,
     MSG_JOIN_ROOM_REQ, MSG_JOIN_ROOM_RES,
     MSG_GET_STUDENT_ROOMS_REQ, MSG_GET_STUDENT_ROOMS_RES,
     MSG_GET_AVAILABLE_ROOMS_REQ, MSG_GET_AVAILABLE_ROOMS_RES,
     MSG_START_ROOM_TEST_REQ, MSG_START_ROOM_TEST_RES,
     MSG_SUBMIT_ROOM_TEST_REQ, MSG_SUBMIT_ROOM_TEST_RES,
-    MSG_AUTO_SAVE_REQ, MSG_AUTO_SAVE_RES
+    MSG_AUTO_SAVE_REQ, MSG_AUTO_SAVE_RES,
+    MSG_PREFETCH_EXAM_REQ
 )
+from exam_cipher import decrypt_exam, ExamCipherError
+import json
+import random
+import threading
+import uuid
+
+
+class PendingRequestIds:
+    """
+    Request ids for mutating actions
+    
+    An id is kept until the server answers, so retrying an action after a
+    timeout sends the same id and the server replays its original response
+    instead of doing the work twice.
+    """
+    
+    def __init__(self):
+        self._ids = {}  # {action key: request_id}
+    
+    def get(self, action):
+        """Get the request id for an action (new one if none is pending)"""
+        if action not in self._ids:
+            self._ids[action] = uuid.uuid4().hex
+        return self._ids[action]
+    
+    def done(self, action):
+        """Server answered: the next attempt is a new request"""
+        self._ids.pop(action, None)
 
 
 class TeacherHandler:
@@ -28,6 +60,7 @@ class TeacherHandler:
     def __init__(self, connection, ui_callbacks):
         self.conn = connection
         self.ui = ui_callbacks
+        self.request_ids = PendingRequestIds()
         
     def load_dashboard(self, full_name):
         """Load teacher dashboard"""
@@ -49,15 +82,23 @@ class TeacherHandler:
         except Exception as e:
             raise Exception(f"Failed to load teacher dashboard: {str(e)}")
     
-    def create_room(self, room_name, num_questions, duration_minutes):
-        """Create a new test room"""
+    def create_room(self, room_name, num_questions, duration_minutes, scheduled_start=None):
+        """Create a new test room (scheduled_start: Unix time for the server to start it)"""
         try:
-            # Send request via C select loop
-            payload = self.conn.send_request(MSG_CREATE_ROOM_REQ, {
+            action = ('create_room', room_name, num_questions, duration_minutes, scheduled_start)
+            
+            request = {
                 'room_name': room_name,
                 'num_questions': num_questions,
-                'duration_minutes': duration_minutes
-            })
+                'duration_minutes': duration_minutes,
+                'request_id': self.request_ids.get(action)
+            }
+            if scheduled_start:
+                request['scheduled_start'] = int(scheduled_start)
+            
+            # Send request via C select loop
+            payload = self.conn.send_request(MSG_CREATE_ROOM_REQ, request)
+            self.request_ids.done(action)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 data = payload.get('data', {})
@@ -72,6 +113,32 @@ class TeacherHandler:
         except Exception as e:
             raise Exception(f"Failed to create room: {str(e)}")
     
+    def clone_room(self, room_id, room_name=None):
+        """Clone a room's settings and questions into a new room"""
+        try:
+            action = ('clone_room', room_id, room_name)
+            request = {'room_id': room_id, 'request_id': self.request_ids.get(action)}
+            if room_name:
+                request['room_name'] = room_name
+            
+            # Send request via C select loop
+            payload = self.conn.send_request(MSG_CLONE_ROOM_REQ, request)
+            self.request_ids.done(action)
+            
+            if payload.get('code') == 1000:  # ERR_SUCCESS
+                data = payload.get('data', {})
+                return {
+                    'success': True,
+                    'room_id': data.get('room_id'),
+                    'room_code': data.get('room_code'),
+                    'question_count': data.get('question_count', 0)
+                }
+            else:
+                return {'success': False, 'message': payload.get('message')}
+            
+        except Exception as e:
+            raise Exception(f"Failed to clone room: {str(e)}")
+    
     def refresh_rooms(self):
         """Refresh room list"""
         try:
@@ -122,6 +189,8 @@ class TeacherHandler:
     def add_question(self, room_id, question_text, option_a, option_b, option_c, option_d, correct_answer):
         """Add a question to a room"""
         try:
+            action = ('add_question', room_id, question_text, option_a, option_b, option_c, option_d, correct_answer)
+            
             # Send request via C select loop
             payload = self.conn.send_request(MSG_ADD_QUESTION_REQ, {
                 'room_id': room_id,
@@ -130,8 +199,10 @@ class TeacherHandler:
                 'option_b': option_b,
                 'option_c': option_c,
                 'option_d': option_d,
-                'correct_answer': correct_answer
+                'correct_answer': correct_answer,
+                'request_id': self.request_ids.get(action)
             })
+            self.request_ids.done(action)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 return {'success': True, 'question_id': payload.get('data', {}).get('question_id')}
@@ -141,6 +212,77 @@ class TeacherHandler:
         except Exception as e:
             raise Exception(f"Failed to add question: {str(e)}")
     
+    def bulk_add_questions(self, room_id, questions):
+        """Import many questions into a room with one request"""
+        try:
+            action = ('bulk_add_questions', room_id, json.dumps(questions, sort_keys=True))
+            
+            # Send request via C select loop
+            payload = self.conn.send_request(MSG_BULK_ADD_QUESTIONS_REQ, {
+                'room_id': room_id,
+                'questions': questions,
+                'request_id': self.request_ids.get(action)
+            })
+            self.request_ids.done(action)
+            
+            data = payload.get('data', {})
+            if payload.get('code') == 1000:  # ERR_SUCCESS
+                return {'success': True, 'inserted': data.get('inserted', 0), 'total': data.get('total')}
+            else:
+                return {
+                    'success': False,
+                    'message': payload.get('message'),
+                    'errors': data.get('errors', [])
+                }
+            
+        except Exception as e:
+            raise Exception(f"Failed to import questions: {str(e)}")
+    
+    def add_bank_question(self, room_id, bank_id):
+        """Add an existing question bank entry to a room"""
+        try:
+            action = ('add_bank_question', room_id, bank_id)
+            
+            # Send request via C select loop
+            payload = self.conn.send_request(MSG_ADD_QUESTION_REQ, {
+                'room_id': room_id,
+                'bank_id': bank_id,
+                'request_id': self.request_ids.get(action)
+            })
+            self.request_ids.done(action)
+            
+            if payload.get('code') == 1000:  # ERR_SUCCESS
+                return {'success': True, 'question_id': payload.get('data', {}).get('question_id')}
+            else:
+                return {'success': False, 'message': payload.get('message')}
+            
+        except Exception as e:
+            raise Exception(f"Failed to add question: {str(e)}")
+    
+    def search_questions(self, query, offset=0, limit=20, mine_only=False):
+        """Search the question bank (results are ranked and paginated by the server)"""
+        try:
+            # Send request via C select loop
+            payload = self.conn.send_request(MSG_SEARCH_QUESTIONS_REQ, {
+                'query': query,
+                'offset': offset,
+                'limit': limit,
+                'mine_only': mine_only
+            })
+            
+            if payload.get('code') == 1000:  # ERR_SUCCESS
+                data = payload.get('data', {})
+                return {
+                    'results': data.get('results', []),
+                    'offset': data.get('offset', offset),
+                    'has_more': data.get('has_more', False)
+                }
+            else:
+                raise ValueError(payload.get('message', 'Failed to search questions'))
+            
+        except Exception as e:
+            raise Exception(f"Failed to search questions: {str(e)}")
+    
     def get_questions(self, room_id):
         """Get questions for a room"""
         try:
@@ -183,17 +325,26 @@ class StudentHandler:
         self.ui = ui_callbacks
         self.questions = []
         self.auto_save_in_progress = False  # Track auto-save state
+        self.request_ids = PendingRequestIds()
+        self.exams = {}  # {room_id: {'version', 'blob', 'key'}} prefetched encrypted exams
+        self._prefetch_timers = {}
+        self._exams_lock = threading.Lock()
         
     def join_room(self, room_id):
         """Join a test room by room ID"""
         try:
+            action = ('join_room', room_id)
+            
             # Send request via C select loop
             payload = self.conn.send_request(MSG_JOIN_ROOM_REQ, {
-                'room_id': room_id
+                'room_id': room_id,
+                'request_id': self.request_ids.get(action)
             })
+            self.request_ids.done(action)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 data = payload.get('data', {})
+                self.schedule_prefetch(room_id, data.get('prefetch_within', 0))
                 return {
                     'success': True,
                     'room_name': data.get('room_name'),
@@ -213,47 +364,151 @@ class StudentHandler:
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 data = payload.get('data', {})
-                return data.get('rooms', [])
+                rooms = data.get('rooms', [])
+                
+                # Rooms joined in an earlier session: fetch their exams while waiting
+                for room in rooms:
+                    if room.get('room_status') == 'waiting' and room.get('participant_status') != 'submitted':
+                        self.schedule_prefetch(room['id'], self.RESUME_PREFETCH_WITHIN)
+                return rooms
             else:
                 raise ValueError(payload.get('message', 'Failed to get rooms'))
             
         except Exception as e:
             raise Exception(f"Failed to refresh rooms: {str(e)}")
     
-    def get_available_rooms(self):
-        """Get list of available rooms to join"""
+    def get_available_rooms(self, cursor=None, search=None, limit=20):
+        """
+        Get one page of available rooms to join
+        
+        Args:
+            cursor: next_cursor from the previous page (None = first page)
+            search: Room name substring or exact room code
+            limit: Page size
+            
+        Returns:
+            dict: {'rooms': [...], 'next_cursor', 'total_hint', 'total_capped'}
+        """
         try:
+            request = {'limit': limit}
+            if cursor is not None:
+                request['cursor'] = cursor
+            if search:
+                request['search'] = search
+            
             # Send request via C select loop
-            payload = self.conn.send_request(MSG_GET_AVAILABLE_ROOMS_REQ, {})
+            payload = self.conn.send_request(MSG_GET_AVAILABLE_ROOMS_REQ, request)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 data = payload.get('data', {})
-                return data.get('rooms', [])
+                return {
+                    'rooms': data.get('rooms', []),
+                    'next_cursor': data.get('next_cursor'),
+                    'total_hint': data.get('total_hint'),
+                    'total_capped': data.get('total_capped', False)
+                }
             else:
                 raise ValueError(payload.get('message', 'Failed to get available rooms'))
             
         except Exception as e:
             raise Exception(f"Failed to get available rooms: {str(e)}")
     
-    def start_room_test(self, room_id, cached_data=None):
+    # ==================== Exam prefetch ====================
+    
+    RESUME_PREFETCH_WITHIN = 10  # Jitter (seconds) for rooms found on refresh
+    
+    def schedule_prefetch(self, room_id, within):
+        """
+        Download a room's encrypted exam after a random delay
+        
+        Args:
+            room_id: Joined room
+            within: Server-suggested spread in seconds (0 = room already running, skip)
+        """
+        if not within:
+            return
+        with self._exams_lock:
+            if room_id in self.exams or room_id in self._prefetch_timers:
+                return
+            # Random delay spreads a class's downloads over the waiting period
+            timer = threading.Timer(random.uniform(0, within), self.prefetch_exam, args=(room_id,))
+            timer.daemon = True
+            self._prefetch_timers[room_id] = timer
+        timer.start()
+    
+    def prefetch_exam(self, room_id):
+        """Fetch (or refresh) the encrypted exam of a room; failures are silent"""
+        with self._exams_lock:
+            self._prefetch_timers.pop(room_id, None)
+            cached = self.exams.get(room_id)
+        
+        try:
+            request = {'room_id': room_id}
+            if cached:
+                request['exam_version'] = cached['version']
+            payload = self.conn.send_request(MSG_PREFETCH_EXAM_REQ, request)
+            
+            if payload.get('code') != 1000:
+                print(f"[PREFETCH] Room {room_id}: {payload.get('message')}")
+                return
+            
+            data = payload.get('data', {})
+            with self._exams_lock:
+                exam = self.exams.get(room_id) or {}
+                if 'blob' in data:
+                    exam = {'blob': data['blob'], 'key': None}
+                exam['version'] = data['exam_version']
+                if data.get('exam_key'):
+                    exam['key'] = data['exam_key']
+                self.exams[room_id] = exam
+            print(f"[PREFETCH] Room {room_id}: {data.get('question_count')} questions cached")
+            
+        except Exception as e:
+            print(f"[PREFETCH] Room {room_id} failed: {e}")
+    
+    def set_exam_key(self, room_id, key, version):
+        """Store the key released in the room start broadcast"""
+        with self._exams_lock:
+            exam = self.exams.get(room_id)
+            if exam and exam.get('version') == version:
+                exam['key'] = key
+    
+    def start_room_test(self, room_id, cached_data=None, use_prefetch=True):
         """Start test for a specific room (optionally resume from cache)"""
         try:
+            request = {'room_id': room_id}
+            with self._exams_lock:
+                exam = self.exams.get(room_id)
+            if use_prefetch and exam:
+                # Server answers with just the key if our copy is current
+                request['exam_version'] = exam['version']
+            
             # Send request via C select loop
-            payload = self.conn.send_request(MSG_START_ROOM_TEST_REQ, {
-                'room_id': room_id
-            })
+            payload = self.conn.send_request(MSG_START_ROOM_TEST_REQ, request)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 data = payload.get('data', {})
-                questions = data.get('questions', [])
+                if 'questions' in data:
+                    questions = data['questions']
+                else:
+                    try:
+                        # Key from the response, or the one released in the start broadcast
+                        questions = decrypt_exam(data.get('exam_key') or exam.get('key'), exam['blob'])
+                    except ExamCipherError as e:
+                        # Corrupt or stale copy: drop it and ask for the plain questions
+                        print(f"[PREFETCH] Room {room_id}: {e}, downloading questions")
+                        with self._exams_lock:
+                            self.exams.pop(room_id, None)
+                        return self.start_room_test(room_id, cached_data, use_prefetch=False)
                 duration = data.get('duration_minutes', 30)
                 room_name = data.get('room_name', 'Test Room')
                 server_timestamp = data.get('server_timestamp')  # Unix timestamp from C server
+                deadline = data.get('deadline')  # Room end time set by the server
                 
                 # Show test screen via UI callback (with cached data if resuming)
                 self.questions = questions
                 self.ui['show_test'](questions, duration, room_id, cached_data, 
-                                    server_timestamp=server_timestamp)
+                                    server_timestamp=server_timestamp, deadline=deadline)
                 
                 return {
                     'success': True,
@@ -282,11 +537,16 @@ class StudentHandler:
             if self.auto_save_in_progress:
                 print("⚠️ [SUBMIT] Auto-save still in progress, proceeding anyway...")
             
+            # One id per room: a retried submit replays the first grading
+            action = ('submit_room_test', room_id)
+            
             # Send request via C select loop
             payload = self.conn.send_request(MSG_SUBMIT_ROOM_TEST_REQ, {
                 'room_id': room_id,
-                'answers': answers
+                'answers': answers,
+                'request_id': self.request_ids.get(action)
             })
+            self.request_ids.done(action)
             
             if payload.get('code') == 1000:  # ERR_SUCCESS
                 result = payload.get('data', {})
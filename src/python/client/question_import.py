@@ -0,0 +1,70 @@
+"""
+Question Import
+Parses CSV/JSON question files for bulk import
+"""
+import csv
+import json
+import os
+
+
+QUESTION_FIELDS = ['question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer']
+
+
+def _parse_correct_answer(value):
+    """Accept 0-3 or A-D, return int (or the raw value so the server reports it)"""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().upper()
+    if text in ('A', 'B', 'C', 'D'):
+        return ord(text) - ord('A')
+    if text.isdigit():
+        return int(text)
+    return value
+
+
+def _normalize(row):
+    """Map a parsed row onto the protocol question fields"""
+    return {
+        'question_text': str(row.get('question_text', row.get('question', ''))).strip(),
+        'option_a': str(row.get('option_a', '')).strip(),
+        'option_b': str(row.get('option_b', '')).strip(),
+        'option_c': str(row.get('option_c', '')).strip(),
+        'option_d': str(row.get('option_d', '')).strip(),
+        'correct_answer': _parse_correct_answer(row.get('correct_answer', 0))
+    }
+
+
+def load_questions_file(file_path):
+    """
+    Load questions from a CSV or JSON file
+    
+    CSV needs a header row with question_text, option_a..option_d, correct_answer.
+    JSON may be a list of question objects or {"questions": [...]}.
+    correct_answer accepts 0-3 or A-D.
+    
+    Args:
+        file_path: Path to .csv or .json file
+    
+    Returns:
+        list: Question dicts ready for MSG_BULK_ADD_QUESTIONS_REQ
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    
+    if ext == '.json':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('questions', [])
+        if not isinstance(data, list):
+            raise ValueError("JSON file must contain a list of questions")
+        return [_normalize(row) if isinstance(row, dict) else row for row in data]
+    
+    if ext == '.csv':
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            missing = [name for name in QUESTION_FIELDS if name not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"CSV file is missing columns: {', '.join(missing)}")
+            return [_normalize(row) for row in reader]
+    
+    raise ValueError("Unsupported file type (use .csv or .json)")
@@ -14,6 +14,8 @@ from .user_repository import UserRepository
 from .test_repository import TestRepository
 from .room_repository import RoomRepository
 from .stats_repository import StatsRepository
+from .question_bank_repository import QuestionBankRepository
+from .instrumentation import QueryInstrumentation
 
 # For backward compatibility
 Database = DatabaseManager
@@ -26,7 +28,9 @@ __all__ = [
     'UserRepository',
     'TestRepository', 
     'RoomRepository',
-    'StatsRepository'
+    'StatsRepository',
+    'QuestionBankRepository',
+    'QueryInstrumentation'
 ]
 
 
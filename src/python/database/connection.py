@@ -5,6 +5,9 @@ Core database setup and connection management
 import sqlite3
 import os
 
+from .question_bank_repository import upsert_bank_questions
+from .instrumentation import QueryInstrumentation
+
 
 class Database:
     """Database connection manager"""
@@ -13,6 +16,9 @@ class Database:
         """Initialize database connection"""
         self.db_path = db_path
         
+        # Statement timing, off until enabled (see instrumentation.py)
+        self.instrumentation = QueryInstrumentation()
+        
         # Create directory if not exists
         db_dir = os.path.dirname(db_path)
         if db_dir:  # Only create if there's a directory
@@ -23,7 +29,7 @@ class Database:
     
     def get_connection(self):
         """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        return self.instrumentation.connect(self.db_path)
     
     def init_database(self):
         """Create database tables if they don't exist"""
@@ -100,9 +106,12 @@ class Database:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 start_time TIMESTAMP,
                 end_time TIMESTAMP,
+                scheduled_start TIMESTAMP,
+                exam_key TEXT,
                 FOREIGN KEY (teacher_id) REFERENCES users(id)
             )
         ''')
+        self._migrate_test_rooms(cursor)
         
         # Room participants table
         cursor.execute('''
@@ -120,22 +129,61 @@ class Database:
             )
         ''')
         
-        # Room questions table
+        # A student's rooms (resume, student room list): the UNIQUE index leads with room_id
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS room_questions (
+            CREATE INDEX IF NOT EXISTS idx_room_participants_student
+            ON room_participants(student_id)
+        ''')
+        
+        # Lobby index: joinable rooms newest first (participant anti-join uses UNIQUE(room_id, student_id))
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_test_rooms_open
+            ON test_rooms(id) WHERE status IN ('waiting', 'active')
+        ''')
+        
+        # Question bank (shared, deduplicated by content hash)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_bank (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_id INTEGER NOT NULL,
+                content_hash TEXT UNIQUE NOT NULL,
                 question_text TEXT NOT NULL,
                 option_a TEXT NOT NULL,
                 option_b TEXT NOT NULL,
                 option_c TEXT NOT NULL,
                 option_d TEXT NOT NULL,
                 correct_answer INTEGER NOT NULL CHECK(correct_answer BETWEEN 0 AND 3),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Full-text index over the question bank (optional, needs SQLite FTS5)
+        self.fts_enabled = self._init_question_search(cursor)
+        
+        # Convert rooms created before the question bank existed
+        self._migrate_room_questions(cursor)
+        
+        # Room questions table (references question bank entries)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS room_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER NOT NULL,
+                bank_id INTEGER NOT NULL,
                 question_order INTEGER DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (room_id) REFERENCES test_rooms(id) ON DELETE CASCADE
+                FOREIGN KEY (room_id) REFERENCES test_rooms(id) ON DELETE CASCADE,
+                FOREIGN KEY (bank_id) REFERENCES question_bank(id)
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_room_questions_room
+            ON room_questions(room_id, question_order)
+        ''')
+        # Reverse lookup (rooms using a bank question: "mine only" question search);
+        # IF NOT EXISTS also adds it to databases created before it existed
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_room_questions_bank
+            ON room_questions(bank_id)
+        ''')
         
         # Test progress table (for auto-save)
         cursor.execute('''
@@ -151,12 +199,128 @@ class Database:
                 UNIQUE(room_id, student_id)
             )
         ''')
+        # Resume loads a student's progress across rooms (the UNIQUE index leads with room_id)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_test_progress_student
+            ON test_progress(student_id)
+        ''')
         
         conn.commit()
         conn.close()
         
         print(f"[OK] Database initialized at: {self.db_path}")
     
+    def _init_question_search(self, cursor):
+        """
+        Create FTS5 index over question_bank, kept in sync by triggers
+        
+        Returns:
+            bool: True if full-text search is available
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'question_bank_fts'")
+        exists = cursor.fetchone() is not None
+        
+        try:
+            # External content table: stores only the index, text stays in question_bank
+            # remove_diacritics lets "thuc" match "thức"; prefix index keeps "tc*" queries fast
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS question_bank_fts USING fts5(
+                    question_text, option_a, option_b, option_c, option_d,
+                    content='question_bank',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"[WARN] Question search disabled (FTS5 unavailable): {e}")
+            return False
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS question_bank_ai AFTER INSERT ON question_bank BEGIN
+                INSERT INTO question_bank_fts(rowid, question_text, option_a, option_b, option_c, option_d)
+                VALUES (new.id, new.question_text, new.option_a, new.option_b, new.option_c, new.option_d);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS question_bank_ad AFTER DELETE ON question_bank BEGIN
+                INSERT INTO question_bank_fts(question_bank_fts, rowid, question_text, option_a, option_b, option_c, option_d)
+                VALUES ('delete', old.id, old.question_text, old.option_a, old.option_b, old.option_c, old.option_d);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS question_bank_au AFTER UPDATE ON question_bank BEGIN
+                INSERT INTO question_bank_fts(question_bank_fts, rowid, question_text, option_a, option_b, option_c, option_d)
+                VALUES ('delete', old.id, old.question_text, old.option_a, old.option_b, old.option_c, old.option_d);
+                INSERT INTO question_bank_fts(rowid, question_text, option_a, option_b, option_c, option_d)
+                VALUES (new.id, new.question_text, new.option_a, new.option_b, new.option_c, new.option_d);
+            END
+        ''')
+        
+        if not exists:
+            # Index rows stored before the search table existed
+            cursor.execute("INSERT INTO question_bank_fts(question_bank_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    def _migrate_test_rooms(self, cursor):
+        """Add columns introduced after the first release to an existing test_rooms table"""
+        cursor.execute("PRAGMA table_info(test_rooms)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'scheduled_start' not in columns:
+            cursor.execute("ALTER TABLE test_rooms ADD COLUMN scheduled_start TIMESTAMP")
+        if 'exam_key' not in columns:
+            cursor.execute("ALTER TABLE test_rooms ADD COLUMN exam_key TEXT")
+    
+    def _migrate_room_questions(self, cursor):
+        """Move legacy room_questions rows (inline question text) into the question bank"""
+        cursor.execute("PRAGMA table_info(room_questions)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'question_text' not in columns:
+            return  # Fresh database or already migrated
+        
+        cursor.execute('''
+            SELECT id, room_id, question_text, option_a, option_b, option_c, option_d,
+                   correct_answer, question_order, created_at
+            FROM room_questions
+        ''')
+        legacy_rows = cursor.fetchall()
+        
+        bank_ids = []
+        if legacy_rows:
+            bank_ids = upsert_bank_questions(cursor, [{
+                'question_text': row[2],
+                'option_a': row[3],
+                'option_b': row[4],
+                'option_c': row[5],
+                'option_d': row[6],
+                'correct_answer': row[7]
+            } for row in legacy_rows])
+        
+        # Rebuild table keeping question IDs (answers reference them)
+        cursor.execute("ALTER TABLE room_questions RENAME TO room_questions_legacy")
+        cursor.execute('''
+            CREATE TABLE room_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id INTEGER NOT NULL,
+                bank_id INTEGER NOT NULL,
+                question_order INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (room_id) REFERENCES test_rooms(id) ON DELETE CASCADE,
+                FOREIGN KEY (bank_id) REFERENCES question_bank(id)
+            )
+        ''')
+        cursor.executemany('''
+            INSERT INTO room_questions (id, room_id, bank_id, question_order, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (row[0], row[1], bank_id, row[8], row[9])
+            for row, bank_id in zip(legacy_rows, bank_ids)
+        ])
+        cursor.execute("DROP TABLE room_questions_legacy")
+        
+        print(f"[OK] Migrated {len(legacy_rows)} room questions into question bank")
+    
     def close(self):
         """Close database connection"""
         pass  # Using context manager, connection auto-closes
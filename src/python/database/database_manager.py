@@ -7,6 +7,7 @@ from .user_repository import UserRepository
 from .test_repository import TestRepository
 from .room_repository import RoomRepository
 from .stats_repository import StatsRepository
+from .question_bank_repository import QuestionBankRepository
 
 class DatabaseManager:
     """
@@ -19,12 +20,14 @@ class DatabaseManager:
         # Core connection
         self.db_conn = DBConnection(db_path)
         self.db_path = db_path
+        self.instrumentation = self.db_conn.instrumentation
         
         # Initialize repositories
         self.users = UserRepository(self.db_conn.get_connection)
         self.tests = TestRepository(self.db_conn.get_connection)
         self.rooms = RoomRepository(self.db_conn.get_connection)
         self.stats = StatsRepository(self.db_conn.get_connection)
+        self.bank = QuestionBankRepository(self.db_conn.get_connection, self.db_conn.fts_enabled)
     
     def get_connection(self):
         """Get database connection"""
@@ -50,6 +53,11 @@ class DatabaseManager:
         """Save test result"""
         return self.tests.save_test_result(student_id, score, total_questions, answers_json, duration_seconds)
     
+    def save_room_result(self, room_id, student_id, score, total_questions, answers_json, duration_seconds=0):
+        """Save a room test result unless the participant already submitted (None then)"""
+        return self.tests.save_room_result(room_id, student_id, score, total_questions, answers_json,
+                                           duration_seconds)
+    
     def get_user_results(self, user_id):
         """Get test results for a user"""
         return self.tests.get_user_results(user_id)
@@ -58,11 +66,31 @@ class DatabaseManager:
         """Get all test results"""
         return self.tests.get_all_results()
     
+    def save_test_progress(self, room_id, student_id, answers_json, is_final=False):
+        """Save auto-saved answers"""
+        return self.tests.save_test_progress(room_id, student_id, answers_json, is_final)
+    
+    def get_student_progress(self, student_id):
+        """Get auto-saved answers of a student by room"""
+        return self.tests.get_student_progress(student_id)
+    
+    def get_room_progress(self, room_id):
+        """Get auto-saved answers of every student in a room"""
+        return self.tests.get_room_progress(room_id)
+    
+    def get_unsubmitted_progress(self, room_id):
+        """Get auto-saved answers of participants who have not submitted"""
+        return self.tests.get_unsubmitted_progress(room_id)
+    
+    def save_final_results(self, room_id, results):
+        """Save results for participants who did not submit"""
+        return self.tests.save_final_results(room_id, results)
+    
     # ==================== ROOM OPERATIONS (Delegate to RoomRepository) ====================
     
-    def create_test_room(self, room_name, teacher_id, num_questions, duration_minutes):
+    def create_test_room(self, room_name, teacher_id, num_questions, duration_minutes, scheduled_start=None):
         """Create test room"""
-        return self.rooms.create_test_room(room_name, teacher_id, num_questions, duration_minutes)
+        return self.rooms.create_test_room(room_name, teacher_id, num_questions, duration_minutes, scheduled_start)
     
     def get_room_by_id(self, room_id):
         """Get room by ID"""
@@ -80,14 +108,22 @@ class DatabaseManager:
         """Start test in room"""
         return self.rooms.start_test_room(room_id)
     
-    def end_test_room(self, room_id):
+    def end_test_room(self, room_id, force=False):
         """
         End test in room
         
         Returns:
             dict: {'success': bool, 'message': str, 'error': str (optional)}
         """
-        return self.rooms.end_test_room(room_id)
+        return self.rooms.end_test_room(room_id, force)
+    
+    def get_scheduled_rooms(self):
+        """Get rooms with a pending scheduled start or an active test"""
+        return self.rooms.get_scheduled_rooms()
+    
+    def ensure_exam_key(self, room_id, new_key):
+        """Get the room's exam key, storing new_key if it has none"""
+        return self.rooms.ensure_exam_key(room_id, new_key)
     
     def join_room(self, room_code, student_id):
         """Student joins room"""
@@ -97,6 +133,10 @@ class DatabaseManager:
         """Get room participants"""
         return self.rooms.get_room_participants(room_id)
     
+    def get_participant_status(self, room_id, student_id):
+        """Get a student's status in a room (None if not joined)"""
+        return self.rooms.get_participant_status(room_id, student_id)
+    
     def update_participant_status(self, room_id, student_id, status):
         """Update participant status"""
         return self.rooms.update_participant_status(room_id, student_id, status)
@@ -109,12 +149,26 @@ class DatabaseManager:
         """Get available rooms"""
         return self.rooms.get_available_rooms(student_id)
     
+    def get_available_rooms_page(self, student_id=None, limit=20, after_id=None,
+                                 name_filter=None, teacher_filter=None):
+        """Get one keyset page of available rooms"""
+        return self.rooms.get_available_rooms_page(student_id, limit, after_id,
+                                                   name_filter, teacher_filter)
+    
+    def clone_room(self, source_room_id, teacher_id, room_name=None):
+        """Clone room settings and question set into a new waiting room"""
+        return self.rooms.clone_room(source_room_id, teacher_id, room_name)
+    
     # ==================== ROOM QUESTIONS (Delegate to RoomRepository) ====================
     
     def add_room_question(self, room_id, question_text, option_a, option_b, option_c, option_d, correct_answer, question_order=0):
         """Add question to room"""
         return self.rooms.add_room_question(room_id, question_text, option_a, option_b, option_c, option_d, correct_answer, question_order)
     
+    def add_room_questions_bulk(self, room_id, questions, max_questions=None):
+        """Add many questions to room in one transaction"""
+        return self.rooms.add_room_questions_bulk(room_id, questions, max_questions)
+    
     def get_room_questions(self, room_id):
         """Get questions for a room"""
         return self.rooms.get_room_questions(room_id)
@@ -135,6 +189,20 @@ class DatabaseManager:
         """Get a question by ID"""
         return self.rooms.get_question_by_id(question_id)
     
+    # ==================== QUESTION BANK (Delegate to QuestionBankRepository) ====================
+    
+    def get_bank_question(self, bank_id):
+        """Get a question bank entry"""
+        return self.bank.get_bank_question(bank_id)
+    
+    def get_bank_size(self):
+        """Get number of distinct questions in the bank"""
+        return self.bank.get_bank_size()
+    
+    def search_questions(self, query, limit=20, offset=0, teacher_id=None):
+        """Full-text search over the question bank"""
+        return self.bank.search_questions(query, limit, offset, teacher_id)
+    
     # ==================== STATISTICS (Delegate to StatsRepository) ====================
     
     def get_statistics(self):
@@ -143,6 +211,10 @@ class DatabaseManager:
     
     # ==================== UTILITY ====================
     
+    def get_query_stats(self, top=20):
+        """Per-statement timing aggregates and recent slow queries"""
+        return self.instrumentation.snapshot(top)
+    
     def close(self):
         """Close database connection"""
         self.db_conn.close()
@@ -0,0 +1,369 @@
+"""
+Query Instrumentation
+Times every SQL statement run through the repository connection factory
+
+When enabled, Database.get_connection returns connections whose cursors
+time each statement (execute plus fetching its rows) and aggregate it by
+normalised SQL text. Statements slower than a threshold go to a slow-query
+log (JSON lines) together with their EXPLAIN QUERY PLAN. Bound parameters
+are never logged (they include password hashes and salts), only their count.
+
+Connections are opened per repository call, so switching on or off takes
+effect with the next call; while disabled the factory returns plain
+sqlite3 connections and costs one attribute check.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_histogram import LatencyHistogram
+
+_SPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape: one line, literals and placeholder lists collapsed
+    
+    "SELECT * FROM t WHERE id IN (?, ?, ?) AND s = 'x'" and the same query
+    with other values and list lengths share the key
+    "SELECT * FROM t WHERE id IN (?, ...) AND s = ?".
+    """
+    text = _SPACE.sub(' ', sql).strip()
+    text = _STRING.sub('?', text)
+    text = _NUMBER.sub('?', text)
+    return _PLACEHOLDER_LIST.sub('(?, ...)', text)
+
+
+class StatementStats:
+    """Aggregates of one normalised statement (guarded by the instrumentation lock)"""
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.histogram = LatencyHistogram()
+    
+    def snapshot(self, sql):
+        latency = self.histogram.summary()
+        return {
+            'sql': sql,
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': round(self.histogram.sum_us / 1000, 3),
+            'mean_ms': latency['mean_ms'],
+            'p50_ms': latency['p50_ms'],
+            'p99_ms': latency['p99_ms'],
+            'max_ms': latency['max_ms']
+        }
+
+
+class QueryInstrumentation:
+    """
+    Statement timing, aggregates and slow-query log of one database
+    
+    Attributes:
+        enabled: Instrument new connections
+        slow_ms: Statements at or over this many milliseconds are logged
+        slow_log_path: JSON-lines file for slow statements (None: memory only)
+        label: Callable naming what the current thread runs the query for
+               (e.g. the request type), or None
+        on_slow: Callable(entry) for every slow statement, or None
+    """
+    
+    MAX_STATEMENTS = 500  # Distinct normalised statements kept
+    
+    def __init__(self, slow_ms=100, slow_log_path=None):
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self.label = None
+        self.on_slow = None
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._normalized = {}
+        self.slow_count = 0
+        self.recent_slow = deque(maxlen=20)
+        self.enabled_at = None
+    
+    def enable(self, slow_ms=None, slow_log_path=None):
+        """Start timing statements (optionally changing threshold and log file)"""
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if slow_log_path is not None:
+            self.slow_log_path = slow_log_path
+        if self.slow_log_path and os.path.exists(self.slow_log_path):
+            try:
+                os.chmod(self.slow_log_path, 0o600)  # Created by an older version with the default mode
+            except OSError:
+                pass
+        if not self.enabled:
+            self.enabled_at = time.time()
+        self.enabled = True
+    
+    def disable(self):
+        """Stop timing new connections (aggregates are kept)"""
+        self.enabled = False
+    
+    def reset(self):
+        """Drop all aggregates and the recent slow statements"""
+        with self._lock:
+            self._stats.clear()
+            self.recent_slow.clear()
+            self.slow_count = 0
+    
+    def connect(self, db_path):
+        """Connection factory used by Database.get_connection"""
+        if not self.enabled:
+            return sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
+        conn.instrumentation = self
+        return conn
+    
+    def record(self, conn, sql, params, seconds, rows, failed=False):
+        """Add one finished statement; log it with its plan if it was slow"""
+        key = self._normalized.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._normalized) < 4 * self.MAX_STATEMENTS:
+                self._normalized[sql] = key
+        
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.MAX_STATEMENTS:
+                    key = '(other statements)'
+                stats = self._stats.setdefault(key, StatementStats())
+            stats.count += 1
+            stats.rows += max(0, rows)
+            if failed:
+                stats.errors += 1
+            stats.histogram.record(seconds)
+        
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(conn, sql, params, seconds, rows, failed)
+    
+    def _log_slow(self, conn, sql, params, seconds, rows, failed):
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(seconds * 1000, 3),
+            'label': self.label() if self.label else None,
+            'sql': _SPACE.sub(' ', sql).strip(),
+            'param_count': len(params) if params is not None else 0,
+            'rows': rows,
+            'failed': failed,
+            'plan': explain(conn, sql, params)
+        }
+        
+        with self._lock:
+            self.slow_count += 1
+            self.recent_slow.append(entry)
+        
+        path = self.slow_log_path
+        if path:
+            try:
+                append_line(path, json.dumps(entry, ensure_ascii=False))
+            except OSError:
+                pass  # Never fail a query because the log is unwritable
+        
+        if self.on_slow:
+            self.on_slow(entry)
+    
+    def snapshot(self, top=20):
+        """
+        Statements ordered by total time
+        
+        Returns:
+            dict: {'enabled', 'slow_ms', 'statements': [...top], 'distinct',
+                   'slow_count', 'recent_slow': [...]}
+        """
+        with self._lock:
+            statements = [stats.snapshot(sql) for sql, stats in self._stats.items()]
+            recent = list(self.recent_slow)
+            slow_count = self.slow_count
+        
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'distinct': len(statements),
+            'statements': statements[:top],
+            'slow_count': slow_count,
+            'recent_slow': recent
+        }
+
+
+def append_line(path, line):
+    """
+    Append one line to an owner-only file (created 0600)
+    
+    A single O_APPEND write per line, so threads logging at once need no lock
+    and their lines do not interleave.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, (line + '\n').encode('utf-8'))
+    finally:
+        os.close(fd)
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN lines of a statement, indented by depth (or the error)"""
+    try:
+        cursor = sqlite3.Connection.cursor(conn, sqlite3.Cursor)  # Not instrumented
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, params if params is not None else ()).fetchall()
+    except (sqlite3.Error, ValueError) as e:
+        return [f"(no plan: {e})"]
+    
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return lines
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement until its rows are fetched
+    
+    A statement is finished (and recorded) when its rows are exhausted,
+    the cursor runs the next statement, or the connection closes.
+    """
+    
+    _pending = None  # [sql, params, seconds, rows]
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception:
+            self.connection.instrumentation.record(self.connection, sql, parameters,
+                                                   time.perf_counter() - started, 0, failed=True)
+            raise
+        # Writes report affected rows now; reads count rows as they are fetched
+        rows = 0 if self.description is not None else self.rowcount
+        self._pending = [sql, parameters, time.perf_counter() - started, rows]
+        self.connection._track(self)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        first = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        started = time.perf_counter()
+        failed = True
+        try:
+            super().executemany(sql, seq_of_parameters)
+            failed = False
+            return self
+        finally:
+            self.connection.instrumentation.record(self.connection, sql, first, time.perf_counter() - started,
+                                                   0 if failed else self.rowcount, failed=failed)
+    
+    def executescript(self, sql_script):
+        self._finish()
+        started = time.perf_counter()
+        failed = True
+        try:
+            super().executescript(sql_script)
+            failed = False
+            return self
+        finally:
+            self.connection.instrumentation.record(self.connection, sql_script, None,
+                                                   time.perf_counter() - started, 0, failed=failed)
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, 0 if row is None else 1, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - started, len(rows), not rows)
+        return rows
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+    
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - started, 0, True)
+            raise
+        self._fetched(time.perf_counter() - started, 1, False)
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def _fetched(self, seconds, rows, exhausted):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += seconds
+            pending[3] += rows
+            if exhausted:
+                self._finish()
+    
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        self._pending = None
+        self.connection._untrack(self)
+        sql, params, seconds, rows = pending
+        self.connection.instrumentation.record(self.connection, sql, params, seconds, rows)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose statements all run on InstrumentedCursor"""
+    
+    instrumentation = None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._open_cursors = set()
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    # sqlite3.Connection.execute* do not go through cursor(), so route them explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+    
+    def close(self):
+        # Record statements whose rows were not read to the end (e.g. one fetchone)
+        for cursor in list(self._open_cursors):
+            cursor._finish()
+        super().close()
+    
+    def _track(self, cursor):
+        self._open_cursors.add(cursor)
+    
+    def _untrack(self, cursor):
+        self._open_cursors.discard(cursor)
@@ -0,0 +1,211 @@
+"""
+Question Bank Repository
+Shared, content-addressed question storage referenced by rooms
+"""
+import hashlib
+import re
+
+
+QUESTION_COLUMNS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')
+
+
+def content_hash(question_text, option_a, option_b, option_c, option_d, correct_answer):
+    """
+    Compute the bank key for a question
+    
+    Text and options are stripped so copy/paste whitespace does not create duplicates.
+    
+    Returns:
+        str: SHA-256 hex digest
+    """
+    parts = [str(part).strip() for part in (question_text, option_a, option_b, option_c, option_d)]
+    parts.append(str(int(correct_answer)))
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression
+    
+    Every word becomes a quoted prefix term, so user input cannot inject FTS
+    syntax and "tcp hand" matches "TCP handshake".
+    
+    Returns:
+        str: MATCH expression, or '' if the text has no searchable words
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words[:8])
+
+
+def upsert_bank_questions(cursor, questions):
+    """
+    Insert questions into the bank (skipping ones already stored) using an open cursor
+    
+    Args:
+        cursor: Cursor inside the caller's transaction
+        questions: List of dicts with question_text, option_a..option_d, correct_answer
+    
+    Returns:
+        list: Bank IDs in the same order as questions
+    """
+    hashes = [content_hash(*(q[col] for col in QUESTION_COLUMNS)) for q in questions]
+    
+    cursor.executemany('''
+        INSERT OR IGNORE INTO question_bank
+        (content_hash, question_text, option_a, option_b, option_c, option_d, correct_answer)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (h, q['question_text'], q['option_a'], q['option_b'], q['option_c'], q['option_d'], q['correct_answer'])
+        for h, q in zip(hashes, questions)
+    ])
+    
+    unique_hashes = list(set(hashes))
+    placeholders = ','.join('?' * len(unique_hashes))
+    cursor.execute(f'SELECT content_hash, id FROM question_bank WHERE content_hash IN ({placeholders})',
+                   unique_hashes)
+    ids_by_hash = dict(cursor.fetchall())
+    
+    return [ids_by_hash[h] for h in hashes]
+
+
+class QuestionBankRepository:
+    """Repository for question bank operations"""
+    
+    def __init__(self, db_connection_getter, fts_enabled=True):
+        """
+        Initialize repository
+        
+        Args:
+            db_connection_getter: Function that returns database connection
+            fts_enabled: Whether the question_bank_fts index exists
+        """
+        self.get_connection = db_connection_getter
+        self.fts_enabled = fts_enabled
+    
+    def get_or_create(self, question_text, option_a, option_b, option_c, option_d, correct_answer):
+        """Return bank ID for a question, storing it if it is new"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            bank_id = upsert_bank_questions(cursor, [{
+                'question_text': question_text,
+                'option_a': option_a,
+                'option_b': option_b,
+                'option_c': option_c,
+                'option_d': option_d,
+                'correct_answer': correct_answer
+            }])[0]
+            conn.commit()
+            return bank_id
+        finally:
+            conn.close()
+    
+    def get_bank_question(self, bank_id):
+        """Get a bank question by ID"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, content_hash, question_text, option_a, option_b, option_c, option_d,
+                   correct_answer, created_at
+            FROM question_bank
+            WHERE id = ?
+        ''', (bank_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return {
+                'id': row[0],
+                'content_hash': row[1],
+                'question_text': row[2],
+                'option_a': row[3],
+                'option_b': row[4],
+                'option_c': row[5],
+                'option_d': row[6],
+                'correct_answer': row[7],
+                'created_at': str(row[8]) if row[8] else None
+            }
+        return None
+    
+    def get_bank_size(self):
+        """Get number of distinct questions stored in the bank"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM question_bank')
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    
+    def search_questions(self, query, limit=20, offset=0, teacher_id=None):
+        """
+        Full-text search over the question bank
+        
+        Args:
+            query: Free text (prefix matching per word)
+            limit: Page size
+            offset: Page start
+            teacher_id: Only return questions used in this teacher's rooms (None = whole bank)
+            
+        Returns:
+            dict: {'results': [...], 'has_more': bool}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        owner_filter = ''
+        params = []
+        if teacher_id is not None:
+            owner_filter = '''
+                AND EXISTS (
+                    SELECT 1 FROM room_questions rq
+                    JOIN test_rooms r ON rq.room_id = r.id
+                    WHERE rq.bank_id = b.id AND r.teacher_id = ?
+                )
+            '''
+            params.append(teacher_id)
+        
+        if self.fts_enabled:
+            match = build_match_query(query)
+            if not match:
+                conn.close()
+                return {'results': [], 'has_more': False}
+            
+            # Question text weighs 10x more than options when ranking
+            cursor.execute(f'''
+                SELECT b.id, snippet(question_bank_fts, -1, '[', ']', '…', 12),
+                       b.question_text, b.option_a, b.option_b, b.option_c, b.option_d, b.correct_answer
+                FROM question_bank_fts
+                JOIN question_bank b ON b.id = question_bank_fts.rowid
+                WHERE question_bank_fts MATCH ? {owner_filter}
+                ORDER BY bm25(question_bank_fts, 10.0, 1.0, 1.0, 1.0, 1.0)
+                LIMIT ? OFFSET ?
+            ''', [match] + params + [limit + 1, offset])
+        else:
+            # Fallback without FTS5: unranked substring match on question text
+            like = '%' + query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            cursor.execute(f'''
+                SELECT b.id, b.question_text,
+                       b.question_text, b.option_a, b.option_b, b.option_c, b.option_d, b.correct_answer
+                FROM question_bank b
+                WHERE b.question_text LIKE ? ESCAPE '\\' {owner_filter}
+                ORDER BY b.id DESC
+                LIMIT ? OFFSET ?
+            ''', [like] + params + [limit + 1, offset])
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        results = []
+        for row in rows[:limit]:
+            results.append({
+                'bank_id': row[0],
+                'snippet': row[1],
+                'question_text': row[2],
+                'option_a': row[3],
+                'option_b': row[4],
+                'option_c': row[5],
+                'option_d': row[6],
+                'correct_answer': row[7]
+            })
+        return {'results': results, 'has_more': len(rows) > limit}
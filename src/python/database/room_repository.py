@@ -7,6 +7,8 @@ import random
 import string
 from datetime import datetime
 
+from .question_bank_repository import upsert_bank_questions
+
 
 class RoomRepository:
     """Repository for room operations"""
@@ -20,8 +22,8 @@ class RoomRepository:
         """
         self.get_connection = db_connection_getter
     
-    def create_test_room(self, room_name, teacher_id, num_questions, duration_minutes):
-        """Create new test room"""
+    def create_test_room(self, room_name, teacher_id, num_questions, duration_minutes, scheduled_start=None):
+        """Create new test room (scheduled_start: ISO time to start automatically, or None)"""
         # Generate room code
         room_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
         
@@ -30,9 +32,10 @@ class RoomRepository:
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT INTO test_rooms (room_name, room_code, teacher_id, num_questions, duration_minutes, status)
-                VALUES (?, ?, ?, ?, ?, 'waiting')
-            ''', (room_name, room_code, teacher_id, num_questions, duration_minutes))
+                INSERT INTO test_rooms (room_name, room_code, teacher_id, num_questions, duration_minutes,
+                                        status, scheduled_start)
+                VALUES (?, ?, ?, ?, ?, 'waiting', ?)
+            ''', (room_name, room_code, teacher_id, num_questions, duration_minutes, scheduled_start))
             
             room_id = cursor.lastrowid
             conn.commit()
@@ -41,7 +44,7 @@ class RoomRepository:
             return {'room_id': room_id, 'room_code': room_code}
         except sqlite3.IntegrityError:
             # If room_code collision, retry
-            return self.create_test_room(room_name, teacher_id, num_questions, duration_minutes)
+            return self.create_test_room(room_name, teacher_id, num_questions, duration_minutes, scheduled_start)
     
     def get_room_by_id(self, room_id):
         """Get room by ID"""
@@ -51,7 +54,7 @@ class RoomRepository:
         cursor.execute('''
             SELECT r.id, r.room_name, r.room_code, r.teacher_id, u.full_name,
                    r.num_questions, r.duration_minutes, r.status, r.created_at,
-                   r.start_time, r.end_time
+                   r.start_time, r.end_time, r.scheduled_start
             FROM test_rooms r
             JOIN users u ON r.teacher_id = u.id
             WHERE r.id = ?
@@ -72,7 +75,8 @@ class RoomRepository:
                 'status': row[7],
                 'created_at': str(row[8]) if row[8] else None,
                 'start_time': str(row[9]) if row[9] else None,
-                'end_time': str(row[10]) if row[10] else None
+                'end_time': str(row[10]) if row[10] else None,
+                'scheduled_start': str(row[11]) if row[11] else None
             }
         return None
     
@@ -161,10 +165,14 @@ class RoomRepository:
         
         return success
     
-    def end_test_room(self, room_id):
+    def end_test_room(self, room_id, force=False):
         """
         End test in room
         
+        Args:
+            room_id: Room ID
+            force: Skip the minimum-duration check (scheduler ending at the deadline)
+        
         Returns:
             dict: {'success': bool, 'message': str, 'error': str (optional)}
         """
@@ -200,7 +208,7 @@ class RoomRepository:
         min_end_time = start_time + timedelta(minutes=duration_minutes)
         now = datetime.now()
         
-        if now < min_end_time:
+        if now < min_end_time and not force:
             remaining = min_end_time - now
             remaining_minutes = int(remaining.total_seconds() / 60)
             conn.close()
@@ -209,18 +217,71 @@ class RoomRepository:
                 'error': f'Cannot end test yet. Students need {remaining_minutes} more minutes to finish.'
             }
         
-        # All checks passed, end the room
+        # All checks passed, end the room (unless the teacher and the scheduler race: only one wins)
         cursor.execute('''
             UPDATE test_rooms
             SET status = 'ended', end_time = ?
-            WHERE id = ?
+            WHERE id = ? AND status = 'active'
         ''', (now.isoformat(), room_id))
         
+        ended = cursor.rowcount > 0
         conn.commit()
         conn.close()
         
+        if not ended:
+            return {'success': False, 'error': 'Room is not active (status: ended)'}
         return {'success': True, 'message': 'Room ended successfully'}
     
+    def get_scheduled_rooms(self):
+        """
+        Get rooms the scheduler must track: waiting with a scheduled start, or active
+        
+        Returns:
+            list: [{'id', 'status', 'scheduled_start', 'start_time', 'duration_minutes'}]
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, status, scheduled_start, start_time, duration_minutes
+            FROM test_rooms
+            WHERE status = 'active' OR (status = 'waiting' AND scheduled_start IS NOT NULL)
+        ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'id': row[0],
+            'status': row[1],
+            'scheduled_start': str(row[2]) if row[2] else None,
+            'start_time': str(row[3]) if row[3] else None,
+            'duration_minutes': row[4]
+        } for row in rows]
+    
+    def ensure_exam_key(self, room_id, new_key):
+        """
+        Store new_key as the room's exam key unless it already has one
+        
+        Returns:
+            str or None: The room's key (None if the room does not exist)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Conditional update: concurrent callers all end up with the first key
+        cursor.execute('''
+            UPDATE test_rooms SET exam_key = ?
+            WHERE id = ? AND exam_key IS NULL
+        ''', (new_key, room_id))
+        cursor.execute('SELECT exam_key FROM test_rooms WHERE id = ?', (room_id,))
+        
+        row = cursor.fetchone()
+        conn.commit()
+        conn.close()
+        
+        return row[0] if row else None
+    
     def join_room(self, room_code, student_id):
         """Student joins a room"""
         room = self.get_room_by_code(room_code)
@@ -277,6 +338,21 @@ class RoomRepository:
             })
         return participants
     
+    def get_participant_status(self, room_id, student_id):
+        """Get a student's status in a room, or None if they have not joined"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT status FROM room_participants
+            WHERE room_id = ? AND student_id = ?
+        ''', (room_id, student_id))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else None
+    
     def update_participant_status(self, room_id, student_id, status):
         """Update participant status"""
         conn = self.get_connection()
@@ -298,7 +374,8 @@ class RoomRepository:
         
         cursor.execute('''
             SELECT r.id, r.room_name, r.room_code, u.full_name as teacher_name,
-                   r.num_questions, r.duration_minutes, r.status, p.joined_at, p.status as participant_status
+                   r.num_questions, r.duration_minutes, r.status, p.joined_at, p.status as participant_status,
+                   r.start_time
             FROM room_participants p
             JOIN test_rooms r ON p.room_id = r.id
             JOIN users u ON r.teacher_id = u.id
@@ -320,42 +397,103 @@ class RoomRepository:
                 'duration_minutes': row[5],
                 'room_status': row[6],
                 'joined_at': str(row[7]) if row[7] else None,
-                'participant_status': row[8]
+                'participant_status': row[8],
+                'start_time': str(row[9]) if row[9] else None
             })
         return rooms
     
     def get_available_rooms(self, student_id=None):
         """Get list of available rooms (optionally filter out already joined by student)"""
+        return self.get_available_rooms_page(student_id, limit=None)['rooms']
+    
+    def get_available_rooms_page(self, student_id=None, limit=20, after_id=None,
+                                 name_filter=None, teacher_filter=None, count_cap=1000):
+        """
+        Get one page of joinable rooms, newest first
+        
+        Uses keyset pagination on room id (pass the previous page's next_cursor
+        as after_id) so deep pages cost the same as the first one.
+        
+        Args:
+            student_id: Exclude rooms this student already joined
+            limit: Page size (None = no limit)
+            after_id: Return rooms with id below this cursor
+            name_filter: Substring of room name, or exact room code
+            teacher_filter: Substring of teacher name
+            count_cap: Stop counting the total hint at this many rooms
+        
+        Returns:
+            dict: {'rooms': [...], 'next_cursor': int or None,
+                   'total_hint': int or None, 'total_capped': bool}
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Filters shared by the page query and the count hint
+        where = ["r.status IN ('waiting', 'active')"]
+        params = []
+        
         if student_id:
-            # Get rooms NOT joined by this student
-            cursor.execute('''
-                SELECT r.id, r.room_name, r.room_code, u.full_name as teacher_name,
-                       r.num_questions, r.duration_minutes, r.status, r.created_at
-                FROM test_rooms r
-                JOIN users u ON r.teacher_id = u.id
-                WHERE r.id NOT IN (
-                    SELECT room_id FROM room_participants WHERE student_id = ?
+            where.append('''NOT EXISTS (
+                    SELECT 1 FROM room_participants p
+                    WHERE p.room_id = r.id AND p.student_id = ?
+                )''')
+            params.append(student_id)
+        
+        if name_filter:
+            where.append("(r.room_name LIKE ? ESCAPE '\\' OR r.room_code = ?)")
+            params.extend([self._like_pattern(name_filter), name_filter.strip().upper()])
+        
+        if teacher_filter:
+            where.append("u.full_name LIKE ? ESCAPE '\\'")
+            params.append(self._like_pattern(teacher_filter))
+        
+        # Total hint only on the first page, capped so it stays cheap with many rooms
+        total_hint = None
+        total_capped = False
+        if after_id is None and limit is not None:
+            cursor.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT 1
+                    FROM test_rooms r
+                    JOIN users u ON r.teacher_id = u.id
+                    WHERE {' AND '.join(where)}
+                    LIMIT ?
                 )
-                AND r.status IN ('waiting', 'active')
-                ORDER BY r.created_at DESC
-            ''', (student_id,))
-        else:
-            # Get all non-ended rooms
-            cursor.execute('''
-                SELECT r.id, r.room_name, r.room_code, u.full_name as teacher_name,
-                       r.num_questions, r.duration_minutes, r.status, r.created_at
-                FROM test_rooms r
-                JOIN users u ON r.teacher_id = u.id
-                WHERE r.status IN ('waiting', 'active')
-                ORDER BY r.created_at DESC
-            ''')
+            ''', params + [count_cap + 1])
+            total_hint = cursor.fetchone()[0]
+            if total_hint > count_cap:
+                total_hint = count_cap
+                total_capped = True
+        
+        page_where = list(where)
+        page_params = list(params)
+        if after_id is not None:
+            page_where.append("r.id < ?")
+            page_params.append(after_id)
+        
+        limit_clause = ''
+        if limit is not None:
+            limit_clause = 'LIMIT ?'
+            page_params.append(limit + 1)
+        
+        cursor.execute(f'''
+            SELECT r.id, r.room_name, r.room_code, u.full_name as teacher_name,
+                   r.num_questions, r.duration_minutes, r.status, r.created_at
+            FROM test_rooms r
+            JOIN users u ON r.teacher_id = u.id
+            WHERE {' AND '.join(page_where)}
+            ORDER BY r.id DESC
+            {limit_clause}
+        ''', page_params)
         
         rows = cursor.fetchall()
         conn.close()
         
+        has_more = limit is not None and len(rows) > limit
+        if has_more:
+            rows = rows[:limit]
+        
         rooms = []
         for row in rows:
             rooms.append({
@@ -368,30 +506,52 @@ class RoomRepository:
                 'status': row[6],
                 'created_at': str(row[7]) if row[7] else None
             })
-        return rooms
+        
+        return {
+            'rooms': rooms,
+            'next_cursor': rooms[-1]['id'] if has_more else None,
+            'total_hint': total_hint,
+            'total_capped': total_capped
+        }
+    
+    @staticmethod
+    def _like_pattern(text):
+        """Escape LIKE wildcards in user text and wrap it for substring match"""
+        escaped = text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f'%{escaped}%'
     
     def add_room_question(self, room_id, question_text, option_a, option_b, option_c, option_d, correct_answer, question_order=0):
-        """Add a question to a room"""
+        """Add a question to a room (stored once in the question bank)"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        bank_id = upsert_bank_questions(cursor, [{
+            'question_text': question_text,
+            'option_a': option_a,
+            'option_b': option_b,
+            'option_c': option_c,
+            'option_d': option_d,
+            'correct_answer': correct_answer
+        }])[0]
         cursor.execute('''
-            INSERT INTO room_questions 
-            (room_id, question_text, option_a, option_b, option_c, option_d, correct_answer, question_order)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (room_id, question_text, option_a, option_b, option_c, option_d, correct_answer, question_order))
+            INSERT INTO room_questions (room_id, bank_id, question_order)
+            VALUES (?, ?, ?)
+        ''', (room_id, bank_id, question_order))
+        question_id = cursor.lastrowid
         conn.commit()
-        return cursor.lastrowid
+        conn.close()
+        return question_id
     
     def get_room_questions(self, room_id):
         """Get all questions for a room"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, question_text, option_a, option_b, option_c, option_d, 
-                   correct_answer, question_order
-            FROM room_questions
-            WHERE room_id = ?
-            ORDER BY question_order, id
+            SELECT rq.id, b.question_text, b.option_a, b.option_b, b.option_c, b.option_d, 
+                   b.correct_answer, rq.question_order, rq.bank_id
+            FROM room_questions rq
+            JOIN question_bank b ON rq.bank_id = b.id
+            WHERE rq.room_id = ?
+            ORDER BY rq.question_order, rq.id
         ''', (room_id,))
         
         questions = []
@@ -404,31 +564,47 @@ class RoomRepository:
                 'option_c': row[4],
                 'option_d': row[5],
                 'correct_answer': row[6],
-                'question_order': row[7]
+                'question_order': row[7],
+                'bank_id': row[8]
             })
+        conn.close()
         return questions
     
     def update_room_question(self, question_id, question_text, option_a, option_b, option_c, option_d, correct_answer):
-        """Update a room question"""
+        """
+        Update a room question
+        
+        Bank entries may be shared by other rooms, so the edited content is stored
+        as its own bank entry and only this room's reference is repointed.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        bank_id = upsert_bank_questions(cursor, [{
+            'question_text': question_text,
+            'option_a': option_a,
+            'option_b': option_b,
+            'option_c': option_c,
+            'option_d': option_d,
+            'correct_answer': correct_answer
+        }])[0]
         cursor.execute('''
             UPDATE room_questions
-            SET question_text = ?, option_a = ?, option_b = ?, option_c = ?, 
-                option_d = ?, correct_answer = ?
+            SET bank_id = ?
             WHERE id = ?
-        ''', (question_text, option_a, option_b, option_c, option_d, correct_answer, question_id))
+        ''', (bank_id, question_id))
         conn.commit()
+        conn.close()
     
     def get_question_by_id(self, question_id):
         """Get a question by ID"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, room_id, question_text, option_a, option_b, option_c, option_d, 
-                   correct_answer, question_order
-            FROM room_questions 
-            WHERE id = ?
+            SELECT rq.id, rq.room_id, b.question_text, b.option_a, b.option_b, b.option_c, b.option_d, 
+                   b.correct_answer, rq.question_order, rq.bank_id
+            FROM room_questions rq
+            JOIN question_bank b ON rq.bank_id = b.id
+            WHERE rq.id = ?
         ''', (question_id,))
         
         row = cursor.fetchone()
@@ -444,12 +620,13 @@ class RoomRepository:
                 'option_c': row[5],
                 'option_d': row[6],
                 'correct_answer': row[7],
-                'question_order': row[8]
+                'question_order': row[8],
+                'bank_id': row[9]
             }
         return None
     
     def delete_room_question(self, question_id):
-        """Delete a room question"""
+        """Delete a room question (the bank entry is kept for reuse)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM room_questions WHERE id = ?', (question_id,))
@@ -462,11 +639,122 @@ class RoomRepository:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM room_questions WHERE room_id = ?', (room_id,))
         conn.commit()
+        conn.close()
     
     def get_room_question_count(self, room_id):
         """Get count of questions in a room"""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM room_questions WHERE room_id = ?', (room_id,))
-        return cursor.fetchone()[0]
-
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    
+    def add_room_questions_bulk(self, room_id, questions, max_questions=None):
+        """
+        Add many questions to a room in a single transaction
+        
+        Args:
+            room_id: Target room ID
+            questions: List of dicts with question_text, option_a..option_d, correct_answer
+            max_questions: Room capacity (None = no limit)
+        
+        Returns:
+            dict: {'success': bool, 'inserted': int, 'total': int, 'error': str (optional)}
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            
+            # Take the write lock before counting so capacity check and insert are atomic
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT COUNT(*) FROM room_questions WHERE room_id = ?', (room_id,))
+            current_count = cursor.fetchone()[0]
+            
+            if max_questions is not None and current_count + len(questions) > max_questions:
+                conn.rollback()
+                return {
+                    'success': False,
+                    'inserted': 0,
+                    'total': current_count,
+                    'error': f"Room limit: {max_questions}, Current: {current_count}, Importing: {len(questions)}"
+                }
+            
+            bank_ids = upsert_bank_questions(cursor, questions)
+            cursor.executemany('''
+                INSERT INTO room_questions (room_id, bank_id, question_order)
+                VALUES (?, ?, ?)
+            ''', [
+                (room_id, bank_id, current_count + i + 1)
+                for i, bank_id in enumerate(bank_ids)
+            ])
+            
+            conn.commit()
+            return {
+                'success': True,
+                'inserted': len(questions),
+                'total': current_count + len(questions)
+            }
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def clone_room(self, source_room_id, teacher_id, room_name=None):
+        """
+        Create a new waiting room with the same settings and question set
+        
+        Questions are copied as bank references with one INSERT ... SELECT.
+        
+        Returns:
+            dict: {'room_id', 'room_code', 'room_name', 'question_count'} or None if source not found
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT room_name, num_questions, duration_minutes
+                FROM test_rooms
+                WHERE id = ?
+            ''', (source_room_id,))
+            source = cursor.fetchone()
+            if not source:
+                return None
+            
+            new_name = room_name or f"{source[0]} (copy)"
+            
+            while True:
+                room_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+                try:
+                    cursor.execute('''
+                        INSERT INTO test_rooms (room_name, room_code, teacher_id, num_questions, duration_minutes, status)
+                        VALUES (?, ?, ?, ?, ?, 'waiting')
+                    ''', (new_name, room_code, teacher_id, source[1], source[2]))
+                    break
+                except sqlite3.IntegrityError:
+                    continue  # room_code collision, pick another
+            
+            new_room_id = cursor.lastrowid
+            
+            cursor.execute('''
+                INSERT INTO room_questions (room_id, bank_id, question_order)
+                SELECT ?, bank_id, question_order
+                FROM room_questions
+                WHERE room_id = ?
+                ORDER BY question_order, id
+            ''', (new_room_id, source_room_id))
+            question_count = cursor.rowcount
+            
+            conn.commit()
+            return {
+                'room_id': new_room_id,
+                'room_code': room_code,
+                'room_name': new_name,
+                'question_count': question_count
+            }
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -2,6 +2,7 @@
 Test Repository
 Handles test results and test-related database operations
 """
+import json
 
 
 class TestRepository:
@@ -32,6 +33,42 @@ class TestRepository:
         
         return result_id
     
+    def save_room_result(self, room_id, student_id, score, total_questions, answers_json, duration_seconds=0):
+        """
+        Save a room test result and mark the participant submitted, in one transaction
+        
+        Returns:
+            int: Result ID, or None if the participant had already submitted (or finalize_room
+                 graded them first) or is not in the room; nothing is saved then
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO test_results (student_id, score, total_questions, answers, duration_seconds)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (student_id, score, total_questions, answers_json, duration_seconds))
+            result_id = cursor.lastrowid
+            
+            cursor.execute('''
+                UPDATE room_participants
+                SET status = 'submitted', test_result_id = ?
+                WHERE room_id = ? AND student_id = ? AND status != 'submitted'
+            ''', (result_id, room_id, student_id))
+            
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return result_id
+    
     def get_user_results(self, user_id):
         """Get test results for a specific user"""
         conn = self.get_connection()
@@ -88,4 +125,137 @@ class TestRepository:
                 'percentage': round(row[4] / row[5] * 100, 2) if row[5] > 0 else 0
             })
         return results
-
+    
+    def save_test_progress(self, room_id, student_id, answers_json, is_final=False):
+        """Save auto-saved answers (one row per room and student, overwritten)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            REPLACE INTO test_progress (room_id, student_id, answers_json, is_final)
+            VALUES (?, ?, ?, ?)
+        ''', (room_id, student_id, answers_json, is_final))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_room_progress(self, room_id):
+        """
+        Get auto-saved answers of every student in a room
+        
+        Returns:
+            dict: {student_id: [answers]}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT student_id, answers_json
+            FROM test_progress
+            WHERE room_id = ?
+        ''', (room_id,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row[0]: json.loads(row[1]) if row[1] else [] for row in rows}
+    
+    def get_unsubmitted_progress(self, room_id):
+        """
+        Get the last auto-saved answers of participants who started but have not submitted
+        
+        Returns:
+            list: [{'student_id': int, 'answers': [...]}] (empty answers if nothing saved)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT p.student_id, tp.answers_json
+            FROM room_participants p
+            LEFT JOIN test_progress tp ON tp.room_id = p.room_id AND tp.student_id = p.student_id
+            WHERE p.room_id = ? AND p.status != 'submitted'
+              AND (p.status = 'testing' OR tp.answers_json IS NOT NULL)
+        ''', (room_id,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            'student_id': row[0],
+            'answers': json.loads(row[1]) if row[1] else []
+        } for row in rows]
+    
+    def save_final_results(self, room_id, results):
+        """
+        Save results for participants who did not submit, in one transaction
+        
+        A participant who submitted in the meantime keeps their own result.
+        
+        Args:
+            results: [{'student_id', 'score', 'total_questions', 'answers'}]
+        
+        Returns:
+            int: Number of results saved
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        saved = 0
+        
+        try:
+            for result in results:
+                cursor.execute('''
+                    INSERT INTO test_results (student_id, score, total_questions, answers, duration_seconds)
+                    VALUES (?, ?, ?, ?, 0)
+                ''', (result['student_id'], result['score'], result['total_questions'],
+                      json.dumps(result['answers'])))
+                result_id = cursor.lastrowid
+                
+                cursor.execute('''
+                    UPDATE room_participants
+                    SET status = 'submitted', test_result_id = ?
+                    WHERE room_id = ? AND student_id = ? AND status != 'submitted'
+                ''', (result_id, room_id, result['student_id']))
+                
+                if cursor.rowcount == 0:
+                    cursor.execute('DELETE FROM test_results WHERE id = ?', (result_id,))
+                    continue
+                saved += 1
+            
+            cursor.execute('UPDATE test_progress SET is_final = 1 WHERE room_id = ?', (room_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return saved
+    
+    def get_student_progress(self, student_id):
+        """
+        Get auto-saved answers of a student for every room
+        
+        Returns:
+            dict: {room_id: {'answers': [...], 'saved_at': str, 'is_final': bool}}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT room_id, answers_json, saved_at, is_final
+            FROM test_progress
+            WHERE student_id = ?
+        ''', (student_id,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        progress = {}
+        for row in rows:
+            progress[row[0]] = {
+                'answers': json.loads(row[1]) if row[1] else [],
+                'saved_at': str(row[2]) if row[2] else None,
+                'is_final': bool(row[3])
+            }
+        return progress
@@ -0,0 +1,120 @@
+"""
+Exam Cipher
+Encrypts a room's questions for prefetch before the room starts (shared by client and server)
+
+Standard library only: the keystream is HMAC-SHA256 in counter mode and the
+ciphertext is authenticated with a separate HMAC key (encrypt-then-MAC).
+
+Blob layout (base64): version (1) | nonce (16) | ciphertext | tag (16)
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import struct
+import zlib
+
+BLOB_VERSION = 1
+KEY_SIZE = 32
+NONCE_SIZE = 16
+TAG_SIZE = 16
+_BLOCK = hashlib.sha256().digest_size
+
+
+class ExamCipherError(ValueError):
+    """Blob is malformed, tampered with, or the key is wrong"""
+
+
+def generate_key():
+    """New random room key (hex string, safe to store and send as JSON)"""
+    return os.urandom(KEY_SIZE).hex()
+
+
+def _subkeys(key_hex):
+    try:
+        key = bytes.fromhex(key_hex)
+    except (TypeError, ValueError):
+        raise ExamCipherError("Invalid exam key")
+    if len(key) != KEY_SIZE:
+        raise ExamCipherError("Invalid exam key")
+    enc_key = hmac.new(key, b"exam-enc", hashlib.sha256).digest()
+    mac_key = hmac.new(key, b"exam-mac", hashlib.sha256).digest()
+    return enc_key, mac_key
+
+
+def _keystream_xor(enc_key, nonce, data):
+    if not data:
+        return b""
+    base = hmac.new(enc_key, nonce, hashlib.sha256)
+    blocks = []
+    for counter in range((len(data) + _BLOCK - 1) // _BLOCK):
+        h = base.copy()
+        h.update(struct.pack(">Q", counter))
+        blocks.append(h.digest())
+    stream = b"".join(blocks)[:len(data)]
+    # XOR as big integers: one C-level operation instead of a per-byte loop
+    return (int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")).to_bytes(len(data), "big")
+
+
+def encrypt_exam(key_hex, questions):
+    """
+    Encrypt questions for prefetch
+    
+    Args:
+        key_hex: Room key from generate_key()
+        questions: JSON-serializable questions (as sent to clients)
+    
+    Returns:
+        str: Base64 blob
+    """
+    enc_key, mac_key = _subkeys(key_hex)
+    nonce = os.urandom(NONCE_SIZE)
+    # Compress first: smaller frames and fewer keystream blocks
+    plaintext = zlib.compress(json.dumps(questions, separators=(',', ':')).encode('utf-8'))
+    body = bytes([BLOB_VERSION]) + nonce + _keystream_xor(enc_key, nonce, plaintext)
+    tag = hmac.new(mac_key, body, hashlib.sha256).digest()[:TAG_SIZE]
+    return base64.b64encode(body + tag).decode('ascii')
+
+
+def decrypt_exam(key_hex, blob):
+    """
+    Decrypt a prefetched blob
+    
+    Returns:
+        Questions as passed to encrypt_exam
+    
+    Raises:
+        ExamCipherError: Wrong key, tampered or malformed blob
+    """
+    enc_key, mac_key = _subkeys(key_hex)
+    try:
+        raw = base64.b64decode(blob, validate=True)
+    except (TypeError, ValueError):
+        raise ExamCipherError("Invalid exam blob encoding")
+    if len(raw) < 1 + NONCE_SIZE + TAG_SIZE or raw[0] != BLOB_VERSION:
+        raise ExamCipherError("Unsupported exam blob")
+    
+    body, tag = raw[:-TAG_SIZE], raw[-TAG_SIZE:]
+    if not hmac.compare_digest(hmac.new(mac_key, body, hashlib.sha256).digest()[:TAG_SIZE], tag):
+        raise ExamCipherError("Exam blob authentication failed")
+    
+    nonce = body[1:1 + NONCE_SIZE]
+    plaintext = _keystream_xor(enc_key, nonce, body[1 + NONCE_SIZE:])
+    try:
+        return json.loads(zlib.decompress(plaintext).decode('utf-8'))
+    except (zlib.error, ValueError):
+        raise ExamCipherError("Exam blob is corrupt")
+
+
+def exam_version(key_hex, questions):
+    """
+    Fingerprint of a question set under a room key
+    
+    Stable across blob rebuilds (each blob has a fresh nonce), so a client
+    holding an older blob of the same questions is still current. Keyed, so
+    it says nothing about the questions before the key is released.
+    """
+    _, mac_key = _subkeys(key_hex)
+    canonical = json.dumps(questions, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return hmac.new(mac_key, b"exam-version" + canonical, hashlib.sha256).hexdigest()[:16]
@@ -0,0 +1,76 @@
+"""
+Latency Histogram
+Log-linear (HDR style) histogram shared by the request and query metrics (server and database)
+"""
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram (HDR style) in microseconds
+    
+    Values below 128 us get exact buckets; above that every power of two is
+    split into 64 buckets, so any recorded value is off by at most 1/64
+    (~1.6%) while the histogram stays a few hundred counters at most.
+    Not thread-safe: callers record under their own lock.
+    """
+    
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # 128
+    HALF = SUB_BUCKETS >> 1  # 64
+    
+    def __init__(self):
+        self.counts = []
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+    
+    @classmethod
+    def bucket_index(cls, value_us):
+        if value_us < cls.SUB_BUCKETS:
+            return value_us
+        shift = value_us.bit_length() - cls.SUB_BUCKET_BITS
+        return (shift + 1) * cls.HALF + (value_us >> shift) - cls.HALF
+    
+    @classmethod
+    def bucket_high(cls, index):
+        """Highest value (us) that lands in bucket index"""
+        if index < cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.HALF - 1
+        mantissa = index % cls.HALF + cls.HALF
+        return ((mantissa + 1) << shift) - 1
+    
+    def record(self, seconds):
+        value = max(0, int(seconds * 1e6))
+        index = self.bucket_index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.total += 1
+        self.sum_us += value
+        if value > self.max_us:
+            self.max_us = value
+    
+    def percentile(self, p):
+        """Value at percentile p (0-100) in milliseconds, or None if empty"""
+        if self.total == 0:
+            return None
+        target = max(1, int(round(p / 100 * self.total)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return round(min(self.bucket_high(index), self.max_us) / 1000, 3)
+        return round(self.max_us / 1000, 3)
+    
+    def summary(self):
+        """Count, mean, p50/p90/p99/p99.9 and max in milliseconds"""
+        return {
+            'count': self.total,
+            'mean_ms': round(self.sum_us / self.total / 1000, 3) if self.total else None,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'p999_ms': self.percentile(99.9),
+            'max_ms': round(self.max_us / 1000, 3) if self.total else None
+        }
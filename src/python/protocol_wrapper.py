@@ -6,8 +6,10 @@ import ctypes
 import json
 import platform
 import struct
+import sys
 import os
 import re
+import time
 from pathlib import Path
 
 # ==================== AUTO-LOAD CONSTANTS FROM C HEADER ====================
@@ -45,8 +47,9 @@ globals().update(_load_protocol_constants())
 # Determine socket type based on platform
 socket_type = ctypes.c_int64 if platform.system() == "Windows" else ctypes.c_int
 
-# Protocol Header Structure (matches C struct)
+# Protocol Header Structure (matches C struct, packed: 80 bytes)
 class ProtocolHeader(ctypes.Structure):
+    _pack_ = 1
     _fields_ = [
         ("magic", ctypes.c_uint32),
         ("version", ctypes.c_uint16),
@@ -72,7 +75,9 @@ class ServerContext(ctypes.Structure):
         ("server_socket", socket_type),
         ("handler", ctypes.c_void_p),  # Function pointer
         ("running", ctypes.c_int),
-        ("clients_mutex", ctypes.c_void_p),  # Opaque mutex
+        # pthread_mutex_t / CRITICAL_SECTION (40 bytes on 64-bit Linux and Windows, 64 on macOS):
+        # opaque storage of at least that size, so C never writes past the structure
+        ("clients_mutex", ctypes.c_uint64 * 8),
         ("active_clients", ctypes.c_int),
         ("user_data", ctypes.c_void_p)
     ]
@@ -102,6 +107,12 @@ class ProtocolWrapper:
         
         # Session token (stored locally after login)
         self.session_token = None
+        
+        # Broadcast callbacks of running select loop connections {conn: CFUNCTYPE}
+        self._broadcast_callbacks = {}
+        
+        # traffic_capture.CaptureWriter recording the frames of this wrapper (None: off)
+        self.recorder = None
     
     def _load_library(self):
         """Load the C network library"""
@@ -141,6 +152,10 @@ class ProtocolWrapper:
         self.lib.py_create_server.argtypes = [ctypes.c_int]
         self.lib.py_create_server.restype = socket_type
         
+        # py_create_server_on(const char* host, int port) -> socket_t
+        self.lib.py_create_server_on.argtypes = [ctypes.c_char_p, ctypes.c_int]
+        self.lib.py_create_server_on.restype = socket_type
+        
         # py_accept_client(socket_t) -> socket_t
         self.lib.py_accept_client.argtypes = [socket_type]
         self.lib.py_accept_client.restype = socket_type
@@ -248,24 +263,60 @@ class ProtocolWrapper:
         ]
         self.lib.py_broadcast_to_room.restype = ctypes.c_int
         
+        # py_broadcast_subscribe / py_broadcast_unsubscribe
+        self.lib.py_broadcast_subscribe.argtypes = [socket_type, ctypes.c_char_p]
+        self.lib.py_broadcast_subscribe.restype = ctypes.c_int
+        self.lib.py_broadcast_unsubscribe.argtypes = [socket_type, ctypes.c_char_p]
+        self.lib.py_broadcast_unsubscribe.restype = ctypes.c_int
+        
+        # py_broadcast_publish
+        self.lib.py_broadcast_publish.argtypes = [
+            ctypes.c_char_p,   # topic
+            ctypes.c_int,      # msg_type
+            ctypes.c_char_p    # json_data
+        ]
+        self.lib.py_broadcast_publish.restype = ctypes.c_int
+        
+        # py_broadcast_subscriber_count
+        self.lib.py_broadcast_subscriber_count.argtypes = [ctypes.c_char_p]
+        self.lib.py_broadcast_subscriber_count.restype = ctypes.c_int
+        
         # === Client Select Loop Functions ===
         # Define callback type for broadcast messages
         self.BroadcastCallbackType = ctypes.CFUNCTYPE(None, ctypes.c_int, ctypes.c_char_p)
         
+        # py_client_select_loop_create / destroy / connection_count (loop handles)
+        self.lib.py_client_select_loop_create.argtypes = []
+        self.lib.py_client_select_loop_create.restype = ctypes.c_void_p
+        self.lib.py_client_select_loop_destroy.argtypes = [ctypes.c_void_p]
+        self.lib.py_client_select_loop_destroy.restype = None
+        self.lib.py_client_select_loop_connection_count.argtypes = [ctypes.c_void_p]
+        self.lib.py_client_select_loop_connection_count.restype = ctypes.c_int
+        
+        # py_client_select_loop_attach
+        self.lib.py_client_select_loop_attach.argtypes = [
+            ctypes.c_void_p,  # loop
+            socket_type,
+            ctypes.c_char_p,  # session_token
+            self.BroadcastCallbackType
+        ]
+        self.lib.py_client_select_loop_attach.restype = ctypes.c_void_p
+        
         # py_client_select_loop_start
         self.lib.py_client_select_loop_start.argtypes = [
             socket_type,
             ctypes.c_char_p,  # session_token
             self.BroadcastCallbackType
         ]
-        self.lib.py_client_select_loop_start.restype = ctypes.c_int
+        self.lib.py_client_select_loop_start.restype = ctypes.c_void_p
         
         # py_client_select_loop_stop
-        self.lib.py_client_select_loop_stop.argtypes = []
+        self.lib.py_client_select_loop_stop.argtypes = [ctypes.c_void_p]
         self.lib.py_client_select_loop_stop.restype = None
         
         # py_client_select_loop_send_request
         self.lib.py_client_select_loop_send_request.argtypes = [
+            ctypes.c_void_p,   # conn
             ctypes.c_int,      # msg_type
             ctypes.c_char_p,   # json_data
             ctypes.c_char_p,   # response_buf
@@ -274,7 +325,7 @@ class ProtocolWrapper:
         self.lib.py_client_select_loop_send_request.restype = ctypes.c_int
         
         # py_client_select_loop_is_running
-        self.lib.py_client_select_loop_is_running.argtypes = []
+        self.lib.py_client_select_loop_is_running.argtypes = [ctypes.c_void_p]
         self.lib.py_client_select_loop_is_running.restype = ctypes.c_int
     
     def send_message(self, socket, msg_type, payload_dict=None, use_session=True):
@@ -301,7 +352,7 @@ class ProtocolWrapper:
         if use_session and self.session_token:
             session_token_bytes = self.session_token.encode('utf-8')
         
-        # Send via C function
+        # Send via C function (serialized per socket, so pushes never interleave with responses)
         result = self.lib.py_send_protocol_message(
             socket,
             msg_type,
@@ -312,6 +363,9 @@ class ProtocolWrapper:
         if result < 0:
             raise RuntimeError(f"Failed to send protocol message (error: {result})")
         
+        if self.recorder is not None:
+            self.recorder.record_out(socket, msg_type, (payload_dict or {}).get('code'), result)
+        
         return result
     
     def receive_message(self, socket, max_size=65536):
@@ -337,6 +391,8 @@ class ProtocolWrapper:
             max_size
         )
         
+        received = time.perf_counter()
+        
         if result < 0:
             error_messages = {
                 -1: "Header receive failed",
@@ -347,6 +403,9 @@ class ProtocolWrapper:
             }
             raise RuntimeError(error_messages.get(result, f"Receive error: {result}"))
         
+        if self.recorder is not None:
+            self.recorder.record_in(socket, bytes(header), payload_buffer.raw[:result])
+        
         # Parse JSON payload
         payload_dict = {}
         if result > 0:
@@ -359,7 +418,7 @@ class ProtocolWrapper:
         # C code uses htons() which converts to network byte order (big-endian)
         # But ctypes reads as native byte order, so we need to swap on little-endian systems
         msg_type_raw = header.message_type
-        if platform.system() == "Windows":  # Little-endian
+        if sys.byteorder == "little":  # Windows and Linux on x86/ARM
             # Swap bytes: 0xFF00 -> 0x00FF
             msg_type = ((msg_type_raw & 0xFF) << 8) | ((msg_type_raw >> 8) & 0xFF)
         else:
@@ -370,7 +429,9 @@ class ProtocolWrapper:
             'message_id': header.message_id.decode('utf-8', errors='ignore'),
             'timestamp': header.timestamp,
             'session_token': header.session_token.decode('utf-8', errors='ignore').rstrip('\x00'),
-            'payload': payload_dict
+            'payload': payload_dict,
+            'bytes_received': ctypes.sizeof(header) + result,
+            'receive_seconds': time.perf_counter() - received  # Decode time after the bytes arrived
         }
     
     def set_session_token(self, token):
@@ -393,8 +454,10 @@ class ProtocolWrapper:
         """Cleanup network subsystem"""
         self.lib.py_cleanup_network()
     
-    def create_server(self, port):
-        """Create TCP server socket"""
+    def create_server(self, port, host=None):
+        """Create TCP server socket (on all interfaces unless host is given)"""
+        if host:
+            return self.lib.py_create_server_on(host.encode('utf-8'), port)
         return self.lib.py_create_server(port)
     
     def accept_client(self, server_socket):
@@ -407,6 +470,8 @@ class ProtocolWrapper:
     
     def close_socket(self, socket):
         """Close socket connection"""
+        if self.recorder is not None:
+            self.recorder.record_close(socket)
         self.lib.py_close_socket(socket)
     
     def is_connection_alive(self, socket):
@@ -502,6 +567,8 @@ class ProtocolWrapper:
             bool: True on success, False on error
         """
         result = self.lib.py_broadcast_register(socket, room_id)
+        if result == 0 and self.recorder is not None:
+            self.recorder.record_room(socket, room_id)
         return result == 0
     
     def broadcast_unregister(self, socket):
@@ -512,6 +579,8 @@ class ProtocolWrapper:
             socket: Client socket descriptor
         """
         self.lib.py_broadcast_unregister(socket)
+        if self.recorder is not None:
+            self.recorder.record_room(socket, None)
     
     def broadcast_update_room(self, socket, room_id):
         """
@@ -525,6 +594,8 @@ class ProtocolWrapper:
             bool: True on success, False if socket not found
         """
         result = self.lib.py_broadcast_update_room(socket, room_id)
+        if result == 0 and self.recorder is not None:
+            self.recorder.record_room(socket, room_id, replace=True)
         return result == 0
     
     def broadcast_to_room(self, room_id, msg_type, payload_dict):
@@ -540,45 +611,139 @@ class ProtocolWrapper:
             int: Number of clients that received the message
         """
         json_data = json.dumps(payload_dict).encode('utf-8')
+        started = time.perf_counter()
         result = self.lib.py_broadcast_to_room(room_id, msg_type, json_data)
+        if result > 0 and self.recorder is not None:
+            self.recorder.record_broadcast(msg_type, ctypes.sizeof(ProtocolHeader) + len(json_data), started,
+                                           room_id=room_id)
         return result
     
+    def broadcast_subscribe(self, socket, topic):
+        """
+        Subscribe a client socket to a topic
+        
+        Args:
+            socket: Client socket descriptor
+            topic: Topic name (e.g. 'lobby', 'room:42', 'teacher:7')
+            
+        Returns:
+            bool: True on success, False on error
+        """
+        result = self.lib.py_broadcast_subscribe(socket, topic.encode('utf-8'))
+        if result == 0 and self.recorder is not None:
+            self.recorder.record_topic(socket, topic, True)
+        return result == 0
+    
+    def broadcast_unsubscribe(self, socket, topic):
+        """
+        Unsubscribe a client socket from a topic
+        
+        Returns:
+            bool: True on success, False if not subscribed
+        """
+        result = self.lib.py_broadcast_unsubscribe(socket, topic.encode('utf-8'))
+        if result == 0 and self.recorder is not None:
+            self.recorder.record_topic(socket, topic, False)
+        return result == 0
+    
+    def broadcast_publish(self, topic, msg_type, payload_dict):
+        """
+        Publish message to all subscribers of a topic
+        
+        Args:
+            topic: Topic name
+            msg_type: Message type (e.g., MSG_EVENT)
+            payload_dict: Python dict to convert to JSON
+            
+        Returns:
+            int: Number of clients that received the message
+        """
+        json_data = json.dumps(payload_dict).encode('utf-8')
+        started = time.perf_counter()
+        result = self.lib.py_broadcast_publish(topic.encode('utf-8'), msg_type, json_data)
+        if result > 0 and self.recorder is not None:
+            self.recorder.record_broadcast(msg_type, ctypes.sizeof(ProtocolHeader) + len(json_data), started,
+                                           topic=topic)
+        return result
+    
+    def broadcast_subscriber_count(self, topic):
+        """Number of sockets subscribed to a topic"""
+        return self.lib.py_broadcast_subscriber_count(topic.encode('utf-8'))
+    
     # ==================== CLIENT SELECT LOOP METHODS ====================
     
-    def client_select_loop_start(self, socket, session_token, callback):
+    def client_select_loop_create(self):
         """
-        Start client select loop in background thread (C handles select loop)
+        Create a select loop thread that several connections can share
+        
+        Pass the handle to client_select_loop_start(loop=...); one loop
+        thread then drives all of them (e.g. thousands of simulated clients
+        in a handful of threads).
+        
+        Returns:
+            int: Loop handle
+            
+        Raises:
+            RuntimeError: If the thread cannot be created
+        """
+        loop = self.lib.py_client_select_loop_create()
+        if not loop:
+            raise RuntimeError("Failed to create select loop")
+        return loop
+    
+    def client_select_loop_destroy(self, loop):
+        """Stop a shared select loop thread (stop its connections first)"""
+        self.lib.py_client_select_loop_destroy(loop)
+    
+    def client_select_loop_connection_count(self, loop):
+        """Number of connections a shared select loop drives"""
+        return self.lib.py_client_select_loop_connection_count(loop)
+    
+    def client_select_loop_start(self, socket, session_token, callback, loop=None):
+        """
+        Start driving a logged-in connection from a C select loop
         
         Args:
             socket: Client socket descriptor
             session_token: Session token for authenticated requests
             callback: Python function(msg_type, json_data) to call for broadcast messages
+            loop: Shared loop from client_select_loop_create(), or None for a
+                  loop thread of its own
             
         Returns:
-            bool: True on success, False on error
+            int or None: Connection handle for send_request/stop/is_running, None on error
         """
         # Wrap Python callback to match C signature
         def c_callback(msg_type, json_bytes):
             json_str = json_bytes.decode('utf-8')
             callback(msg_type, json_str)
         
-        # Keep reference to prevent garbage collection
-        self._broadcast_callback = self.BroadcastCallbackType(c_callback)
+        c_func = self.BroadcastCallbackType(c_callback)
         
         # Pass session token to C for authenticated requests
         session_token_bytes = session_token.encode('utf-8') if session_token else None
-        result = self.lib.py_client_select_loop_start(socket, session_token_bytes, self._broadcast_callback)
-        return result == 0
+        if loop is None:
+            conn = self.lib.py_client_select_loop_start(socket, session_token_bytes, c_func)
+        else:
+            conn = self.lib.py_client_select_loop_attach(loop, socket, session_token_bytes, c_func)
+        if not conn:
+            return None
+    
+        # Keep reference to prevent garbage collection while C can call it
+        self._broadcast_callbacks[conn] = c_func
+        return conn
     
-    def client_select_loop_stop(self):
-        """Stop client select loop thread (C handles thread cleanup)"""
-        self.lib.py_client_select_loop_stop()
+    def client_select_loop_stop(self, conn):
+        """Stop a connection's select loop (C detaches it and frees the handle)"""
+        self.lib.py_client_select_loop_stop(conn)
+        self._broadcast_callbacks.pop(conn, None)
     
-    def client_select_loop_send_request(self, msg_type, payload_dict, max_response_size=65536):
+    def client_select_loop_send_request(self, conn, msg_type, payload_dict, max_response_size=65536):
         """
         Send request and wait for response (C handles thread-safe queuing)
         
         Args:
+            conn: Connection handle from client_select_loop_start()
             msg_type: Message type
             payload_dict: Python dict to convert to JSON
             max_response_size: Maximum response buffer size
@@ -593,6 +758,7 @@ class ProtocolWrapper:
         response_buf = ctypes.create_string_buffer(max_response_size)
         
         result = self.lib.py_client_select_loop_send_request(
+            conn,
             msg_type,
             json_data,
             response_buf,
@@ -606,9 +772,9 @@ class ProtocolWrapper:
         response_str = response_buf.value.decode('utf-8')
         return json.loads(response_str)
     
-    def client_select_loop_is_running(self):
-        """Check if select loop is running"""
-        return self.lib.py_client_select_loop_is_running() == 1
+    def client_select_loop_is_running(self, conn):
+        """Check if a connection's select loop is running"""
+        return bool(conn) and self.lib.py_client_select_loop_is_running(conn) == 1
 
 
 # Message Type Names (for debugging)
@@ -619,6 +785,8 @@ MESSAGE_TYPE_NAMES = {
     MSG_LOGIN_RES: "LOGIN_RES",
     MSG_LOGOUT_REQ: "LOGOUT_REQ",
     MSG_LOGOUT_RES: "LOGOUT_RES",
+    MSG_RESUME_REQ: "RESUME_REQ",
+    MSG_RESUME_RES: "RESUME_RES",
     MSG_TEST_CONFIG: "TEST_CONFIG",
     MSG_TEST_START_REQ: "TEST_START_REQ",
     MSG_TEST_START_RES: "TEST_START_RES",
@@ -654,6 +822,30 @@ MESSAGE_TYPE_NAMES = {
     MSG_AUTO_SAVE_REQ: "AUTO_SAVE_REQ",
     MSG_AUTO_SAVE_RES: "AUTO_SAVE_RES",
     MSG_ROOM_STATUS: "ROOM_STATUS",
+    MSG_BULK_ADD_QUESTIONS_REQ: "BULK_ADD_QUESTIONS_REQ",
+    MSG_BULK_ADD_QUESTIONS_RES: "BULK_ADD_QUESTIONS_RES",
+    MSG_CLONE_ROOM_REQ: "CLONE_ROOM_REQ",
+    MSG_CLONE_ROOM_RES: "CLONE_ROOM_RES",
+    MSG_SEARCH_QUESTIONS_REQ: "SEARCH_QUESTIONS_REQ",
+    MSG_SEARCH_QUESTIONS_RES: "SEARCH_QUESTIONS_RES",
+    MSG_ROOM_PROGRESS: "ROOM_PROGRESS",
+    MSG_PREFETCH_EXAM_REQ: "PREFETCH_EXAM_REQ",
+    MSG_PREFETCH_EXAM_RES: "PREFETCH_EXAM_RES",
+    MSG_SUBSCRIBE_REQ: "SUBSCRIBE_REQ",
+    MSG_SUBSCRIBE_RES: "SUBSCRIBE_RES",
+    MSG_UNSUBSCRIBE_REQ: "UNSUBSCRIBE_REQ",
+    MSG_UNSUBSCRIBE_RES: "UNSUBSCRIBE_RES",
+    MSG_EVENT: "EVENT",
+    MSG_SERVER_STATS_REQ: "SERVER_STATS_REQ",
+    MSG_SERVER_STATS_RES: "SERVER_STATS_RES",
+    MSG_PROFILE_START_REQ: "PROFILE_START_REQ",
+    MSG_PROFILE_START_RES: "PROFILE_START_RES",
+    MSG_PROFILE_STOP_REQ: "PROFILE_STOP_REQ",
+    MSG_PROFILE_STOP_RES: "PROFILE_STOP_RES",
+    MSG_MEMORY_SNAPSHOT_REQ: "MEMORY_SNAPSHOT_REQ",
+    MSG_MEMORY_SNAPSHOT_RES: "MEMORY_SNAPSHOT_RES",
+    MSG_SQL_TIMING_REQ: "SQL_TIMING_REQ",
+    MSG_SQL_TIMING_RES: "SQL_TIMING_RES",
     MSG_ERROR: "ERROR",
     MSG_HEARTBEAT: "HEARTBEAT"
 }
@@ -2,12 +2,25 @@
 Server Application Package
 Django-style modular architecture with clean separation of concerns
 
-Entry point: python -m server.main
+Entry point: python -m server.main [--headless]
+
+TestServerGUI is imported on first use, so headless servers never load
+customtkinter.
 """
-from .server_gui import TestServerGUI
 from .handlers import RequestHandlers
 from .room_manager import RoomManager
 from .client_handler import ClientHandler
+from .idempotency import IdempotencyCache
+from .room_scheduler import RoomScheduler
+from .progress_aggregator import ProgressAggregator
+from .exam_prefetch import ExamPrefetch
+from .connection_registry import ConnectionRegistry
+from .dispatch import Dispatcher
+from .metrics import ServerMetrics
+from .event_log import EventLog
+from .profiler import RuntimeProfiler
+from .config import load_config
+from .core import ServerCore
 
 __version__ = '2.0.0'
 __all__ = [
@@ -15,5 +28,23 @@ __all__ = [
     'RequestHandlers',
     'RoomManager',
     'ClientHandler',
+    'IdempotencyCache',
+    'RoomScheduler',
+    'ProgressAggregator',
+    'ExamPrefetch',
+    'ConnectionRegistry',
+    'Dispatcher',
+    'ServerMetrics',
+    'EventLog',
+    'RuntimeProfiler',
+    'load_config',
+    'ServerCore',
 ]
 
+
+def __getattr__(name):
+    if name == 'TestServerGUI':
+        from .server_gui import TestServerGUI
+        return TestServerGUI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -6,20 +6,14 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from protocol_wrapper import (
-    MSG_REGISTER_REQ, MSG_LOGIN_REQ, MSG_TEACHER_DATA_REQ,
-    MSG_CREATE_ROOM_REQ, MSG_GET_ROOMS_REQ,
-    MSG_START_ROOM_REQ, MSG_END_ROOM_REQ,
-    MSG_ADD_QUESTION_REQ, MSG_GET_QUESTIONS_REQ, MSG_DELETE_QUESTION_REQ,
-    MSG_JOIN_ROOM_REQ, MSG_GET_STUDENT_ROOMS_REQ, MSG_GET_AVAILABLE_ROOMS_REQ,
-    MSG_START_ROOM_TEST_REQ, MSG_SUBMIT_ROOM_TEST_REQ,
-    MSG_AUTO_SAVE_REQ
-)
+from protocol_wrapper import MSG_RESUME_REQ
+from .dispatch import Dispatcher
+from .event_log import DEBUG, INFO
 
 class ClientHandler:
     """Handles individual client connections"""
     
-    def __init__(self, proto, session_mgr, handlers, room_mgr, logger, clients_dict, update_callbacks):
+    def __init__(self, proto, session_mgr, handlers, room_mgr, logger, registry, update_callbacks, send_timeout=60):
         """
         Initialize client handler
         
@@ -29,74 +23,78 @@ class ClientHandler:
             handlers: RequestHandlers instance
             room_mgr: RoomManager instance
             logger: Callback function for logging
-            clients_dict: Shared dictionary of connected clients
+            registry: ConnectionRegistry of connected clients
             update_callbacks: Dict of update callbacks (students_list, statistics)
+            send_timeout: Seconds a send to this client may block
         """
         self.proto = proto
         self.session_mgr = session_mgr
         self.handlers = handlers
         self.room_mgr = room_mgr
         self.log = logger
-        self.clients = clients_dict
+        self.registry = registry
         self.update_callbacks = update_callbacks
+        self.send_timeout = send_timeout
+        self.dispatcher = Dispatcher(handlers, session_mgr)
     
     def handle_client(self, client_socket):
         """Handle client communication"""
         # Get client IP from C
         client_ip = self.proto.get_client_ip(client_socket)
         
-        # Set SEND timeout only (60s) - protect against network block
-        if not self.proto.set_send_timeout(client_socket, 60):
-            self.log(f"⚠️ Failed to set send timeout for {client_ip}")
+        # Set SEND timeout only - protect against network block
+        if not self.proto.set_send_timeout(client_socket, self.send_timeout):
+            self.log("⚠️ Failed to set send timeout for %s", client_ip)
         else:
-            self.log(f"[OK] Set 60s send timeout for {client_ip}")
+            self.log("[OK] Set %ds send timeout for %s", self.send_timeout, client_ip, level=DEBUG)
         
         try:
             # Wait for authentication (REGISTER or LOGIN)
             request = self.proto.receive_message(client_socket)
             msg_type = request['message_type']
             
-            if msg_type == MSG_REGISTER_REQ:
-                self.handlers.handle_register(client_socket, request)
-                
-            elif msg_type == MSG_LOGIN_REQ:
-                session_token = self.handlers.handle_login(client_socket, request)
+            if self.dispatcher.handles_auth(msg_type):
+                # REGISTER returns nothing; LOGIN/RESUME return the session token
+                session_token = self.dispatcher.dispatch_auth(client_socket, request)
                 
                 if session_token:
                     # Get session info
                     session = self.session_mgr.validate_session(session_token)
                     
+                    # Resumed session: stop pushing broadcasts to the dropped socket
+                    if msg_type == MSG_RESUME_REQ:
+                        self._release_previous_sockets(session_token, client_socket)
+                    
                     # Register client
-                    self.clients[client_socket] = {
-                        'username': session['username'],
-                        'role': session['role'],
-                        'status': 'connected',
-                        'ip_address': client_ip  # Store IP from C
-                    }
+                    self.registry.add(
+                        client_socket, session['user_id'], session['username'],
+                        session['role'], client_ip, session_token
+                    )
+                    if msg_type == MSG_RESUME_REQ and session['role'] == 'student':
+                        self._index_student_rooms(client_socket, session)
                     self.update_callbacks['students_list']()
                     
                     # Log with IP address
-                    self.log(f"[OK] {session['username']} ({session['role']}) logged in from {client_ip}")
+                    action = "resumed" if msg_type == MSG_RESUME_REQ else "logged in"
+                    self.log("[OK] %s (%s) %s from %s", session['username'], session['role'], action, client_ip)
+                    
+                    # Teachers get live progress of their rooms on this connection
+                    if session['role'] == 'teacher' and self.handlers.progress:
+                        self.handlers.progress.watch_teacher(session['user_id'], client_socket)
                     
-                    # Handle based on role
-                    if session['role'] == 'student':
-                        # Student: handle room-based workflow
-                        self._handle_student_requests(client_socket, session)
-                    else:
-                        # Teacher: handle room management (no auto-send data)
-                        self._handle_teacher_requests(client_socket, session)
+                    # Student: room-based workflow; teacher: room management (no auto-send data)
+                    self._handle_requests(client_socket, session)
                     
             else:
                 self.handlers.send_error(client_socket, 2000, "Invalid request")
                 
         except Exception as e:
-            self.log(f"✗ Client error: {str(e)}")
+            self.log("✗ Client error: %s", e)
         finally:
             # Cleanup
-            if client_socket in self.clients:
-                user = self.clients[client_socket]
-                self.log(f"✗ {user['username']} disconnected")
-                del self.clients[client_socket]
+            record = self.registry.remove(client_socket)
+            if record:
+                self.log("✗ %s disconnected", record.username, level=INFO)
                 self.update_callbacks['students_list']()
             
             # Unregister from broadcast (C handles cleanup)
@@ -105,86 +103,40 @@ class ClientHandler:
             except:
                 pass
             
+            if self.handlers.progress:
+                self.handlers.progress.unwatch(client_socket)
+            
             try:
                 self.proto.close_socket(client_socket)
             except:
                 pass
     
-    def _handle_student_requests(self, client_socket, session):
-        """Handle ongoing student requests (join rooms, take tests)"""
-        try:
-            while True:
-                # Receive next request
-                request = self.proto.receive_message(client_socket)
-                msg_type = request['message_type']
-                
-                # Route request
-                if msg_type == MSG_JOIN_ROOM_REQ:
-                    self.handlers.handle_join_room(client_socket, session, request)
-                
-                elif msg_type == MSG_GET_STUDENT_ROOMS_REQ:
-                    self.handlers.handle_get_student_rooms(client_socket, session, request)
-                
-                elif msg_type == MSG_GET_AVAILABLE_ROOMS_REQ:
-                    self.handlers.handle_get_available_rooms(client_socket, session, request)
-                
-                elif msg_type == MSG_START_ROOM_TEST_REQ:
-                    self.handlers.handle_start_room_test(client_socket, session, request)
-                
-                elif msg_type == MSG_SUBMIT_ROOM_TEST_REQ:
-                    self.handlers.handle_submit_room_test(client_socket, session, request)
-                
-                elif msg_type == MSG_AUTO_SAVE_REQ:
-                    self.handlers.handle_auto_save(client_socket, session, request)
-                
-                else:
-                    self.handlers.send_error(client_socket, 2000, "Invalid request type")
-                    break
-                    
-        except Exception as e:
-            # Graceful disconnect vs error
-            error_msg = str(e)
-            if "Header receive failed" in error_msg or "Connection" in error_msg:
-                # Normal disconnect - use info icon
-                self.log(f"[OK] {session['username']} disconnected")
-            else:
-                # Actual error
-                self.log(f"✗ [Student {session['username']}] Error: {error_msg}")
+    def _release_previous_sockets(self, session_token, new_socket):
+        """Unregister broadcasts for older connections of a resumed session"""
+        for old_socket in self.registry.sockets_for_session(session_token, exclude=new_socket):
+            self.registry.set_status(old_socket, 'replaced')
+            try:
+                self.proto.broadcast_unregister(old_socket)
+            except:
+                pass
     
-    def _handle_teacher_requests(self, client_socket, session):
-        """Handle ongoing teacher requests (room management)"""
+    def _index_student_rooms(self, client_socket, session):
+        """Index a resumed student's unfinished rooms in the registry"""
+        for room in self.handlers.db.get_student_rooms(session['user_id']):
+            if room['room_status'] != 'ended' and room['participant_status'] != 'submitted':
+                self.registry.join_room(client_socket, room['id'])
+    
+    def _handle_requests(self, client_socket, session):
+        """Handle ongoing requests of a logged-in student or teacher until disconnect"""
+        role = session['role'].capitalize()
         try:
             while True:
                 # Receive next request
                 request = self.proto.receive_message(client_socket)
-                msg_type = request['message_type']
-                
-                # Route request
-                if msg_type == MSG_TEACHER_DATA_REQ:
-                    self.handlers.handle_teacher_data(client_socket, session, request)
-                
-                elif msg_type == MSG_CREATE_ROOM_REQ:
-                    self.handlers.handle_create_room(client_socket, session, request)
-                
-                elif msg_type == MSG_GET_ROOMS_REQ:
-                    self.handlers.handle_get_rooms(client_socket, session, request)
-                
-                elif msg_type == MSG_START_ROOM_REQ:
-                    self.handlers.handle_start_room(client_socket, session, request)
-                
-                elif msg_type == MSG_END_ROOM_REQ:
-                    self.handlers.handle_end_room(client_socket, session, request)
-                
-                elif msg_type == MSG_ADD_QUESTION_REQ:
-                    self.handlers.handle_add_question(client_socket, session, request)
-                
-                elif msg_type == MSG_GET_QUESTIONS_REQ:
-                    self.handlers.handle_get_questions(client_socket, session, request)
-                
-                elif msg_type == MSG_DELETE_QUESTION_REQ:
-                    self.handlers.handle_delete_question(client_socket, session, request)
+                self.registry.record_in(client_socket, request['bytes_received'])
                 
-                else:
+                # Route request (authorization and metrics run as middleware)
+                if not self.dispatcher.dispatch(client_socket, session, request):
                     self.handlers.send_error(client_socket, 2000, "Invalid request type")
                     break
                     
@@ -193,7 +145,7 @@ class ClientHandler:
             error_msg = str(e)
             if "Header receive failed" in error_msg or "Connection" in error_msg:
                 # Normal disconnect - use info icon
-                self.log(f"[OK] {session['username']} disconnected")
+                self.log("[OK] %s disconnected", session['username'])
             else:
                 # Actual error
-                self.log(f"✗ [Teacher {session['username']}] Error: {error_msg}")
+                self.log("✗ [%s %s] Error: %s", role, session['username'], error_msg)
@@ -0,0 +1,93 @@
+"""
+Server Configuration
+Defaults, JSON config file and command-line overrides for ServerCore
+
+A config file only needs the settings it changes:
+
+    {
+        "server": {"host": "127.0.0.1", "port": 6000},
+        "log": {"level": "DEBUG", "console": false}
+    }
+"""
+import copy
+import json
+
+DEFAULTS = {
+    'server': {
+        'host': '',                  # Bind address ('' = all interfaces)
+        'port': 5555,
+        'send_timeout': 60,          # Seconds a send to one client may block
+        'shutdown_timeout': 10,      # Seconds to let in-flight requests finish on shutdown
+        'capture': None              # Record inbound TAP frames to this file (see traffic_capture.py)
+    },
+    'database': {
+        'path': 'data/app.db',
+        'sessions_path': 'data/sessions.db',
+        'slow_query_ms': None,       # Time SQL statements from startup (None: off, switchable at runtime)
+        'slow_query_log': 'data/slow_queries.log'
+    },
+    'auth': {
+        'session_hours': 24,
+        'hash_workers': None,        # Password hash threads (None: half the CPU cores, at least 1)
+        'hash_queue': 256,           # Logins waiting for a worker before new ones are refused
+        'hash_wait_timeout': 20
+    },
+    'rooms': {
+        'grace_seconds': 30,         # Extra time after a room deadline for in-flight submissions
+        'progress_interval': 2.0     # Seconds between live progress pushes per room
+    },
+    'profiling': {
+        'enabled': True,             # Allow PROFILE_*/MEMORY_SNAPSHOT requests (nothing runs until asked)
+        'admins': [],                # Opt-in: teacher usernames allowed to profile ([]: nobody)
+        'dir': 'data/profiles',      # Folded CPU stacks and tracemalloc snapshots
+        'max_seconds': 300           # Longest CPU profile a request may ask for
+    },
+    'log': {
+        'file': 'data/server.log',   # None: no log file
+        'level': 'INFO',
+        'console': True,             # Also print the log on stdout (headless mode)
+        'max_bytes': 5 * 1024 * 1024,
+        'backups': 3,
+        'capacity': 10000            # Entries kept in memory for the readers
+    }
+}
+
+
+def load_config(path=None, overrides=None):
+    """
+    Build the server configuration
+    
+    Args:
+        path: JSON config file merged over the defaults (None: defaults only)
+        overrides: {(section, key): value} applied last (None values are skipped)
+    
+    Returns:
+        dict: {section: {key: value}}
+    
+    Raises:
+        ValueError: Unknown section or setting, or a file that is not a JSON object
+    """
+    config = copy.deepcopy(DEFAULTS)
+    
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path}: expected a JSON object of sections")
+        for section, values in data.items():
+            if section not in config or not isinstance(values, dict):
+                raise ValueError(f"{path}: unknown section '{section}'")
+            for key, value in values.items():
+                _set(config, section, key, value, path)
+    
+    for (section, key), value in (overrides or {}).items():
+        if value is not None:
+            _set(config, section, key, value, 'command line')
+    
+    return config
+
+
+def _set(config, section, key, value, source):
+    if key not in config[section]:
+        raise ValueError(f"{source}: unknown setting '{section}.{key}'")
+    config[section][key] = value
@@ -0,0 +1,243 @@
+"""
+Connection Registry
+Thread-safe table of logged-in connections, indexed by socket, user and room
+"""
+import threading
+import time
+
+
+class ConnectionRecord:
+    """One logged-in connection (fields are updated under the registry lock)"""
+    
+    __slots__ = ('socket', 'user_id', 'username', 'role', 'ip_address', 'session_token',
+                 'status', 'connected_at', 'last_activity', 'bytes_in', 'bytes_out', 'rooms')
+    
+    def __init__(self, socket, user_id, username, role, ip_address, session_token):
+        self.socket = socket
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.ip_address = ip_address
+        self.session_token = session_token
+        self.status = 'connected'
+        self.connected_at = time.time()
+        self.last_activity = self.connected_at
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.rooms = set()
+    
+    def to_dict(self):
+        return {
+            'socket': self.socket,
+            'user_id': self.user_id,
+            'username': self.username,
+            'role': self.role,
+            'ip_address': self.ip_address,
+            'status': self.status,
+            'connected_at': self.connected_at,
+            'last_activity': self.last_activity,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'rooms': sorted(self.rooms)
+        }
+
+
+class ConnectionRegistry:
+    """
+    Connected clients
+    
+    Client threads add, update and remove their own connection; the GUI and
+    the handlers read it. All indexes are updated under one lock, so a
+    reader never sees a connection in one index but not another. Readers
+    get copies (snapshot(), sockets_for_*), never the live dicts.
+    
+    send_to_user() pushes a message to every connection of one user
+    (e.g. a student on a laptop and a phone) with a dict lookup instead of a
+    scan over all clients; sockets_for_session() is a lookup too.
+    """
+    
+    def __init__(self, proto):
+        """
+        Initialize registry
+        
+        Args:
+            proto: ProtocolWrapper instance (for unicast pushes)
+        """
+        self.proto = proto
+        self._lock = threading.Lock()
+        self._by_socket = {}  # {socket: ConnectionRecord}
+        self._by_user = {}  # {user_id: set(socket)}
+        self._by_session = {}  # {session token: set(socket)}
+        self._by_room = {}  # {room_id: set(socket)}
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._by_socket)
+    
+    def __contains__(self, client_socket):
+        with self._lock:
+            return client_socket in self._by_socket
+    
+    # ==================== Membership ====================
+    
+    def add(self, client_socket, user_id, username, role, ip_address, session_token):
+        """Register a connection after login or resume"""
+        record = ConnectionRecord(client_socket, user_id, username, role, ip_address, session_token)
+        with self._lock:
+            self._remove_locked(client_socket)  # Socket numbers are reused after close
+            self._by_socket[client_socket] = record
+            self._by_user.setdefault(user_id, set()).add(client_socket)
+            self._by_session.setdefault(session_token, set()).add(client_socket)
+        return record
+    
+    def remove(self, client_socket):
+        """
+        Forget a connection (on disconnect)
+        
+        Returns:
+            ConnectionRecord or None: The removed record
+        """
+        with self._lock:
+            return self._remove_locked(client_socket)
+    
+    def _remove_locked(self, client_socket):
+        record = self._by_socket.pop(client_socket, None)
+        if record is None:
+            return None
+        
+        for index, key in ((self._by_user, record.user_id), (self._by_session, record.session_token)):
+            sockets = index.get(key)
+            if sockets is not None:
+                sockets.discard(client_socket)
+                if not sockets:
+                    del index[key]
+        
+        for room_id in record.rooms:
+            self._discard_room_locked(room_id, client_socket)
+        return record
+    
+    def _discard_room_locked(self, room_id, client_socket):
+        sockets = self._by_room.get(room_id)
+        if sockets is not None:
+            sockets.discard(client_socket)
+            if not sockets:
+                del self._by_room[room_id]
+    
+    def join_room(self, client_socket, room_id):
+        """Index a connection under a room"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            if record is None:
+                return False
+            record.rooms.add(room_id)
+            self._by_room.setdefault(room_id, set()).add(client_socket)
+            return True
+    
+    def leave_room(self, client_socket, room_id):
+        """Remove a connection from a room's index"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            if record is not None:
+                record.rooms.discard(room_id)
+            self._discard_room_locked(room_id, client_socket)
+    
+    # ==================== Updates ====================
+    
+    def set_status(self, client_socket, status):
+        """Set the status shown in the server GUI ('connected', 'testing', 'replaced')"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            if record is not None:
+                record.status = status
+    
+    def record_in(self, client_socket, nbytes):
+        """Count a received request"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            if record is not None:
+                record.bytes_in += nbytes
+                record.last_activity = time.time()
+    
+    def record_out(self, client_socket, nbytes):
+        """Count a sent response or push"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            if record is not None:
+                record.bytes_out += nbytes
+    
+    # ==================== Lookups ====================
+    
+    def get(self, client_socket):
+        """Copy of a connection's record as a dict, or None"""
+        with self._lock:
+            record = self._by_socket.get(client_socket)
+            return record.to_dict() if record else None
+    
+    def sockets_for_user(self, user_id):
+        """Sockets of a user's connections"""
+        with self._lock:
+            return list(self._by_user.get(user_id, ()))
+    
+    def sockets_for_room(self, room_id):
+        """Sockets indexed under a room"""
+        with self._lock:
+            return list(self._by_room.get(room_id, ()))
+    
+    def sockets_for_session(self, session_token, exclude=None):
+        """Sockets logged in with a session token (other than exclude)"""
+        with self._lock:
+            return [s for s in self._by_session.get(session_token, ()) if s != exclude]
+    
+    def is_user_online(self, user_id):
+        with self._lock:
+            return user_id in self._by_user
+    
+    def snapshot(self):
+        """
+        Copy of all connections, oldest first
+        
+        Returns:
+            list: Record dicts (safe to iterate from any thread)
+        """
+        with self._lock:
+            records = [r.to_dict() for r in self._by_socket.values()]
+        records.sort(key=lambda r: r['connected_at'])
+        return records
+    
+    def get_stats(self):
+        """Connection counts by role and total traffic"""
+        with self._lock:
+            stats = {'connections': len(self._by_socket), 'users': len(self._by_user),
+                     'students': 0, 'teachers': 0, 'bytes_in': 0, 'bytes_out': 0}
+            for record in self._by_socket.values():
+                stats['students' if record.role == 'student' else 'teachers'] += 1
+                stats['bytes_in'] += record.bytes_in
+                stats['bytes_out'] += record.bytes_out
+            return stats
+    
+    # ==================== Unicast ====================
+    
+    def send_to_user(self, user_id, msg_type, payload, exclude=None):
+        """
+        Push a message to every connection of one user
+        
+        Args:
+            user_id: Target user
+            msg_type: Message type (e.g. MSG_EVENT)
+            payload: Python dict
+            exclude: Socket to skip (e.g. the one whose request caused the push)
+        
+        Returns:
+            int: Number of connections that received it (0 if the user is offline)
+        """
+        sent = 0
+        for client_socket in self.sockets_for_user(user_id):
+            if client_socket == exclude:
+                continue
+            try:
+                nbytes = self.proto.send_message(client_socket, msg_type, payload, use_session=False)
+            except RuntimeError:
+                continue  # Disconnecting; its client thread removes it
+            self.record_out(client_socket, nbytes)
+            sent += 1
+        return sent
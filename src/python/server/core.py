@@ -0,0 +1,319 @@
+"""
+Server Core
+Everything the test server runs, without any UI
+
+ServerCore owns the network, database, auth and room services and the C
+accept loop. It runs on its own (headless, see main.py) or with
+TestServerGUI attached as a monitoring front end; the GUI subscribes to
+the same events through on().
+"""
+import ctypes
+import signal
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import ProtocolWrapper, ServerContext, ClientHandlerFunc
+from traffic_capture import CaptureWriter
+from auth import AuthManager, SessionManager, SQLiteSessionStore, HashWorkerPool
+from database import Database
+from .handlers import RequestHandlers
+from .room_manager import RoomManager
+from .room_scheduler import RoomScheduler
+from .progress_aggregator import ProgressAggregator
+from .exam_prefetch import ExamPrefetch
+from .client_handler import ClientHandler
+from .connection_registry import ConnectionRegistry
+from .metrics import ServerMetrics
+from .event_log import EventLog, LEVELS, WARNING
+from .profiler import RuntimeProfiler
+from .config import load_config
+
+
+class ServerCore:
+    """
+    Test server without a UI
+    
+    Events for front ends (callbacks take no arguments and are called from
+    handler threads):
+        students_list  a user connected or disconnected
+        statistics     results or users changed
+        state          the server started or stopped
+    """
+    
+    EVENTS = ('students_list', 'statistics', 'state')
+    
+    def __init__(self, config=None):
+        """
+        Initialize all services (nothing listens until start())
+        
+        Args:
+            config: Settings from load_config() (None: defaults)
+        """
+        self.config = config or load_config()
+        server_cfg = self.config['server']
+        db_cfg = self.config['database']
+        auth_cfg = self.config['auth']
+        rooms_cfg = self.config['rooms']
+        profiling_cfg = self.config['profiling']
+        log_cfg = self.config['log']
+        
+        # Log first, so every service below can write to it
+        self.event_log = EventLog(
+            capacity=log_cfg['capacity'],
+            level=LEVELS[log_cfg['level'].upper()],
+            path=log_cfg['file'],
+            max_bytes=log_cfg['max_bytes'],
+            backups=log_cfg['backups'],
+            stream=sys.stdout if log_cfg['console'] else None
+        )
+        self.event_log.start()
+        self.log = self.event_log
+        
+        self._listeners = {event: [] for event in self.EVENTS}
+        
+        self.proto = ProtocolWrapper()
+        self.proto.init_network()
+        if server_cfg['capture']:
+            capture_dir = os.path.dirname(server_cfg['capture'])
+            if capture_dir:
+                os.makedirs(capture_dir, exist_ok=True)
+            self.proto.recorder = CaptureWriter(server_cfg['capture'])
+            self.log("[CAPTURE] Recording received frames to %s", server_cfg['capture'])
+        
+        self.db = Database(db_cfg['path'])
+        self.db.instrumentation.slow_log_path = db_cfg['slow_query_log']
+        self.db.instrumentation.on_slow = lambda entry: self.log(
+            "[SLOW SQL] %.0f ms (%s): %s", entry['ms'], entry['label'] or 'server', entry['sql'][:120],
+            level=WARNING
+        )
+        if db_cfg['slow_query_ms'] is not None:
+            self.db.instrumentation.enable(slow_ms=db_cfg['slow_query_ms'])
+        
+        self.auth = AuthManager()
+        # Sessions persist across restarts, so students mid-exam are not all forced to log in again
+        self.session_mgr = SessionManager(
+            session_duration_hours=auth_cfg['session_hours'],
+            user_loader=self.db.get_user_by_id,
+            store=SQLiteSessionStore(db_cfg['sessions_path'])
+        )
+        self.hash_pool = HashWorkerPool(
+            workers=auth_cfg['hash_workers'],
+            max_queue=auth_cfg['hash_queue'],
+            wait_timeout=auth_cfg['hash_wait_timeout']
+        )
+        self.metrics = ServerMetrics()
+        self.clients = ConnectionRegistry(self.proto)
+        
+        # CPU sampling and tracemalloc, idle until an admin asks over the protocol
+        self.profiler = RuntimeProfiler(
+            output_dir=profiling_cfg['dir'],
+            admins=profiling_cfg['admins'],
+            enabled=profiling_cfg['enabled'],
+            max_seconds=profiling_cfg['max_seconds']
+        )
+        
+        # Live class progress for teachers, pushed at most every interval seconds per room
+        self.progress = ProgressAggregator(self.db, self.proto, self.log, interval=rooms_cfg['progress_interval'])
+        
+        # Encrypted exams students download while waiting (key released at start)
+        self.prefetch = ExamPrefetch(self.db)
+        
+        # Room deadlines are enforced by the server (started with the server)
+        self.scheduler = RoomScheduler(
+            self.db, self.proto, self.log,
+            grace_seconds=rooms_cfg['grace_seconds'],
+            progress=self.progress, prefetch=self.prefetch
+        )
+        
+        self.handlers = RequestHandlers(
+            self.proto, self.db, self.auth,
+            self.session_mgr, self.log,
+            hash_pool=self.hash_pool,
+            scheduler=self.scheduler,
+            progress=self.progress,
+            prefetch=self.prefetch,
+            registry=self.clients,
+            metrics=self.metrics,
+            profiler=self.profiler
+        )
+        self.handlers.load_questions()
+        
+        self.room_mgr = RoomManager(self.proto, self.db, self.log)
+        
+        self.client_handler = ClientHandler(
+            self.proto, self.session_mgr, self.handlers,
+            self.room_mgr, self.log, self.clients,
+            {
+                'students_list': lambda: self._emit('students_list'),
+                'statistics': lambda: self._emit('statistics')
+            },
+            send_timeout=server_cfg['send_timeout']
+        )
+        
+        # Server state
+        self.running = False
+        self.server_socket = None
+        self.server_context = None
+        self.server_thread = None
+        self._c_handler_ref = None
+        self._closed = False
+        self._stop_requested = threading.Event()
+    
+    # ==================== EVENTS ====================
+    
+    def on(self, event, callback):
+        """Call callback() whenever event happens (see EVENTS)"""
+        self._listeners[event].append(callback)
+    
+    def _emit(self, event):
+        for callback in self._listeners[event]:
+            try:
+                callback()
+            except Exception as e:
+                self.log("✗ %s listener error: %s", event, e)
+    
+    # ==================== LIFECYCLE ====================
+    
+    @property
+    def address(self):
+        """'host:port' the server listens on"""
+        server_cfg = self.config['server']
+        return f"{server_cfg['host'] or '0.0.0.0'}:{server_cfg['port']}"
+    
+    def start(self):
+        """
+        Listen and start the background services
+        
+        Raises:
+            RuntimeError: The port could not be bound or the accept loop not set up
+        """
+        if self.running:
+            return
+        
+        server_cfg = self.config['server']
+        self.server_socket = self.proto.create_server(server_cfg['port'], server_cfg['host'])
+        if self.server_socket < 0:
+            self.server_socket = None
+            raise RuntimeError(f"Cannot listen on {self.address} (address in use or invalid)")
+        
+        # Initialize broadcast manager (C core)
+        self.proto.broadcast_init()
+        self.log("[BROADCAST] Manager initialized")
+        
+        # Scheduler broadcasts, so start it after the broadcast manager
+        self.scheduler.start()
+        self.progress.start()
+        
+        # Create C callback for client handler
+        @ClientHandlerFunc
+        def c_client_handler(ctx_ptr):
+            """C callback wrapper for Python client handler"""
+            try:
+                self.client_handler.handle_client(ctx_ptr.contents.client_socket)
+            except Exception as e:
+                self.log("✗ Handler error: %s", e)
+            return None
+        
+        # Keep reference to prevent garbage collection
+        self._c_handler_ref = c_client_handler
+        
+        self.server_context = ServerContext()
+        result = self.proto.lib.py_server_context_init(
+            ctypes.byref(self.server_context),
+            self.server_socket,
+            c_client_handler,
+            None  # user_data
+        )
+        if result != 0:
+            raise RuntimeError("Failed to initialize server context")
+        
+        # C accept loop in a Python thread (C spawns a thread per client)
+        self.server_thread = threading.Thread(target=self._run_c_accept_loop, name='accept-loop', daemon=True)
+        self.server_thread.start()
+        self.running = True
+        
+        self.log("[OK] Server started on %s (TAP Protocol v1.0)", self.address)
+        self.log("[OK] Using C accept loop with pthread per client")
+        self._emit('state')
+    
+    def _run_c_accept_loop(self):
+        """Run C accept loop (blocks until the server context is destroyed)"""
+        try:
+            self.proto.lib.py_server_accept_loop(ctypes.byref(self.server_context))
+        except Exception as e:
+            self.log("✗ Accept loop error: %s", e)
+    
+    def stop(self):
+        """
+        Graceful shutdown
+        
+        Stops accepting, lets requests already inside a handler finish (up to
+        server.shutdown_timeout seconds), then stops the background services,
+        flushes sessions and closes the log. Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        was_running = self.running
+        self.running = False
+        
+        if was_running:
+            self.log("[INFO] Shutting down: no new connections")
+            self.proto.lib.py_server_context_destroy(ctypes.byref(self.server_context))
+            self.server_thread.join(timeout=2)
+            
+            deadline = time.monotonic() + self.config['server']['shutdown_timeout']
+            while self.metrics.in_flight() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            if self.metrics.in_flight():
+                self.log("⚠ Shutdown: %s requests still running", self.metrics.in_flight(), level=WARNING)
+        
+        # Stop room scheduler, progress feed and password hash workers
+        self.scheduler.stop()
+        self.progress.stop()
+        self.hash_pool.shutdown()
+        self.session_mgr.shutdown()
+        self.profiler.shutdown()
+        
+        if self.proto.recorder is not None:
+            self.proto.recorder.close()
+            capture = self.proto.recorder.get_stats()
+            self.log("[CAPTURE] %d frames from %d connections saved to %s",
+                     capture['frames_in'], capture['connections'], capture['path'])
+        
+        if was_running:
+            self.proto.broadcast_destroy()
+        try:
+            self.proto.cleanup_network()
+        except Exception as e:
+            self.log("✗ Network cleanup error: %s", e)
+        
+        self.log("[OK] Server stopped")
+        self._emit('state')
+        self.event_log.stop()
+    
+    def request_stop(self, *_):
+        """Ask serve_forever() to shut down (signal handler)"""
+        self._stop_requested.set()
+    
+    def serve_forever(self):
+        """
+        Start, run until SIGINT/SIGTERM (or request_stop()), then stop gracefully
+        
+        Must be called from the main thread (signal handlers).
+        """
+        for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.request_stop)
+        
+        try:
+            self.start()
+            # Short waits so signal handlers run promptly on every platform
+            while not self._stop_requested.wait(0.5):
+                pass
+        finally:
+            self.stop()
@@ -0,0 +1,157 @@
+"""
+Request Dispatcher
+Routes requests to RequestHandlers through a middleware chain
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import (
+    MSG_REGISTER_REQ, MSG_LOGIN_REQ, MSG_RESUME_REQ, MSG_TEACHER_DATA_REQ,
+    MSG_CREATE_ROOM_REQ, MSG_GET_ROOMS_REQ,
+    MSG_START_ROOM_REQ, MSG_END_ROOM_REQ,
+    MSG_ADD_QUESTION_REQ, MSG_GET_QUESTIONS_REQ, MSG_DELETE_QUESTION_REQ,
+    MSG_BULK_ADD_QUESTIONS_REQ, MSG_CLONE_ROOM_REQ, MSG_SEARCH_QUESTIONS_REQ,
+    MSG_JOIN_ROOM_REQ, MSG_GET_STUDENT_ROOMS_REQ, MSG_GET_AVAILABLE_ROOMS_REQ,
+    MSG_START_ROOM_TEST_REQ, MSG_SUBMIT_ROOM_TEST_REQ,
+    MSG_AUTO_SAVE_REQ, MSG_PREFETCH_EXAM_REQ,
+    MSG_SUBSCRIBE_REQ, MSG_UNSUBSCRIBE_REQ, MSG_SERVER_STATS_REQ,
+    MSG_PROFILE_START_REQ, MSG_PROFILE_STOP_REQ, MSG_MEMORY_SNAPSHOT_REQ, MSG_SQL_TIMING_REQ,
+    ERR_UNAUTHORIZED, ERR_SESSION_EXPIRED
+)
+from .metrics import RequestContext
+
+# Before login: handler(client_socket, request)
+AUTH_ROUTES = {
+    MSG_REGISTER_REQ: 'handle_register',
+    MSG_LOGIN_REQ: 'handle_login',
+    MSG_RESUME_REQ: 'handle_resume'
+}
+
+# After login, per role: msg_type -> (handler name, run through handle_idempotent)
+ROUTES = {
+    'student': {
+        MSG_JOIN_ROOM_REQ: ('handle_join_room', True),
+        MSG_GET_STUDENT_ROOMS_REQ: ('handle_get_student_rooms', False),
+        MSG_GET_AVAILABLE_ROOMS_REQ: ('handle_get_available_rooms', False),
+        MSG_START_ROOM_TEST_REQ: ('handle_start_room_test', False),
+        MSG_SUBMIT_ROOM_TEST_REQ: ('handle_submit_room_test', True),
+        MSG_AUTO_SAVE_REQ: ('handle_auto_save', False),
+        MSG_PREFETCH_EXAM_REQ: ('handle_prefetch_exam', False),
+        MSG_SUBSCRIBE_REQ: ('handle_subscribe', False),
+        MSG_UNSUBSCRIBE_REQ: ('handle_unsubscribe', False)
+    },
+    'teacher': {
+        MSG_TEACHER_DATA_REQ: ('handle_teacher_data', False),
+        MSG_CREATE_ROOM_REQ: ('handle_create_room', True),
+        MSG_GET_ROOMS_REQ: ('handle_get_rooms', False),
+        MSG_CLONE_ROOM_REQ: ('handle_clone_room', True),
+        MSG_START_ROOM_REQ: ('handle_start_room', False),
+        MSG_END_ROOM_REQ: ('handle_end_room', False),
+        MSG_ADD_QUESTION_REQ: ('handle_add_question', True),
+        MSG_GET_QUESTIONS_REQ: ('handle_get_questions', False),
+        MSG_DELETE_QUESTION_REQ: ('handle_delete_question', False),
+        MSG_BULK_ADD_QUESTIONS_REQ: ('handle_bulk_add_questions', True),
+        MSG_SEARCH_QUESTIONS_REQ: ('handle_search_questions', False),
+        MSG_SUBSCRIBE_REQ: ('handle_subscribe', False),
+        MSG_UNSUBSCRIBE_REQ: ('handle_unsubscribe', False),
+        MSG_SERVER_STATS_REQ: ('handle_server_stats', False),
+        MSG_PROFILE_START_REQ: ('handle_profile_start', False),
+        MSG_PROFILE_STOP_REQ: ('handle_profile_stop', False),
+        MSG_MEMORY_SNAPSHOT_REQ: ('handle_memory_snapshot', False),
+        MSG_SQL_TIMING_REQ: ('handle_sql_timing', False)
+    }
+}
+
+
+class Dispatcher:
+    """
+    Table-driven request routing
+    
+    Every request runs through the middleware chain before its handler. A
+    middleware is called as middleware(context, call_next) and returns what
+    call_next() returned, or stops the request by not calling it.
+    """
+    
+    def __init__(self, handlers, session_mgr):
+        """
+        Initialize dispatcher
+        
+        Args:
+            handlers: RequestHandlers instance (its metrics record every request)
+            session_mgr: SessionManager used to check request tokens
+        """
+        self.handlers = handlers
+        self.session_mgr = session_mgr
+        
+        # Resolve handler names once, so a typo fails at startup rather than mid-exam
+        self.auth_routes = {msg_type: getattr(handlers, name) for msg_type, name in AUTH_ROUTES.items()}
+        self.routes = {
+            role: {msg_type: self._endpoint(getattr(handlers, name), idempotent)
+                   for msg_type, (name, idempotent) in table.items()}
+            for role, table in ROUTES.items()
+        }
+        
+        self.auth_middleware = [handlers.metrics.middleware]
+        self.middleware = [handlers.metrics.middleware, self.authorize]
+    
+    def _endpoint(self, handler, idempotent):
+        if idempotent:
+            return lambda ctx: self.handlers.handle_idempotent(handler, ctx.client_socket, ctx.session, ctx.request)
+        return lambda ctx: handler(ctx.client_socket, ctx.session, ctx.request)
+    
+    def handles_auth(self, msg_type):
+        return msg_type in self.auth_routes
+    
+    def dispatch_auth(self, client_socket, request):
+        """
+        Run a REGISTER/LOGIN/RESUME request
+        
+        Returns:
+            The handler's result (session token for login/resume)
+        """
+        handler = self.auth_routes[request['message_type']]
+        context = RequestContext(client_socket, None, request)
+        return self._run(context, self.auth_middleware, lambda ctx: handler(ctx.client_socket, ctx.request))
+    
+    def dispatch(self, client_socket, session, request):
+        """
+        Run a request of a logged-in user
+        
+        Returns:
+            bool: False if the message type is not valid for the user's role
+        """
+        endpoint = self.routes[session['role']].get(request['message_type'])
+        if endpoint is None:
+            return False
+        
+        self._run(RequestContext(client_socket, session, request), self.middleware, endpoint)
+        return True
+    
+    def _run(self, context, middleware, endpoint):
+        def call(index):
+            if index == len(middleware):
+                return endpoint(context)
+            return middleware[index](context, lambda: call(index + 1))
+        
+        return call(0)
+    
+    def authorize(self, context, call_next):
+        """
+        Check the session token in the request header
+        
+        Only the signature and expiry are checked (no session lookup), so this
+        is cheap enough to run on every request. The token must belong to the
+        user who logged in on this connection.
+        """
+        claims = self.session_mgr.verify_token(context.request.get('session_token', ''))
+        if claims is None:
+            self.handlers.send_error(context.client_socket, ERR_SESSION_EXPIRED, "Session expired or invalid")
+            return None
+        
+        session = context.session
+        if claims['user_id'] != session['user_id'] or claims['role'] != session['role']:
+            self.handlers.send_error(context.client_socket, ERR_UNAUTHORIZED, "Session token does not match connection")
+            return None
+        
+        return call_next()
@@ -0,0 +1,242 @@
+"""
+Event Log
+Bounded, asynchronous server log shared by every handler thread
+
+Handler threads only append (timestamp, level, format, args) to a ring
+buffer; the text is built later, by whoever reads it: the background
+writer (rotating file) and the server window (a batched view of the last
+lines). When producers outrun the readers the oldest entries are
+overwritten and the readers report how many they missed, instead of
+memory or GUI work growing with the event rate.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+def infer_level(message):
+    """Level of a message written without one, from the prefixes the server already uses"""
+    if message.startswith(('✗', '[ERROR]')):
+        return ERROR
+    if message.startswith(('⚠', '[WARNING]', '[WARN]')):
+        return WARNING
+    if message.startswith('[DEBUG]'):
+        return DEBUG
+    return INFO
+
+
+def format_message(entry):
+    """Text of an entry (format % args is applied only here)"""
+    _, _, _, message, args = entry
+    if not args:
+        return message
+    try:
+        return message % args
+    except (TypeError, ValueError):
+        return f"{message} {args!r}"
+
+
+def format_line(entry, with_date=False):
+    """One log line: '[HH:MM:SS] message' (file lines add the date, milliseconds and level)"""
+    stamp = datetime.fromtimestamp(entry[1])
+    if with_date:
+        return f"{stamp.isoformat(sep=' ', timespec='milliseconds')} {LEVEL_NAMES[entry[2]]:<7} {format_message(entry)}"
+    return f"[{stamp.strftime('%H:%M:%S')}] {format_message(entry)}"
+
+
+class EventLog:
+    """
+    Ring buffer of log entries plus an optional rotating file writer
+    
+    Use it as the logger callback of the server components:
+        log("[OK] Room created: %s", room_name)
+        log("[AUTO-SAVE] %s - %d answers", username, count, level=DEBUG)
+    
+    Entries below `level` are dropped before anything is stored or
+    formatted. Appending takes no lock: next() on the sequence counter and
+    deque.append are each atomic, so readers only have to put entries back
+    in sequence order (see read()).
+    """
+    
+    REORDER_WINDOW = 256  # Bound on how far a delayed append lands from its sequence position
+    
+    def __init__(self, capacity=10000, level=INFO, path=None, max_bytes=5 * 1024 * 1024, backups=3,
+                 flush_interval=0.5, stream=None):
+        """
+        Initialize event log
+        
+        Args:
+            capacity: Entries kept in memory (older ones are overwritten)
+            level: Minimum level stored (DEBUG, INFO, WARNING, ERROR)
+            path: Log file written by the background writer (None: memory only)
+            max_bytes: Size at which the file is rotated to path.1 .. path.<backups>
+            backups: Rotated files kept
+            flush_interval: Seconds between writer passes
+            stream: Text stream also written by the writer (e.g. sys.stdout when headless)
+        """
+        self.capacity = capacity
+        self.level = level
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.stream = stream
+        self._ring = deque(maxlen=capacity)
+        self._sequence = itertools.count(1)
+        self._stop = threading.Event()
+        self._writer = None
+        self._file = None
+        self.written = 0
+        self.dropped = 0  # Entries the file writer never saw
+    
+    def __call__(self, message, *args, level=None):
+        """Add an entry (the level is inferred from the message prefix if not given)"""
+        if level is None:
+            level = infer_level(message)
+        if level < self.level:
+            return
+        self._ring.append((next(self._sequence), time.time(), level, message, args))
+    
+    def debug(self, message, *args):
+        self(message, *args, level=DEBUG)
+    
+    def info(self, message, *args):
+        self(message, *args, level=INFO)
+    
+    def warning(self, message, *args):
+        self(message, *args, level=WARNING)
+    
+    def error(self, message, *args):
+        self(message, *args, level=ERROR)
+    
+    def read(self, after):
+        """
+        Entries appended after sequence number `after`, in order
+        
+        A producer can be interrupted between taking its sequence number and
+        appending, so a gap in the middle is an entry still on its way: the
+        read stops before it and picks it up next time. A gap at the start
+        of a full ring means entries were overwritten before being read.
+        
+        Returns:
+            tuple: (entries, new position, number of entries missed)
+        """
+        entries = []
+        for entry in reversed(list(self._ring)):
+            if entry[0] > after:
+                entries.append(entry)
+            elif entry[0] <= after - self.REORDER_WINDOW:
+                break  # Older than any entry that can still be out of order
+        entries.sort()
+        missed = 0
+        if entries and entries[0][0] != after + 1 and len(self._ring) == self.capacity:
+            missed = entries[0][0] - after - 1
+            after = entries[0][0] - 1
+        
+        count = 0
+        for entry in entries:
+            if entry[0] != after + 1:
+                break
+            after = entry[0]
+            count += 1
+        return entries[:count], after, missed
+    
+    def tail(self, lines=100):
+        """Last formatted lines (for diagnostics and tests)"""
+        entries = sorted(list(self._ring))[-lines:]
+        return [format_line(entry) for entry in entries]
+    
+    # ==================== FILE WRITER ====================
+    
+    def start(self):
+        """Start the background writer (no-op without a path or stream)"""
+        if (self.path is None and self.stream is None) or self._writer is not None:
+            return
+        if self.path is not None:
+            log_dir = os.path.dirname(self.path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._stop.clear()
+        self._writer = threading.Thread(target=self._write_loop, name='event-log-writer', daemon=True)
+        self._writer.start()
+    
+    def stop(self):
+        """Write what is left and close the file"""
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join(timeout=5)
+        self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _write_loop(self):
+        position = 0
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            position = self._write_pending(position)
+            if stopping:
+                # One more pass so entries still being appended are not lost
+                self._write_pending(position)
+                return
+    
+    def _write_pending(self, position):
+        entries, position, missed = self.read(position)
+        if not entries and not missed:
+            return position
+        
+        lines = []
+        if missed:
+            self.dropped += missed
+            lines.append(f"{datetime.now().isoformat(sep=' ', timespec='milliseconds')} WARNING "
+                         f"... {missed} log entries dropped (log buffer full)")
+        lines.extend(format_line(entry, with_date=True) for entry in entries)
+        text = '\n'.join(lines) + '\n'
+        try:
+            if self._file is not None:
+                self._file.write(text)
+                self._file.flush()
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            if self.stream is not None:
+                self.stream.write(text)
+                self.stream.flush()
+            self.written += len(entries)
+        except (OSError, ValueError):
+            pass  # A full disk or closed console must not take the server down
+        return position
+    
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+    
+    def get_stats(self):
+        """Buffer and writer counters"""
+        return {
+            'level': LEVEL_NAMES[self.level],
+            'buffered': len(self._ring),
+            'capacity': self.capacity,
+            'written': self.written,
+            'dropped': self.dropped
+        }
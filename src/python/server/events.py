@@ -0,0 +1,120 @@
+"""
+Change Events
+Topic names, subscription rules and MSG_EVENT publishing
+
+Topics:
+    lobby           Rooms created, started or ended (what students can join)
+    room:<id>       Status of one room (MSG_ROOM_STATUS), participants and its teacher
+    teacher:<id>    Changes to one teacher's rooms (new rooms, joins, start/end)
+    user:<id>       Sent directly to one user's connections (not subscribable)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import MSG_EVENT
+
+LOBBY_TOPIC = 'lobby'
+
+
+def room_topic(room_id):
+    return f"room:{room_id}"
+
+
+def teacher_topic(teacher_id):
+    return f"teacher:{teacher_id}"
+
+
+def _topic_id(topic, prefix):
+    """Numeric id of a '<prefix>:<id>' topic, or None"""
+    name, _, value = topic.partition(':')
+    if name != prefix or not value.isdigit():
+        return None
+    return int(value)
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+def can_subscribe(db, session, topic):
+    """
+    Check whether a session may subscribe to a topic
+    
+    Args:
+        db: Database instance
+        session: Session of the requesting connection
+        topic: Topic name
+    
+    Returns:
+        bool: True if allowed
+    """
+    if not isinstance(topic, str):
+        return False
+    
+    if topic == LOBBY_TOPIC:
+        return True
+    
+    teacher_id = _topic_id(topic, 'teacher')
+    if teacher_id is not None:
+        return session['role'] == 'teacher' and session['user_id'] == teacher_id
+    
+    room_id = _topic_id(topic, 'room')
+    if room_id is not None:
+        if session['role'] == 'teacher':
+            room = db.get_room_by_id(room_id)
+            return bool(room) and room['teacher_id'] == session['user_id']
+        return db.get_participant_status(room_id, session['user_id']) is not None
+    
+    return False
+
+
+def publish_event(proto, topics, event, data):
+    """
+    Send one MSG_EVENT to every subscriber of the given topics
+    
+    A socket subscribed to several of the topics receives the event once per topic.
+    
+    Returns:
+        int: Number of messages sent
+    """
+    sent = 0
+    for topic in topics:
+        sent += proto.broadcast_publish(topic, MSG_EVENT, {
+            'topic': topic,
+            'event': event,
+            'data': data
+        })
+    return sent
+
+
+def publish_room_event(proto, room, event, **data):
+    """
+    Publish a room change to the lobby and the owning teacher
+    
+    Args:
+        proto: ProtocolWrapper instance
+        room: Room dict (needs 'id' and 'teacher_id')
+        event: Event name ('room_created', 'room_started', 'room_ended')
+        **data: Extra event fields
+    """
+    data['room_id'] = room['id']
+    return publish_event(proto, (LOBBY_TOPIC, teacher_topic(room['teacher_id'])), event, data)
+
+
+def send_user_event(registry, user_id, event, data, exclude=None):
+    """
+    Send a MSG_EVENT to one user's connections (no subscription needed)
+    
+    For messages meant for a single student, e.g. 'test_submitted' to the
+    other devices of a student who just submitted. Uses the registry's user
+    index, not a topic.
+    
+    Returns:
+        int: Number of connections that received it (0 if offline)
+    """
+    return registry.send_to_user(user_id, MSG_EVENT, {
+        'topic': user_topic(user_id),
+        'event': event,
+        'data': data
+    }, exclude=exclude)
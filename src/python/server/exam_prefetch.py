@@ -0,0 +1,99 @@
+"""
+Exam Prefetch
+Per-room encrypted question blobs that students download while the room is waiting
+"""
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exam_cipher import generate_key, encrypt_exam, exam_version
+
+
+def client_questions(questions):
+    """Questions as sent to students (correct answers removed)"""
+    return [{
+        'id': q['id'],
+        'question': q['question_text'],
+        'options': [q['option_a'], q['option_b'], q['option_c'], q['option_d']]
+    } for q in questions]
+
+
+class ExamPrefetch:
+    """
+    Encrypted exam cache
+    
+    Each room gets a random key (stored with the room so a restart does not
+    invalidate blobs students already hold). The blob is built once per
+    question set and served to every student who asks; the key is only
+    released when the room starts, in the start broadcast and in
+    START_ROOM_TEST_RES.
+    """
+    
+    def __init__(self, db):
+        """
+        Initialize cache
+        
+        Args:
+            db: Database instance
+        """
+        self.db = db
+        self._cache = {}  # {room_id: entry}
+        self._generation = {}  # {room_id: invalidation count}
+        self._discards = 0  # Rooms dropped so far (a build racing a discard is not cached)
+        self._lock = threading.Lock()
+        self.built = 0
+    
+    def get(self, room_id):
+        """
+        Encrypted exam of a room, built on first use
+        
+        Returns:
+            dict or None: {'key', 'blob', 'version', 'count', 'questions'}, or None if the room does not exist
+        """
+        with self._lock:
+            entry = self._cache.get(room_id)
+            generation = self._generation.get(room_id, 0)
+            discards = self._discards
+        if entry:
+            return entry
+        
+        key = self.db.ensure_exam_key(room_id, generate_key())
+        if key is None:
+            return None
+        
+        questions = client_questions(self.db.get_room_questions(room_id))
+        blob = encrypt_exam(key, questions)
+        entry = {
+            'key': key,
+            'blob': blob,
+            'version': exam_version(key, questions),
+            'count': len(questions),
+            'questions': questions  # Plaintext for clients without a prefetched copy
+        }
+        
+        with self._lock:
+            self.built += 1
+            # Questions changed or a room ended while building: serve this blob but do not cache it
+            if self._generation.get(room_id, 0) != generation or self._discards != discards:
+                return entry
+            # A concurrent build of the same question set is equivalent; keep the first
+            return self._cache.setdefault(room_id, entry)
+    
+    def invalidate(self, room_id):
+        """Drop a room's blob after its questions change"""
+        with self._lock:
+            self._cache.pop(room_id, None)
+            self._generation[room_id] = self._generation.get(room_id, 0) + 1
+    
+    def discard(self, room_id):
+        """Forget a room for good (room ended: nobody downloads its exam again)"""
+        with self._lock:
+            self._cache.pop(room_id, None)
+            self._generation.pop(room_id, None)
+            self._discards += 1
+    
+    def get_stats(self):
+        """Cache size and number of blobs built"""
+        with self._lock:
+            return {'rooms_cached': len(self._cache), 'built': self.built}
@@ -7,25 +7,42 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from protocol_wrapper import (
-    MSG_REGISTER_RES, MSG_LOGIN_RES, MSG_TEST_CONFIG,
+    MSG_REGISTER_RES, MSG_LOGIN_RES, MSG_RESUME_RES, MSG_TEST_CONFIG,
     MSG_TEST_START_RES, MSG_TEST_QUESTIONS, MSG_TEST_RESULT,
     MSG_TEACHER_DATA_RES, MSG_ERROR,
     MSG_CREATE_ROOM_RES, MSG_GET_ROOMS_RES,
     MSG_START_ROOM_RES, MSG_END_ROOM_RES,
     MSG_ADD_QUESTION_RES, MSG_GET_QUESTIONS_RES, MSG_DELETE_QUESTION_RES,
+    MSG_BULK_ADD_QUESTIONS_RES, MSG_CLONE_ROOM_RES, MSG_SEARCH_QUESTIONS_RES,
     MSG_JOIN_ROOM_RES, MSG_GET_STUDENT_ROOMS_RES, MSG_GET_AVAILABLE_ROOMS_RES,
     MSG_START_ROOM_TEST_RES, MSG_SUBMIT_ROOM_TEST_RES,
-    MSG_AUTO_SAVE_RES, MSG_ROOM_STATUS,
-    ERR_SUCCESS, ERR_BAD_REQUEST, ERR_INVALID_CREDS,
-    ERR_USERNAME_EXISTS, ERR_INTERNAL
+    MSG_AUTO_SAVE_RES, MSG_ROOM_STATUS, MSG_PREFETCH_EXAM_RES,
+    MSG_SUBSCRIBE_RES, MSG_UNSUBSCRIBE_RES, MSG_SERVER_STATS_RES,
+    MSG_PROFILE_START_RES, MSG_PROFILE_STOP_RES, MSG_MEMORY_SNAPSHOT_RES, MSG_SQL_TIMING_RES,
+    ERR_SUCCESS, ERR_BAD_REQUEST, ERR_INVALID_CREDS, ERR_SESSION_EXPIRED,
+    ERR_FORBIDDEN, ERR_CONFLICT, ERR_USERNAME_EXISTS, ERR_INTERNAL, ERR_SERVER_BUSY,
+    get_message_type_name
 )
+from auth.hash_pool import HashWorkerPool, PoolBusyError
+from .idempotency import IdempotencyCache
+from .room_scheduler import room_deadline, grade_answers
+from .progress_aggregator import count_answered
+from .exam_prefetch import ExamPrefetch
+from .profiler import RuntimeProfiler
+from .events import can_subscribe, publish_event, publish_room_event, send_user_event, teacher_topic
+from .metrics import ServerMetrics, TimedDatabase, active_request, note_send
+from .event_log import DEBUG, WARNING
+from datetime import datetime
 import json
+import threading
+import time
 
 
 class RequestHandlers:
     """Handles all protocol message requests"""
     
-    def __init__(self, proto, db, auth, session_mgr, logger):
+    def __init__(self, proto, db, auth, session_mgr, logger, hash_pool=None, scheduler=None, progress=None,
+                 prefetch=None, registry=None, metrics=None, profiler=None):
         """
         Initialize handlers
         
@@ -34,15 +51,35 @@ class RequestHandlers:
             db: Database instance
             auth: AuthManager instance
             session_mgr: SessionManager instance
-            logger: Callback function for logging
+            logger: Callback log(message, *args, level=None) such as EventLog; args are
+                    %-formatted only if the entry is kept
+            hash_pool: HashWorkerPool for password hashing (created if None)
+            scheduler: RoomScheduler for automatic start/end (None: manual only)
+            progress: ProgressAggregator for the teachers' live feed (None: disabled)
+            prefetch: ExamPrefetch cache of encrypted exams (created if None)
+            registry: ConnectionRegistry of connected clients (None: no traffic counters or room index)
+            metrics: ServerMetrics recording every dispatched request (created if None)
+            profiler: RuntimeProfiler behind the profiling requests (created if None)
         """
         self.proto = proto
-        self.db = db
+        self.db = TimedDatabase(db)  # DB time of each request goes to its metrics
         self.auth = auth
+        self.hash_pool = hash_pool or HashWorkerPool()
         self.session_mgr = session_mgr
+        self.scheduler = scheduler
+        self.progress = progress
+        self.prefetch = prefetch or ExamPrefetch(db)
+        self.registry = registry
+        self.metrics = metrics or ServerMetrics()
+        self.profiler = profiler or RuntimeProfiler()
+        db.instrumentation.label = self.current_request_name  # Slow queries name their request
+        self.prefetch_window = 30  # Seconds over which joined students spread their prefetch
+        self.max_topics_per_request = 20
         self.log = logger
         self.questions = []
         self.test_duration = 30
+        self.idempotency = IdempotencyCache()
+        self._capture = threading.local()  # Responses sent by the current handler thread
     
     def load_questions(self):
         """Check database questions availability"""
@@ -55,23 +92,36 @@ class RequestHandlers:
             conn.close()
             
             if count > 0:
-                self.log(f"[OK] Database has {count} questions available")
+                self.log("[OK] Database has %s questions available (%s distinct in question bank)", count,
+                         self.db.get_bank_size())
             else:
-                self.log(f"[OK] Database ready (no questions yet - use teacher panel to add)")
+                self.log("[OK] Database ready (no questions yet - use teacher panel to add)")
             
             self.questions = []  # Questions loaded per-room
             
         except Exception as e:
-            self.log(f"✗ Failed to check database: {str(e)}")
+            self.log("✗ Failed to check database: %s", e)
             self.questions = []
     
     def send_response(self, client_socket, msg_type, payload):
         """Send protocol response"""
+        # Record before sending so a response lost to a dead socket can still be replayed
+        captured = getattr(self._capture, 'responses', None)
+        if captured is not None:
+            captured.append((msg_type, payload))
+        
+        failed = msg_type == MSG_ERROR or (payload or {}).get('code', ERR_SUCCESS) != ERR_SUCCESS
+        started = time.perf_counter()
         try:
-            self.proto.send_message(client_socket, msg_type, payload, use_session=False)
+            sent = self.proto.send_message(client_socket, msg_type, payload, use_session=False)
         except Exception as e:
-            self.log(f"✗ Send error: {str(e)}")
+            note_send(time.perf_counter() - started, 0, True)
+            self.log("✗ Send error: %s", e)
             raise  # Re-raise so caller knows send failed
+        note_send(time.perf_counter() - started, sent, failed)
+        
+        if self.registry:
+            self.registry.record_out(client_socket, sent)
     
     def send_error(self, client_socket, error_code, message):
         """Send error response"""
@@ -80,6 +130,52 @@ class RequestHandlers:
             'message': message
         })
     
+    def handle_idempotent(self, handler, client_socket, session, request):
+        """
+        Run a mutating handler at most once per client request_id
+        
+        A retry carrying the same payload request_id gets the stored response
+        instead of running the handler again. Requests without a request_id
+        run normally. Only successful responses (code ERR_SUCCESS) are stored,
+        so a failed request can be retried for real.
+        """
+        request_id = request.get('payload', {}).get('request_id')
+        if request_id is None:
+            handler(client_socket, session, request)
+            return
+        
+        if not isinstance(request_id, str) or not 0 < len(request_id) <= 64:
+            self.send_error(client_socket, ERR_BAD_REQUEST, "request_id must be a string of 1-64 characters")
+            return
+        
+        key = (session['user_id'], request['message_type'], request_id)
+        try:
+            cached = self.idempotency.claim(key)
+        except TimeoutError as e:
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+            return
+        
+        if cached is not None:
+            msg_type, response = cached
+            self.log("[IDEMPOTENT] Replayed response for %s (request %s)", session['username'], request_id)
+            self.send_response(client_socket, msg_type, response)
+            return
+        
+        self._capture.responses = []
+        try:
+            handler(client_socket, session, request)
+        finally:
+            responses = self._capture.responses
+            self._capture.responses = None
+            
+            # Only successes are kept: failures sent under the normal response
+            # type (code != ERR_SUCCESS) must run again on retry, like MSG_ERROR
+            final = responses[-1] if responses else None
+            if final is not None and final[0] != MSG_ERROR and (final[1] or {}).get('code') == ERR_SUCCESS:
+                self.idempotency.complete(key, *final)
+            else:
+                self.idempotency.release(key)
+    
     def handle_register(self, client_socket, request):
         """Handle registration request"""
         try:
@@ -115,8 +211,17 @@ class RequestHandlers:
                 })
                 return
             
-            # Hash password and create user
-            password_hash = self.auth.hash_password(password)
+            # Hash password on the hash pool (bounded, shared with logins)
+            try:
+                password_hash = self.hash_pool.hash_password(password)
+            except PoolBusyError as e:
+                self.send_response(client_socket, MSG_REGISTER_RES, {
+                    'code': ERR_SERVER_BUSY,
+                    'message': str(e),
+                    'retry_after': 2
+                })
+                return
+            
             user_id = self.db.create_user(username, password_hash, role, full_name, email)
             
             if user_id:
@@ -124,7 +229,7 @@ class RequestHandlers:
                     'code': ERR_SUCCESS,
                     'message': 'Registration successful'
                 })
-                self.log(f"[OK] User registered: {username} ({role})")
+                self.log("[OK] User registered: %s (%s)", username, role)
             else:
                 self.send_response(client_socket, MSG_REGISTER_RES, {
                     'code': ERR_USERNAME_EXISTS,
@@ -132,7 +237,7 @@ class RequestHandlers:
                 })
                 
         except Exception as e:
-            self.log(f"✗ Registration error: {str(e)}")
+            self.log("✗ Registration error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, "Registration failed")
     
     def handle_login(self, client_socket, request):
@@ -152,8 +257,20 @@ class RequestHandlers:
                 })
                 return None
             
-            # Verify password
-            if not self.auth.verify_password(password, user['password_hash']):
+            # Verify password on the hash pool (queues during login storms)
+            try:
+                valid = self.hash_pool.verify_password(password, user['password_hash'])
+            except PoolBusyError as e:
+                stats = self.hash_pool.get_stats()
+                self.log("⚠️ Login for %s refused: hash queue %s/%s", username, stats['depth'], stats['max_queue'])
+                self.send_response(client_socket, MSG_LOGIN_RES, {
+                    'code': ERR_SERVER_BUSY,
+                    'message': str(e),
+                    'retry_after': 2
+                })
+                return None
+            
+            if not valid:
                 self.send_response(client_socket, MSG_LOGIN_RES, {
                     'code': ERR_INVALID_CREDS,
                     'message': 'Invalid username or password'
@@ -173,18 +290,356 @@ class RequestHandlers:
                 'code': ERR_SUCCESS,
                 'message': 'Login successful',
                 'session_token': session_token,
+                'user_id': user['id'],
                 'role': user['role'],
                 'full_name': user['full_name']
             })
             
-            self.log(f"[OK] {username} logged in ({user['role']})")
+            self.log("[OK] %s logged in (%s)", username, user['role'])
             return session_token
             
         except Exception as e:
-            self.log(f"✗ Login error: {str(e)}")
+            self.log("✗ Login error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, "Login failed")
             return None
     
+    def handle_resume(self, client_socket, request):
+        """
+        Handle session resume on a new connection, returns session_token or None
+        
+        Skips password hashing: the token is looked up directly. For students,
+        broadcast subscriptions of unfinished rooms are restored on the new
+        socket and their auto-saved answers are returned.
+        """
+        try:
+            payload = request.get('payload', {})
+            session_token = payload.get('session_token', '')
+            
+            session = self.session_mgr.validate_session(session_token) if session_token else None
+            if not session:
+                self.send_response(client_socket, MSG_RESUME_RES, {
+                    'code': ERR_SESSION_EXPIRED,
+                    'message': 'Session expired, please log in again'
+                })
+                return None
+            
+            rooms = []
+            if session['role'] == 'student':
+                progress = self.db.get_student_progress(session['user_id'])
+                
+                for room in self.db.get_student_rooms(session['user_id']):
+                    if room['room_status'] == 'ended' or room['participant_status'] == 'submitted':
+                        continue
+                    
+                    # Re-register for room broadcasts on the new socket
+                    self.proto.broadcast_register(client_socket, room['id'])
+                    
+                    saved = progress.get(room['id'])
+                    rooms.append({
+                        'room_id': room['id'],
+                        'room_name': room['room_name'],
+                        'room_status': room['room_status'],
+                        'participant_status': room['participant_status'],
+                        'duration_minutes': room['duration_minutes'],
+                        'deadline': room_deadline(room),
+                        'saved_answers': saved['answers'] if saved else [],
+                        'saved_at': saved['saved_at'] if saved else None
+                    })
+            
+            self.send_response(client_socket, MSG_RESUME_RES, {
+                'code': ERR_SUCCESS,
+                'message': 'Session resumed',
+                'user_id': session['user_id'],
+                'role': session['role'],
+                'full_name': session['full_name'],
+                'data': {
+                    'rooms': rooms,
+                    'server_timestamp': self.proto.lib.py_get_unix_timestamp()
+                }
+            })
+            
+            self.log("[OK] %s resumed session (%s rooms restored)", session['username'], len(rooms))
+            return session_token
+            
+        except Exception as e:
+            self.log("✗ Resume error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, "Resume failed")
+            return None
+    
+    def handle_subscribe(self, client_socket, session, request):
+        """Handle topic subscription (MSG_EVENT / MSG_ROOM_STATUS pushes on this connection)"""
+        try:
+            payload = request.get('payload', {})
+            topics = payload.get('topics')
+            
+            if not isinstance(topics, list) or not topics or len(topics) > self.max_topics_per_request:
+                self.send_error(client_socket, ERR_BAD_REQUEST,
+                                f"topics must be a list of 1-{self.max_topics_per_request} topic names")
+                return
+            
+            subscribed, rejected = [], []
+            for topic in topics:
+                if can_subscribe(self.db, session, topic) and self.proto.broadcast_subscribe(client_socket, topic):
+                    subscribed.append(topic)
+                else:
+                    rejected.append(topic)
+            
+            self.send_response(client_socket, MSG_SUBSCRIBE_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"Subscribed to {len(subscribed)} topics",
+                'data': {
+                    'subscribed': subscribed,
+                    'rejected': rejected
+                }
+            })
+            
+            if rejected:
+                self.log("[OK] %s subscribed to %s (rejected %s)", session['username'], subscribed or 'nothing',
+                         rejected)
+            else:
+                self.log("[OK] %s subscribed to %s", session['username'], subscribed or 'nothing')
+            
+        except Exception as e:
+            self.log("✗ Subscribe error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_unsubscribe(self, client_socket, session, request):
+        """Handle topic unsubscription"""
+        try:
+            payload = request.get('payload', {})
+            topics = payload.get('topics')
+            
+            if not isinstance(topics, list) or not topics or len(topics) > self.max_topics_per_request:
+                self.send_error(client_socket, ERR_BAD_REQUEST,
+                                f"topics must be a list of 1-{self.max_topics_per_request} topic names")
+                return
+            
+            unsubscribed = [t for t in topics if isinstance(t, str) and self.proto.broadcast_unsubscribe(client_socket, t)]
+            
+            self.send_response(client_socket, MSG_UNSUBSCRIBE_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"Unsubscribed from {len(unsubscribed)} topics",
+                'data': {
+                    'unsubscribed': unsubscribed
+                }
+            })
+            
+        except Exception as e:
+            self.log("✗ Unsubscribe error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def server_stats(self):
+        """Request metrics per message type plus the queues and caches that shape latency"""
+        stats = self.metrics.snapshot(get_message_type_name)
+        stats['hash_pool'] = self.hash_pool.get_stats()
+        stats['idempotency'] = self.idempotency.get_stats()
+        stats['prefetch'] = self.prefetch.get_stats()
+        stats['connections'] = self.registry.get_stats() if self.registry else None
+        stats['queries'] = self.db.get_query_stats()
+        stats['capture'] = self.proto.recorder.get_stats() if self.proto.recorder else None
+        stats['profiling'] = self.profiler.get_stats()
+        return stats
+    
+    def current_request_name(self):
+        """Message type name of the request this thread is handling (None outside one)"""
+        context = active_request()
+        return get_message_type_name(context.msg_type) if context else None
+    
+    def handle_server_stats(self, client_socket, session, request):
+        """Handle server metrics query (admins only: the `profiling.admins` list)"""
+        try:
+            if not self._check_admin(client_socket, session, "Server stats are for admins only"):
+                return
+            
+            self.send_response(client_socket, MSG_SERVER_STATS_RES, {
+                'code': ERR_SUCCESS,
+                'message': 'Server stats',
+                'data': self.server_stats()
+            })
+            
+        except Exception as e:
+            self.log("✗ Server stats error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def _check_admin(self, client_socket, session, refusal):
+        """Send ERROR and return False unless this user is in the admin list (`profiling.admins`)"""
+        if session['username'] in self.profiler.admins:
+            return True
+        if not self.profiler.admins:
+            reason = "No admins are configured on this server"
+        else:
+            reason = refusal
+        self.send_error(client_socket, ERR_FORBIDDEN, reason)
+        return False
+    
+    def _check_profiling(self, client_socket, session):
+        """Send ERROR and return False unless this user may profile the server"""
+        if not self.profiler.enabled:
+            self.send_error(client_socket, ERR_FORBIDDEN, "Profiling is disabled on this server")
+            return False
+        return self._check_admin(client_socket, session, "Profiling is for admins only")
+    
+    def handle_profile_start(self, client_socket, session, request):
+        """Handle CPU profile start (stack sampling of every thread until PROFILE_STOP_REQ)"""
+        try:
+            if not self._check_profiling(client_socket, session):
+                return
+            
+            payload = request.get('payload', {})
+            interval_ms = payload.get('interval_ms', 10)
+            max_seconds = payload.get('max_seconds', 60)
+            include_idle = bool(payload.get('include_idle', False))
+            
+            if not isinstance(interval_ms, (int, float)) or not (1 <= interval_ms <= 1000):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid interval_ms (1-1000)")
+                return
+            
+            if not isinstance(max_seconds, (int, float)) or not (1 <= max_seconds <= self.profiler.max_seconds):
+                self.send_error(client_socket, ERR_BAD_REQUEST, f"Invalid max_seconds (1-{self.profiler.max_seconds})")
+                return
+            
+            try:
+                self.profiler.cpu.start(interval_ms / 1000, max_seconds, include_idle)
+            except RuntimeError as e:
+                self.send_error(client_socket, ERR_CONFLICT, str(e))
+                return
+            
+            self.send_response(client_socket, MSG_PROFILE_START_RES, {
+                'code': ERR_SUCCESS,
+                'message': 'CPU profile started',
+                'data': {
+                    'interval_ms': interval_ms,
+                    'max_seconds': max_seconds,
+                    'include_idle': include_idle
+                }
+            })
+            
+            self.log("[PROFILE] CPU profile started by %s (%s ms, max %s s)",
+                     session['username'], interval_ms, max_seconds, level=WARNING)
+            
+        except Exception as e:
+            self.log("✗ Profile start error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_profile_stop(self, client_socket, session, request):
+        """Handle CPU profile stop: folded stacks written to disk, top frames returned"""
+        try:
+            if not self._check_profiling(client_socket, session):
+                return
+            
+            try:
+                result = self.profiler.cpu.stop()
+            except RuntimeError as e:
+                self.send_error(client_socket, ERR_BAD_REQUEST, str(e))
+                return
+            
+            self.send_response(client_socket, MSG_PROFILE_STOP_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"CPU profile saved to {result['path']}",
+                'data': result
+            })
+            
+            self.log("[PROFILE] CPU profile by %s: %d samples in %.1f s -> %s",
+                     session['username'], result['samples'], result['duration_s'], result['path'], level=WARNING)
+            
+        except Exception as e:
+            self.log("✗ Profile stop error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_memory_snapshot(self, client_socket, session, request):
+        """Handle tracemalloc snapshot (first one starts tracing) or stop of tracing"""
+        try:
+            if not self._check_profiling(client_socket, session):
+                return
+            
+            payload = request.get('payload', {})
+            action = payload.get('action', 'snapshot')
+            frames = payload.get('frames', 10)
+            top = payload.get('top', 20)
+            
+            if action == 'stop':
+                stopped = self.profiler.memory.stop()
+                self.send_response(client_socket, MSG_MEMORY_SNAPSHOT_RES, {
+                    'code': ERR_SUCCESS,
+                    'message': 'Memory tracing stopped' if stopped else 'Memory tracing was not running',
+                    'data': {'tracing': False}
+                })
+                self.log("[PROFILE] Memory tracing stopped by %s", session['username'], level=WARNING)
+                return
+            
+            if action != 'snapshot':
+                self.send_error(client_socket, ERR_BAD_REQUEST, "action must be 'snapshot' or 'stop'")
+                return
+            
+            if not isinstance(frames, int) or not (1 <= frames <= 50):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid frames (1-50)")
+                return
+            
+            if not isinstance(top, int) or not (1 <= top <= 100):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid top (1-100)")
+                return
+            
+            result = self.profiler.memory.snapshot(frames, top)
+            
+            self.send_response(client_socket, MSG_MEMORY_SNAPSHOT_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"Memory snapshot saved to {result['path']}",
+                'data': result
+            })
+            
+            self.log("[PROFILE] Memory snapshot by %s: %.0f KB traced -> %s",
+                     session['username'], result['traced_kb'], result['path'], level=WARNING)
+            
+        except Exception as e:
+            self.log("✗ Memory snapshot error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_sql_timing(self, client_socket, session, request):
+        """Handle SQL timing switch (admins only; without 'enabled' only reports the state)"""
+        try:
+            if not self._check_admin(client_socket, session, "SQL timing is for admins only"):
+                return
+            
+            payload = request.get('payload', {})
+            enabled = payload.get('enabled')
+            slow_ms = payload.get('slow_ms')
+            
+            if enabled is not None and not isinstance(enabled, bool):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "enabled must be true or false")
+                return
+            
+            if slow_ms is not None and (isinstance(slow_ms, bool) or not isinstance(slow_ms, (int, float))
+                                        or not (0 <= slow_ms <= 60000)):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid slow_ms (0-60000)")
+                return
+            
+            instrumentation = self.db.instrumentation
+            if slow_ms is not None:
+                instrumentation.slow_ms = slow_ms
+            if enabled:
+                instrumentation.enable()
+            elif enabled is False:
+                instrumentation.disable()
+            
+            if enabled is not None or slow_ms is not None:
+                self.log("[SQL TIMING] %s by %s (slow >= %s ms)", 'On' if instrumentation.enabled else 'Off',
+                         session['username'], instrumentation.slow_ms, level=WARNING)
+            
+            self.send_response(client_socket, MSG_SQL_TIMING_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"SQL timing {'enabled' if instrumentation.enabled else 'disabled'}",
+                'data': {
+                    'enabled': instrumentation.enabled,
+                    'slow_ms': instrumentation.slow_ms,
+                    'slow_log': instrumentation.slow_log_path,
+                    'slow_count': instrumentation.slow_count
+                }
+            })
+            
+        except Exception as e:
+            self.log("✗ SQL timing error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
     def handle_student_test(self, client_socket, session):
         """Handle student test flow"""
         try:
@@ -207,7 +662,7 @@ class RequestHandlers:
             })
             
             # Send questions
-            self.log(f"[OK] {session['username']} started test")
+            self.log("[OK] %s started test", session['username'])
             self.send_response(client_socket, MSG_TEST_QUESTIONS, {
                 "questions": self.questions
             })
@@ -245,10 +700,10 @@ class RequestHandlers:
                     }
                 })
                 
-                self.log(f"✅ {session['username']} completed: {score}/{len(self.questions)} ({percentage}%)")
+                self.log("✅ %s completed: %s/%s (%s%%)", session['username'], score, len(self.questions), percentage)
                 
         except Exception as e:
-            self.log(f"✗ Student test error: {str(e)}")
+            self.log("✗ Student test error: %s", e)
     
     def handle_teacher_data(self, client_socket, session, request):
         """Handle teacher data request"""
@@ -260,11 +715,11 @@ class RequestHandlers:
             # Get rooms with error handling
             try:
                 rooms = self.db.get_teacher_rooms(session['user_id'])
-                self.log(f"  Loaded {len(rooms)} rooms for teacher")
+                self.log("  Loaded %s rooms for teacher", len(rooms))
             except Exception as room_err:
                 import traceback
-                self.log(f"⚠ Warning: Could not load rooms: {str(room_err)}")
-                self.log(f"  Traceback: {traceback.format_exc()}")
+                self.log("⚠ Warning: Could not load rooms: %s", room_err)
+                self.log("  Traceback: %s", traceback.format_exc())
                 rooms = []
             
             # Try to send with rooms first
@@ -278,11 +733,11 @@ class RequestHandlers:
                         'rooms': rooms
                     }
                 })
-                self.log(f"[OK] {session['username']} accessed teacher dashboard (with {len(rooms)} rooms)")
+                self.log("[OK] %s accessed teacher dashboard (with %s rooms)", session['username'], len(rooms))
             except Exception as send_err:
                 # If sending with rooms failed, try without rooms
-                self.log(f"⚠ Failed to send with rooms: {str(send_err)}")
-                self.log(f"  Retrying without rooms data...")
+                self.log("⚠ Failed to send with rooms: %s", send_err)
+                self.log("  Retrying without rooms data...")
                 try:
                     self.send_response(client_socket, MSG_TEACHER_DATA_RES, {
                         'code': ERR_SUCCESS,
@@ -293,9 +748,9 @@ class RequestHandlers:
                             'rooms': []
                         }
                     })
-                    self.log(f"[OK] {session['username']} accessed teacher dashboard (without rooms)")
+                    self.log("[OK] %s accessed teacher dashboard (without rooms)", session['username'])
                 except Exception as retry_err:
-                    self.log(f"✗ Complete failure: {str(retry_err)}")
+                    self.log("✗ Complete failure: %s", retry_err)
                     try:
                         self.send_error(client_socket, ERR_INTERNAL, "Failed to send teacher data")
                     except:
@@ -303,8 +758,8 @@ class RequestHandlers:
             
         except Exception as e:
             import traceback
-            self.log(f"✗ Teacher data error: {str(e)}")
-            self.log(f"  Traceback: {traceback.format_exc()}")
+            self.log("✗ Teacher data error: %s", e)
+            self.log("  Traceback: %s", traceback.format_exc())
             try:
                 self.send_error(client_socket, ERR_INTERNAL, str(e))
             except:
@@ -317,6 +772,7 @@ class RequestHandlers:
             room_name = payload.get('room_name', '')
             num_questions = payload.get('num_questions', 10)
             duration_minutes = payload.get('duration_minutes', 30)
+            scheduled_start = payload.get('scheduled_start')  # Optional Unix timestamp
             
             # Validate
             if not room_name or len(room_name) < 3:
@@ -331,6 +787,15 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid duration (5-180 minutes)")
                 return
             
+            if scheduled_start is not None:
+                if not isinstance(scheduled_start, (int, float)) or not (
+                        time.time() < scheduled_start <= time.time() + 30 * 86400):
+                    self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid scheduled_start (future time, max 30 days)")
+                    return
+                if not self.scheduler:
+                    self.send_error(client_socket, ERR_BAD_REQUEST, "Scheduled rooms are not enabled on this server")
+                    return
+            
             # Get teacher user
             user = self.db.get_user_by_username(session['username'])
             if not user:
@@ -338,14 +803,23 @@ class RequestHandlers:
                 return
             
             # Create room
-            room_id, room_code = self.db.create_test_room(
+            room = self.db.create_test_room(
                 room_name=room_name,
                 teacher_id=user['id'],
                 num_questions=num_questions,
-                duration_minutes=duration_minutes
+                duration_minutes=duration_minutes,
+                scheduled_start=datetime.fromtimestamp(scheduled_start).isoformat() if scheduled_start else None
             )
+            room_id, room_code = room['room_id'], room['room_code']
+            
+            if scheduled_start:
+                self.scheduler.schedule_start(room_id, scheduled_start)
+            
+            self.log("[OK] Room created: %s (%s) by %s", room_name, room_code, session['username'])
             
-            self.log(f"[OK] Room created: {room_name} ({room_code}) by {session['username']}")
+            publish_room_event(self.proto, {'id': room_id, 'teacher_id': user['id']}, 'room_created',
+                               room_name=room_name, room_code=room_code, num_questions=num_questions,
+                               duration_minutes=duration_minutes, scheduled_start=scheduled_start)
             
             # Send success response
             self.send_response(client_socket, MSG_CREATE_ROOM_RES, {
@@ -353,12 +827,57 @@ class RequestHandlers:
                 'message': 'Room created successfully',
                 'data': {
                     'room_id': room_id,
-                    'room_code': room_code
+                    'room_code': room_code,
+                    'scheduled_start': scheduled_start
                 }
             })
             
         except Exception as e:
-            self.log(f"✗ Create room error: {str(e)}")
+            self.log("✗ Create room error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_clone_room(self, client_socket, session, request):
+        """Handle clone room request (copies settings and question references)"""
+        try:
+            payload = request.get('payload', {})
+            room_id = payload.get('room_id')
+            room_name = payload.get('room_name')
+            
+            if not room_id:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Missing room_id")
+                return
+            
+            if room_name is not None and len(room_name) < 3:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room name too short (min 3 characters)")
+                return
+            
+            room = self.db.get_room_by_id(room_id)
+            if not room:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room not found")
+                return
+            
+            if room['teacher_id'] != session['user_id']:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Only room creator can clone the room")
+                return
+            
+            result = self.db.clone_room(room_id, session['user_id'], room_name)
+            
+            self.log("[OK] Room %s cloned as %s (%s) with %s questions by %s", room_id, result['room_name'],
+                     result['room_code'], result['question_count'], session['username'])
+            
+            publish_room_event(self.proto, {'id': result['room_id'], 'teacher_id': session['user_id']}, 'room_created',
+                               room_name=result['room_name'], room_code=result['room_code'],
+                               num_questions=room['num_questions'], duration_minutes=room['duration_minutes'],
+                               scheduled_start=None)
+            
+            self.send_response(client_socket, MSG_CLONE_ROOM_RES, {
+                'code': ERR_SUCCESS,
+                'message': 'Room cloned successfully',
+                'data': result
+            })
+            
+        except Exception as e:
+            self.log("✗ Clone room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_rooms(self, client_socket, session, request):
@@ -373,7 +892,7 @@ class RequestHandlers:
             # Get teacher rooms
             rooms = self.db.get_teacher_rooms(user['id'])
             
-            self.log(f"[OK] Loaded {len(rooms)} rooms for {session['username']}")
+            self.log("[OK] Loaded %d rooms for %s", len(rooms), session['username'], level=DEBUG)
             
             # Send response
             self.send_response(client_socket, MSG_GET_ROOMS_RES, {
@@ -385,7 +904,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Get rooms error: {str(e)}")
+            self.log("✗ Get rooms error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_start_room(self, client_socket, session, request):
@@ -439,18 +958,37 @@ class RequestHandlers:
                 )
                 return
             
-            # All checks passed - start room
-            self.db.start_test_room(room_id)
+            # All checks passed - start room (False: started meanwhile by the scheduler or another request)
+            if not self.db.start_test_room(room_id):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room is already started")
+                return
             
-            self.log(f"[OK] Room {room_id} ('{room['room_name']}') started by {session['username']} - {len(questions)} questions ready")
+            # Server owns the deadline: the scheduler ends the room even if the teacher does not
+            if self.scheduler:
+                deadline = self.scheduler.room_started(room_id)
+            else:
+                deadline = room_deadline(self.db.get_room_by_id(room_id))
+            
+            self.log("[OK] Room %s ('%s') started by %s - %s questions ready", room_id, room['room_name'],
+                     session['username'], len(questions))
+            
+            # Students already hold the encrypted questions: the broadcast only releases the key
+            exam = self.prefetch.get(room_id)
             
             # Broadcast to all students in room (C handles iteration and sending)
             num_notified = self.proto.broadcast_to_room(room_id, MSG_ROOM_STATUS, {
                 'room_id': room_id,
                 'status': 'in_progress',
-                'action': 'started'
+                'action': 'started',
+                'deadline': deadline,
+                'exam_key': exam['key'],
+                'exam_version': exam['version']
             })
-            self.log(f"[BROADCAST] Notified {num_notified} students in room {room_id}")
+            self.log("[BROADCAST] Notified %s students in room %s", num_notified, room_id)
+            publish_room_event(self.proto, room, 'room_started', deadline=deadline)
+            
+            if self.progress:
+                self.progress.invalidate(room_id)
             
             # Send response
             self.send_response(client_socket, MSG_START_ROOM_RES, {
@@ -459,7 +997,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Start room error: {str(e)}")
+            self.log("✗ Start room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_end_room(self, client_socket, session, request):
@@ -485,7 +1023,11 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, result.get('error', 'Cannot end room'))
                 return
             
-            self.log(f"[OK] Room {room_id} ended by {session['username']}")
+            # Grade auto-saved answers of students who never submitted
+            finalized = self.scheduler.finalize_room(room_id) if self.scheduler else 0
+            
+            self.log("[OK] Room %s ended by %s (%s unsubmitted tests finalized)", room_id, session['username'],
+                     finalized)
             
             # Broadcast to all students in room (C handles iteration and sending)
             num_notified = self.proto.broadcast_to_room(room_id, MSG_ROOM_STATUS, {
@@ -493,7 +1035,12 @@ class RequestHandlers:
                 'status': 'ended',
                 'action': 'ended'
             })
-            self.log(f"[BROADCAST] Notified {num_notified} students in room {room_id}")
+            self.log("[BROADCAST] Notified %s students in room %s", num_notified, room_id)
+            publish_room_event(self.proto, self.db.get_room_by_id(room_id), 'room_ended', finalized=finalized)
+            
+            if self.progress:
+                self.progress.invalidate(room_id)
+            self.prefetch.discard(room_id)
             
             # Send response
             self.send_response(client_socket, MSG_END_ROOM_RES, {
@@ -502,14 +1049,48 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ End room error: {str(e)}")
+            self.log("✗ End room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
+    def _validate_question(self, question):
+        """
+        Validate a single question dict
+        
+        Returns:
+            str: Error message, or None if the question is valid
+        """
+        if not isinstance(question, dict):
+            return "Question must be an object"
+        
+        question_text = question.get('question_text', '')
+        if not isinstance(question_text, str) or len(question_text.strip()) < 5:
+            return "Question text too short (min 5 characters)"
+        
+        options = [question.get(key, '') for key in ('option_a', 'option_b', 'option_c', 'option_d')]
+        if not all(isinstance(opt, str) and opt.strip() for opt in options):
+            return "All options must be provided"
+        
+        correct_answer = question.get('correct_answer', 0)
+        if isinstance(correct_answer, bool) or correct_answer not in [0, 1, 2, 3]:
+            return "Invalid correct answer (must be 0-3)"
+        
+        return None
+    
     def handle_add_question(self, client_socket, session, request):
         """Handle add question request"""
         try:
             payload = request.get('payload', {})
             room_id = payload.get('room_id')
+            
+            # Reuse an existing question bank entry (e.g. picked from search results)
+            if payload.get('bank_id'):
+                bank_question = self.db.get_bank_question(payload['bank_id'])
+                if not bank_question:
+                    self.send_error(client_socket, ERR_BAD_REQUEST, "Question bank entry not found")
+                    return
+                payload = dict(payload, **{key: bank_question[key] for key in (
+                    'question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')})
+            
             question_text = payload.get('question_text', '')
             option_a = payload.get('option_a', '')
             option_b = payload.get('option_b', '')
@@ -538,25 +1119,18 @@ class RequestHandlers:
                 return
             
             # Check current question count
-            current_questions = self.db.get_room_questions(room_id)
-            if len(current_questions) >= room['num_questions']:
+            current_count = self.db.get_room_question_count(room_id)
+            if current_count >= room['num_questions']:
                 self.send_error(
                     client_socket, 
                     ERR_BAD_REQUEST, 
-                    f"Cannot add more questions. Room limit: {room['num_questions']}, Current: {len(current_questions)}"
+                    f"Cannot add more questions. Room limit: {room['num_questions']}, Current: {current_count}"
                 )
                 return
             
-            if not question_text or len(question_text) < 5:
-                self.send_error(client_socket, ERR_BAD_REQUEST, "Question text too short (min 5 characters)")
-                return
-            
-            if not all([option_a, option_b, option_c, option_d]):
-                self.send_error(client_socket, ERR_BAD_REQUEST, "All options must be provided")
-                return
-            
-            if correct_answer not in [0, 1, 2, 3]:
-                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid correct answer (must be 0-3)")
+            error = self._validate_question(payload)
+            if error:
+                self.send_error(client_socket, ERR_BAD_REQUEST, error)
                 return
             
             # Add question to database
@@ -570,9 +1144,12 @@ class RequestHandlers:
                 correct_answer=correct_answer
             )
             
+            self.prefetch.invalidate(room_id)
+            
             # Re-count after adding
-            updated_count = len(current_questions) + 1
-            self.log(f"[OK] Question {question_id} added to room {room_id} by {session['username']} ({updated_count}/{room['num_questions']})")
+            updated_count = current_count + 1
+            self.log("[OK] Question %s added to room %s by %s (%s/%s)", question_id, room_id, session['username'],
+                     updated_count, room['num_questions'])
             
             # Send success response
             self.send_response(client_socket, MSG_ADD_QUESTION_RES, {
@@ -584,7 +1161,140 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Add question error: {str(e)}")
+            self.log("✗ Add question error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_bulk_add_questions(self, client_socket, session, request):
+        """Handle bulk question import (all-or-nothing, single transaction)"""
+        try:
+            payload = request.get('payload', {})
+            room_id = payload.get('room_id')
+            questions = payload.get('questions')
+            
+            if not room_id:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Missing room_id")
+                return
+            
+            if not isinstance(questions, list) or not questions:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "No questions to import")
+                return
+            
+            room = self.db.get_room_by_id(room_id)
+            if not room:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room not found")
+                return
+            
+            if room['teacher_id'] != session['user_id']:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Only room creator can import questions")
+                return
+            
+            if room['status'] != 'waiting':
+                self.send_error(
+                    client_socket,
+                    ERR_BAD_REQUEST,
+                    f"Cannot add questions to room with status '{room['status']}'. Only 'waiting' rooms can be edited."
+                )
+                return
+            
+            # Validate every row before touching the database
+            errors = []
+            for index, question in enumerate(questions):
+                error = self._validate_question(question)
+                if error:
+                    errors.append({'index': index, 'error': error})
+            
+            if errors:
+                self.send_response(client_socket, MSG_BULK_ADD_QUESTIONS_RES, {
+                    'code': ERR_BAD_REQUEST,
+                    'message': f"{len(errors)} of {len(questions)} questions are invalid",
+                    'data': {
+                        'inserted': 0,
+                        'errors': errors
+                    }
+                })
+                return
+            
+            rows = [{
+                'question_text': q['question_text'].strip(),
+                'option_a': q['option_a'].strip(),
+                'option_b': q['option_b'].strip(),
+                'option_c': q['option_c'].strip(),
+                'option_d': q['option_d'].strip(),
+                'correct_answer': q.get('correct_answer', 0)
+            } for q in questions]
+            
+            result = self.db.add_room_questions_bulk(room_id, rows, max_questions=room['num_questions'])
+            
+            if not result['success']:
+                self.send_response(client_socket, MSG_BULK_ADD_QUESTIONS_RES, {
+                    'code': ERR_BAD_REQUEST,
+                    'message': f"Cannot import questions. {result['error']}",
+                    'data': {
+                        'inserted': 0,
+                        'errors': []
+                    }
+                })
+                return
+            
+            self.prefetch.invalidate(room_id)
+            self.log("[OK] %s questions imported to room %s by %s (%s/%s)", result['inserted'], room_id,
+                     session['username'], result['total'], room['num_questions'])
+            
+            self.send_response(client_socket, MSG_BULK_ADD_QUESTIONS_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"Imported {result['inserted']} questions",
+                'data': {
+                    'inserted': result['inserted'],
+                    'total': result['total'],
+                    'errors': []
+                }
+            })
+            
+        except Exception as e:
+            self.log("✗ Bulk add questions error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def handle_search_questions(self, client_socket, session, request):
+        """Handle full-text question bank search (ranked, paginated)"""
+        try:
+            payload = request.get('payload', {})
+            query = payload.get('query', '')
+            limit = payload.get('limit', 20)
+            offset = payload.get('offset', 0)
+            mine_only = payload.get('mine_only', False)
+            
+            if not isinstance(query, str) or not query.strip():
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Missing search query")
+                return
+            
+            if not isinstance(limit, int) or not (1 <= limit <= 50):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid limit (1-50)")
+                return
+            
+            if not isinstance(offset, int) or not (0 <= offset <= 10000):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Invalid offset (0-10000)")
+                return
+            
+            result = self.db.search_questions(
+                query.strip()[:200],
+                limit=limit,
+                offset=offset,
+                teacher_id=session['user_id'] if mine_only else None
+            )
+            
+            self.send_response(client_socket, MSG_SEARCH_QUESTIONS_RES, {
+                'code': ERR_SUCCESS,
+                'message': f"Found {len(result['results'])} questions",
+                'data': {
+                    'results': result['results'],
+                    'offset': offset,
+                    'limit': limit,
+                    'has_more': result['has_more']
+                }
+            })
+            
+        except Exception as e:
+            self.log("✗ Search questions error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_questions(self, client_socket, session, request):
@@ -600,7 +1310,7 @@ class RequestHandlers:
             # Get questions from database
             questions = self.db.get_room_questions(room_id)
             
-            self.log(f"[OK] Loaded {len(questions)} questions for room {room_id}")
+            self.log("[OK] Loaded %d questions for room %s", len(questions), room_id, level=DEBUG)
             
             # Send response
             self.send_response(client_socket, MSG_GET_QUESTIONS_RES, {
@@ -612,7 +1322,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Get questions error: {str(e)}")
+            self.log("✗ Get questions error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_delete_question(self, client_socket, session, request):
@@ -649,8 +1359,9 @@ class RequestHandlers:
             
             # Delete question
             self.db.delete_room_question(question_id)
+            self.prefetch.invalidate(room_id)
             
-            self.log(f"[OK] Question {question_id} deleted from room {room_id} by {session['username']}")
+            self.log("[OK] Question %s deleted from room %s by %s", question_id, room_id, session['username'])
             
             # Send response
             self.send_response(client_socket, MSG_DELETE_QUESTION_RES, {
@@ -659,7 +1370,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Delete question error: {str(e)}")
+            self.log("✗ Delete question error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_join_room(self, client_socket, session, request):
@@ -683,18 +1394,9 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, "Only students can join rooms")
                 return
             
-            # Get room by ID first to get room_code
-            # We need to find room by ID, so let's get all rooms and filter
-            # Better: add get_room_by_id to repository
-            rooms = self.db.get_teacher_rooms(user['id'])  # This won't work
-            
-            # Alternative: join by ID directly
-            # For now, let's modify the join_room method to accept room_id
-            # But join_room needs room_code... let's check available rooms
-            available_rooms = self.db.get_available_rooms(user['id'])
-            room_data = next((r for r in available_rooms if r['id'] == room_id), None)
-            
-            if not room_data:
+            # Look up the room directly (the lobby list is paginated)
+            room_data = self.db.get_room_by_id(room_id)
+            if not room_data or room_data['status'] == 'ended':
                 self.send_error(client_socket, ERR_BAD_REQUEST, "Room not found or already joined")
                 return
             
@@ -705,15 +1407,31 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, result.get('error', 'Failed to join room'))
                 return
             
+            if result.get('already_joined'):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room not found or already joined")
+                return
+            
             room = result['room']
-            self.log(f"[OK] {session['username']} joined room: {room['room_name']} (ID: {room_id})")
+            self.log("[OK] %s joined room: %s (ID: %s)", session['username'], room['room_name'], room_id)
             
             # Register client for broadcast (C handles socket tracking)
             success = self.proto.broadcast_register(client_socket, room_id)
             if success:
-                self.log(f"[BROADCAST] Registered {session['username']} for room {room_id} broadcasts")
+                self.log("[BROADCAST] Registered %s for room %s broadcasts", session['username'], room_id, level=DEBUG)
             else:
-                self.log(f"[BROADCAST] Warning: Failed to register {session['username']} for broadcasts")
+                self.log("[BROADCAST] Warning: Failed to register %s for broadcasts", session['username'], level=WARNING)
+            
+            if self.progress:
+                self.progress.on_join(room_id, user['id'])
+            
+            if self.registry:
+                self.registry.join_room(client_socket, room_id)
+            
+            publish_event(self.proto, (teacher_topic(room_data['teacher_id']),), 'participant_joined', {
+                'room_id': room_id,
+                'student_id': user['id'],
+                'student_name': user['full_name']
+            })
             
             # Send success response
             self.send_response(client_socket, MSG_JOIN_ROOM_RES, {
@@ -726,12 +1444,13 @@ class RequestHandlers:
                     'teacher_name': room['teacher_name'],
                     'num_questions': room['num_questions'],
                     'duration_minutes': room['duration_minutes'],
-                    'status': room['status']
+                    'status': room['status'],
+                    'prefetch_within': self._prefetch_within(room_data)
                 }
             })
             
         except Exception as e:
-            self.log(f"✗ Join room error: {str(e)}")
+            self.log("✗ Join room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_student_rooms(self, client_socket, session, request):
@@ -751,7 +1470,7 @@ class RequestHandlers:
             # Get student rooms
             rooms = self.db.get_student_rooms(user['id'])
             
-            self.log(f"[OK] Loaded {len(rooms)} joined rooms for student {session['username']}")
+            self.log("[OK] Loaded %d joined rooms for student %s", len(rooms), session['username'], level=DEBUG)
             
             # Send response
             self.send_response(client_socket, MSG_GET_STUDENT_ROOMS_RES, {
@@ -763,7 +1482,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Get student rooms error: {str(e)}")
+            self.log("✗ Get student rooms error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_available_rooms(self, client_socket, session, request):
@@ -780,22 +1499,40 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, "Only students can view available rooms")
                 return
             
-            # Get available rooms (exclude already joined)
-            rooms = self.db.get_available_rooms(user['id'])
+            payload = request.get('payload', {})
+            limit = payload.get('limit', 20)
+            cursor = payload.get('cursor')
+            search = (payload.get('search') or '').strip()
+            teacher = (payload.get('teacher') or '').strip()
+            
+            if not isinstance(limit, int) or not 1 <= limit <= 100:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "limit must be between 1 and 100")
+                return
+            
+            if cursor is not None and not isinstance(cursor, int):
+                self.send_error(client_socket, ERR_BAD_REQUEST, "cursor must be a room id")
+                return
+            
+            if len(search) > 100 or len(teacher) > 100:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Search text too long")
+                return
+            
+            # Get one page of available rooms (exclude already joined)
+            page = self.db.get_available_rooms_page(user['id'], limit, cursor,
+                                                    search or None, teacher or None)
             
-            self.log(f"[OK] Loaded {len(rooms)} available rooms for student {session['username']}")
+            self.log("[OK] Loaded %d available rooms for student %s", len(page['rooms']), session['username'],
+                     level=DEBUG)
             
             # Send response
             self.send_response(client_socket, MSG_GET_AVAILABLE_ROOMS_RES, {
                 'code': ERR_SUCCESS,
                 'message': 'Available rooms loaded',
-                'data': {
-                    'rooms': rooms
-                }
+                'data': page
             })
             
         except Exception as e:
-            self.log(f"✗ Get available rooms error: {str(e)}")
+            self.log("✗ Get available rooms error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_start_room_test(self, client_socket, session, request):
@@ -803,6 +1540,7 @@ class RequestHandlers:
         try:
             payload = request.get('payload', {})
             room_id = payload.get('room_id')
+            cached_version = payload.get('exam_version')  # Set if the client prefetched the exam
             
             if not room_id:
                 self.send_error(client_socket, ERR_BAD_REQUEST, "Missing room_id")
@@ -837,51 +1575,121 @@ class RequestHandlers:
                 self.send_error(client_socket, ERR_BAD_REQUEST, f"Room is not active (status: {room_found['room_status']})")
                 return
             
-            # Get questions for this room
-            questions = self.db.get_room_questions(room_id)
+            # Questions come from the prefetch cache (built once per room, not per student)
+            exam = self.prefetch.get(room_id)
             
-            if not questions:
+            if not exam or not exam['count']:
                 self.send_error(client_socket, ERR_BAD_REQUEST, "No questions available for this room")
                 return
             
-            # Format questions for client (hide correct answers)
-            formatted_questions = []
-            for q in questions:
-                formatted_questions.append({
-                    'id': q['id'],
-                    'question': q['question_text'],
-                    'options': [
-                        q['option_a'],
-                        q['option_b'],
-                        q['option_c'],
-                        q['option_d']
-                    ]
-                })
-            
-            self.log(f"[OK] {session['username']} started test in room {room_id} ({room_found['room_name']})")
+            self.log("[OK] %s started test in room %s (%s)", session['username'], room_id, room_found['room_name'])
             
             # Update participant status to 'testing'
             self.db.update_participant_status(room_id, user['id'], 'testing')
             
+            if self.progress:
+                self.progress.on_start(room_id, user['id'])
+            
+            if self.registry:
+                self.registry.set_status(client_socket, 'testing')
+            
             # Get server timestamp from C (for time synchronization)
             server_timestamp = self.proto.lib.py_get_unix_timestamp()
             
+            data = {
+                'room_id': room_id,
+                'room_name': room_found['room_name'],
+                'duration_minutes': room_found['duration_minutes'],
+                'server_timestamp': server_timestamp,  # Unix timestamp from C
+                'start_time': room_found.get('start_time'),  # ISO string for reference
+                'deadline': room_deadline(room_found)  # Room ends here for everyone
+            }
+            
+            if cached_version and cached_version == exam['version']:
+                # Client holds the current encrypted exam: send the key, not the questions
+                data['exam_key'] = exam['key']
+                data['exam_version'] = exam['version']
+            else:
+                data['questions'] = exam['questions']
+            
             # Send questions
             self.send_response(client_socket, MSG_START_ROOM_TEST_RES, {
                 'code': ERR_SUCCESS,
                 'message': 'Test started',
-                'data': {
-                    'room_id': room_id,
-                    'room_name': room_found['room_name'],
-                    'questions': formatted_questions,
-                    'duration_minutes': room_found['duration_minutes'],
-                    'server_timestamp': server_timestamp,  # Unix timestamp from C
-                    'start_time': room_found.get('start_time')  # ISO string for reference
-                }
+                'data': data
             })
             
         except Exception as e:
-            self.log(f"✗ Start room test error: {str(e)}")
+            self.log("✗ Start room test error: %s", e)
+            self.send_error(client_socket, ERR_INTERNAL, str(e))
+    
+    def _prefetch_within(self, room):
+        """
+        Seconds over which a joining student should spread its exam prefetch
+        
+        Returns 0 when the room is already running (start the test directly).
+        """
+        if room['status'] != 'waiting':
+            return 0
+        if room.get('scheduled_start'):
+            # Leave the second half of the wait as margin before the scheduled start
+            remaining = datetime.fromisoformat(room['scheduled_start']).timestamp() - time.time()
+            return max(0, min(self.prefetch_window, int(remaining / 2)))
+        return self.prefetch_window
+    
+    def handle_prefetch_exam(self, client_socket, session, request):
+        """Handle encrypted exam download for a joined room (before it starts)"""
+        try:
+            payload = request.get('payload', {})
+            room_id = payload.get('room_id')
+            
+            if not room_id:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Missing room_id")
+                return
+            
+            status = self.db.get_participant_status(room_id, session['user_id'])
+            if status is None:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "You haven't joined this room")
+                return
+            if status == 'submitted':
+                self.send_error(client_socket, ERR_BAD_REQUEST, "You have already completed this test")
+                return
+            
+            room = self.db.get_room_by_id(room_id)
+            if not room or room['status'] == 'ended':
+                self.send_error(client_socket, ERR_BAD_REQUEST, "Room not found or already ended")
+                return
+            
+            exam = self.prefetch.get(room_id)
+            if not exam or not exam['count']:
+                self.send_error(client_socket, ERR_BAD_REQUEST, "No questions available for this room yet")
+                return
+            
+            data = {
+                'room_id': room_id,
+                'exam_version': exam['version'],
+                'question_count': exam['count']
+            }
+            
+            # Skip the blob if the client already holds this version
+            if payload.get('exam_version') != exam['version']:
+                data['blob'] = exam['blob']
+            
+            # Late prefetch of a running room: the key is public to participants already
+            if room['status'] == 'active':
+                data['exam_key'] = exam['key']
+            
+            self.send_response(client_socket, MSG_PREFETCH_EXAM_RES, {
+                'code': ERR_SUCCESS,
+                'message': 'Exam prefetched',
+                'data': data
+            })
+            
+            self.log("[PREFETCH] %s - Room %s - %s (%d questions)", session['username'], room_id,
+                     'sent' if 'blob' in data else 'up to date', exam['count'], level=DEBUG)
+            
+        except Exception as e:
+            self.log("✗ Prefetch exam error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_submit_room_test(self, client_socket, session, request):
@@ -913,27 +1721,36 @@ class RequestHandlers:
             questions = self.db.get_room_questions(room_id)
             
             # Calculate score
-            score = 0
-            for answer in answers:
-                question = next((q for q in questions if q['id'] == answer.get('question_id')), None)
-                if question and question['correct_answer'] == answer.get('selected'):
-                    score += 1
-            
-            # Save result
-            result_id = self.db.save_test_result(
+            score = grade_answers(questions, answers)
+            
+            # Save result and mark the participant submitted, unless they already were
+            # (a second submit, or finalize_room grading them as the room ended)
+            result_id = self.db.save_room_result(
+                room_id=room_id,
                 student_id=user['id'],
                 score=score,
                 total_questions=len(questions),
                 answers_json=json.dumps(answers),
                 duration_seconds=0  # Could track actual duration
             )
+            if result_id is None:
+                self.send_error(client_socket, ERR_CONFLICT, "Test already submitted for this room")
+                return
             
-            # Update participant status
-            self.db.update_participant_status(room_id, user['id'], 'submitted')
+            if self.progress:
+                self.progress.on_submit(room_id, user['id'], count_answered(answers))
+            
+            if self.registry:
+                self.registry.set_status(client_socket, 'connected')
+                self.registry.leave_room(client_socket, room_id)
+                # The student's other devices stop their copy of the test
+                send_user_event(self.registry, user['id'], 'test_submitted',
+                                {'room_id': room_id, 'score': score, 'total': len(questions)}, exclude=client_socket)
             
             percentage = round(score / len(questions) * 100, 2) if questions else 0
             
-            self.log(f"✅ {session['username']} completed room {room_id} test: {score}/{len(questions)} ({percentage}%)")
+            self.log("✅ %s completed room %s test: %s/%d (%s%%)", session['username'], room_id, score, len(questions),
+                     percentage)
             
             # Send result
             self.send_response(client_socket, MSG_SUBMIT_ROOM_TEST_RES, {
@@ -948,7 +1765,7 @@ class RequestHandlers:
             })
             
         except Exception as e:
-            self.log(f"✗ Submit room test error: {str(e)}")
+            self.log("✗ Submit room test error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_auto_save(self, client_socket, session, request):
@@ -968,18 +1785,11 @@ class RequestHandlers:
             if not user:
                 return
             
-            # Save progress to database
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            # Save progress to database (overwrites previous save)
+            self.db.save_test_progress(room_id, user['id'], json.dumps(answers), is_final)
             
-            # Use REPLACE to overwrite previous saves
-            cursor.execute('''
-                REPLACE INTO test_progress (room_id, student_id, answers_json, is_final)
-                VALUES (?, ?, ?, ?)
-            ''', (room_id, user['id'], json.dumps(answers), is_final))
-            
-            conn.commit()
-            conn.close()
+            if self.progress:
+                self.progress.on_progress(room_id, user['id'], count_answered(answers))
             
             # Send ACK
             self.send_response(client_socket, MSG_AUTO_SAVE_RES, {
@@ -988,9 +1798,9 @@ class RequestHandlers:
                 'timestamp': self.proto.lib.py_get_unix_timestamp()
             })
             
-            self.log(f"[AUTO-SAVE] {session['username']} - Room {room_id} - {len(answers)} answers")
+            self.log("[AUTO-SAVE] %s - Room %s - %d answers", session['username'], room_id, len(answers), level=DEBUG)
             
         except Exception as e:
             # Don't send error - silent fail to not disrupt client
-            self.log(f"⚠️ Auto-save error (non-critical): {str(e)}")
+            self.log("⚠️ Auto-save error (non-critical): %s", e)
 
@@ -0,0 +1,123 @@
+"""
+Idempotency Cache
+Replays the original response when a client retries a mutating request
+"""
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+
+class _Entry:
+    """One request id: in flight until its response is stored"""
+    
+    __slots__ = ('done', 'response', 'stored_at')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.stored_at = None
+
+
+class IdempotencyCache:
+    """
+    Remember responses to mutating requests by (user, message type, request id)
+    
+    The first request with a key runs the handler; a retry with the same key
+    gets the stored response back. A retry that arrives while the first one is
+    still running waits for it instead of running the handler a second time.
+    Keys are per user (not per session token) so a retry after reconnecting
+    and logging in again is still recognised.
+    """
+    
+    def __init__(self, ttl_seconds=600, max_entries=10000, wait_timeout=30):
+        """
+        Initialize cache
+        
+        Args:
+            ttl_seconds: How long a stored response can be replayed
+            max_entries: Oldest responses are dropped beyond this
+            wait_timeout: Max seconds a duplicate waits for the in-flight original
+        """
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()  # {key: _Entry}, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def claim(self, key):
+        """
+        Claim a key before running its handler
+        
+        Returns:
+            tuple or None: (msg_type, payload) to replay, or None if the caller
+            now owns the key and must call complete() or release()
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                self._purge_expired()
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = _Entry()
+                    self.misses += 1
+                    return None
+                if entry.done.is_set() and entry.response is not None:
+                    self.hits += 1
+                    return entry.response
+            
+            # Original still running (or just released): wait, then look again
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not entry.done.wait(remaining):
+                raise TimeoutError("Original request is still being processed")
+    
+    def complete(self, key, msg_type, payload):
+        """Store the response for a claimed key and wake waiting duplicates"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.response = (msg_type, payload)
+            entry.stored_at = time.monotonic()
+            self._entries.move_to_end(key)
+            entry.done.set()
+            
+            # Drop the oldest stored responses; in-flight claims are skipped, not waited for
+            excess = len(self._entries) - self.max_entries
+            if excess > 0:
+                stale = list(islice((k for k, e in self._entries.items() if e.stored_at is not None), excess))
+                for stale_key in stale:
+                    del self._entries[stale_key]
+    
+    def release(self, key):
+        """Forget a claimed key without a response (handler failed, retry may run again)"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+    
+    def _purge_expired(self):
+        """Drop stored responses older than the TTL (lock must be held)"""
+        # Stored entries are in stored_at order (complete() moves them to the
+        # end); in-flight ones in between are skipped
+        now = time.monotonic()
+        expired = []
+        for key, entry in self._entries.items():
+            if entry.stored_at is None:
+                continue
+            if now - entry.stored_at < self.ttl:
+                break
+            expired.append(key)
+        for key in expired:
+            del self._entries[key]
+    
+    def get_stats(self):
+        """Get cache counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
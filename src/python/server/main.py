@@ -4,25 +4,108 @@ Main Entry Point for Test Server Application
 Django-style clean architecture with separated concerns
 
 Usage:
-    python src/python/server/main.py
+    python src/python/server/main.py                      # Server with monitoring window
+    python src/python/server/main.py --headless           # No GUI (customtkinter is not loaded)
+    python src/python/server/main.py --headless --config server.json --port 6000 --host 127.0.0.1
     python -m src.python.server.main
 """
+import argparse
+import json
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from server.server_gui import TestServerGUI
+from server.config import load_config
+from server.core import ServerCore
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TAP test server")
+    parser.add_argument('--headless', action='store_true', help="run without the monitoring window")
+    parser.add_argument('--config', help="JSON config file (see server/config.py for all settings)")
+    parser.add_argument('--print-config', action='store_true', help="print the effective config and exit")
+    
+    server = parser.add_argument_group('server')
+    server.add_argument('--host', help="bind address (default: all interfaces)")
+    server.add_argument('--port', type=int, help="listen port (default: 5555)")
+    server.add_argument('--send-timeout', type=int, help="seconds a send to one client may block")
+    server.add_argument('--shutdown-timeout', type=float, help="seconds to let running requests finish on exit")
+    server.add_argument('--capture', metavar='FILE', help="record received frames for tools/replay_capture.py")
+    
+    storage = parser.add_argument_group('storage')
+    storage.add_argument('--db', help="SQLite database (default: data/app.db)")
+    storage.add_argument('--sessions-db', help="session store (default: data/sessions.db)")
+    storage.add_argument('--slow-query-ms', type=float, help="time SQL from startup, logging statements this slow")
+    
+    auth = parser.add_argument_group('auth')
+    auth.add_argument('--hash-workers', type=int, help="password hash threads (default: half the CPU cores, at least 1)")
+    auth.add_argument('--hash-queue', type=int, help="logins queued before new ones are refused")
+    auth.add_argument('--session-hours', type=float, help="session lifetime")
+    
+    log = parser.add_argument_group('log')
+    log.add_argument('--log-file', help="log file (default: data/server.log)")
+    log.add_argument('--no-log-file', action='store_true', help="do not write a log file")
+    log.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], type=str.upper)
+    log.add_argument('--no-console', action='store_true', help="do not print the log on stdout")
+    return parser.parse_args(argv)
+
+
+def build_config(args):
+    """Defaults < config file < command line"""
+    config = load_config(args.config, {
+        ('server', 'host'): args.host,
+        ('server', 'port'): args.port,
+        ('server', 'send_timeout'): args.send_timeout,
+        ('server', 'shutdown_timeout'): args.shutdown_timeout,
+        ('server', 'capture'): args.capture,
+        ('database', 'path'): args.db,
+        ('database', 'sessions_path'): args.sessions_db,
+        ('database', 'slow_query_ms'): args.slow_query_ms,
+        ('auth', 'hash_workers'): args.hash_workers,
+        ('auth', 'hash_queue'): args.hash_queue,
+        ('auth', 'session_hours'): args.session_hours,
+        ('log', 'file'): args.log_file,
+        ('log', 'level'): args.log_level
+    })
+    if args.no_log_file:
+        config['log']['file'] = None
+    # The window has its own log view; the console is for headless runs
+    if args.no_console or not args.headless:
+        config['log']['console'] = False
+    return config
+
+
+def main(argv=None):
     """Start the server application"""
+    args = parse_args(argv)
+    try:
+        config = build_config(args)
+    except (OSError, ValueError) as e:
+        print(f"Invalid configuration: {e}", file=sys.stderr)
+        return 2
+    
+    if args.print_config:
+        print(json.dumps(config, indent=2))
+        return 0
+    
     print("Starting Test Server...")
-    app = TestServerGUI()
+    core = ServerCore(config)
+    
+    if args.headless:
+        try:
+            core.serve_forever()
+        except RuntimeError as e:
+            print(f"✗ {e}", file=sys.stderr)
+            return 1
+        return 0
+    
+    from server.server_gui import TestServerGUI
+    app = TestServerGUI(core)
     app.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
-
+    sys.exit(main())
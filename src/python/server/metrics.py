@@ -0,0 +1,189 @@
+"""
+Request Metrics
+Per message type counters and latency histograms for the dispatch path
+"""
+import threading
+import time
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_histogram import LatencyHistogram
+
+
+class RequestContext:
+    """One request on its way through the dispatcher"""
+    
+    __slots__ = ('client_socket', 'session', 'request', 'msg_type', 'receive_seconds',
+                 'db_seconds', 'send_seconds', 'bytes_out', 'failed')
+    
+    def __init__(self, client_socket, session, request):
+        self.client_socket = client_socket
+        self.session = session
+        self.request = request
+        self.msg_type = request['message_type']
+        self.receive_seconds = request.get('receive_seconds', 0.0)
+        self.db_seconds = 0.0
+        self.send_seconds = 0.0
+        self.bytes_out = 0
+        self.failed = False
+
+
+# Request being handled on this thread (set by the metrics middleware)
+_active = threading.local()
+
+
+def active_request():
+    """RequestContext of the current thread, or None outside a dispatched request"""
+    return getattr(_active, 'context', None)
+
+
+def note_send(seconds, bytes_sent, failed):
+    """Add one response send to the current request (no-op outside a request)"""
+    context = getattr(_active, 'context', None)
+    if context is not None:
+        context.send_seconds += seconds
+        context.bytes_out += max(0, bytes_sent)
+        context.failed = context.failed or failed
+
+
+class MessageStats:
+    """Counters and phase histograms of one message type"""
+    
+    PHASES = ('total', 'receive', 'db', 'send')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.histograms = {phase: LatencyHistogram() for phase in self.PHASES}
+    
+    def begin(self, bytes_in):
+        with self._lock:
+            self.in_flight += 1
+            self.bytes_in += bytes_in
+    
+    def end(self, context, total_seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self.count += 1
+            self.bytes_out += context.bytes_out
+            if context.failed:
+                self.errors += 1
+            self.histograms['total'].record(total_seconds)
+            self.histograms['receive'].record(context.receive_seconds)
+            self.histograms['db'].record(context.db_seconds)
+            self.histograms['send'].record(context.send_seconds)
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'latency': {phase: histogram.summary() for phase, histogram in self.histograms.items()}
+            }
+
+
+class ServerMetrics:
+    """
+    Request metrics of the whole server, keyed by message type
+    
+    Phases of a request:
+        receive  payload copy and JSON decode once the bytes arrived (time
+                 spent waiting for the client is idle, not latency)
+        db       time inside DatabaseManager calls (TimedDatabase)
+        send     response encoding and sending
+        total    receive + everything the handler did, including db and send
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_type = {}
+        self.started_at = time.time()
+    
+    def stats_for(self, msg_type):
+        stats = self._by_type.get(msg_type)
+        if stats is None:
+            with self._lock:
+                stats = self._by_type.setdefault(msg_type, MessageStats())
+        return stats
+    
+    def middleware(self, context, call_next):
+        """Dispatcher middleware: times the rest of the chain and the handler"""
+        stats = self.stats_for(context.msg_type)
+        stats.begin(context.request.get('bytes_received', 0))
+        previous = getattr(_active, 'context', None)
+        _active.context = context
+        started = time.perf_counter()
+        try:
+            return call_next()
+        except Exception:
+            context.failed = True
+            raise
+        finally:
+            _active.context = previous
+            stats.end(context, time.perf_counter() - started + context.receive_seconds)
+    
+    def in_flight(self):
+        """Requests currently inside a handler"""
+        with self._lock:
+            items = list(self._by_type.values())
+        return sum(stats.in_flight for stats in items)
+    
+    def snapshot(self, name_of=str):
+        """
+        All message types seen so far
+        
+        Args:
+            name_of: Maps a message type code to its display name
+        
+        Returns:
+            dict: {'uptime_s', 'requests', 'errors', 'message_types': {name: stats}}
+        """
+        with self._lock:
+            items = list(self._by_type.items())
+        
+        message_types = {name_of(msg_type): stats.snapshot() for msg_type, stats in sorted(items)}
+        return {
+            'uptime_s': int(time.time() - self.started_at),
+            'requests': sum(s['count'] for s in message_types.values()),
+            'errors': sum(s['errors'] for s in message_types.values()),
+            'message_types': message_types
+        }
+
+
+class TimedDatabase:
+    """
+    DatabaseManager proxy that adds the time of every call to the current request
+    
+    Calls made outside a dispatched request (scheduler, startup) pass
+    straight through.
+    """
+    
+    def __init__(self, db):
+        self._db = db
+    
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+        
+        def timed(*args, **kwargs):
+            context = getattr(_active, 'context', None)
+            if context is None:
+                return attr(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                context.db_seconds += time.perf_counter() - started
+        
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, timed)
+        return timed
@@ -0,0 +1,311 @@
+"""
+Runtime Profiler
+CPU stack sampling and tracemalloc snapshots, switched on over the protocol
+
+Nothing runs until an admin asks for it: the sampler is a thread that
+exists only while a profile is being taken, and tracemalloc is started by
+the first memory snapshot and stopped again on request. Results are
+written under the profile directory:
+
+    cpu-<time>.folded       collapsed stacks, one "frame;frame;... count"
+                            line per stack (flamegraph.pl, speedscope)
+    mem-<time>.tracemalloc  tracemalloc.Snapshot.dump() (load() it to dig
+                            deeper than the top allocators returned)
+"""
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Innermost Python function of a thread that is blocked, not working (only
+# Python frames are visible: a thread in recv() shows up in receive_message)
+IDLE_LEAVES = frozenset({
+    'receive_message', '_run_c_accept_loop', 'wait', 'wait_for', '_wait_for_tstate_lock',
+    'select', 'accept'
+})
+
+
+def _stamp():
+    return datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+def _thread_group(name):
+    """'Dummy-12' -> 'Dummy': handler threads are one group in the flamegraph"""
+    return re.sub(r'[-_ ]?\d+$', '', name) or name
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler over all Python threads (sys._current_frames)
+    
+    The sampler holds the GIL while it walks the stacks, so the interval is
+    stretched when a pass gets expensive (thousands of connection threads):
+    sampling never takes more than about 1/(1 + backoff) of the time.
+    """
+    
+    def __init__(self, output_dir, backoff=4):
+        self.output_dir = output_dir
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = Counter()  # {(thread group, frame, ...): samples}
+        self._labels = {}  # {code object: 'function (file:line)'}
+        self._result = None  # Summary of the last finished profile, until collected
+        self._error = None
+        self.interval = None
+        self.started = None
+        self.deadline = None
+        self.include_idle = False
+        self.samples = 0
+        self.sample_time = 0.0
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, interval=0.01, max_seconds=60, include_idle=False):
+        """
+        Start sampling every interval seconds; stops by itself after max_seconds
+        
+        Raises:
+            RuntimeError: A profile is already running
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("CPU profile already running")
+            self._stacks = Counter()
+            self._result = None
+            self._error = None
+            self._stop.clear()
+            self.interval = interval
+            self.include_idle = include_idle
+            self.samples = 0
+            self.sample_time = 0.0
+            self.started = time.monotonic()
+            self.deadline = self.started + max_seconds
+            self._thread = threading.Thread(target=self._run, name='cpu-profiler', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """
+        Stop sampling, write the folded stacks and return the summary
+        
+        Also returns the summary of a profile that already ran out its
+        max_seconds, once.
+        
+        Raises:
+            RuntimeError: No profile running or left to collect
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                raise RuntimeError("No CPU profile running")
+            self._stop.set()
+            thread.join()
+            self._thread = None
+            if self._error is not None:
+                raise RuntimeError(f"Cannot write CPU profile: {self._error}")
+            result, self._result = self._result, None
+            return result
+    
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        names_at = 0.0
+        while not self._stop.is_set():
+            began = time.perf_counter()
+            if began - names_at > 1.0:
+                names = {t.ident: _thread_group(t.name) for t in threading.enumerate()}
+                names_at = began
+            
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not self.include_idle and frame.f_code.co_name in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'handler'))  # Threads the C layer started
+                stack.reverse()
+                self._stacks[tuple(stack)] += 1
+            
+            self.samples += 1
+            cost = time.perf_counter() - began
+            self.sample_time += cost
+            if time.monotonic() >= self.deadline:
+                break
+            self._stop.wait(max(self.interval, cost * self.backoff))
+        
+        try:
+            self._result = self._finish()
+        except OSError as e:
+            self._error = e
+    
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+    
+    def _finish(self, top=20):
+        duration = time.monotonic() - self.started
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"cpu-{_stamp()}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{';'.join(frame.replace(';', ',') for frame in stack)} {count}\n")
+        
+        stack_samples = sum(self._stacks.values())
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self._stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack[1:]):
+                inclusive[frame] += count
+        
+        def ranked(counter):
+            return [{'frame': frame, 'samples': count, 'percent': round(100 * count / stack_samples, 1)}
+                    for frame, count in counter.most_common(top)]
+        
+        return {
+            'path': path,
+            'duration_s': round(duration, 2),
+            'samples': self.samples,
+            'rate_hz': round(self.samples / duration, 1) if duration else None,
+            'overhead_percent': round(100 * self.sample_time / duration, 1) if duration else None,
+            'stacks': len(self._stacks),
+            'thread_samples': stack_samples,
+            'include_idle': self.include_idle,
+            'top_self': ranked(own),
+            'top_inclusive': ranked(inclusive)
+        }
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots with the difference to the previous one"""
+    
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._previous = None
+        self.snapshots = 0
+    
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+    
+    def snapshot(self, frames=10, top=20):
+        """
+        Take a snapshot (the first one starts tracing with `frames` frames per allocation)
+        
+        Only memory allocated after tracing started is seen, so the first
+        snapshot is mostly a baseline; the diff of later ones shows growth.
+        
+        Returns:
+            dict: Traced memory, top allocators by line, top growth since the last snapshot
+        """
+        with self._lock:
+            started = False
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                self._previous = None
+                started = True
+            
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+                tracemalloc.Filter(False, '<unknown>')
+            ))
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"mem-{_stamp()}-{self.snapshots + 1}.tracemalloc")
+            snapshot.dump(path)
+            self.snapshots += 1
+            
+            current, peak = tracemalloc.get_traced_memory()
+            result = {
+                'path': path,
+                'started_tracing': started,
+                'frames': tracemalloc.get_traceback_limit(),
+                'traced_kb': round(current / 1024, 1),
+                'peak_kb': round(peak / 1024, 1),
+                'tracemalloc_kb': round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+                'top_allocators': [
+                    {'where': self._where(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in snapshot.statistics('lineno')[:top]
+                ],
+                'top_growth': None
+            }
+            if self._previous is not None:
+                result['top_growth'] = [
+                    {'where': self._where(diff.traceback), 'size_kb': round(diff.size / 1024, 1),
+                     'size_diff_kb': round(diff.size_diff / 1024, 1), 'count_diff': diff.count_diff}
+                    for diff in snapshot.compare_to(self._previous, 'lineno')[:top]
+                ]
+            self._previous = snapshot
+            return result
+    
+    def stop(self):
+        """Stop tracing and free its memory (False if it was not tracing)"""
+        with self._lock:
+            self._previous = None
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            return True
+    
+    @staticmethod
+    def _where(traceback):
+        frame = traceback[0]
+        return f"{frame.filename}:{frame.lineno}"
+
+
+class RuntimeProfiler:
+    """
+    Profiling switched on over the protocol (PROFILE_*/MEMORY_SNAPSHOT requests)
+    
+    Only teachers reach the handlers, and anyone may register as one, so
+    profiling is opt-in: only the usernames listed in `admins` may use it.
+    """
+    
+    def __init__(self, output_dir='data/profiles', admins=(), enabled=True, max_seconds=300):
+        """
+        Initialize profiler
+        
+        Args:
+            output_dir: Directory profiles and snapshots are written to
+            admins: Usernames allowed to profile (empty: nobody)
+            enabled: False refuses every profiling request
+            max_seconds: Longest CPU profile a request may ask for
+        """
+        self.enabled = enabled
+        self.admins = frozenset(admins or ())
+        self.max_seconds = max_seconds
+        self.cpu = SamplingProfiler(output_dir)
+        self.memory = MemoryProfiler(output_dir)
+    
+    def allows(self, username):
+        return self.enabled and username in self.admins
+    
+    def shutdown(self):
+        """Stop whatever is still running (server shutdown)"""
+        if self.cpu.running:
+            try:
+                self.cpu.stop()
+            except RuntimeError:
+                pass
+        self.memory.stop()
+    
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'cpu_running': self.cpu.running,
+            'memory_tracing': self.memory.tracing,
+            'snapshots': self.memory.snapshots
+        }
@@ -0,0 +1,268 @@
+"""
+Progress Aggregator
+Live per-room counters pushed to the owning teacher as coalesced snapshots
+"""
+import threading
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import MSG_ROOM_PROGRESS
+
+
+def count_answered(answers):
+    """Number of answers with an option selected"""
+    return sum(1 for a in answers if a.get('selected', -1) != -1)
+
+
+class _RoomCounters:
+    """Counters for one room (guarded by the aggregator lock)"""
+    
+    __slots__ = ('room_id', 'teacher_id', 'room_status', 'total_questions',
+                 'students', 'answered', 'counts', 'histogram')
+    
+    def __init__(self, room_id, teacher_id, room_status, total_questions):
+        self.room_id = room_id
+        self.teacher_id = teacher_id
+        self.room_status = room_status
+        self.total_questions = total_questions
+        self.students = {}  # {student_id: 'joined' | 'testing' | 'submitted'}
+        self.answered = {}  # {student_id: answered count}
+        self.counts = {'joined': 0, 'testing': 0, 'submitted': 0}
+        self.histogram = [0] * (total_questions + 1)  # [students with i answers]
+    
+    def set_status(self, student_id, status):
+        """Move a student to status (idempotent; submitted is final)"""
+        old = self.students.get(student_id)
+        if old == status or old == 'submitted':
+            return False
+        if old is None:
+            self.answered[student_id] = 0
+            self.histogram[0] += 1
+        else:
+            self.counts[old] -= 1
+        self.students[student_id] = status
+        self.counts[status] += 1
+        return True
+    
+    def set_answered(self, student_id, answered):
+        """Move a student to another histogram bucket (idempotent)"""
+        if student_id not in self.students:
+            self.set_status(student_id, 'testing')
+        answered = max(0, min(answered, self.total_questions))
+        old = self.answered[student_id]
+        if old == answered:
+            return False
+        self.histogram[old] -= 1
+        self.histogram[answered] += 1
+        self.answered[student_id] = answered
+        return True
+    
+    def snapshot(self):
+        participants = len(self.students)
+        total_answered = sum(i * n for i, n in enumerate(self.histogram))
+        return {
+            'room_id': self.room_id,
+            'room_status': self.room_status,
+            'total_questions': self.total_questions,
+            'participants': participants,
+            'joined': self.counts['joined'],
+            'testing': self.counts['testing'],
+            'submitted': self.counts['submitted'],
+            'answered_histogram': list(self.histogram),
+            'avg_answered': round(total_answered / participants, 2) if participants else 0
+        }
+
+
+class ProgressAggregator:
+    """
+    Class progress feed for teachers
+    
+    Request handlers report join/start/auto-save/submit events; each event
+    updates the room's counters in O(1) and marks the room dirty. A flusher
+    thread sends one MSG_ROOM_PROGRESS snapshot per dirty room to the owning
+    teacher's sockets every interval seconds, so a class of any size costs
+    the teacher at most one message per room per interval.
+    
+    Counters are loaded from the database the first time a room is touched.
+    Events set state instead of incrementing it, so an event that races the
+    initial load is not counted twice.
+    """
+    
+    def __init__(self, db, proto, logger, interval=2.0):
+        """
+        Initialize aggregator
+        
+        Args:
+            db: Database instance
+            proto: ProtocolWrapper instance (for pushes)
+            logger: Callback function for logging
+            interval: Minimum seconds between snapshots of one room
+        """
+        self.db = db
+        self.proto = proto
+        self.log = logger
+        self.interval = interval
+        self._rooms = {}  # {room_id: _RoomCounters}
+        self._dirty = set()
+        self._watchers = {}  # {teacher_id: set(socket)}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.pushed = 0
+    
+    def start(self):
+        """Start the flusher thread"""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name="progress-feed", daemon=True)
+        self._thread.start()
+        self.log("[PROGRESS] Live progress feed started (%ss interval)", self.interval)
+    
+    def stop(self):
+        """Stop the flusher thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    # ==================== Teacher sockets ====================
+    
+    def watch_teacher(self, teacher_id, client_socket):
+        """Send progress of the teacher's rooms to client_socket"""
+        with self._lock:
+            self._watchers.setdefault(teacher_id, set()).add(client_socket)
+            # Catch the new connection up on rooms already being tracked
+            for room_id, room in self._rooms.items():
+                if room.teacher_id == teacher_id:
+                    self._dirty.add(room_id)
+    
+    def unwatch(self, client_socket):
+        """Stop sending to client_socket (on disconnect)"""
+        with self._lock:
+            for teacher_id, sockets in list(self._watchers.items()):
+                sockets.discard(client_socket)
+                if not sockets:
+                    del self._watchers[teacher_id]
+    
+    # ==================== Events ====================
+    
+    def _load(self, room_id):
+        """Build counters from the database (outside the lock)"""
+        room = self.db.get_room_by_id(room_id)
+        if not room:
+            return None
+        
+        counters = _RoomCounters(room_id, room['teacher_id'], room['status'], room['num_questions'])
+        progress = self.db.get_room_progress(room_id)
+        for p in self.db.get_room_participants(room_id):
+            counters.set_status(p['student_id'], p['status'])
+            if p['student_id'] in progress:
+                counters.set_answered(p['student_id'], count_answered(progress[p['student_id']]))
+        return counters
+    
+    def _update(self, room_id, apply):
+        """Apply a change to a room's counters and mark it dirty if it changed"""
+        with self._lock:
+            counters = self._rooms.get(room_id)
+        
+        if counters is None:
+            loaded = self._load(room_id)
+            if loaded is None:
+                return
+            with self._lock:
+                counters = self._rooms.setdefault(room_id, loaded)
+        
+        with self._lock:
+            if apply(counters):
+                self._dirty.add(room_id)
+    
+    def on_join(self, room_id, student_id):
+        """Student joined a room"""
+        self._update(room_id, lambda c: c.set_status(student_id, 'joined'))
+    
+    def on_start(self, room_id, student_id):
+        """Student opened the test"""
+        self._update(room_id, lambda c: c.set_status(student_id, 'testing'))
+    
+    def on_progress(self, room_id, student_id, answered):
+        """Student auto-saved answered questions"""
+        self._update(room_id, lambda c: c.set_answered(student_id, answered))
+    
+    def on_submit(self, room_id, student_id, answered):
+        """Student submitted"""
+        def apply(counters):
+            changed = counters.set_answered(student_id, answered)
+            return counters.set_status(student_id, 'submitted') or changed
+        self._update(room_id, apply)
+    
+    def invalidate(self, room_id):
+        """
+        Reload a room from the database and push it
+        
+        Used when the room itself changes (started, ended, finalized), which
+        touches many participants at once.
+        """
+        counters = self._load(room_id)
+        with self._lock:
+            if counters is None:
+                self._rooms.pop(room_id, None)
+                self._dirty.discard(room_id)
+                return
+            self._rooms[room_id] = counters
+            self._dirty.add(room_id)
+    
+    def get_snapshot(self, room_id):
+        """
+        Current snapshot of a room (loads it if not tracked yet)
+        
+        Returns:
+            dict or None: Snapshot, or None if the room does not exist
+        """
+        self._update(room_id, lambda c: False)
+        with self._lock:
+            counters = self._rooms.get(room_id)
+            return counters.snapshot() if counters else None
+    
+    # ==================== Flushing ====================
+    
+    def flush(self):
+        """
+        Send one snapshot per dirty room to its teacher
+        
+        Returns:
+            int: Number of messages sent
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            outgoing = []
+            for room_id in dirty:
+                counters = self._rooms.get(room_id)
+                if counters is None:
+                    continue
+                sockets = list(self._watchers.get(counters.teacher_id, ()))
+                if sockets:
+                    outgoing.append((sockets, counters.snapshot()))
+                # Ended rooms get no more events: free them after the last push
+                if counters.room_status == 'ended':
+                    del self._rooms[room_id]
+        
+        sent = 0
+        for sockets, snapshot in outgoing:
+            for client_socket in sockets:
+                try:
+                    self.proto.send_message(client_socket, MSG_ROOM_PROGRESS, snapshot, use_session=False)
+                    sent += 1
+                except RuntimeError:
+                    pass  # Disconnecting; the client handler unwatches it
+        
+        self.pushed += sent
+        return sent
+    
+    def _flush_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self.log("✗ Progress feed error: %s", e)
@@ -34,7 +34,7 @@ class RoomManager:
         try:
             self.proto.send_message(client_socket, msg_type, payload, use_session=False)
         except Exception as e:
-            self.log(f"✗ Send error: {str(e)}")
+            self.log("✗ Send error: %s", e)
     
     def send_error(self, client_socket, error_code, message):
         """Send error response"""
@@ -72,10 +72,10 @@ class RoomManager:
                 }
             })
             
-            self.log(f"[OK] {session['username']} created room '{room_name}' (Code: {result['room_code']})")
+            self.log("[OK] %s created room '%s' (Code: %s)", session['username'], room_name, result['room_code'])
             
         except Exception as e:
-            self.log(f"✗ Create room error: {str(e)}")
+            self.log("✗ Create room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_rooms(self, client_socket, session):
@@ -90,7 +90,7 @@ class RoomManager:
             })
             
         except Exception as e:
-            self.log(f"✗ Get rooms error: {str(e)}")
+            self.log("✗ Get rooms error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_start_room(self, client_socket, request):
@@ -110,13 +110,13 @@ class RoomManager:
                     'code': ERR_SUCCESS,
                     'message': 'Test started successfully'
                 })
-                self.log(f"[OK] Test room {room_id} started")
+                self.log("[OK] Test room %s started", room_id)
             else:
                 self.send_error(client_socket, ERR_BAD_REQUEST, 
                               "Cannot start test (already started or not found)")
                 
         except Exception as e:
-            self.log(f"✗ Start room error: {str(e)}")
+            self.log("✗ Start room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_end_room(self, client_socket, request):
@@ -136,13 +136,13 @@ class RoomManager:
                     'code': ERR_SUCCESS,
                     'message': 'Test ended successfully'
                 })
-                self.log(f"[OK] Test room {room_id} ended")
+                self.log("[OK] Test room %s ended", room_id)
             else:
                 self.send_error(client_socket, ERR_BAD_REQUEST,
                               "Cannot end test (not active or not found)")
                 
         except Exception as e:
-            self.log(f"✗ End room error: {str(e)}")
+            self.log("✗ End room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_join_room(self, client_socket, session, request):
@@ -164,12 +164,12 @@ class RoomManager:
                     'message': 'Joined room successfully',
                     'data': {'room': room}
                 })
-                self.log(f"[OK] {session['username']} joined room '{room['room_name']}' ({room_code})")
+                self.log("[OK] %s joined room '%s' (%s)", session['username'], room['room_name'], room_code)
             else:
                 self.send_error(client_socket, ERR_BAD_REQUEST, result['error'])
                 
         except Exception as e:
-            self.log(f"✗ Join room error: {str(e)}")
+            self.log("✗ Join room error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
     
     def handle_get_student_rooms(self, client_socket, session):
@@ -184,6 +184,6 @@ class RoomManager:
             })
             
         except Exception as e:
-            self.log(f"✗ Get student rooms error: {str(e)}")
+            self.log("✗ Get student rooms error: %s", e)
             self.send_error(client_socket, ERR_INTERNAL, str(e))
 
@@ -0,0 +1,245 @@
+"""
+Room Scheduler
+Starts scheduled rooms and ends active rooms at their deadline on one timer thread
+"""
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import MSG_ROOM_STATUS
+from .events import publish_room_event
+
+
+def room_deadline(room):
+    """
+    Unix time when a room's test time is over
+    
+    Args:
+        room: Dict with 'start_time' (ISO string) and 'duration_minutes'
+    
+    Returns:
+        int or None: Deadline, or None if the room has not started
+    """
+    if not room.get('start_time'):
+        return None
+    start = datetime.fromisoformat(room['start_time']).timestamp()
+    return int(start + room['duration_minutes'] * 60)
+
+
+def grade_answers(questions, answers):
+    """
+    Count correct answers
+    
+    A question answered more than once counts once, with its last answer
+    (the score can never exceed the number of questions).
+    
+    Args:
+        questions: Room questions with 'id' and 'correct_answer'
+        answers: [{'question_id', 'selected'}]
+    
+    Returns:
+        int: Score
+    """
+    correct = {q['id']: q['correct_answer'] for q in questions}
+    selected = {}
+    for a in answers:
+        question_id = a.get('question_id')
+        if isinstance(question_id, int) and question_id in correct:
+            selected[question_id] = a.get('selected')
+    return sum(1 for question_id, choice in selected.items() if correct[question_id] == choice)
+
+
+class RoomScheduler:
+    """
+    Server-side room lifecycle timer
+    
+    Keeps a min-heap of (time, action, room) events and sleeps until the
+    earliest one, so any number of rooms costs one thread. Events are not
+    removed when a teacher acts first; the room is re-read when an event
+    fires and stale events are ignored.
+    """
+    
+    def __init__(self, db, proto, logger, grace_seconds=30, progress=None, prefetch=None):
+        """
+        Initialize scheduler
+        
+        Args:
+            db: Database instance
+            proto: ProtocolWrapper instance (for room broadcasts)
+            logger: Callback function for logging
+            grace_seconds: Extra time after the deadline for in-flight submissions
+            progress: ProgressAggregator to refresh when a room starts or ends
+            prefetch: ExamPrefetch whose key is released in the start broadcast
+        """
+        self.db = db
+        self.proto = proto
+        self.log = logger
+        self.grace_seconds = grace_seconds
+        self.progress = progress
+        self.prefetch = prefetch
+        self._heap = []  # [(when, seq, action, room_id)]
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+    
+    def start(self):
+        """Load pending rooms from the database and start the timer thread"""
+        if self._running:
+            return
+        
+        with self._cond:
+            self._heap = []  # Database is the source of truth; drop events queued before start
+        
+        for room in self.db.get_scheduled_rooms():
+            if room['status'] == 'waiting':
+                when = datetime.fromisoformat(room['scheduled_start']).timestamp()
+                self.schedule_start(room['id'], when)
+            else:
+                self.schedule_end(room['id'], room_deadline(room))
+        
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="room-scheduler", daemon=True)
+        self._thread.start()
+        self.log("[SCHEDULER] Started with %s pending room events", len(self._heap))
+    
+    def stop(self):
+        """Stop the timer thread (pending events stay in the database)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def _push(self, when, action, room_id):
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._seq), action, room_id))
+            self._cond.notify()
+    
+    def schedule_start(self, room_id, when):
+        """Start a waiting room at Unix time when"""
+        self._push(when, 'start', room_id)
+    
+    def schedule_end(self, room_id, deadline):
+        """End an active room at deadline + grace period"""
+        if deadline is not None:
+            self._push(deadline + self.grace_seconds, 'end', room_id)
+    
+    def room_started(self, room_id):
+        """
+        Schedule the end of a room that was just started
+        
+        Returns:
+            int or None: Room deadline (Unix time)
+        """
+        room = self.db.get_room_by_id(room_id)
+        deadline = room_deadline(room) if room else None
+        self.schedule_end(room_id, deadline)
+        return deadline
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._running:
+                    return
+                _, _, action, room_id = heapq.heappop(self._heap)
+            
+            try:
+                if action == 'start':
+                    self._auto_start(room_id)
+                else:
+                    self._auto_end(room_id)
+            except Exception as e:
+                self.log("✗ Scheduler error (room %s, %s): %s", room_id, action, e)
+    
+    def _auto_start(self, room_id):
+        room = self.db.get_room_by_id(room_id)
+        if not room or room['status'] != 'waiting' or not room.get('scheduled_start'):
+            return  # Started by hand, or deleted
+        
+        question_count = len(self.db.get_room_questions(room_id))
+        if question_count < room['num_questions']:
+            self.log("⚠️ [SCHEDULER] Room %s not started: needs %s questions, has %s", room_id,
+                     room['num_questions'], question_count)
+            return
+        
+        if not self.db.start_test_room(room_id):
+            return
+        
+        deadline = self.room_started(room_id)
+        self.log("[SCHEDULER] Room %s ('%s') started automatically", room_id, room['room_name'])
+        
+        status = {
+            'room_id': room_id,
+            'status': 'in_progress',
+            'action': 'started',
+            'deadline': deadline
+        }
+        if self.prefetch:
+            exam = self.prefetch.get(room_id)
+            status['exam_key'] = exam['key']
+            status['exam_version'] = exam['version']
+        
+        num_notified = self.proto.broadcast_to_room(room_id, MSG_ROOM_STATUS, status)
+        self.log("[BROADCAST] Notified %s students in room %s", num_notified, room_id)
+        publish_room_event(self.proto, room, 'room_started', deadline=deadline)
+    
+        if self.progress:
+            self.progress.invalidate(room_id)
+    
+    def _auto_end(self, room_id):
+        result = self.db.end_test_room(room_id, force=True)
+        if not result['success']:
+            return  # Already ended by the teacher
+        
+        finalized = self.finalize_room(room_id)
+        self.log("[SCHEDULER] Room %s ended at deadline (%s unsubmitted tests finalized)", room_id, finalized)
+        
+        num_notified = self.proto.broadcast_to_room(room_id, MSG_ROOM_STATUS, {
+            'room_id': room_id,
+            'status': 'ended',
+            'action': 'ended'
+        })
+        self.log("[BROADCAST] Notified %s students in room %s", num_notified, room_id)
+        
+        room = self.db.get_room_by_id(room_id)
+        if room:
+            publish_room_event(self.proto, room, 'room_ended', finalized=finalized)
+        
+        if self.progress:
+            self.progress.invalidate(room_id)
+        if self.prefetch:
+            self.prefetch.discard(room_id)
+    
+    def finalize_room(self, room_id):
+        """
+        Grade the last auto-saved answers of everyone who did not submit
+        
+        Returns:
+            int: Number of results saved
+        """
+        pending = self.db.get_unsubmitted_progress(room_id)
+        if not pending:
+            return 0
+        
+        questions = self.db.get_room_questions(room_id)
+        results = [{
+            'student_id': p['student_id'],
+            'score': grade_answers(questions, p['answers']),
+            'total_questions': len(questions),
+            'answers': p['answers']
+        } for p in pending]
+        return self.db.save_final_results(room_id, results)
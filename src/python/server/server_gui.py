@@ -1,83 +1,61 @@
 """
 Server GUI Module
-Provides the graphical interface for the test server
+Monitoring front end attached to a ServerCore
 """
 import customtkinter as ctk
-import threading
-import ctypes
-from datetime import datetime
 import sys
 import os
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from protocol_wrapper import (
-    ProtocolWrapper, ClientContext, ServerContext, 
-    ClientHandlerFunc, socket_type
-)
-from auth import AuthManager, SessionManager
-from database import Database
-from server.handlers import RequestHandlers
-from server.room_manager import RoomManager
-from server.client_handler import ClientHandler
+from protocol_wrapper import get_message_type_name
+from server.core import ServerCore
+from server.event_log import LEVELS, LEVEL_NAMES, format_line
 
 
 class TestServerGUI(ctk.CTk):
     """Test Application Server GUI"""
     
-    def __init__(self):
+    def __init__(self, core=None):
+        """
+        Initialize window
+        
+        Args:
+            core: ServerCore to show and control (None: one with the default config)
+        """
         super().__init__()
         
-        # Initialize core components
-        self.proto = ProtocolWrapper()
-        self.proto.init_network()
+        self.core = core or ServerCore()
         
-        self.db = Database("data/app.db")
-        self.auth = AuthManager()
-        self.session_mgr = SessionManager()
+        # Shortcuts to the core services the panels read
+        self.db = self.core.db
+        self.hash_pool = self.core.hash_pool
+        self.metrics = self.core.metrics
+        self.clients = self.core.clients
+        self.event_log = self.core.event_log
         
-        # Server state
-        self.server_socket = None
-        self.server_running = False
-        self.clients = {}
-        self.server_context = None
-        self.server_thread = None
-        self.broadcast_manager = None  # Will be initialized in start_server if needed
+        # The window shows the last lines of the event log (flush_log_view)
+        self.log_position = 0
+        self.log_view_lines = 1000
         
-        # Setup GUI FIRST (so append_log works)
         self.setup_gui()
         
-        # NOW initialize handlers (they can use append_log)
-        self.handlers = RequestHandlers(
-            self.proto, self.db, self.auth,
-            self.session_mgr, self.append_log
-        )
-        self.handlers.load_questions()
-        
-        # Initialize room manager
-        self.room_mgr = RoomManager(self.proto, self.db, self.append_log)
-        
-        # Initialize client handler
-        self.client_handler = ClientHandler(
-            self.proto, self.session_mgr, self.handlers,
-            self.room_mgr, self.append_log, self.clients,
-            {
-                'students_list': self.update_students_list,
-                'statistics': self.update_statistics
-            }
-        )
+        self.core.on('students_list', self.update_students_list)
+        self.core.on('statistics', self.update_statistics)
         
         # Set window close handler
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Start server automatically
-        self.after(100, lambda: self.start_server(5555))
+        self.after(100, self.start_server)
+        self.after(2000, self.update_metrics)
+        self.after(100, self.flush_log_view)
         
     def setup_gui(self):
         """Setup the GUI layout"""
         self.title("Test Application Server (TAP Protocol v1.0)")
-        self.geometry("1000x700")
+        self.geometry("1100x820")
         
         # Configure grid
         self.grid_columnconfigure(0, weight=1)
@@ -106,11 +84,24 @@ class TestServerGUI(ctk.CTk):
         left_panel = ctk.CTkFrame(self)
         left_panel.grid(row=1, column=0, sticky="nsew", padx=(10, 5), pady=10)
         
+        log_header = ctk.CTkFrame(left_panel, fg_color="transparent")
+        log_header.pack(fill="x", padx=10, pady=10)
+        
         ctk.CTkLabel(
-            left_panel,
+            log_header,
             text="📋 Server Log",
             font=("Arial", 16, "bold")
-        ).pack(pady=10)
+        ).pack(side="left")
+        
+        level_menu = ctk.CTkOptionMenu(
+            log_header,
+            values=list(LEVELS),
+            command=self.set_log_level,
+            width=110
+        )
+        level_menu.set(LEVEL_NAMES[self.event_log.level])
+        level_menu.pack(side="right")
+        ctk.CTkLabel(log_header, text="Level:").pack(side="right", padx=5)
         
         self.log_text = ctk.CTkTextbox(left_panel, font=("Consolas", 10))
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
@@ -134,6 +125,20 @@ class TestServerGUI(ctk.CTk):
         self.stats_text.pack(fill="x", padx=10, pady=5)
         self.stats_text.configure(state="disabled")
         
+        # Request latency per message type
+        metrics_frame = ctk.CTkFrame(right_panel)
+        metrics_frame.pack(fill="x", padx=10, pady=10)
+        
+        ctk.CTkLabel(
+            metrics_frame,
+            text="⏱️ Request Latency (ms)",
+            font=("Arial", 14, "bold")
+        ).pack(pady=5)
+        
+        self.metrics_text = ctk.CTkTextbox(metrics_frame, height=160, font=("Consolas", 10))
+        self.metrics_text.pack(fill="x", padx=10, pady=5)
+        self.metrics_text.configure(state="disabled")
+        
         # Connected Users
         users_frame = ctk.CTkFrame(right_panel)
         users_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -170,95 +175,63 @@ class TestServerGUI(ctk.CTk):
             hover_color="darkgray"
         ).pack(side="left", padx=10, pady=10)
         
+        self.sql_timing_button = ctk.CTkButton(
+            controls,
+            text=f"🐢 SQL Timing: {'On' if self.db.instrumentation.enabled else 'Off'}",
+            command=self.toggle_sql_timing,
+            height=40,
+            width=170
+        )
+        self.sql_timing_button.pack(side="left", padx=10, pady=10)
+        
         # Initialize displays
         self.update_statistics()
         self.update_students_list()
     
-    def start_server(self, port=5555):
-        """Start the server using C accept loop"""
-        if self.server_running:
+    def start_server(self):
+        """Start the core (listening on the configured address)"""
+        if self.core.running:
             return
         
         try:
-            # Create server socket
-            self.server_socket = self.proto.create_server(port)
-            self.server_running = True
-            
-            # Initialize broadcast manager (C core)
-            self.proto.broadcast_init()
-            self.append_log("[BROADCAST] Manager initialized")
-            
-            # Create C callback for client handler
-            @ClientHandlerFunc
-            def c_client_handler(ctx_ptr):
-                """C callback wrapper for Python client handler"""
-                try:
-                    # Extract client socket from context
-                    ctx = ctx_ptr.contents
-                    client_socket = ctx.client_socket
-                    
-                    # Call Python handler
-                    self.client_handler.handle_client(client_socket)
-                    
-                except Exception as e:
-                    self.append_log(f"✗ Handler error: {str(e)}")
-                
-                return None
-            
-            # Keep reference to prevent garbage collection
-            self._c_handler_ref = c_client_handler
-            
-            # Initialize C server context
-            self.server_context = ServerContext()
-            result = self.proto.lib.py_server_context_init(
-                ctypes.byref(self.server_context),
-                self.server_socket,
-                c_client_handler,
-                None  # user_data
-            )
-            
-            if result != 0:
-                raise RuntimeError("Failed to initialize server context")
-            
-            # Start C accept loop in Python thread
-            # (C will spawn C threads for each client)
-            self.server_thread = threading.Thread(
-                target=self._run_c_accept_loop,
-                daemon=True
-            )
-            self.server_thread.start()
-            
+            self.core.start()
             self.status_label.configure(
-                text=f"🟢 Server Running on Port {port}",
+                text=f"🟢 Server Running on {self.core.address}",
                 text_color="green"
             )
-            
-            self.append_log(f"[OK] Server started on port {port} (TAP Protocol v1.0)")
-            self.append_log(f"[OK] Using C accept loop with pthread per client")
-            
         except Exception as e:
             self.append_log(f"✗ Failed to start server: {str(e)}")
-            self.server_running = False
     
-    def _run_c_accept_loop(self):
-        """Run C accept loop (blocks until server stops)"""
-        try:
-            self.proto.lib.py_server_accept_loop(
-                ctypes.byref(self.server_context)
-            )
-        except Exception as e:
-            self.append_log(f"✗ Accept loop error: {str(e)}")
+    def append_log(self, message, *args, level=None):
+        """Append message to log (thread-safe; shown by the next flush_log_view)"""
+        self.event_log(message, *args, level=level)
     
-    def append_log(self, message):
-        """Append message to log (thread-safe)"""
-        def _update():
+    def flush_log_view(self):
+        """Move new log entries into the log view in one insert (GUI thread, 10 times a second)"""
+        entries, self.log_position, missed = self.event_log.read(self.log_position)
+        if entries or missed:
+            skipped = missed + max(0, len(entries) - self.log_view_lines)
+            lines = [format_line(entry) for entry in entries[-self.log_view_lines:]]
+            if skipped:
+                lines.insert(0, f"... {skipped} lines skipped (see {self.event_log.path})")
+            
+            # Only follow new lines if the view is already at the bottom
+            following = self.log_text.yview()[1] >= 0.999
             self.log_text.configure(state="normal")
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.log_text.insert("end", f"[{timestamp}] {message}\n")
-            self.log_text.see("end")
+            self.log_text.insert("end", "\n".join(lines) + "\n")
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.log_view_lines
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            if following:
+                self.log_text.see("end")
             self.log_text.configure(state="disabled")
         
-        self.after(0, _update)
+        self.after(100, self.flush_log_view)
+    
+    def set_log_level(self, name):
+        """Minimum level kept from now on (DEBUG shows per-request chatter such as auto-saves)"""
+        self.event_log.level = LEVELS[name]
+        self.append_log("[INFO] Log level set to %s", name, level=LEVELS[name])
     
     def update_students_list(self):
         """Update connected users list (thread-safe)"""
@@ -270,11 +243,12 @@ class TestServerGUI(ctk.CTk):
             self.users_list.configure(state="normal")
             self.users_list.delete("1.0", "end")
             
-            if self.clients:
-                for socket, client_info in self.clients.items():
-                    status_icon = "📝" if client_info.get('status') == "testing" else "[OK]"
+            clients = self.clients.snapshot()
+            if clients:
+                for client_info in clients:
+                    status_icon = "📝" if client_info['status'] == "testing" else "[OK]"
                     role_icon = "👨‍🎓" if client_info['role'] == "student" else "👨‍🏫"
-                    ip = client_info.get('ip_address', 'unknown')
+                    ip = client_info['ip_address'] or 'unknown'
                     self.users_list.insert("end", 
                         f"{status_icon} {role_icon} {client_info['username']} ({ip})\n"
                     )
@@ -300,10 +274,63 @@ class TestServerGUI(ctk.CTk):
             self.stats_text.insert("end", f"Test Attempts: {stats['total_attempts']}\n")
             self.stats_text.insert("end", f"Average Score: {stats['average_score']:.2f}%\n")
             
+            pool = self.hash_pool.get_stats()
+            self.stats_text.insert("end", f"Login Queue: {pool['depth']}/{pool['max_queue']} "
+                                          f"(p95 wait {pool['p95_wait_ms']} ms, rejected {pool['rejected']})\n")
+            
+            conns = self.clients.get_stats()
+            self.stats_text.insert("end", f"Connections: {conns['connections']} ({conns['users']} users), "
+                                          f"{conns['bytes_in'] // 1024} KB in / {conns['bytes_out'] // 1024} KB out\n")
+            
             self.stats_text.configure(state="disabled")
         
         self.after(0, _update)
     
+    def update_metrics(self):
+        """Refresh the latency table (runs on the GUI thread every 2 seconds)"""
+        def ms(value):
+            return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+        
+        snapshot = self.metrics.snapshot(get_message_type_name)
+        rows = sorted(snapshot['message_types'].items(), key=lambda item: item[1]['count'], reverse=True)
+        
+        self.metrics_text.configure(state="normal")
+        self.metrics_text.delete("1.0", "end")
+        self.metrics_text.insert("end", f"{'Message':<24}{'count':>7}{'err':>5}{'busy':>5}"
+                                        f"{'p50':>8}{'p99':>8}{'max':>8}{'db p99':>8}\n")
+        for name, stats in rows:
+            total = stats['latency']['total']
+            self.metrics_text.insert("end", f"{name[:23]:<24}{stats['count']:>7}{stats['errors']:>5}"
+                                            f"{stats['in_flight']:>5}{ms(total['p50_ms'])}{ms(total['p99_ms'])}"
+                                            f"{ms(total['max_ms'])}{ms(stats['latency']['db']['p99_ms'])}\n")
+        if not rows:
+            self.metrics_text.insert("end", "No requests yet")
+        
+        queries = self.db.get_query_stats(top=5)
+        if queries['enabled']:
+            self.metrics_text.insert("end", f"\n{'SQL (by total time)':<44}{'count':>7}{'total':>9}{'p99':>8}\n")
+            for statement in queries['statements']:
+                self.metrics_text.insert("end", f"{statement['sql'][:43]:<44}{statement['count']:>7}"
+                                                f"{statement['total_ms']:>9.0f}{ms(statement['p99_ms'])}\n")
+            self.metrics_text.insert("end", f"Slow (>= {queries['slow_ms']} ms): {queries['slow_count']}\n")
+        self.metrics_text.configure(state="disabled")
+        # SQL_TIMING_REQ can switch timing too
+        self.sql_timing_button.configure(text=f"🐢 SQL Timing: {'On' if queries['enabled'] else 'Off'}")
+        
+        self.after(2000, self.update_metrics)
+    
+    def toggle_sql_timing(self):
+        """Switch per-statement SQL timing on or off (takes effect with the next query)"""
+        instrumentation = self.db.instrumentation
+        if instrumentation.enabled:
+            instrumentation.disable()
+            self.append_log("[INFO] SQL timing disabled")
+        else:
+            instrumentation.enable()
+            self.append_log(f"[INFO] SQL timing enabled (slow >= {instrumentation.slow_ms} ms "
+                            f"logged to {instrumentation.slow_log_path})")
+        self.sql_timing_button.configure(text=f"🐢 SQL Timing: {'On' if instrumentation.enabled else 'Off'}")
+    
     def clear_log(self):
         """Clear the log"""
         self.log_text.configure(state="normal")
@@ -311,31 +338,6 @@ class TestServerGUI(ctk.CTk):
         self.log_text.configure(state="disabled")
     
     def on_closing(self):
-        """Handle window close"""
-        self.server_running = False
-        
-        # Stop C server context (socket will be closed inside)
-        if hasattr(self, 'server_context') and self.server_context:
-            self.server_context.running = 0
-            try:
-                self.proto.lib.py_server_context_destroy(
-                    ctypes.byref(self.server_context)
-                )
-            except Exception as e:
-                print(f"Error destroying server context: {e}")
-        
-        # Cleanup broadcast manager (C core)
-        if self.server_running:
-            try:
-                self.proto.broadcast_destroy()
-                print("[BROADCAST] Manager destroyed")
-            except Exception as e:
-                print(f"Error destroying broadcast manager: {e}")
-        
-        # Cleanup network
-        try:
-            self.proto.cleanup_network()
-        except Exception as e:
-            print(f"Error cleaning up network: {e}")
-        
+        """Handle window close (graceful core shutdown)"""
+        self.core.stop()
         self.destroy()
@@ -0,0 +1,107 @@
+"""
+Test script for admin-only requests
+SERVER_STATS_REQ, SQL_TIMING_REQ and the profiling requests answer only teachers listed in profiling.admins
+"""
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from protocol_wrapper import (
+    ProtocolWrapper, MSG_SERVER_STATS_REQ, MSG_SERVER_STATS_RES, MSG_ERROR, ERR_SUCCESS, ERR_FORBIDDEN
+)
+
+
+@contextlib.contextmanager
+def handlers_with(**profiler_kwargs):
+    """(handlers, call) with a RuntimeProfiler built from profiler_kwargs; call(handler, username) returns the reply"""
+    from database import DatabaseManager
+    from auth import AuthManager, SessionManager
+    from server.handlers import RequestHandlers
+    from server.event_log import EventLog, ERROR
+    from server.profiler import RuntimeProfiler
+    
+    proto = ProtocolWrapper()
+    proto.init_network()
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'app.db'))
+        profiler = RuntimeProfiler(output_dir=os.path.join(tmp, 'profiles'), **profiler_kwargs)
+        handlers = RequestHandlers(proto, db, AuthManager(), SessionManager(sweep_interval=None), EventLog(level=ERROR),
+                                   profiler=profiler)
+        server_end, client_end = socket.socketpair()
+        
+        def call(handler_name, username, payload=None):
+            session = {'user_id': 1, 'username': username, 'role': 'teacher'}
+            request = {'message_type': MSG_SERVER_STATS_REQ, 'payload': payload or {}}
+            getattr(handlers, handler_name)(server_end.fileno(), session, request)
+            return proto.receive_message(client_end.fileno())
+        
+        try:
+            yield handlers, call
+        finally:
+            handlers.hash_pool.shutdown()
+            server_end.close()
+            client_end.close()
+            proto.cleanup_network()
+
+
+def test_server_stats_for_admins():
+    with handlers_with(admins=['teacher1']) as (_, call):
+        reply = call('handle_server_stats', 'teacher1')
+        assert reply['message_type'] == MSG_SERVER_STATS_RES
+        assert reply['payload']['code'] == ERR_SUCCESS
+        assert 'queries' in reply['payload']['data']
+
+
+def test_server_stats_refused_to_other_teachers():
+    with handlers_with(admins=['teacher1']) as (_, call):
+        reply = call('handle_server_stats', 'teacher2')
+        assert reply['message_type'] == MSG_ERROR
+        assert reply['payload']['code'] == ERR_FORBIDDEN
+    
+    with handlers_with() as (_, call):  # No admins configured: nobody
+        reply = call('handle_server_stats', 'teacher1')
+        assert reply['payload']['code'] == ERR_FORBIDDEN
+
+
+def test_disabled_profiling_keeps_server_stats():
+    with handlers_with(admins=['teacher1'], enabled=False) as (_, call):
+        assert call('handle_server_stats', 'teacher1')['payload']['code'] == ERR_SUCCESS
+        reply = call('handle_memory_snapshot', 'teacher1')
+        assert reply['payload']['code'] == ERR_FORBIDDEN
+
+
+def test_sql_timing_switch():
+    with handlers_with(admins=['teacher1']) as (handlers, call):
+        reply = call('handle_sql_timing', 'teacher1')  # State only
+        assert reply['payload']['data']['enabled'] is False
+        
+        reply = call('handle_sql_timing', 'teacher1', {'enabled': True, 'slow_ms': 5})
+        assert reply['payload']['code'] == ERR_SUCCESS
+        assert handlers.db.instrumentation.enabled and handlers.db.instrumentation.slow_ms == 5
+        
+        handlers.db.get_user_by_username('teacher1')
+        assert handlers.db.get_query_stats()['statements']
+        
+        reply = call('handle_sql_timing', 'teacher1', {'enabled': False})
+        assert reply['payload']['data']['enabled'] is False and not handlers.db.instrumentation.enabled
+        
+        assert call('handle_sql_timing', 'teacher1', {'enabled': 'yes'})['payload']['code'] != ERR_SUCCESS
+        assert call('handle_sql_timing', 'teacher1', {'slow_ms': -1})['payload']['code'] != ERR_SUCCESS
+        
+        reply = call('handle_sql_timing', 'teacher2', {'enabled': True})
+        assert reply['payload']['code'] == ERR_FORBIDDEN
+        assert not handlers.db.instrumentation.enabled
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
@@ -0,0 +1,80 @@
+"""
+Test script for the connection registry
+User, session and room indexes of ConnectionRegistry and unicast pushes to one user
+"""
+import socket
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.connection_registry import ConnectionRegistry
+from server.events import send_user_event
+
+
+def test_indexes_follow_add_and_remove():
+    registry = ConnectionRegistry(proto=None)
+    registry.add(10, 5, 'student1', 'student', '10.0.0.1', 'token-a')
+    registry.add(11, 5, 'student1', 'student', '10.0.0.2', 'token-a')  # Resumed on another socket
+    registry.add(12, 5, 'student1', 'student', '10.0.0.3', 'token-b')  # Second login
+    registry.add(13, 6, 'student2', 'student', '10.0.0.4', 'token-c')
+    registry.join_room(10, 3)
+    
+    assert sorted(registry.sockets_for_user(5)) == [10, 11, 12]
+    assert sorted(registry.sockets_for_session('token-a')) == [10, 11]
+    assert registry.sockets_for_session('token-a', exclude=11) == [10]
+    assert registry.sockets_for_room(3) == [10]
+    
+    registry.remove(10)
+    registry.add(11, 7, 'teacher1', 'teacher', '10.0.0.2', 'token-d')  # Socket number reused
+    assert registry.sockets_for_user(5) == [12]
+    assert registry.sockets_for_session('token-a') == []
+    assert registry.sockets_for_room(3) == []
+    assert registry._by_session.keys() == {'token-b', 'token-c', 'token-d'}
+    assert not registry.is_user_online(8) and registry.is_user_online(7)
+
+
+def test_user_event_reaches_every_socket_of_the_user():
+    from protocol_wrapper import ProtocolWrapper, MSG_EVENT
+    
+    proto = ProtocolWrapper()
+    proto.init_network()
+    pairs = [socket.socketpair() for _ in range(4)]
+    try:
+        registry = ConnectionRegistry(proto)
+        (laptop, _), (phone, _), (tablet, _), (other, _) = pairs
+        registry.add(laptop.fileno(), 5, 'student1', 'student', '10.0.0.1', 'token-a')
+        registry.add(phone.fileno(), 5, 'student1', 'student', '10.0.0.2', 'token-b')
+        registry.add(tablet.fileno(), 5, 'student1', 'student', '10.0.0.3', 'token-c')
+        registry.add(other.fileno(), 6, 'student2', 'student', '10.0.0.4', 'token-d')
+        
+        data = {'room_id': 3, 'score': 2, 'total': 3}
+        assert send_user_event(registry, 5, 'test_submitted', data, exclude=laptop.fileno()) == 2
+        for server_end, client_end in pairs[1:3]:
+            message = proto.receive_message(client_end.fileno())
+            assert message['message_type'] == MSG_EVENT
+            assert message['payload'] == {'topic': 'user:5', 'event': 'test_submitted', 'data': data}
+            assert registry.get(server_end.fileno())['bytes_out'] > 0
+        
+        # Nothing for the excluded socket or the other user
+        for _, client_end in (pairs[0], pairs[3]):
+            client_end.setblocking(False)
+            try:
+                client_end.recv(1)
+            except BlockingIOError:
+                continue
+            raise AssertionError("unexpected push")
+        
+        assert send_user_event(registry, 9, 'test_submitted', data) == 0  # Offline
+    finally:
+        for server_end, client_end in pairs:
+            server_end.close()
+            client_end.close()
+        proto.cleanup_network()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
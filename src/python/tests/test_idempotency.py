@@ -0,0 +1,163 @@
+"""
+Test script for request deduplication
+IdempotencyCache claim/complete/release, TTL and eviction, and which responses
+RequestHandlers.handle_idempotent keeps
+"""
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.idempotency import IdempotencyCache
+
+KEY = (7, 0x0031, 'req-1')
+RESPONSE = (0x0032, {'code': 1000, 'room_id': 3})
+
+
+def test_first_claim_runs_and_retry_replays():
+    cache = IdempotencyCache()
+    assert cache.claim(KEY) is None
+    cache.complete(KEY, *RESPONSE)
+    assert cache.claim(KEY) == RESPONSE
+    assert cache.get_stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+
+
+def test_keys_are_independent():
+    cache = IdempotencyCache()
+    assert cache.claim(KEY) is None
+    cache.complete(KEY, *RESPONSE)
+    assert cache.claim((8, 0x0031, 'req-1')) is None  # Other user
+    assert cache.claim((7, 0x0041, 'req-1')) is None  # Other message type
+
+
+def test_release_lets_a_retry_run_again():
+    cache = IdempotencyCache()
+    assert cache.claim(KEY) is None
+    cache.release(KEY)
+    assert cache.claim(KEY) is None
+    assert cache.get_stats()['hits'] == 0
+
+
+def test_duplicate_waits_for_the_original():
+    cache = IdempotencyCache(wait_timeout=5)
+    assert cache.claim(KEY) is None
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(cache.claim(KEY)))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()  # Blocked on the in-flight original
+    cache.complete(KEY, *RESPONSE)
+    waiter.join(timeout=5)
+    assert result == [RESPONSE]
+
+
+def test_duplicate_takes_over_after_release():
+    cache = IdempotencyCache(wait_timeout=5)
+    assert cache.claim(KEY) is None
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(cache.claim(KEY)))
+    waiter.start()
+    time.sleep(0.05)
+    cache.release(KEY)
+    waiter.join(timeout=5)
+    assert result == [None]  # The duplicate now owns the key and runs the handler
+
+
+def test_duplicate_times_out():
+    cache = IdempotencyCache(wait_timeout=0.05)
+    assert cache.claim(KEY) is None
+    try:
+        cache.claim(KEY)
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("duplicate of an in-flight request did not time out")
+
+
+def test_responses_expire_after_ttl():
+    cache = IdempotencyCache(ttl_seconds=0.05)
+    assert cache.claim(KEY) is None
+    cache.complete(KEY, *RESPONSE)
+    time.sleep(0.1)
+    assert cache.claim(KEY) is None
+
+
+def test_in_flight_entry_does_not_block_purge():
+    cache = IdempotencyCache(ttl_seconds=0.05)
+    assert cache.claim('slow') is None
+    for i in range(5):
+        assert cache.claim(i) is None
+        cache.complete(i, *RESPONSE)
+    time.sleep(0.1)
+    cache.claim('new')
+    assert set(cache._entries) == {'slow', 'new'}
+
+
+def test_eviction_skips_in_flight_entries():
+    cache = IdempotencyCache(max_entries=3)
+    assert cache.claim('slow') is None
+    for i in range(5):
+        assert cache.claim(i) is None
+        cache.complete(i, *RESPONSE)
+    assert list(cache._entries) == ['slow', 3, 4]
+    assert not cache._entries['slow'].done.is_set()  # Still in flight, not evicted
+
+
+def test_handler_keeps_only_successful_responses():
+    from protocol_wrapper import (
+        ProtocolWrapper, MSG_BULK_ADD_QUESTIONS_REQ, MSG_BULK_ADD_QUESTIONS_RES, ERR_SUCCESS, ERR_BAD_REQUEST
+    )
+    from database import DatabaseManager
+    from auth import AuthManager, SessionManager
+    from server.handlers import RequestHandlers
+    from server.event_log import EventLog, ERROR
+    
+    proto = ProtocolWrapper()
+    proto.init_network()
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager(os.path.join(tmp, 'app.db'))
+        handlers = RequestHandlers(proto, db, AuthManager(), SessionManager(sweep_interval=None), EventLog(level=ERROR))
+        server_end, client_end = socket.socketpair()
+        try:
+            session = {'user_id': 1, 'username': 'teacher1', 'role': 'teacher'}
+            runs = []
+            
+            def handler_answering(code):
+                def handler(client_socket, session, request):
+                    runs.append(code)
+                    handlers.send_response(client_socket, MSG_BULK_ADD_QUESTIONS_RES, {'code': code})
+                return handler
+            
+            def call(handler, request_id):
+                request = {'message_type': MSG_BULK_ADD_QUESTIONS_REQ, 'payload': {'request_id': request_id}}
+                handlers.handle_idempotent(handler, server_end.fileno(), session, request)
+                return proto.receive_message(client_end.fileno())
+            
+            # Failure under the normal response type: the retry runs for real
+            call(handler_answering(ERR_BAD_REQUEST), 'bulk-1')
+            call(handler_answering(ERR_SUCCESS), 'bulk-1')
+            assert runs == [ERR_BAD_REQUEST, ERR_SUCCESS]
+            
+            # Success: the retry is answered from the cache
+            call(handler_answering(ERR_SUCCESS), 'bulk-1')
+            assert runs == [ERR_BAD_REQUEST, ERR_SUCCESS]
+        finally:
+            handlers.hash_pool.shutdown()
+            server_end.close()
+            client_end.close()
+            proto.cleanup_network()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
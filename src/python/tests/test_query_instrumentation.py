@@ -0,0 +1,75 @@
+"""
+Test script for SQL statement timing
+Aggregates by normalised statement and the slow-query log of QueryInstrumentation
+"""
+import json
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.instrumentation import QueryInstrumentation, normalize_sql
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT *\n  FROM t WHERE id IN (?, ?, ?) AND s = 'x' AND n = 42") == \
+        "SELECT * FROM t WHERE id IN (?, ...) AND s = ? AND n = ?"
+
+
+def test_statements_are_aggregated():
+    with tempfile.TemporaryDirectory() as tmp:
+        instrumentation = QueryInstrumentation()
+        instrumentation.enable()
+        conn = instrumentation.connect(os.path.join(tmp, 'app.db'))
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+        for i in range(3):
+            conn.execute('INSERT INTO t (name) VALUES (?)', (f"name{i}",))
+        assert len(conn.execute('SELECT * FROM t').fetchall()) == 3
+        conn.close()
+        
+        statements = {s['sql']: s for s in instrumentation.snapshot()['statements']}
+        assert statements['INSERT INTO t (name) VALUES (?)']['count'] == 3
+        assert statements['SELECT * FROM t']['rows'] == 3
+
+
+def test_slow_log_keeps_parameters_out():
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'slow.log')
+        instrumentation = QueryInstrumentation()
+        instrumentation.enable(slow_ms=0, slow_log_path=log_path)  # Everything is slow
+        conn = instrumentation.connect(os.path.join(tmp, 'app.db'))
+        conn.execute('CREATE TABLE users (username TEXT, password_hash TEXT)')
+        conn.execute('INSERT INTO users VALUES (?, ?)', ('teacher1', 'secret-hash$salt'))
+        conn.commit()
+        conn.close()
+        
+        with open(log_path, encoding='utf-8') as f:
+            text = f.read()
+        assert 'secret-hash' not in text
+        assert 'secret-hash' not in json.dumps(list(instrumentation.recent_slow))
+        
+        entries = [json.loads(line) for line in text.splitlines()]
+        insert = [e for e in entries if e['sql'].startswith('INSERT')]
+        assert insert and insert[0]['param_count'] == 2
+        assert instrumentation.slow_count == len(entries)
+        
+        if os.name == 'posix':
+            assert stat.S_IMODE(os.stat(log_path).st_mode) == 0o600
+
+
+def test_disabled_connections_are_plain():
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = QueryInstrumentation().connect(os.path.join(tmp, 'app.db'))
+        assert type(conn) is sqlite3.Connection
+        conn.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
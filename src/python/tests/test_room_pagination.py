@@ -0,0 +1,121 @@
+"""
+Test script for the available-rooms lobby query
+Keyset pagination boundaries, filters and the total hint of get_available_rooms_page
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import DatabaseManager
+
+
+def make_db(tmp, rooms):
+    """Database with one teacher, one student and `rooms` waiting rooms (ids 1..rooms)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(os.path.join(tmp, 'rooms.db'))
+    teacher_id = db.create_user('teacher1', 'x', 'teacher', 'Nguyen Van Giang')
+    student_id = db.create_user('student1', 'x', 'student', 'Tran Thi Hoc')
+    room_ids = [db.create_test_room(f"Room {i:02d}", teacher_id, 10, 30)['room_id'] for i in range(1, rooms + 1)]
+    return db, teacher_id, student_id, room_ids
+
+
+def walk_pages(db, limit, **filters):
+    """All pages of the lobby: [[room ids of page 1], [page 2], ...]"""
+    pages = []
+    cursor = None
+    while True:
+        page = db.get_available_rooms_page(limit=limit, after_id=cursor, **filters)
+        pages.append([room['id'] for room in page['rooms']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_room_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _, _, room_ids = make_db(tmp, 25)
+        pages = walk_pages(db, 10)
+        assert [len(page) for page in pages] == [10, 10, 5]
+        flat = [room_id for page in pages for room_id in page]
+        assert flat == sorted(room_ids, reverse=True)
+
+
+def test_exact_multiple_has_no_empty_last_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _, _, room_ids = make_db(tmp, 20)
+        first = db.get_available_rooms_page(limit=10)
+        assert first['next_cursor'] == first['rooms'][-1]['id']
+        second = db.get_available_rooms_page(limit=10, after_id=first['next_cursor'])
+        assert len(second['rooms']) == 10
+        assert second['next_cursor'] is None
+        assert second['total_hint'] is None  # Only the first page counts
+
+
+def test_cursor_past_the_end():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _, _, room_ids = make_db(tmp, 3)
+        page = db.get_available_rooms_page(limit=10, after_id=min(room_ids))
+        assert page['rooms'] == []
+        assert page['next_cursor'] is None
+
+
+def test_new_rooms_do_not_shift_later_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, teacher_id, _, room_ids = make_db(tmp, 12)
+        first = db.get_available_rooms_page(limit=5)
+        db.create_test_room("Room late", teacher_id, 10, 30)
+        second = db.get_available_rooms_page(limit=5, after_id=first['next_cursor'])
+        assert [room['id'] for room in second['rooms']] == sorted(room_ids, reverse=True)[5:10]
+
+
+def test_joined_and_ended_rooms_are_excluded():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _, student_id, room_ids = make_db(tmp, 6)
+        joined, ended = room_ids[0], room_ids[1]
+        assert db.join_room(db.get_room_by_id(joined)['room_code'], student_id)['success']
+        db.start_test_room(ended)
+        db.end_test_room(ended, force=True)
+        
+        ids = [room['id'] for room in db.get_available_rooms_page(student_id=student_id, limit=None)['rooms']]
+        assert joined not in ids and ended not in ids
+        assert len(ids) == 4
+        # Other students still see the joined room
+        assert joined in [room['id'] for room in db.get_available_rooms_page(limit=None)['rooms']]
+
+
+def test_total_hint_is_capped():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _, _, _ = make_db(tmp, 8)
+        # The facade keeps the default cap; the repository takes it as an argument
+        page = db.rooms.get_available_rooms_page(limit=3, count_cap=5)
+        assert page['total_hint'] == 5 and page['total_capped']
+        page = db.rooms.get_available_rooms_page(limit=3, count_cap=8)
+        assert page['total_hint'] == 8 and not page['total_capped']
+
+
+def test_name_filter_escapes_wildcards_and_matches_codes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, teacher_id, _, room_ids = make_db(tmp, 3)
+        percent = db.create_test_room("Giua ky 100%", teacher_id, 10, 30)
+        
+        page = db.get_available_rooms_page(limit=None, name_filter='%')
+        assert [room['id'] for room in page['rooms']] == [percent['room_id']]
+        
+        code = db.get_room_by_id(room_ids[1])['room_code']
+        page = db.get_available_rooms_page(limit=None, name_filter=code.lower())
+        assert [room['id'] for room in page['rooms']] == [room_ids[1]]
+        
+        assert len(db.get_available_rooms_page(limit=None, teacher_filter='van giang')['rooms']) == 4
+        assert db.get_available_rooms_page(limit=None, teacher_filter='nobody')['rooms'] == []
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
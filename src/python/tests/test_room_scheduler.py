@@ -0,0 +1,156 @@
+"""
+Test script for the room scheduler
+grade_answers, room_deadline, finalizing unsubmitted tests and deadline enforcement
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.room_scheduler import RoomScheduler, grade_answers, room_deadline
+
+QUESTIONS = [
+    {'id': 11, 'correct_answer': 0},
+    {'id': 12, 'correct_answer': 3},
+    {'id': 13, 'correct_answer': 1}
+]
+
+
+def answer(question_id, selected):
+    return {'question_id': question_id, 'selected': selected}
+
+
+def test_grade_counts_correct_answers():
+    assert grade_answers(QUESTIONS, []) == 0
+    assert grade_answers(QUESTIONS, [answer(11, 0), answer(12, 3), answer(13, 1)]) == 3
+    assert grade_answers(QUESTIONS, [answer(11, 1), answer(12, 3), answer(13, -1)]) == 1
+
+
+def test_grade_ignores_unknown_and_malformed_answers():
+    answers = [
+        answer(99, 0),               # Not a question of this room
+        {'question_id': 11},         # Nothing selected
+        {'selected': 3},             # No question id
+        {'question_id': [12], 'selected': 3},
+        {'question_id': '13', 'selected': 1}
+    ]
+    assert grade_answers(QUESTIONS, answers) == 0
+
+
+def test_grade_counts_each_question_once():
+    assert grade_answers(QUESTIONS, [answer(11, 0)] * 10) == 1
+    assert grade_answers(QUESTIONS, [answer(11, 0), answer(11, 2)]) == 0  # Last answer counts
+    assert grade_answers(QUESTIONS, [answer(11, 2), answer(11, 0)]) == 1
+
+
+def test_room_deadline():
+    start = datetime(2025, 12, 1, 8, 0, 0)
+    room = {'start_time': start.isoformat(sep=' '), 'duration_minutes': 45}
+    assert room_deadline(room) == int(start.timestamp()) + 45 * 60
+    assert room_deadline({'start_time': None, 'duration_minutes': 45}) is None
+    assert room_deadline({'duration_minutes': 45}) is None
+
+
+def make_room(tmp):
+    """Database with an active 3-question room; returns (db, room_id, [student ids])"""
+    from database import DatabaseManager
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(os.path.join(tmp, 'app.db'))
+    teacher_id = db.create_user('teacher1', 'x', 'teacher', 'Teacher One')
+    students = [db.create_user(f"student{i}", 'x', 'student', f"Student {i}") for i in range(1, 5)]
+    room = db.create_test_room('Scheduled', teacher_id, 3, 30)
+    for order, correct in enumerate((0, 3, 1)):
+        db.add_room_question(room['room_id'], f"Q{order}", 'a', 'b', 'c', 'd', correct, order)
+    for student_id in students:
+        db.join_room(room['room_code'], student_id)
+    db.start_test_room(room['room_id'])
+    return db, room['room_id'], students
+
+
+def test_finalize_grades_only_unsubmitted_tests():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, room_id, (saved, testing, submitted, idle) = make_room(tmp)
+        questions = db.get_room_questions(room_id)
+        right = [answer(q['id'], q['correct_answer']) for q in questions]
+        
+        db.save_test_progress(room_id, saved, json.dumps(right[:2]))
+        db.update_participant_status(room_id, testing, 'testing')  # Opened the test, nothing saved
+        db.update_participant_status(room_id, submitted, 'submitted')
+        
+        scheduler = RoomScheduler(db, proto=None, logger=lambda *args, **kwargs: None)
+        assert scheduler.finalize_room(room_id) == 2
+        assert scheduler.finalize_room(room_id) == 0  # Nothing left to finalize
+        
+        statuses = {p['student_id']: p['status'] for p in db.get_room_participants(room_id)}
+        assert statuses[saved] == statuses[testing] == statuses[submitted] == 'submitted'
+        assert statuses[idle] != 'submitted'  # Never started: no result
+        
+        assert [(r['score'], r['total_questions']) for r in db.get_user_results(saved)] == [(2, 3)]
+        assert [(r['score'], r['total_questions']) for r in db.get_user_results(testing)] == [(0, 3)]
+        assert db.get_user_results(idle) == []
+
+
+def test_room_ends_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, room_id, _ = make_room(tmp)
+        assert not db.start_test_room(room_id)  # Already active
+        assert db.end_test_room(room_id, force=True)['success']
+        # The teacher and the scheduler racing: the second one must not finalize or broadcast again
+        assert not db.end_test_room(room_id, force=True)['success']
+
+
+def test_submit_after_finalize_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        db, room_id, (student_id, other_id, _, _) = make_room(tmp)
+        db.save_test_progress(room_id, student_id, json.dumps([]))
+        RoomScheduler(db, proto=None, logger=lambda *args, **kwargs: None).finalize_room(room_id)
+        
+        # A submit arriving after finalize_room graded the student saves nothing
+        assert db.save_room_result(room_id, student_id, 3, 3, json.dumps([])) is None
+        assert [r['score'] for r in db.get_user_results(student_id)] == [0]
+        
+        # A first submit goes through, a second one does not
+        assert db.save_room_result(room_id, other_id, 2, 3, json.dumps([])) is not None
+        assert db.save_room_result(room_id, other_id, 3, 3, json.dumps([])) is None
+        assert [r['score'] for r in db.get_user_results(other_id)] == [2]
+        assert db.get_participant_status(room_id, other_id) == 'submitted'
+
+
+def test_room_ends_at_its_deadline():
+    from protocol_wrapper import ProtocolWrapper
+    
+    proto = ProtocolWrapper()
+    proto.init_network()
+    with tempfile.TemporaryDirectory() as tmp:
+        db, room_id, (student_id, _, _, _) = make_room(tmp)
+        db.save_test_progress(room_id, student_id, json.dumps([]))
+        
+        scheduler = RoomScheduler(db, proto, logger=lambda *args, **kwargs: None, grace_seconds=0)
+        scheduler.start()
+        try:
+            scheduler.schedule_end(room_id, time.time() + 0.2)
+            # The room is ended first, then unsubmitted tests are finalized
+            for _ in range(50):
+                if db.get_participant_status(room_id, student_id) == 'submitted':
+                    break
+                time.sleep(0.1)
+            assert db.get_room_by_id(room_id)['status'] == 'ended'
+            assert db.get_participant_status(room_id, student_id) == 'submitted'
+        finally:
+            scheduler.stop()
+            proto.cleanup_network()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
@@ -0,0 +1,127 @@
+"""
+Test script for the session manager
+Striped store, user index, revocation and expiry sweeping of SessionManager
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import SessionManager
+
+
+def manager(**kwargs):
+    """SessionManager without the background sweeper (tests sweep explicitly)"""
+    kwargs.setdefault('sweep_interval', None)
+    return SessionManager(**kwargs)
+
+
+def test_create_and_validate():
+    sessions = manager()
+    token = sessions.create_session(5, 'student1', 'student', 'Student One')
+    session = sessions.validate_session(token)
+    assert session['user_id'] == 5 and session['username'] == 'student1' and session['role'] == 'student'
+    assert session.get('missing') is None
+    assert sessions.get_session_count() == 1
+
+
+def test_sessions_spread_over_stripes():
+    sessions = manager(stripes=10)
+    assert len(sessions._stripes) == 16  # Rounded up to a power of two
+    tokens = [sessions.create_session(i, f"user{i}", 'student', f"User {i}") for i in range(200)]
+    assert sessions.get_session_count() == 200
+    assert sum(1 for stripe in sessions._stripes if stripe.sessions) > 1
+    assert all(sessions.validate_session(token) for token in tokens)
+
+
+def test_user_index():
+    sessions = manager()
+    first = sessions.create_session(5, 'student1', 'student', 'Student One')
+    second = sessions.create_session(5, 'student1', 'student', 'Student One')
+    other = sessions.create_session(6, 'student2', 'student', 'Student Two')
+    assert sorted(sessions.get_user_sessions(5)) == sorted([first, second])
+    
+    assert sessions.destroy_user_sessions(5) == 2
+    assert sessions.get_user_sessions(5) == []
+    assert sessions.validate_session(first) is None and sessions.validate_session(second) is None
+    assert sessions.validate_session(other) is not None
+
+
+def test_logout_revokes_the_signed_token():
+    sessions = manager()
+    token = sessions.create_session(5, 'student1', 'student', 'Student One')
+    assert sessions.destroy_session(token)
+    assert sessions.get_session(token) is None
+    assert sessions.verify_token(token) is None  # Signature still fine, but revoked
+    assert sessions.validate_session(token) is None
+    assert not sessions.destroy_session('not-a-token')
+
+
+def test_revoked_token_is_not_restored():
+    user = {'id': 5, 'username': 'student1', 'role': 'student', 'full_name': 'Student One'}
+    sessions = manager(user_loader=lambda user_id: user if user_id == 5 else None)
+    token = sessions.create_session(5, 'student1', 'student', 'Student One')
+    
+    # A valid token this process has not seen is rebuilt from the user record...
+    sessions._remove(token)
+    assert sessions.validate_session(token)['username'] == 'student1'
+    
+    # ...but not once it was logged out
+    sessions.destroy_session(token)
+    assert sessions.validate_session(token) is None
+
+
+def test_restore_checks_the_role():
+    user = {'id': 5, 'username': 'student1', 'role': 'student', 'full_name': 'Student One'}
+    issuer = manager()
+    sessions = manager(signer=issuer.signer, user_loader=lambda user_id: user)
+    teacher_token = issuer.create_session(5, 'student1', 'teacher', 'Student One')
+    assert sessions.validate_session(teacher_token) is None
+
+
+def test_extend_issues_a_new_token():
+    sessions = manager()
+    token = sessions.create_session(5, 'student1', 'student', 'Student One')
+    new_token = sessions.extend_session(token, hours=48)
+    assert new_token and new_token != token
+    assert sessions.validate_session(token) is None
+    session = sessions.validate_session(new_token)
+    assert session['expires_at'] > time.time() + 47 * 3600
+    assert sessions.get_user_sessions(5) == [new_token]
+
+
+def test_expired_sessions_are_swept():
+    sessions = manager(session_duration_hours=2 / 3600)  # 2 seconds
+    expiring = sessions.create_session(5, 'student1', 'student', 'Student One')
+    sessions.destroy_session(sessions.create_session(6, 'student2', 'student', 'Student Two'))
+    lasting = sessions.extend_session(sessions.create_session(7, 'student3', 'student', 'Student Three'))
+    assert sessions.cleanup_expired_sessions() == 0
+    assert sum(len(stripe.revoked) for stripe in sessions._stripes) == 2
+    
+    time.sleep(2.2)
+    assert sessions.cleanup_expired_sessions() == 1
+    assert sessions.get_session(expiring) is None
+    assert sessions.validate_session(expiring) is None
+    assert sessions.get_user_sessions(5) == []
+    # Revoked tokens are forgotten once they could not verify anyway
+    assert sum(len(stripe.revoked) for stripe in sessions._stripes) == 0
+    assert sessions.validate_session(lasting) is not None
+
+
+def test_sweeper_thread():
+    sessions = manager(session_duration_hours=1 / 3600, sweep_interval=0.2)  # 1 second
+    try:
+        token = sessions.create_session(5, 'student1', 'student', 'Student One')
+        time.sleep(1.6)
+        assert sessions.get_session(token) is None
+        assert sessions.get_session_count() == 0
+    finally:
+        sessions.shutdown()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
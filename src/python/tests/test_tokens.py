@@ -0,0 +1,114 @@
+"""
+Test script for signed session tokens
+Issue/verify, tampering, expiry and key rotation of SessionTokenSigner
+"""
+import base64
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth.tokens import SessionTokenSigner, TOKEN_LENGTH
+
+BASE64URL = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+
+
+def future(seconds=3600):
+    return int(time.time() + seconds)
+
+
+def flip(token, position):
+    """Token with one base64 character changed (its top bit flipped)"""
+    replacement = BASE64URL[BASE64URL.index(token[position]) ^ 32]
+    return token[:position] + replacement + token[position + 1:]
+
+
+def test_issue_and_verify():
+    signer = SessionTokenSigner()
+    expires_at = future()
+    token = signer.issue(42, 'teacher', expires_at)
+    assert len(token) == TOKEN_LENGTH
+    assert base64.urlsafe_b64decode(token + '=')  # Header-safe alphabet, no padding
+    assert signer.verify(token) == {'user_id': 42, 'role': 'teacher', 'expires_at': expires_at, 'kid': signer.active_kid}
+
+
+def test_tokens_are_unique():
+    signer = SessionTokenSigner()
+    expires_at = future()
+    assert signer.issue(1, 'student', expires_at) != signer.issue(1, 'student', expires_at)
+
+
+def test_tampered_tokens_are_rejected():
+    signer = SessionTokenSigner()
+    token = signer.issue(42, 'student', future())
+    # Every character: claims (kid, user id, role, expiry, nonce) and MAC
+    for position in range(TOKEN_LENGTH):
+        assert signer.verify(flip(token, position)) is None, position
+
+
+def test_non_canonical_spelling_is_rejected():
+    signer = SessionTokenSigner()
+    token = signer.issue(42, 'student', future())
+    last = BASE64URL.index(token[-1])
+    # Same 23 bytes with the unused low bits of the last character set
+    for bits in (1, 2, 3):
+        variant = token[:-1] + BASE64URL[last | bits]
+        assert base64.urlsafe_b64decode(variant + '=') == base64.urlsafe_b64decode(token + '=')
+        assert signer.verify(variant) is None
+
+
+def test_malformed_tokens_are_rejected():
+    signer = SessionTokenSigner()
+    token = signer.issue(42, 'student', future())
+    for bad in (None, '', token[:-1], token + 'A', '!' * TOKEN_LENGTH, '=' * TOKEN_LENGTH):
+        assert signer.verify(bad) is None, bad
+
+
+def test_other_key_is_rejected():
+    token = SessionTokenSigner({1: b'a' * 32}).issue(42, 'student', future())
+    assert SessionTokenSigner({1: b'b' * 32}).verify(token) is None
+    assert SessionTokenSigner({1: b'a' * 32}).verify(token) is not None
+
+
+def test_expired_tokens_are_rejected():
+    signer = SessionTokenSigner()
+    expires_at = future(60)
+    token = signer.issue(42, 'student', expires_at)
+    assert signer.verify(token, now=expires_at - 1) is not None
+    assert signer.verify(token, now=expires_at) is None
+
+
+def test_rotation_keeps_old_tokens_valid():
+    signer = SessionTokenSigner()
+    old_kid = signer.active_kid
+    old_token = signer.issue(1, 'student', future())
+    new_kid = signer.rotate_key()
+    assert new_kid != old_kid and signer.active_kid == new_kid
+    new_token = signer.issue(1, 'student', future())
+    assert signer.verify(new_token)['kid'] == new_kid
+    assert signer.verify(old_token)['kid'] == old_kid
+
+
+def test_retired_key_stops_verifying():
+    signer = SessionTokenSigner()
+    old_kid = signer.active_kid
+    old_token = signer.issue(1, 'student', future())
+    signer.rotate_key()
+    signer.retire_key(old_kid)
+    assert signer.verify(old_token) is None
+    signer.retire_key(signer.active_kid)  # The signing key is never retired
+    assert signer.verify(signer.issue(1, 'student', future())) is not None
+
+
+def test_key_ids_wrap_within_a_byte():
+    signer = SessionTokenSigner({255: b'k' * 32})
+    assert signer.rotate_key() == 1
+    assert signer.verify(signer.issue(1, 'teacher', future()))['kid'] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
@@ -0,0 +1,100 @@
+"""
+Test script for traffic capture
+Room and topic membership mirrored by CaptureWriter, and the records read back
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from protocol_wrapper import MSG_ROOM_STATUS, MSG_EVENT
+from traffic_capture import CaptureWriter, read_capture, FRAME_IN, FRAME_OUT, CLOSE, TAP_HEADER
+
+
+def header(msg_type=0x0001):
+    return TAP_HEADER.pack(0x54415001, 1, msg_type, 0, b'', 0, b'', b'')
+
+
+def capture(tmp, actions):
+    """Records written by a CaptureWriter after actions(writer); sockets 1-3 have each sent one frame"""
+    path = os.path.join(tmp, 'traffic.tapcap')
+    writer = CaptureWriter(path)
+    for socket in (1, 2, 3):
+        writer.record_in(socket, header(), b'{}')
+    actions(writer)
+    writer.close()
+    return read_capture(path)[1]
+
+
+def broadcast_receivers(records, msg_type):
+    return sorted(r['conn'] for r in records if r['kind'] == FRAME_OUT and r['msg_type'] == msg_type)
+
+
+def test_socket_in_several_rooms():
+    def actions(writer):
+        writer.record_room(1, 10)
+        writer.record_room(1, 11)  # RESUME_REQ registers every unfinished room
+        writer.record_room(2, 11)
+        writer.record_broadcast(MSG_ROOM_STATUS, 100, time.perf_counter(), room_id=10)
+        writer.record_broadcast(MSG_EVENT, 100, time.perf_counter(), room_id=11)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        records = capture(tmp, actions)
+        assert broadcast_receivers(records, MSG_ROOM_STATUS) == [1]
+        assert broadcast_receivers(records, MSG_EVENT) == [1, 2]
+
+
+def test_update_room_replaces_rooms_only():
+    def actions(writer):
+        writer.record_room(1, 10)
+        writer.record_room(1, 11)
+        writer.record_topic(1, 'lobby', True)
+        writer.record_room(1, 12, replace=True)
+        writer.record_broadcast(MSG_ROOM_STATUS, 100, time.perf_counter(), room_id=10)
+        writer.record_broadcast(MSG_ROOM_STATUS, 100, time.perf_counter(), room_id=12)
+        writer.record_broadcast(MSG_EVENT, 100, time.perf_counter(), topic='lobby')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        records = capture(tmp, actions)
+        assert broadcast_receivers(records, MSG_ROOM_STATUS) == [1]  # Room 12 only
+        assert broadcast_receivers(records, MSG_EVENT) == [1]
+
+
+def test_room_topic_subscription_receives_room_broadcasts():
+    def actions(writer):
+        writer.record_topic(3, 'room:10', True)  # SUBSCRIBE_REQ to the room topic
+        writer.record_broadcast(MSG_ROOM_STATUS, 100, time.perf_counter(), room_id=10)
+        writer.record_topic(3, 'room:10', False)
+        writer.record_broadcast(MSG_EVENT, 100, time.perf_counter(), room_id=10)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        records = capture(tmp, actions)
+        assert broadcast_receivers(records, MSG_ROOM_STATUS) == [3]
+        assert broadcast_receivers(records, MSG_EVENT) == []
+
+
+def test_unregister_and_close_forget_membership():
+    def actions(writer):
+        writer.record_room(1, 10)
+        writer.record_topic(1, 'lobby', True)
+        writer.record_room(1, None)
+        writer.record_room(2, 10)
+        writer.record_close(2)
+        writer.record_broadcast(MSG_ROOM_STATUS, 100, time.perf_counter(), room_id=10)
+        writer.record_broadcast(MSG_EVENT, 100, time.perf_counter(), topic='lobby')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        records = capture(tmp, actions)
+        assert broadcast_receivers(records, MSG_ROOM_STATUS) == []
+        assert broadcast_receivers(records, MSG_EVENT) == []
+        assert [r['kind'] for r in records] == [FRAME_IN, FRAME_IN, FRAME_IN, CLOSE]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"   ✓ {name}")
@@ -0,0 +1,4 @@
+"""
+Tools Module
+Command-line utilities for load testing and test data (not used by client or server)
+"""
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Load Generator
+Simulates an exam day against a running TAP server and reports the results as JSON
+
+Every simulated user is one thread with its own connection speaking plain
+TAP (no GUI, no select loop). All users move through the phases together:
+
+    register   Create the accounts (existing accounts are reused)
+    login      Login storm: everyone logs in at the same moment
+    setup      Teachers create rooms and import questions
+    join       Students join a room (and prefetch the exam with --prefetch)
+    start      Teachers start all rooms at once; students wait for the
+               ROOM_STATUS push, then open the test
+    autosave   Students auto-save every --autosave-interval seconds
+    submit     Everyone submits at the same moment
+
+Usage (from src/python, with the server running):
+    python -m tools.load_generator --students 200 --teachers 4
+    python -m tools.load_generator --students 1000 --teachers 20 --autosaves 4 \\
+        --autosave-interval 30 --server-pid $(pgrep -f server.main) -o run.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import (
+    ProtocolWrapper, get_message_type_name,
+    MSG_REGISTER_REQ, MSG_LOGIN_REQ, MSG_CREATE_ROOM_REQ, MSG_BULK_ADD_QUESTIONS_REQ,
+    MSG_JOIN_ROOM_REQ, MSG_PREFETCH_EXAM_REQ, MSG_START_ROOM_REQ, MSG_START_ROOM_TEST_REQ,
+    MSG_AUTO_SAVE_REQ, MSG_SUBMIT_ROOM_TEST_REQ,
+    MSG_ROOM_STATUS, MSG_ROOM_PROGRESS, MSG_EVENT, MSG_ERROR,
+    ERR_SUCCESS, ERR_USERNAME_EXISTS, ERR_SERVER_BUSY
+)
+from exam_cipher import decrypt_exam
+
+PUSH_TYPES = (MSG_ROOM_STATUS, MSG_ROOM_PROGRESS, MSG_EVENT)
+PHASES = ('register', 'login', 'setup', 'join', 'start', 'autosave', 'submit')
+PASSWORD = 'loadtest123'
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Metrics:
+    """Latencies and errors per message type and phase (thread-safe)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)  # {name: [seconds]}
+        self.errors = defaultdict(lambda: defaultdict(int))  # {name: {message: count}}
+        self.phase_requests = defaultdict(int)
+        self.counters = defaultdict(int)
+    
+    def record(self, name, seconds, phase):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.phase_requests[phase] += 1
+    
+    def error(self, name, message):
+        with self._lock:
+            self.errors[name][str(message)[:120]] += 1
+    
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+    
+    def summary(self):
+        with self._lock:
+            names = set(self.latencies) | set(self.errors)
+            result = {}
+            for name in sorted(names):
+                values = sorted(self.latencies.get(name, []))
+                errors = self.errors.get(name, {})
+                result[name] = {
+                    'count': len(values),
+                    'errors': sum(errors.values()),
+                    'p50_ms': _ms(percentile(values, 50)),
+                    'p95_ms': _ms(percentile(values, 95)),
+                    'p99_ms': _ms(percentile(values, 99)),
+                    'max_ms': _ms(values[-1] if values else None),
+                    'mean_ms': _ms(sum(values) / len(values) if values else None),
+                    'error_messages': dict(sorted(errors.items(), key=lambda e: -e[1])[:5])
+                }
+            return result
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+class ServerSampler:
+    """Samples RSS and thread count of the server process from /proc (Linux)"""
+    
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # [(rss_kb, threads)]
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def read(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+            return int(fields['VmRSS'].split()[0]), int(fields['Threads'])
+        except (OSError, KeyError, ValueError):
+            return None
+    
+    def start(self):
+        if self.read() is None:
+            return False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return True
+    
+    def _run(self):
+        while True:
+            sample = self.read()
+            if sample:
+                self.samples.append(sample)
+            if self._stop.wait(self.interval):
+                break
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+    
+    def summary(self):
+        if not self.samples:
+            return None
+        rss = [s[0] for s in self.samples]
+        threads = [s[1] for s in self.samples]
+        return {
+            'pid': self.pid,
+            'rss_mb_start': round(rss[0] / 1024, 1),
+            'rss_mb_peak': round(max(rss) / 1024, 1),
+            'rss_mb_end': round(rss[-1] / 1024, 1),
+            'threads_start': threads[0],
+            'threads_peak': max(threads),
+            'threads_end': threads[-1]
+        }
+
+
+class SimUser:
+    """One simulated student or teacher on its own connection"""
+    
+    def __init__(self, run, role, index):
+        self.run = run
+        self.role = role
+        self.username = f"{run.args.prefix}{role[0]}{index:06d}"
+        self.index = index
+        self.proto = ProtocolWrapper()
+        self.socket = None
+        self.failed = None  # Reason this user stopped, or None
+        self.phase = None
+        self.pushes = []  # [(receive time, msg_type, payload)]
+        self.rng = random.Random(f"{run.args.seed}:{self.username}")
+    
+    # ==================== Transport ====================
+    
+    def connect(self):
+        self.close()
+        self.socket = self.proto.connect_to_server(self.run.args.host, self.run.args.port)
+        if self.socket < 0:
+            self.socket = None
+            raise ConnectionError("Connect failed")
+        self.proto.set_recv_timeout(self.socket, self.run.args.timeout)
+    
+    def close(self):
+        if self.socket is not None:
+            try:
+                self.proto.close_socket(self.socket)
+            except Exception:
+                pass
+            self.socket = None
+    
+    def _receive(self):
+        message = self.proto.receive_message(self.socket, 1024 * 1024)
+        return time.monotonic(), message
+    
+    def request(self, msg_type, payload, ok_codes=(ERR_SUCCESS,)):
+        """
+        Send a request and wait for its response (pushes in between are kept)
+        
+        Returns:
+            dict or None: Response payload, or None on error (recorded)
+        """
+        name = get_message_type_name(msg_type)
+        started = time.monotonic()
+        try:
+            self.proto.send_message(self.socket, msg_type, payload)
+            while True:
+                received, message = self._receive()
+                if message['message_type'] in PUSH_TYPES:
+                    self.pushes.append((received, message['message_type'], message['payload']))
+                    continue
+                break
+        except RuntimeError as e:
+            self.run.metrics.error(name, e)
+            self.failed = f"{name}: {e}"
+            return None
+        
+        self.run.metrics.record(name, received - started, self.phase)
+        response = message['payload']
+        if message['message_type'] == MSG_ERROR or response.get('code') not in ok_codes:
+            self.run.metrics.error(name, response.get('message', response.get('code')))
+            return None
+        return response
+    
+    def wait_push(self, match, timeout):
+        """Wait for a push matching match(msg_type, payload); returns its receive time or None"""
+        for received, msg_type, payload in self.pushes:
+            if match(msg_type, payload):
+                return received
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline:
+                received, message = self._receive()
+                self.pushes.append((received, message['message_type'], message['payload']))
+                if match(message['message_type'], message['payload']):
+                    return received
+        except RuntimeError as e:
+            self.failed = f"push wait: {e}"
+        return None
+    
+    # ==================== Phases ====================
+    
+    def do_register(self):
+        self.connect()
+        for attempt in range(5):
+            response = self.request(MSG_REGISTER_REQ, {
+                'username': self.username,
+                'password': PASSWORD,
+                'full_name': f"Load {self.role.title()} {self.index}",
+                'email': f"{self.username}@load.test",
+                'role': self.role
+            }, ok_codes=(ERR_SUCCESS, ERR_USERNAME_EXISTS, ERR_SERVER_BUSY))
+            if not response or response['code'] != ERR_SERVER_BUSY:
+                break
+            self.run.metrics.count('register_busy_retries')
+            time.sleep(response.get('retry_after', 1) * (attempt + 1) * self.rng.uniform(0.5, 1.5))
+        self.close()
+        if response is None:
+            self.failed = self.failed or "register failed"
+    
+    def do_login(self):
+        for attempt in range(5):
+            self.connect()
+            response = self.request(MSG_LOGIN_REQ, {
+                'username': self.username,
+                'password': PASSWORD,
+                'role': self.role
+            }, ok_codes=(ERR_SUCCESS, ERR_SERVER_BUSY))
+            if response and response['code'] == ERR_SERVER_BUSY:
+                # Server closes the connection after a refused login
+                self.run.metrics.count('login_busy_retries')
+                time.sleep(response.get('retry_after', 1) * (attempt + 1) * self.rng.uniform(0.5, 1.5))
+                continue
+            break
+        if response is None or response.get('code') != ERR_SUCCESS:
+            self.failed = self.failed or "login failed"
+            return
+        self.proto.set_session_token(response['session_token'])
+    
+    def do_setup(self):
+        if self.role != 'teacher':
+            return
+        args = self.run.args
+        for r in range(args.rooms_per_teacher):
+            created = self.request(MSG_CREATE_ROOM_REQ, {
+                'room_name': f"Load room {self.index}-{r}",
+                'num_questions': args.questions,
+                'duration_minutes': args.duration
+            })
+            if not created:
+                self.failed = self.failed or "create room failed"
+                return
+            room_id = created['data']['room_id']
+            questions = [{
+                'question_text': f"Load question {q + 1} of room {room_id}?",
+                'option_a': 'Alpha', 'option_b': 'Beta', 'option_c': 'Gamma', 'option_d': 'Delta',
+                'correct_answer': self.rng.randrange(4)
+            } for q in range(args.questions)]
+            if self.request(MSG_BULK_ADD_QUESTIONS_REQ, {'room_id': room_id, 'questions': questions}):
+                self.run.add_room(room_id)
+    
+    def do_join(self):
+        if self.role != 'student':
+            return
+        rooms = self.run.rooms
+        if not rooms:
+            self.failed = "no rooms"
+            return
+        self.room_id = rooms[self.index % len(rooms)]
+        self.exam = None
+        if not self.request(MSG_JOIN_ROOM_REQ, {'room_id': self.room_id}):
+            self.failed = self.failed or "join failed"
+            return
+        if self.run.args.prefetch:
+            response = self.request(MSG_PREFETCH_EXAM_REQ, {'room_id': self.room_id})
+            if response:
+                self.exam = response['data']
+    
+    def do_start(self):
+        if self.role == 'teacher':
+            for room_id in self.run.rooms_of_teacher(self):
+                self.request(MSG_START_ROOM_REQ, {'room_id': room_id})
+            return
+        
+        received = self.wait_push(
+            lambda t, p: t == MSG_ROOM_STATUS and p.get('room_id') == self.room_id and p.get('action') == 'started',
+            self.run.args.timeout)
+        if received is None:
+            self.run.metrics.error('ROOM_STATUS (push)', 'not received')
+        else:
+            self.run.metrics.record('ROOM_STATUS (push)', received - self.run.phase_started, self.phase)
+        
+        payload = {'room_id': self.room_id}
+        if self.exam:
+            payload['exam_version'] = self.exam['exam_version']
+        response = self.request(MSG_START_ROOM_TEST_REQ, payload)
+        if not response:
+            self.failed = self.failed or "start test failed"
+            return
+        
+        data = response['data']
+        if 'questions' in data:
+            self.questions = data['questions']
+        else:
+            self.questions = decrypt_exam(data['exam_key'], self.exam['blob'])
+    
+    def _answers(self, answered):
+        return [{'question_id': q['id'], 'selected': self.rng.randrange(4) if i < answered else -1}
+                for i, q in enumerate(self.questions)]
+    
+    def do_autosave(self):
+        if self.role != 'student':
+            return
+        args = self.run.args
+        for round_ in range(args.autosaves):
+            # Spread students over the interval like real clocks would
+            time.sleep(args.autosave_interval * self.rng.uniform(0.5, 1.5) if round_ else
+                       args.autosave_interval * self.rng.random())
+            answered = len(self.questions) * (round_ + 1) // (args.autosaves + 1)
+            self.request(MSG_AUTO_SAVE_REQ, {'room_id': self.room_id, 'answers': self._answers(answered)})
+    
+    def do_submit(self):
+        if self.role != 'student':
+            return
+        self.request(MSG_SUBMIT_ROOM_TEST_REQ, {
+            'room_id': self.room_id,
+            'answers': self._answers(len(self.questions)),
+            'request_id': f"{self.username}-submit"
+        })
+    
+    # ==================== Thread ====================
+    
+    def main(self):
+        for phase in PHASES:
+            self.phase = phase
+            self.run.sync()
+            if self.failed or (phase == 'register' and self.run.args.skip_register):
+                continue
+            try:
+                getattr(self, f"do_{phase}")()
+            except Exception as e:
+                self.failed = f"{phase}: {e}"
+                self.run.metrics.error(phase, e)
+        self.close()
+
+
+class LoadRun:
+    """Shared state of one run: users, rooms, phase barrier and metrics"""
+    
+    def __init__(self, args):
+        self.args = args
+        self.metrics = Metrics()
+        self.rooms = []
+        self._room_owner = {}  # {room_id: teacher username}
+        self._lock = threading.Lock()
+        self.users = ([SimUser(self, 'teacher', i) for i in range(args.teachers)] +
+                      [SimUser(self, 'student', i) for i in range(args.students)])
+        self.phase_marks = []  # [monotonic time at the start of each phase]
+        self.phase_started = None
+        self._barrier = threading.Barrier(len(self.users), action=self._next_phase)
+    
+    def _next_phase(self):
+        self.phase_started = time.monotonic()
+        self.phase_marks.append(self.phase_started)
+        if not self.args.quiet and len(self.phase_marks) <= len(PHASES):
+            print(f"[LOAD] Phase {PHASES[len(self.phase_marks) - 1]}", file=sys.stderr)
+    
+    def sync(self):
+        """Wait for all users to finish the previous phase"""
+        try:
+            self._barrier.wait(timeout=self.args.phase_timeout)
+        except threading.BrokenBarrierError:
+            pass  # A user is stuck: carry on without lockstep
+    
+    def add_room(self, room_id):
+        with self._lock:
+            self.rooms.append(room_id)
+            self._room_owner[room_id] = threading.current_thread().name
+    
+    def rooms_of_teacher(self, teacher):
+        with self._lock:
+            return [r for r, owner in self._room_owner.items() if owner == teacher.username]
+    
+    def execute(self):
+        sampler = ServerSampler(self.args.server_pid) if self.args.server_pid else None
+        if sampler and not sampler.start():
+            sampler = None
+        
+        started = time.monotonic()
+        threads = [threading.Thread(target=u.main, name=u.username, daemon=True) for u in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        finished = time.monotonic()
+        
+        if sampler:
+            sampler.stop()
+        return self.report(finished - started, sampler)
+    
+    def report(self, duration, sampler):
+        marks = self.phase_marks + [time.monotonic()]
+        phases = {}
+        for i, name in enumerate(PHASES[:len(marks) - 1]):
+            seconds = marks[i + 1] - marks[i]
+            requests = self.metrics.phase_requests.get(name, 0)
+            phases[name] = {
+                'duration_s': round(seconds, 3),
+                'requests': requests,
+                'requests_per_sec': round(requests / seconds, 1) if seconds > 0 else None
+            }
+        
+        messages = self.metrics.summary()
+        total = sum(m['count'] for name, m in messages.items() if '(push)' not in name)
+        failures = defaultdict(int)
+        for user in self.users:
+            if user.failed:
+                failures[user.failed.split(':')[0]] += 1
+        
+        return {
+            'config': {k: v for k, v in vars(self.args).items() if k not in ('output', 'quiet')},
+            'duration_s': round(duration, 3),
+            'requests': total,
+            'errors': sum(m['errors'] for m in messages.values()),
+            'requests_per_sec': round(total / duration, 1) if duration > 0 else None,
+            'failed_users': sum(failures.values()),
+            'failures': dict(failures),
+            'retries': dict(self.metrics.counters),
+            'phases': phases,
+            'messages': messages,
+            'server': sampler.summary() if sampler else None
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exam-day load generator for the TAP server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--teachers', type=int, default=2)
+    parser.add_argument('--rooms-per-teacher', type=int, default=1)
+    parser.add_argument('--questions', type=int, default=20, help="Questions per room (1-50)")
+    parser.add_argument('--duration', type=int, default=30, help="Room duration in minutes (5-180)")
+    parser.add_argument('--autosaves', type=int, default=3, help="Auto-saves per student")
+    parser.add_argument('--autosave-interval', type=float, default=30.0, help="Seconds between auto-saves")
+    parser.add_argument('--prefetch', action='store_true', help="Prefetch the encrypted exam after joining")
+    parser.add_argument('--skip-register', action='store_true', help="Accounts exist from an earlier run")
+    parser.add_argument('--prefix', default='lg', help="Username prefix (letters/digits)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for jitter and answers")
+    parser.add_argument('--timeout', type=int, default=60, help="Receive timeout per message (seconds)")
+    parser.add_argument('--phase-timeout', type=float, default=600, help="Max seconds to wait for a phase")
+    parser.add_argument('--server-pid', type=int, help="Sample RSS/threads of this process (Linux)")
+    parser.add_argument('-o', '--output', help="Write JSON report to this file (default: stdout)")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+    
+    if not args.prefix.isalnum() or len(args.prefix) > 12:
+        parser.error("--prefix must be letters/digits, at most 12 characters")
+    if args.students < 1 or args.teachers < 1:
+        parser.error("need at least one student and one teacher")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run = LoadRun(args)
+    report = run.execute()
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        if not args.quiet:
+            print(f"[LOAD] {report['requests']} requests in {report['duration_s']}s, "
+                  f"{report['errors']} errors, {report['failed_users']} failed users -> {args.output}",
+                  file=sys.stderr)
+    else:
+        print(text)
+    return 0 if report['failed_users'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
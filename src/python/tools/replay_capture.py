@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Capture Replay
+Re-drives a traffic capture (server --capture) against a running TAP server
+and reports how its latencies and results diverge from the recording
+
+Each recorded connection gets its own thread and connection. Frames are
+sent with their recorded payload, at their recorded offset divided by
+--speed (0: as fast as possible), and in capture order: a frame is not sent
+before the frames recorded ahead of it, nor before the responses the server
+had sent by the time it arrived. That keeps cross-connection causality
+(a teacher starts the room before students open the test) at any speed.
+
+Session tokens differ between runs: the token a replayed LOGIN/RESUME
+returns replaces the recorded one in later headers and RESUME payloads.
+Room ids are remapped the same way (the id a replayed CREATE_ROOM/
+CLONE_ROOM returns replaces the one the recording used next on that
+connection), since concurrent teachers may get them in another order.
+
+Replay against the database the capture started from (copy data/app.db
+before starting a captured server), otherwise registrations, joins and
+submissions answer differently. Captures hold passwords and tokens.
+
+Latencies compared per message type:
+    recorded  server time, frame received -> response sent (from the capture)
+    replay    round trip seen by this tool (includes the network)
+
+Usage (from src/python, with the server running):
+    python -m tools.replay_capture data/traffic.tapcap
+    python -m tools.replay_capture data/traffic.tapcap --speed 0 --fail-above 3 -o replay.json
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol_wrapper import (
+    ProtocolWrapper, get_message_type_name,
+    MSG_LOGIN_REQ, MSG_RESUME_REQ, MSG_CREATE_ROOM_REQ, MSG_CLONE_ROOM_REQ,
+    MSG_ROOM_STATUS, MSG_ROOM_PROGRESS, MSG_EVENT, MSG_ERROR,
+    ERR_SUCCESS
+)
+from traffic_capture import read_capture, FRAME_IN, FRAME_OUT, CLOSE
+from tools.load_generator import percentile, _ms
+
+PUSH_TYPES = (MSG_ROOM_STATUS, MSG_ROOM_PROGRESS, MSG_EVENT)
+SESSION_TYPES = (MSG_LOGIN_REQ, MSG_RESUME_REQ)
+ROOM_CREATE_TYPES = (MSG_CREATE_ROOM_REQ, MSG_CLONE_ROOM_REQ)
+
+
+class Frame:
+    """One recorded request and what the server answered to it"""
+    
+    __slots__ = ('index', 'conn', 'offset', 'msg_type', 'token', 'payload', 'room_id', 'pushes_before',
+                 'response_type', 'response_code', 'response_offset', 'issued_token', 'issued_room',
+                 'sent_at', 'lag', 'replay_type', 'replay_code', 'replay_message', 'replay_latency', 'failure')
+    
+    def __init__(self, index, record):
+        self.index = index
+        self.conn = record['conn']
+        self.offset = record['offset']
+        self.msg_type = record['msg_type']
+        self.token = record['token']
+        self.payload = record['payload']
+        self.room_id = _room_id(self.payload)
+        self.pushes_before = 0       # Pushes the connection had received when this was sent
+        self.response_type = None    # None: the server sent no response
+        self.response_code = None
+        self.response_offset = None
+        self.issued_token = None     # Recorded token a LOGIN/RESUME on this connection led to
+        self.issued_room = None      # Recorded room id a CREATE_ROOM/CLONE_ROOM led to
+        self.sent_at = None
+        self.lag = None
+        self.replay_type = None
+        self.replay_code = None
+        self.replay_message = None
+        self.replay_latency = None
+        self.failure = None
+    
+    @property
+    def name(self):
+        return get_message_type_name(self.msg_type)
+    
+    @property
+    def recorded_latency(self):
+        return self.response_offset - self.offset if self.response_offset is not None else None
+
+
+def _room_id(payload):
+    """Top-level room_id of a JSON payload (None if there is none)"""
+    if b'"room_id"' not in payload:
+        return None
+    try:
+        request = json.loads(payload)
+    except ValueError:
+        return None
+    return request.get('room_id') if isinstance(request, dict) else None
+
+
+def load_frames(path):
+    """
+    Requests of a capture in arrival order, each with its recorded response
+    
+    Returns:
+        tuple: (start time, [Frame], {conn: close offset})
+    """
+    started, records = read_capture(path)
+    records.sort(key=lambda record: record['offset'])  # Broadcasts are written after they started
+    frames = []
+    pending = {}  # {conn: frame waiting for its response}
+    last_session = {}  # {conn: last LOGIN/RESUME frame, until a token shows up}
+    last_create = {}  # {conn: last CREATE_ROOM/CLONE_ROOM frame, until a room id shows up}
+    pushes = defaultdict(int)
+    closes = {}
+    for record in records:
+        conn = record['conn']
+        if record['kind'] == FRAME_IN:
+            frame = Frame(len(frames), record)
+            frame.pushes_before = pushes[conn]
+            frames.append(frame)
+            pending[conn] = frame
+            session_frame = last_session.get(conn)
+            if frame.token and session_frame is not None and frame.token != session_frame.token:
+                session_frame.issued_token = frame.token
+                del last_session[conn]
+            if frame.msg_type in SESSION_TYPES:
+                last_session[conn] = frame
+            create_frame = last_create.pop(conn, None)
+            if create_frame is not None and frame.room_id is None:
+                last_create[conn] = create_frame
+            elif create_frame is not None:
+                create_frame.issued_room = frame.room_id
+            if frame.msg_type in ROOM_CREATE_TYPES:
+                last_create[conn] = frame
+        elif record['kind'] == FRAME_OUT:
+            frame = pending.get(conn)
+            if record['msg_type'] in PUSH_TYPES:
+                pushes[conn] += 1
+            elif frame is not None:
+                frame.response_type = record['msg_type']
+                frame.response_code = record['code']
+                frame.response_offset = record['offset']
+                del pending[conn]
+        elif record['kind'] == CLOSE:
+            closes[conn] = record['offset']
+    return started, frames, closes
+
+
+class _Prefix:
+    """Length of the leading run of done items (items finish in any order)"""
+    
+    def __init__(self, size):
+        self.done = [False] * size
+        self.length = 0
+    
+    def mark(self, position):
+        self.done[position] = True
+        while self.length < len(self.done) and self.done[self.length]:
+            self.length += 1
+
+
+class Sequencer:
+    """
+    Keeps replayed frames in capture order
+    
+    Frame i may be sent once frames 0..i-1 were sent and every response the
+    server had sent before frame i arrived has been received again (or
+    given up on). Pushes are waited for per connection (see
+    Replay._await_pushes).
+    """
+    
+    def __init__(self, frames):
+        self._cond = threading.Condition()
+        self._sent = _Prefix(len(frames))
+        # Answered frames in recorded response order; frame i waits for a prefix of it
+        answered = sorted((f.response_offset, f.index) for f in frames if f.response_offset is not None)
+        self._answer_rank = {index: rank for rank, (_, index) in enumerate(answered)}
+        response_offsets = [offset for offset, _ in answered]
+        self._needs = [bisect.bisect_left(response_offsets, f.offset) for f in frames]
+        self._answered = _Prefix(len(answered))
+    
+    def wait_turn(self, frame, timeout):
+        """Block until frame may be sent (False on timeout)"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._sent.length >= frame.index and self._answered.length >= self._needs[frame.index],
+                timeout
+            )
+    
+    def sent(self, frame):
+        with self._cond:
+            self._sent.mark(frame.index)
+            self._cond.notify_all()
+    
+    def answered(self, frame):
+        rank = self._answer_rank.get(frame.index)
+        if rank is None:
+            return
+        with self._cond:
+            self._answered.mark(rank)
+            self._cond.notify_all()
+    
+    def skip(self, frame):
+        """Frame will not be (fully) replayed: release whoever waits for it"""
+        self.sent(frame)
+        self.answered(frame)
+
+
+class Replay:
+    """Replays one capture"""
+    
+    def __init__(self, args, frames, closes):
+        self.args = args
+        self.frames = frames
+        self.closes = closes
+        self.sequencer = Sequencer(frames) if not args.unordered else None
+        self.tokens = {}  # {recorded token: replayed token}
+        self.room_ids = {}  # {recorded room id: replayed room id}
+        self._ids_lock = threading.Lock()
+        self.failed_connections = {}  # {conn: reason}
+        self.origin = 0.0
+        self.started = None
+    
+    def map_token(self, token):
+        with self._ids_lock:
+            return self.tokens.get(token, token)
+    
+    def map_room(self, room_id):
+        with self._ids_lock:
+            return self.room_ids.get(room_id, room_id)
+    
+    def execute(self):
+        by_conn = defaultdict(list)
+        for frame in self.frames:
+            by_conn[frame.conn].append(frame)
+        
+        # Offsets count from the capture start; replay starts at the first frame
+        self.origin = self.frames[0].offset if self.frames else 0.0
+        self.started = time.monotonic()
+        threads = [threading.Thread(target=self._run_connection, args=(conn, frames), daemon=True)
+                   for conn, frames in by_conn.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - self.started
+    
+    def _wait_until(self, offset):
+        if self.args.speed > 0:
+            delay = self.started + (offset - self.origin) / self.args.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    
+    def _run_connection(self, conn, frames):
+        proto = ProtocolWrapper()
+        socket = None
+        pushes = 0
+        remaining = list(frames)
+        try:
+            while remaining:
+                frame = remaining[0]
+                self._wait_until(frame.offset)
+                if self.sequencer and not self.sequencer.wait_turn(frame, self.args.timeout * 4):
+                    raise RuntimeError("gave up waiting for earlier frames")
+                if socket is None:
+                    socket = proto.connect_to_server(self.args.host, self.args.port)
+                    if socket < 0:
+                        socket = None
+                        raise ConnectionError("connect failed")
+                    proto.set_recv_timeout(socket, self.args.timeout)
+                if pushes < frame.pushes_before:
+                    pushes += self._await_pushes(proto, socket, frame.pushes_before - pushes)
+                pushes += self._replay_frame(proto, socket, frame)
+                remaining.pop(0)
+            
+            if conn in self.closes:
+                self._wait_until(self.closes[conn])
+        except Exception as e:
+            self.failed_connections[conn] = str(e)
+            for frame in remaining:
+                if frame.failure is None:
+                    frame.failure = f"not sent: {e}" if frame.sent_at is None else str(e)
+                if self.sequencer:
+                    self.sequencer.skip(frame)
+        finally:
+            if socket is not None:
+                proto.close_socket(socket)
+    
+    def _await_pushes(self, proto, socket, count):
+        """
+        Receive the pushes that preceded the next frame in the recording
+        (a student sends START_ROOM_TEST_REQ after the ROOM_STATUS push)
+        
+        Returns:
+            int: Pushes received (fewer if they stopped coming within --timeout)
+        """
+        received = 0
+        while received < count:
+            try:
+                message = proto.receive_message(socket, 1024 * 1024)
+            except RuntimeError:
+                break
+            if message['message_type'] in PUSH_TYPES:
+                received += 1
+        return received
+    
+    def _replay_frame(self, proto, socket, frame):
+        """Send one frame and wait for its response; returns the pushes received meanwhile"""
+        token = self.map_token(frame.token).encode('utf-8') if frame.token else None
+        payload = frame.payload
+        room_id = self.map_room(frame.room_id)
+        if (frame.msg_type == MSG_RESUME_REQ and payload) or room_id != frame.room_id:
+            request = json.loads(payload)
+            if frame.msg_type == MSG_RESUME_REQ:
+                request['session_token'] = self.map_token(request.get('session_token', ''))
+            if room_id != frame.room_id:
+                request['room_id'] = room_id
+            payload = json.dumps(request).encode('utf-8')
+        
+        # Recorded bytes as they are (send_message would re-encode the JSON)
+        sent_at = time.monotonic()
+        result = proto.lib.py_send_protocol_message(socket, frame.msg_type, payload or None, token)
+        frame.sent_at = sent_at
+        if self.args.speed > 0:
+            frame.lag = sent_at - (self.started + (frame.offset - self.origin) / self.args.speed)
+        if self.sequencer:
+            self.sequencer.sent(frame)
+        if result < 0:
+            frame.failure = f"send failed ({result})"
+            raise ConnectionError(frame.failure)
+        
+        pushes = 0
+        try:
+            if frame.response_type is None:
+                return pushes
+            expected = (frame.response_type, frame.msg_type + 1, MSG_ERROR)
+            while True:
+                message = proto.receive_message(socket, 1024 * 1024)
+                if message['message_type'] in expected:
+                    break
+                if message['message_type'] in PUSH_TYPES:
+                    pushes += 1
+            frame.replay_latency = time.monotonic() - sent_at
+            frame.replay_type = message['message_type']
+            response = message['payload'] if isinstance(message['payload'], dict) else {}
+            frame.replay_code = response.get('code')
+            frame.replay_message = response.get('message')
+            
+            if frame.issued_token and frame.replay_code == ERR_SUCCESS and response.get('session_token'):
+                with self._ids_lock:
+                    self.tokens[frame.issued_token] = response['session_token']
+            data = response.get('data')
+            if frame.issued_room is not None and frame.replay_code == ERR_SUCCESS and isinstance(data, dict):
+                with self._ids_lock:
+                    self.room_ids[frame.issued_room] = data.get('room_id', frame.issued_room)
+            return pushes
+        except RuntimeError as e:
+            frame.failure = f"no response: {e}"
+            raise
+        finally:
+            if self.sequencer:
+                self.sequencer.answered(frame)
+
+
+def _outcome(msg_type, code):
+    return 'ERROR' if msg_type == MSG_ERROR else code
+
+
+def build_report(args, started, frames, replay, duration):
+    types = defaultdict(lambda: {'recorded': [], 'replay': [], 'mismatches': 0, 'failures': 0, 'count': 0})
+    divergences = []
+    mismatches = []
+    for frame in frames:
+        entry = types[frame.name]
+        entry['count'] += 1
+        if frame.failure:
+            entry['failures'] += 1
+            continue
+        if frame.response_type is None or frame.replay_latency is None:
+            continue
+        entry['recorded'].append(frame.recorded_latency)
+        entry['replay'].append(frame.replay_latency)
+        divergences.append(frame)
+        recorded = _outcome(frame.response_type, frame.response_code)
+        replayed = _outcome(frame.replay_type, frame.replay_code)
+        if recorded != replayed:
+            entry['mismatches'] += 1
+            mismatches.append({'frame': frame.index, 'conn': frame.conn, 'type': frame.name,
+                               'recorded': recorded, 'replay': replayed, 'message': frame.replay_message})
+    
+    summary = {}
+    for name in sorted(types):
+        entry = types[name]
+        recorded = sorted(entry['recorded'])
+        replayed = sorted(entry['replay'])
+        recorded_p95 = percentile(recorded, 95)
+        replay_p95 = percentile(replayed, 95)
+        summary[name] = {
+            'count': entry['count'],
+            'failures': entry['failures'],
+            'mismatches': entry['mismatches'],
+            'recorded_p50_ms': _ms(percentile(recorded, 50)),
+            'recorded_p95_ms': _ms(recorded_p95),
+            'replay_p50_ms': _ms(percentile(replayed, 50)),
+            'replay_p95_ms': _ms(replay_p95),
+            'replay_p99_ms': _ms(percentile(replayed, 99)),
+            # Round trip over server time: >1 is expected, a jump between runs is the signal
+            'p95_ratio': round(replay_p95 / max(recorded_p95, 1e-4), 2) if replayed else None
+        }
+    
+    divergences.sort(key=lambda f: f.recorded_latency - f.replay_latency)
+    lags = sorted(f.lag for f in frames if f.lag is not None)
+    failed = sum(1 for f in frames if f.failure)
+    return {
+        'capture': args.capture,
+        'captured_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'target': f"{args.host}:{args.port}",
+        'speed': args.speed or 'max',
+        'ordered': not args.unordered,
+        'connections': len({f.conn for f in frames}),
+        'frames': len(frames),
+        'recorded_duration_s': round(frames[-1].offset - frames[0].offset, 2) if frames else 0,
+        'duration_s': round(duration, 2),
+        'failed_frames': failed,
+        'mismatches': len(mismatches),
+        'schedule_lag_ms': {
+            'p50': _ms(percentile(lags, 50)),
+            'p95': _ms(percentile(lags, 95)),
+            'max': _ms(lags[-1] if lags else None)
+        },
+        'types': summary,
+        'top_divergences': [
+            {'frame': f.index, 'conn': f.conn, 'type': f.name,
+             'recorded_ms': _ms(f.recorded_latency), 'replay_ms': _ms(f.replay_latency)}
+            for f in divergences[:10]
+        ],
+        'mismatch_samples': mismatches[:20],
+        'failed_connections': dict(list(replay.failed_connections.items())[:20])
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a TAP traffic capture against a server")
+    parser.add_argument('capture', help="Capture file written by the server (--capture)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--speed', type=float, default=1.0, help="Time scale (2 = twice as fast, 0 = no waiting)")
+    parser.add_argument('--unordered', action='store_true',
+                        help="Only follow the schedule, not the capture order across connections")
+    parser.add_argument('--timeout', type=int, default=10, help="Receive timeout per response (seconds)")
+    parser.add_argument('--fail-above', type=float, metavar='RATIO',
+                        help="Exit 1 if a message type's replay/recorded p95 ratio exceeds RATIO")
+    parser.add_argument('-o', '--output', help="Write JSON report to this file (default: stdout)")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+    
+    if args.speed < 0:
+        parser.error("--speed must be 0 or more")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        started, frames, closes = load_frames(args.capture)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read capture: {e}", file=sys.stderr)
+        return 2
+    
+    replay = Replay(args, frames, closes)
+    duration = replay.execute()
+    report = build_report(args, started, frames, replay, duration)
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        if not args.quiet:
+            print(f"[REPLAY] {report['frames']} frames in {report['duration_s']}s "
+                  f"(recorded {report['recorded_duration_s']}s), {report['failed_frames']} failed, "
+                  f"{report['mismatches']} mismatches -> {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    
+    slow = [name for name, entry in report['types'].items()
+            if args.fail_above and entry['p95_ratio'] and entry['p95_ratio'] > args.fail_above]
+    if slow and not args.quiet:
+        print(f"[REPLAY] p95 ratio above {args.fail_above}: {', '.join(slow)}", file=sys.stderr)
+    return 0 if not (slow or report['failed_frames'] or report['mismatches']) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
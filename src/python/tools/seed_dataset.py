@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Dataset Seeder
+Fills a fresh database (schema from Database.init_database) with a large,
+reproducible exam history for query-plan and benchmark work
+
+Same --seed and volumes give the same rows on every machine. Rooms are
+created in time order: old rooms are ended, the newest ones are active or
+waiting, so the lobby queries see what a real semester leaves behind.
+
+    users              teachers + students (Pareto activity: a few teachers
+                       own many rooms, a few students take many exams)
+    question_bank      unique questions, rooms draw local windows of it
+    test_rooms         ended / active / waiting, varied size and duration
+    room_questions     spread over rooms around the mean
+    room_participants  one per result (ended), testing/joined (active/waiting)
+    test_results       one per participant of an ended room
+    test_progress      final for ended rooms, partial for active ones
+
+Seeded accounts are <prefix><t|s><index:06d> with one shared password, the
+naming the load generator uses (python -m tools.load_generator --prefix ds
+--skip-register logs in as seeded users).
+
+Usage (from src/python):
+    python -m tools.seed_dataset data/seed_small.db
+    python -m tools.seed_dataset data/seed_large.db --preset large
+    python -m tools.seed_dataset /tmp/x.db --students 50000 --results 2000000 --answers none --seed 7
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import Database
+from database.question_bank_repository import content_hash
+
+# results = rows in test_results; test_progress gets one more row per active-room participant
+PRESETS = {
+    'small': {'teachers': 50, 'students': 2000, 'rooms': 400, 'room_questions': 16000,
+              'bank': 4000, 'results': 40000, 'answers': 'full'},
+    'medium': {'teachers': 500, 'students': 20000, 'rooms': 4000, 'room_questions': 200000,
+               'bank': 40000, 'results': 500000, 'answers': 'full'},
+    'large': {'teachers': 5000, 'students': 100000, 'rooms': 20000, 'room_questions': 1000000,
+              'bank': 200000, 'results': 5000000, 'answers': 'none'}
+}
+VOLUME_KEYS = ('teachers', 'students', 'rooms', 'room_questions', 'bank', 'results')
+
+# Share of rooms per status (oldest first: ended, then active/waiting mixed)
+ENDED_SHARE = 0.85
+ACTIVE_SHARE_OF_OPEN = 0.35
+DURATIONS = (15, 30, 45, 60, 90)
+DURATION_WEIGHTS = (1, 3, 4, 3, 1)
+
+# Same default as the load generator, so its users can log in to a seeded database
+DEFAULT_PASSWORD = 'loadtest123'
+PBKDF2_ITERATIONS = 100000
+
+SUBJECTS = ('Mạng máy tính', 'Hệ điều hành', 'Cơ sở dữ liệu', 'Lập trình C', 'Giải tích', 'Vật lý',
+            'Cấu trúc dữ liệu', 'Xác suất thống kê')
+TOPICS = ('giao thức TCP', 'bắt tay ba bước', 'địa chỉ IP', 'socket', 'select()', 'luồng', 'khóa mutex',
+          'chỉ mục B-tree', 'giao dịch', 'con trỏ', 'đạo hàm', 'tích phân', 'định luật Ohm', 'cây AVL',
+          'bảng băm', 'phân phối chuẩn')
+FAMILY_NAMES = ('Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Vũ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ')
+MIDDLE_NAMES = ('Văn', 'Thị', 'Minh', 'Đức', 'Thu', 'Quang', 'Ngọc', 'Hữu')
+GIVEN_NAMES = ('An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hùng', 'Lan', 'Linh', 'Long', 'Mai',
+               'Nam', 'Phong', 'Quân', 'Sơn', 'Trang', 'Tú', 'Việt', 'Yến')
+CODE_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+
+def hash_password(password, seed):
+    """AuthManager.hash_password with a salt derived from the seed instead of a random one"""
+    salt = hashlib.sha256(f"{seed}:salt".encode('utf-8')).hexdigest()[:32]
+    pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), PBKDF2_ITERATIONS)
+    return f"{salt}${pwd_hash.hex()}"
+
+
+def apportion(total, weights, cap=None, floor=1):
+    """
+    Split total into integers proportional to weights (largest remainder)
+    
+    Each share is clipped to [floor, cap], so the sum can miss total when
+    the bounds bite; callers report the real counts.
+    """
+    weight_sum = sum(weights) or 1
+    exact = [total * w / weight_sum for w in weights]
+    shares = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in by_remainder[:total - sum(shares)]:
+        shares[i] += 1
+    return [max(floor, min(cap, s) if cap is not None else s) for s in shares]
+
+
+def weighted_sample(rng, cum_weights, k):
+    """k distinct indices drawn with the given cumulative weights"""
+    population = len(cum_weights)
+    if k >= population:
+        return list(range(population))
+    if k > population // 3:
+        return rng.sample(range(population), k)  # Dense rooms: weights barely matter
+    
+    total = cum_weights[-1]
+    chosen = set()
+    while len(chosen) < k:
+        chosen.add(bisect.bisect(cum_weights, rng.random() * total, 0, population - 1))
+    return list(chosen)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def sql_time(moment):
+    """CURRENT_TIMESTAMP format (created_at, joined_at, saved_at, test_date)"""
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class DatasetSeeder:
+    """
+    Bulk loader for one empty database file
+    
+    Every table has its own random stream derived from the seed, so changing
+    the volume of one table does not reshuffle the others.
+    """
+    
+    def __init__(self, db_path, volumes, seed=1, answers='full', prefix='ds', password=DEFAULT_PASSWORD,
+                 start_date=datetime(2025, 9, 1, 7, 0, 0), days=120, batch_size=50000, log=None):
+        self.db_path = db_path
+        self.volumes = dict(volumes)
+        self.seed = seed
+        self.answers = answers
+        self.prefix = prefix
+        self.password = password
+        self.start_date = start_date
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.counts = {}
+        
+        self.teacher_ids = []
+        self.student_ids = []
+        self.bank_correct = []  # correct_answer per bank id - 1
+        self.rooms = []  # [(room_id, status, start, duration_minutes, first_question_id, bank_ids)]
+    
+    def rng(self, stream):
+        return random.Random(f"{self.seed}:{stream}")
+    
+    # ==================== Driver ====================
+    
+    def run(self):
+        """Create the schema and load every table; returns {table: rows}"""
+        with redirect_stdout(sys.stderr):
+            schema = Database(self.db_path)
+        
+        conn = schema.get_connection()
+        try:
+            if conn.execute("SELECT EXISTS (SELECT 1 FROM users)").fetchone()[0]:
+                raise ValueError(f"{self.db_path} already has users; seed an empty database")
+            
+            # The file is scratch until the load finishes: trade durability for speed
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA cache_size = -262144")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            
+            self._load(conn, 'users', self._users())
+            self._load_bank(conn, schema)
+            self._plan_rooms()
+            self._load(conn, 'test_rooms', self._test_rooms())
+            self._load(conn, 'room_questions', self._room_questions())
+            self._load_participation(conn)
+            
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+        return self.counts
+    
+    def _load(self, conn, table, rows_and_sql):
+        sql, rows = rows_and_sql
+        started = time.perf_counter()
+        loaded = 0
+        for batch in batched(rows, self.batch_size):
+            conn.executemany(sql, batch)
+            conn.commit()
+            loaded += len(batch)
+        self.counts[table] = self.counts.get(table, 0) + loaded
+        elapsed = time.perf_counter() - started
+        self.log(f"[SEED] {table}: {loaded} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+    
+    # ==================== Users ====================
+    
+    def _users(self):
+        rng = self.rng('users')
+        password_hash = hash_password(self.password, self.seed)
+        teachers = self.volumes['teachers']
+        students = self.volumes['students']
+        self.teacher_ids = list(range(1, teachers + 1))
+        self.student_ids = list(range(teachers + 1, teachers + students + 1))
+        
+        def full_name():
+            return f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}"
+        
+        def rows():
+            for i in range(teachers):
+                created = self.start_date - timedelta(days=30, minutes=rng.randrange(60 * 24 * 30))
+                yield (1 + i, f"{self.prefix}t{i:06d}", password_hash, 'teacher', full_name(),
+                       f"{self.prefix}t{i:06d}@seed.test", sql_time(created))
+            for i in range(students):
+                created = self.start_date - timedelta(minutes=rng.randrange(60 * 24 * 30))
+                email = f"{self.prefix}s{i:06d}@seed.test" if rng.random() < 0.7 else None
+                yield (teachers + 1 + i, f"{self.prefix}s{i:06d}", password_hash, 'student', full_name(),
+                       email, sql_time(created))
+        
+        return ('''
+            INSERT INTO users (id, username, password_hash, role, full_name, email, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+    
+    # ==================== Question bank ====================
+    
+    def _load_bank(self, conn, schema):
+        """Load the bank without the per-row FTS trigger, then index it in one rebuild"""
+        if not schema.fts_enabled:
+            self._load(conn, 'question_bank', self._bank())
+            return
+        
+        conn.execute("DROP TRIGGER IF EXISTS question_bank_ai")
+        conn.commit()
+        self._load(conn, 'question_bank', self._bank())
+        
+        started = time.perf_counter()
+        conn.execute("INSERT INTO question_bank_fts(question_bank_fts) VALUES ('rebuild')")
+        conn.commit()
+        with redirect_stdout(sys.stderr):
+            schema.init_database()  # Recreates the trigger
+        self.log(f"[SEED] question_bank_fts: rebuilt in {time.perf_counter() - started:.1f}s")
+    
+    def _bank(self):
+        rng = self.rng('bank')
+        
+        def rows():
+            for i in range(self.volumes['bank']):
+                subject = SUBJECTS[i * len(SUBJECTS) // max(1, self.volumes['bank'])]  # Neighbours share a subject
+                topic = rng.choice(TOPICS)
+                question = (f"Câu {i + 1} ({subject}): Phát biểu nào sau đây đúng về {topic}?",
+                            f"{topic.capitalize()} đảm bảo dữ liệu đến đúng thứ tự ({rng.randint(1, 999)})",
+                            f"{topic.capitalize()} chỉ hoạt động trên mạng cục bộ ({rng.randint(1, 999)})",
+                            f"{topic.capitalize()} không cần cấp phát tài nguyên ({rng.randint(1, 999)})",
+                            f"Cả ba phát biểu trên đều sai ({rng.randint(1, 999)})",
+                            rng.randint(0, 3))
+                self.bank_correct.append(question[5])
+                created = self.start_date - timedelta(days=rng.randrange(60))
+                yield (i + 1, content_hash(*question)) + question + (sql_time(created),)
+        
+        return ('''
+            INSERT INTO question_bank
+            (id, content_hash, question_text, option_a, option_b, option_c, option_d, correct_answer, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+    
+    # ==================== Rooms ====================
+    
+    def _plan_rooms(self):
+        """Decide status, time, size and questions of every room before writing"""
+        rng = self.rng('rooms')
+        count = self.volumes['rooms']
+        bank = len(self.bank_correct)
+        
+        ended = min(count, int(round(count * ENDED_SHARE)))
+        if count >= 3:
+            ended = max(1, min(ended, count - 2))  # Keep at least one active and one waiting room
+        open_rooms = count - ended
+        active = max(1 if open_rooms >= 2 else 0, int(round(open_rooms * ACTIVE_SHARE_OF_OPEN)))
+        open_statuses = ['active'] * active + ['waiting'] * (open_rooms - active)
+        rng.shuffle(open_statuses)
+        statuses = ['ended'] * ended + open_statuses
+        
+        sizes = apportion(self.volumes['room_questions'], [rng.lognormvariate(0, 0.4) for _ in range(count)],
+                          cap=max(1, bank))
+        span = timedelta(days=self.days)
+        next_question_id = 1
+        
+        for i, (status, size) in enumerate(zip(statuses, sizes)):
+            start = self.start_date + span * ((i + rng.random()) / count)
+            duration = rng.choices(DURATIONS, DURATION_WEIGHTS)[0]
+            window = min(bank, size * 4)
+            offset = rng.randrange(bank - window + 1)
+            bank_ids = [offset + 1 + j for j in rng.sample(range(window), size)]
+            self.rooms.append((i + 1, status, start, duration, next_question_id, bank_ids))
+            next_question_id += size
+    
+    def _test_rooms(self):
+        rng = self.rng('test_rooms')
+        teacher_weights = list(accumulate(rng.paretovariate(1.5) for _ in self.teacher_ids))
+        codes = set()
+        end_of_data = self.start_date + timedelta(days=self.days)
+        
+        def room_code():
+            while True:
+                code = ''.join(rng.choices(CODE_ALPHABET, k=6))
+                if code not in codes:
+                    codes.add(code)
+                    return code
+        
+        def rows():
+            for room_id, status, start, duration, _, bank_ids in self.rooms:
+                teacher = self.teacher_ids[bisect.bisect(teacher_weights, rng.random() * teacher_weights[-1],
+                                                         0, len(self.teacher_ids) - 1)]
+                created = start - timedelta(hours=rng.uniform(1, 72))
+                start_time = end_time = scheduled = None
+                if status != 'waiting':
+                    start_time = start.isoformat()
+                if status == 'ended':
+                    end_time = (start + timedelta(minutes=duration)).isoformat()
+                if status == 'waiting' and rng.random() < 0.3:
+                    scheduled = (end_of_data + timedelta(hours=rng.uniform(1, 240))).isoformat(timespec='minutes')
+                yield (room_id, f"{rng.choice(SUBJECTS)} - Phòng {room_id}", room_code(), teacher, len(bank_ids),
+                       duration, status, sql_time(created), start_time, end_time, scheduled)
+        
+        return ('''
+            INSERT INTO test_rooms
+            (id, room_name, room_code, teacher_id, num_questions, duration_minutes, status,
+             created_at, start_time, end_time, scheduled_start)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+    
+    def _room_questions(self):
+        def rows():
+            for room_id, _, start, _, first_id, bank_ids in self.rooms:
+                created = sql_time(start - timedelta(hours=1))
+                for order, bank_id in enumerate(bank_ids):
+                    yield (first_id + order, room_id, bank_id, order, created)
+        
+        return ('''
+            INSERT INTO room_questions (id, room_id, bank_id, question_order, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows())
+    
+    # ==================== Participation ====================
+    
+    def _load_participation(self, conn):
+        """room_participants, test_results and test_progress in one pass over the rooms"""
+        rng = self.rng('participation')
+        student_weights = list(accumulate(rng.paretovariate(2.5) for _ in self.student_ids))
+        ended_rooms = [room for room in self.rooms if room[1] == 'ended']
+        ended_sizes = apportion(self.volumes['results'], [rng.lognormvariate(0, 0.5) for _ in ended_rooms],
+                                cap=len(self.student_ids), floor=0)
+        sizes = dict(zip((room[0] for room in ended_rooms), ended_sizes))
+        
+        # Open rooms get the same mean size as ended ones
+        mean_size = max(1, self.volumes['results'] // max(1, len(ended_rooms)))
+        participants, results, progress = [], [], []
+        result_id = 0
+        started = time.perf_counter()
+        
+        for room_id, status, start, duration, first_id, bank_ids in self.rooms:
+            size = sizes.get(room_id)
+            if status != 'ended':
+                size = min(len(self.student_ids), max(0, int(rng.gauss(mean_size, mean_size / 3))))
+            question_ids = range(first_id, first_id + len(bank_ids))
+            correct = [self.bank_correct[b - 1] for b in bank_ids]
+            
+            for student in weighted_sample(rng, student_weights, size):
+                student_id = self.student_ids[student]
+                joined = start - timedelta(minutes=rng.uniform(1, 30))
+                
+                if status == 'ended':
+                    ability = min(0.98, max(0.05, rng.gauss(0.68, 0.15)))
+                    answers, score = self._answers(rng, question_ids, correct, ability, 0.97)
+                    seconds = min(duration * 60, int(duration * 60 * rng.uniform(0.35, 1.0)))
+                    submitted = start + timedelta(seconds=seconds)
+                    result_id += 1
+                    results.append((result_id, student_id, sql_time(submitted), score, len(bank_ids),
+                                    answers, seconds))
+                    participants.append((room_id, student_id, sql_time(joined), 'submitted', result_id))
+                    progress.append((room_id, student_id, answers, sql_time(submitted), 1))
+                elif status == 'active':
+                    if rng.random() < 0.1:
+                        participants.append((room_id, student_id, sql_time(joined), 'joined', None))
+                        continue
+                    ability = min(0.98, max(0.05, rng.gauss(0.68, 0.15)))
+                    answers, _ = self._answers(rng, question_ids, correct, ability, rng.random())
+                    participants.append((room_id, student_id, sql_time(joined), 'testing', None))
+                    progress.append((room_id, student_id, answers,
+                                     sql_time(start + timedelta(minutes=rng.uniform(0, duration))), 0))
+                else:
+                    participants.append((room_id, student_id, sql_time(joined), 'joined', None))
+            
+            if len(participants) >= self.batch_size:
+                self._flush_participation(conn, participants, results, progress)
+        
+        self._flush_participation(conn, participants, results, progress)
+        elapsed = time.perf_counter() - started
+        self.log(f"[SEED] room_participants/test_results/test_progress: "
+                 f"{self.counts.get('room_participants', 0)}/{self.counts.get('test_results', 0)}/"
+                 f"{self.counts.get('test_progress', 0)} rows in {elapsed:.1f}s")
+    
+    def _answers(self, rng, question_ids, correct, ability, answered_share):
+        """Answers JSON as submitted ([{'question_id', 'selected'}]) and its score"""
+        if self.answers == 'none':
+            score = sum(1 for _ in correct if rng.random() < ability * answered_share)
+            return '[]', score
+        
+        answers = []
+        score = 0
+        for question_id, right in zip(question_ids, correct):
+            if rng.random() >= answered_share:
+                continue
+            if rng.random() < ability:
+                selected = right
+                score += 1
+            else:
+                selected = (right + rng.randint(1, 3)) % 4
+            answers.append({'question_id': question_id, 'selected': selected})
+        return json.dumps(answers), score
+    
+    def _flush_participation(self, conn, participants, results, progress):
+        # Results first: participants reference them
+        conn.executemany('''
+            INSERT INTO test_results (id, student_id, test_date, score, total_questions, answers, duration_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', results)
+        conn.executemany('''
+            INSERT INTO room_participants (room_id, student_id, joined_at, status, test_result_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', participants)
+        conn.executemany('''
+            INSERT INTO test_progress (room_id, student_id, answers_json, saved_at, is_final)
+            VALUES (?, ?, ?, ?, ?)
+        ''', progress)
+        conn.commit()
+        
+        for table, rows in (('room_participants', participants), ('test_results', results),
+                            ('test_progress', progress)):
+            self.counts[table] = self.counts.get(table, 0) + len(rows)
+            rows.clear()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a fresh database with a reproducible exam history")
+    parser.add_argument('db', help="Database file to create (must not contain users)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                        help="Base volumes (large: 100k students, 20k rooms, 1M room questions, 5M results)")
+    parser.add_argument('--teachers', type=int)
+    parser.add_argument('--students', type=int)
+    parser.add_argument('--rooms', type=int)
+    parser.add_argument('--room-questions', type=int, help="Total room_questions rows")
+    parser.add_argument('--bank', type=int, help="Unique questions in question_bank")
+    parser.add_argument('--results', type=int, help="Total test_results rows (participants of ended rooms)")
+    parser.add_argument('--answers', choices=('full', 'none'),
+                        help="Per-question answer JSON, or '[]' to keep large datasets small")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='ds', help="Username prefix (letters/digits)")
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Password of every seeded account")
+    parser.add_argument('--start-date', default='2025-09-01', help="First day of the seeded history (YYYY-MM-DD)")
+    parser.add_argument('--days', type=int, default=120, help="Days the rooms are spread over")
+    parser.add_argument('--batch-size', type=int, default=50000, help="Rows per transaction")
+    parser.add_argument('--overwrite', action='store_true', help="Delete the file first if it exists")
+    parser.add_argument('--analyze', action='store_true',
+                        help="Run ANALYZE afterwards (the server never does, so the default keeps its plans)")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+    
+    volumes = dict(PRESETS[args.preset])
+    for key in VOLUME_KEYS + ('answers',):
+        if getattr(args, key) is not None:
+            volumes[key] = getattr(args, key)
+    if min(volumes[key] for key in VOLUME_KEYS) < 0 or volumes['teachers'] < 1 or volumes['students'] < 1:
+        parser.error("volumes must be positive (at least one teacher and one student)")
+    if volumes['room_questions'] and (volumes['bank'] < 1 or volumes['rooms'] < 1):
+        parser.error("room questions need at least one room and one bank question")
+    if not args.prefix.isalnum() or len(args.prefix) > 12:
+        parser.error("--prefix must be letters/digits, at most 12 characters")
+    try:
+        args.start_date = datetime.strptime(args.start_date, '%Y-%m-%d').replace(hour=7)
+    except ValueError:
+        parser.error("--start-date must be YYYY-MM-DD")
+    args.volumes = volumes
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr, flush=True))
+    
+    if os.path.exists(args.db):
+        if not args.overwrite:
+            print(f"[ERROR] {args.db} exists (use --overwrite to replace it)", file=sys.stderr)
+            return 1
+        os.remove(args.db)
+    
+    started = time.perf_counter()
+    volumes = {key: value for key, value in args.volumes.items() if key != 'answers'}
+    seeder = DatasetSeeder(args.db, volumes, seed=args.seed, answers=args.volumes['answers'],
+                           prefix=args.prefix, password=args.password, start_date=args.start_date,
+                           days=args.days, batch_size=args.batch_size, log=log)
+    try:
+        counts = seeder.run()
+    except ValueError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    
+    if args.analyze:
+        conn = sqlite3.connect(args.db)
+        conn.execute("ANALYZE")
+        conn.close()
+    
+    print(json.dumps({
+        'db': args.db,
+        'seed': args.seed,
+        'preset': args.preset,
+        'volumes': args.volumes,
+        'rows': counts,
+        'size_mb': round(os.path.getsize(args.db) / 1e6, 1),
+        'duration_s': round(time.perf_counter() - started, 1)
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
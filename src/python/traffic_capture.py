@@ -0,0 +1,234 @@
+"""
+Traffic Capture
+Compact binary recording of the TAP frames a server receives
+
+A CaptureWriter set as ProtocolWrapper.recorder records every inbound
+frame exactly as it came off the wire (80-byte header + payload), plus a
+small record per outbound message (type, response code, size) so replay can
+compare latencies, and a record when a connection closes. Offsets are
+microseconds since the capture started; connections get sequential ids
+(socket descriptors are reused).
+
+Broadcasts are sent by the C broadcast manager, so the writer mirrors room
+registrations and topic subscriptions made through the wrapper and records
+one outbound message per member, as if each had been sent on its own.
+
+File layout (network byte order):
+    file header  "TAPCAP" 0x00 0x01 | start time (double, unix seconds)
+    record       kind (B) | connection id (I) | offset_us (Q) | body
+        FRAME_IN   payload length (I) | header (80 bytes) | payload
+        FRAME_OUT  msg_type (H) | code (H, 0xFFFF if none) | bytes sent (I)
+        CLOSE      (no body)
+
+Captures contain session tokens and login passwords: keep them private.
+"""
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'TAPCAP\x00\x01'
+FILE_HEADER = struct.Struct('!8sd')
+RECORD = struct.Struct('!BIQ')
+FRAME_IN_BODY = struct.Struct('!I')
+FRAME_OUT_BODY = struct.Struct('!HHI')
+
+# protocol_header_t: magic, version, type, length, message_id, timestamp, token, reserved
+TAP_HEADER = struct.Struct('!IHHI16sq32s12s')
+
+FRAME_IN = 1
+FRAME_OUT = 2
+CLOSE = 3
+
+NO_CODE = 0xFFFF
+
+
+class CaptureWriter:
+    """
+    Appends frames to a capture file (thread-safe)
+    
+    Records are buffered and flushed at most every flush_interval seconds,
+    so recording costs a struct.pack and a buffered write per frame.
+    """
+    
+    def __init__(self, path, flush_interval=1.0, buffer_size=1024 * 1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Owner-only: captures hold login passwords and session tokens
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o600)
+        try:
+            os.chmod(path, 0o600)  # The mode above only applies to a new file
+        except OSError:
+            pass
+        self._file = os.fdopen(fd, 'wb', buffering=buffer_size)
+        self._lock = threading.Lock()
+        self._connections = {}  # {socket: connection id}
+        self._topics = {}  # {socket: set of topics} (rooms are the 'room:<id>' topics, as in the C manager)
+        self._next_id = 1
+        self._started = time.perf_counter()
+        self._last_flush = self._started
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_written = FILE_HEADER.size
+        self._file.write(FILE_HEADER.pack(MAGIC, time.time()))
+    
+    def _connection_id(self, socket):
+        connection_id = self._connections.get(socket)
+        if connection_id is None:
+            connection_id = self._connections[socket] = self._next_id
+            self._next_id += 1
+        return connection_id
+    
+    def _write(self, data, now):
+        self._file.write(data)
+        self.bytes_written += len(data)
+        if now - self._last_flush >= self.flush_interval:
+            self._file.flush()
+            self._last_flush = now
+    
+    def record_in(self, socket, header, payload):
+        """Inbound frame: raw header bytes and payload bytes"""
+        now = time.perf_counter()
+        with self._lock:
+            if self._file is None:
+                return
+            record = (RECORD.pack(FRAME_IN, self._connection_id(socket), int((now - self._started) * 1e6)) +
+                      FRAME_IN_BODY.pack(len(payload)) + header + payload)
+            self._write(record, now)
+            self.frames_in += 1
+    
+    def record_out(self, socket, msg_type, code, bytes_sent, now=None):
+        """Outbound message (responses and pushes), without its payload"""
+        if not isinstance(code, int) or not 0 <= code < NO_CODE:
+            code = None
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            if self._file is None or socket not in self._connections:
+                return  # Nothing was received on it yet (e.g. a push to a client seen before the capture)
+            record = (RECORD.pack(FRAME_OUT, self._connections[socket], int((now - self._started) * 1e6)) +
+                      FRAME_OUT_BODY.pack(msg_type, NO_CODE if code is None else code, max(0, bytes_sent)))
+            self._write(record, now)
+            self.frames_out += 1
+    
+    def record_room(self, socket, room_id, replace=False):
+        """
+        Socket registered for broadcasts to room_id (None: unregistered, topics included)
+        
+        A socket can be in several rooms (RESUME_REQ registers every unfinished one);
+        replace leaves the others first, like broadcast_update_room.
+        """
+        with self._lock:
+            if room_id is None:
+                self._topics.pop(socket, None)
+                return
+            topics = self._topics.setdefault(socket, set())
+            if replace:
+                topics.difference_update([topic for topic in topics if topic.startswith('room:')])
+            topics.add(f"room:{room_id}")
+    
+    def record_topic(self, socket, topic, subscribed):
+        with self._lock:
+            if subscribed:
+                self._topics.setdefault(socket, set()).add(topic)
+            else:
+                self._topics.get(socket, set()).discard(topic)
+    
+    def record_broadcast(self, msg_type, bytes_sent, started, room_id=None, topic=None):
+        """
+        Broadcast to a room or topic: one outbound message per member
+        
+        Stamped with the time.perf_counter() the broadcast started at: members
+        may already have reacted to it by the time the C call returns.
+        """
+        with self._lock:
+            if room_id is not None:
+                topic = f"room:{room_id}"
+            members = [s for s, topics in self._topics.items() if topic in topics]
+        for socket in members:
+            self.record_out(socket, msg_type, None, bytes_sent, started)
+    
+    def record_close(self, socket):
+        """Connection closed (its socket descriptor may be reused by the next one)"""
+        now = time.perf_counter()
+        with self._lock:
+            self._topics.pop(socket, None)
+            connection_id = self._connections.pop(socket, None)
+            if self._file is None or connection_id is None:
+                return
+            self._write(RECORD.pack(CLOSE, connection_id, int((now - self._started) * 1e6)), now)
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'frames_in': self.frames_in,
+            'frames_out': self.frames_out,
+            'connections': self._next_id - 1,
+            'bytes': self.bytes_written
+        }
+
+
+def read_capture(path):
+    """
+    Read a capture file
+    
+    Records are in the order they were written; broadcasts are stamped
+    when they started, so offsets can step back slightly.
+    
+    Returns:
+        tuple: (start time, [record]) where a record is a dict with
+               'kind', 'conn', 'offset' (seconds) and, per kind:
+               FRAME_IN   'msg_type', 'token', 'header', 'payload' (bytes)
+               FRAME_OUT  'msg_type', 'code' (None if none), 'bytes'
+    
+    Raises:
+        ValueError: Not a capture file (a truncated last record is ignored)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        raise ValueError(f"{path}: not a TAP capture")
+    magic, started = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a TAP capture (bad magic)")
+    
+    records = []
+    pos = FILE_HEADER.size
+    end = len(data)
+    while pos + RECORD.size <= end:
+        kind, conn, offset_us = RECORD.unpack_from(data, pos)
+        pos += RECORD.size
+        record = {'kind': kind, 'conn': conn, 'offset': offset_us / 1e6}
+        
+        if kind == FRAME_IN:
+            if pos + FRAME_IN_BODY.size + TAP_HEADER.size > end:
+                break
+            (length,) = FRAME_IN_BODY.unpack_from(data, pos)
+            pos += FRAME_IN_BODY.size
+            header = data[pos:pos + TAP_HEADER.size]
+            pos += TAP_HEADER.size
+            if pos + length > end:
+                break
+            fields = TAP_HEADER.unpack(header)
+            record['msg_type'] = fields[2]
+            record['token'] = fields[6].rstrip(b'\x00').decode('utf-8', errors='ignore')
+            record['header'] = header
+            record['payload'] = data[pos:pos + length]
+            pos += length
+        elif kind == FRAME_OUT:
+            if pos + FRAME_OUT_BODY.size > end:
+                break
+            msg_type, code, sent = FRAME_OUT_BODY.unpack_from(data, pos)
+            pos += FRAME_OUT_BODY.size
+            record.update(msg_type=msg_type, code=None if code == NO_CODE else code, bytes=sent)
+        elif kind != CLOSE:
+            raise ValueError(f"{path}: unknown record kind {kind} at byte {pos - RECORD.size}")
+        
+        records.append(record)
+    return started, records
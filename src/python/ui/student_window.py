@@ -21,7 +21,8 @@ class StudentWindow:
                 - on_answer_change: callback(question_idx, selected)
                 - on_join_room: callback(room_id)
                 - on_refresh_rooms: callback()
-                - on_refresh_available: callback()
+                - on_refresh_available: callback(search=None)
+                - on_load_more_available: callback(cursor)
                 - on_logout: callback()
         """
         self.parent = parent
@@ -56,6 +57,9 @@ class StudentWindow:
         # Room data
         self.joined_rooms_data = []
         self.available_rooms_data = []
+        self.available_next_cursor = None
+        self.available_total_hint = None
+        self.available_total_capped = False
     
     def show_room_lobby(self, full_name, username=None):
         """Show room lobby where student can join a test room"""
@@ -115,9 +119,48 @@ class StudentWindow:
             height=30
         ).pack(side="right")
         
+        # Search by room name or code
+        search_frame = ctk.CTkFrame(left_frame)
+        search_frame.pack(fill="x", padx=10, pady=(0, 5))
+        
+        self.available_search_entry = ctk.CTkEntry(
+            search_frame,
+            placeholder_text="Search room name or code..."
+        )
+        self.available_search_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.available_search_entry.bind("<Return>", lambda e: self._handle_search_available())
+        
+        ctk.CTkButton(
+            search_frame,
+            text="🔍",
+            command=self._handle_search_available,
+            width=40,
+            height=30
+        ).pack(side="right")
+        
         # Available rooms list (scrollable with buttons)
         self.available_scroll = ctk.CTkScrollableFrame(left_frame, height=400)
-        self.available_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.available_scroll.pack(fill="both", expand=True, padx=10, pady=(0, 5))
+        
+        # Page footer: count hint and load more
+        available_footer = ctk.CTkFrame(left_frame)
+        available_footer.pack(fill="x", padx=10, pady=(0, 10))
+        
+        self.available_count_label = ctk.CTkLabel(
+            available_footer,
+            text="",
+            font=("Arial", 10),
+            text_color="gray"
+        )
+        self.available_count_label.pack(side="left", padx=5)
+        
+        self.available_more_button = ctk.CTkButton(
+            available_footer,
+            text="Load more",
+            command=self._handle_load_more_available,
+            width=100,
+            height=28
+        )
         
         # Right column: My Joined Rooms
         right_frame = ctk.CTkFrame(columns_frame)
@@ -161,61 +204,82 @@ class StudentWindow:
                 font=("Arial", 12),
                 text_color="gray"
             ).pack(pady=20)
+            self._update_available_footer()
             return
         
         # Display each available room as a card with join button
         for room in self.available_rooms_data:
-            room_card = ctk.CTkFrame(self.available_scroll)
-            room_card.pack(fill="x", pady=5, padx=5)
-            
-            # Room info
-            info_frame = ctk.CTkFrame(room_card)
-            info_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
-            
-            # Room name
-            ctk.CTkLabel(
-                info_frame,
-                text=room['room_name'],
-                font=("Arial", 14, "bold")
-            ).pack(anchor="w")
-            
-            # Teacher and details
-            details_text = f"👨‍🏫 {room['teacher_name']} | ⏱ {room['duration_minutes']} min | 📝 {room['num_questions']} questions"
-            ctk.CTkLabel(
-                info_frame,
-                text=details_text,
-                font=("Arial", 10),
-                text_color="gray"
-            ).pack(anchor="w")
-            
-            # Status
-            status_icon = "⏳ Waiting" if room['status'] == 'waiting' else ("▶️ Active" if room['status'] == 'active' else "✅ Ended")
-            status_color = "orange" if room['status'] == 'waiting' else ("green" if room['status'] == 'active' else "gray")
+            self._add_available_room_card(room)
+        
+        self._update_available_footer()
+    
+    def _update_available_footer(self):
+        """Update count hint and load more button"""
+        shown = len(self.available_rooms_data)
+        if self.available_total_hint is not None:
+            total = f"{self.available_total_hint}+" if self.available_total_capped else str(self.available_total_hint)
+            self.available_count_label.configure(text=f"Showing {shown} of {total}")
+        else:
+            self.available_count_label.configure(text=f"Showing {shown}")
+        
+        if self.available_next_cursor is not None:
+            self.available_more_button.pack(side="right", padx=5)
+        else:
+            self.available_more_button.pack_forget()
+    
+    def _add_available_room_card(self, room):
+        """Add one available room card with join button"""
+        room_card = ctk.CTkFrame(self.available_scroll)
+        room_card.pack(fill="x", pady=5, padx=5)
+        
+        # Room info
+        info_frame = ctk.CTkFrame(room_card)
+        info_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+        
+        # Room name
+        ctk.CTkLabel(
+            info_frame,
+            text=room['room_name'],
+            font=("Arial", 14, "bold")
+        ).pack(anchor="w")
+        
+        # Teacher and details
+        details_text = f"👨‍🏫 {room['teacher_name']} | ⏱ {room['duration_minutes']} min | 📝 {room['num_questions']} questions"
+        ctk.CTkLabel(
+            info_frame,
+            text=details_text,
+            font=("Arial", 10),
+            text_color="gray"
+        ).pack(anchor="w")
+        
+        # Status
+        status_icon = "⏳ Waiting" if room['status'] == 'waiting' else ("▶️ Active" if room['status'] == 'active' else "✅ Ended")
+        status_color = "orange" if room['status'] == 'waiting' else ("green" if room['status'] == 'active' else "gray")
+        ctk.CTkLabel(
+            info_frame,
+            text=status_icon,
+            font=("Arial", 10),
+            text_color=status_color
+        ).pack(anchor="w")
+        
+        # Join button
+        if room['status'] in ['waiting', 'active']:
+            ctk.CTkButton(
+                room_card,
+                text="Join",
+                command=lambda r=room: self._handle_join_room_by_id(r['id']),
+                width=80,
+                height=60,
+                fg_color="green",
+                hover_color="darkgreen"
+            ).pack(side="right", padx=10, pady=10)
+        else:
             ctk.CTkLabel(
-                info_frame,
-                text=status_icon,
-                font=("Arial", 10),
-                text_color=status_color
-            ).pack(anchor="w")
-            
-            # Join button
-            if room['status'] in ['waiting', 'active']:
-                ctk.CTkButton(
-                    room_card,
-                    text="Join",
-                    command=lambda r=room: self._handle_join_room_by_id(r['id']),
-                    width=80,
-                    height=60,
-                    fg_color="green",
-                    hover_color="darkgreen"
-                ).pack(side="right", padx=10, pady=10)
-            else:
-                ctk.CTkLabel(
-                    room_card,
-                    text="Ended",
-                    text_color="gray",
-                    width=80
-                ).pack(side="right", padx=10, pady=10)
+                room_card,
+                text="Ended",
+                text_color="gray",
+                width=80
+            ).pack(side="right", padx=10, pady=10)
     
     def _update_joined_rooms(self):
         """Update joined rooms display"""
@@ -307,9 +371,31 @@ class StudentWindow:
                     width=80
                 ).pack(side="right", padx=10, pady=10)
     
-    def update_available_rooms(self, rooms):
-        """Update available rooms data and refresh display"""
-        self.available_rooms_data = rooms
+    def update_available_rooms(self, rooms, append=False, next_cursor=None,
+                               total_hint=None, total_capped=False):
+        """
+        Update available rooms data and refresh display
+        
+        Args:
+            rooms: Rooms on this page
+            append: Add below the current list instead of replacing it
+            next_cursor: Cursor for the next page (None = last page)
+            total_hint: Approximate total (first page only)
+            total_capped: total_hint is a lower bound
+        """
+        self.available_next_cursor = next_cursor
+        
+        if append and self.available_rooms_data:
+            self.available_rooms_data.extend(rooms)
+            if hasattr(self, 'available_scroll'):
+                for room in rooms:
+                    self._add_available_room_card(room)
+                self._update_available_footer()
+            return
+        
+        self.available_rooms_data = list(rooms)
+        self.available_total_hint = total_hint
+        self.available_total_capped = total_capped
         if hasattr(self, 'available_scroll'):
             self._update_available_rooms()
     
@@ -334,6 +420,16 @@ class StudentWindow:
         if self.callbacks.get('on_refresh_available'):
             self.callbacks['on_refresh_available']()
     
+    def _handle_search_available(self):
+        """Handle search available rooms"""
+        if self.callbacks.get('on_refresh_available'):
+            self.callbacks['on_refresh_available'](self.available_search_entry.get())
+    
+    def _handle_load_more_available(self):
+        """Handle load more available rooms button"""
+        if self.available_next_cursor is not None and self.callbacks.get('on_load_more_available'):
+            self.callbacks['on_load_more_available'](self.available_next_cursor)
+    
     def _handle_enter_room(self, room_id):
         """Handle enter room to take test"""
         if self.callbacks.get('on_enter_room'):
@@ -404,12 +500,13 @@ class StudentWindow:
             hover_color="darkgreen"
         ).pack(pady=20)
     
-    def show_test_screen(self, questions, duration, room_id=None, cached_data=None, server_timestamp=None, username=None):
+    def show_test_screen(self, questions, duration, room_id=None, cached_data=None, server_timestamp=None, username=None, deadline=None):
         """Show test screen with questions"""
         self.questions = questions
         self.test_duration = duration
         self.room_id = room_id
         self.server_timestamp = server_timestamp  # Store server timestamp
+        self.deadline = deadline  # Server-side room deadline (Unix), same for every student
         # Store username for cache file
         if username:
             self.username = username
@@ -634,9 +731,12 @@ class StudentWindow:
         import time
         current_unix = time.time() + getattr(self, 'time_offset', 0)
         
-        # Calculate elapsed and remaining time
-        elapsed_seconds = current_unix - self.start_time
-        remaining_seconds = (self.test_duration * 60) - elapsed_seconds
+        # Calculate remaining time (room deadline from server if known)
+        if getattr(self, 'deadline', None):
+            remaining_seconds = self.deadline - current_unix
+        else:
+            elapsed_seconds = current_unix - self.start_time
+            remaining_seconds = (self.test_duration * 60) - elapsed_seconds
         
         if remaining_seconds <= 0:
             self.timer_running = False
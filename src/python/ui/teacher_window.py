@@ -8,6 +8,8 @@ from tkinter import messagebox
 class TeacherWindow:
     """Teacher dashboard UI component"""
     
+    SEARCH_PAGE_SIZE = 20
+    
     def __init__(self, parent, callbacks):
         """
         Initialize teacher window
@@ -17,14 +19,17 @@ class TeacherWindow:
             callbacks: Dict with callback functions
                 - on_logout: callback()
                 - on_create_room: callback(room_name, num_questions, duration)
+                - on_clone_room: callback(room_id)
                 - on_start_room: callback(room_id)
                 - on_end_room: callback(room_id)
                 - on_refresh_rooms: callback()
+                - on_import_questions: callback(room_id, file_path)
         """
         self.parent = parent
         self.callbacks = callbacks
         self.frame = None
         self.rooms_data = []
+        self.room_progress = {}  # {room_id: latest ROOM_PROGRESS snapshot}
         
     def show_dashboard(self, full_name, results, rooms=None):
         """
@@ -219,6 +224,14 @@ class TeacherWindow:
             height=35
         ).pack(side="left", padx=5)
         
+        ctk.CTkButton(
+            control_frame,
+            text="📄 Clone",
+            command=self._handle_clone_room,
+            width=100,
+            height=35
+        ).pack(side="left", padx=5)
+        
         self._update_rooms_list()
     
     def _update_rooms_list(self):
@@ -228,9 +241,10 @@ class TeacherWindow:
         
         # Header with fixed-width formatting (no emoji for perfect alignment)
         self.rooms_text.insert("end",
-            f"{'Room Name':<25} {'Code':<8} {'Q#':<4} {'Mins':<6} {'Status':<10} {'Students':<10} {'Timeline':<50}\n"
+            f"{'Room Name':<25} {'Code':<8} {'Q#':<4} {'Mins':<6} {'Status':<10} {'Students':<10} "
+            f"{'Progress':<20} {'Timeline':<50}\n"
         )
-        self.rooms_text.insert("end", "=" * 120 + "\n")
+        self.rooms_text.insert("end", "=" * 140 + "\n")
         
         # Rooms data
         if self.rooms_data:
@@ -246,13 +260,20 @@ class TeacherWindow:
                 # Format timestamps
                 timeline = self._format_timeline(room)
  
+                # Live counts pushed by the server override the last refresh
+                progress = self.room_progress.get(room['id'])
+                students = progress['participants'] if progress else room.get('participant_count', 0)
+                progress_display = (f"{progress['testing']} testing, {progress['submitted']} done"
+                                    if progress else "-")
+                
                 self.rooms_text.insert("end",
                     f"{room['room_name']:<25} "
                     f"{room['room_code']:<8} "
                     f"{room['num_questions']:<4} "
                     f"{room['duration_minutes']:<6} "
                     f"{status_display:<10} "
-                    f"{room.get('participant_count', 0):<10} "
+                    f"{students:<10} "
+                    f"{progress_display:<20} "
                     f"{timeline}\n"
                 )
         else:
@@ -321,6 +342,18 @@ class TeacherWindow:
                 return " → ".join(timeline_parts)
             return "Ended (no timestamp)"
     
+    def update_room_progress(self, snapshot):
+        """Apply a live ROOM_PROGRESS snapshot and refresh display"""
+        self.room_progress[snapshot['room_id']] = snapshot
+        
+        # Server status changes (e.g. scheduled start) show up without a refresh
+        for room in self.rooms_data:
+            if room['id'] == snapshot['room_id']:
+                room['status'] = snapshot['room_status']
+        
+        if hasattr(self, 'rooms_text'):
+            self._update_rooms_list()
+    
     def update_rooms(self, rooms):
         """Update rooms data and refresh display"""
         self.rooms_data = rooms
@@ -467,6 +500,68 @@ class TeacherWindow:
             height=35
         ).pack(side="left", padx=5)
         
+        # Question bank search
+        search_frame = ctk.CTkFrame(scrollable_frame)
+        search_frame.pack(fill="x", padx=10, pady=(5, 10))
+        
+        search_row = ctk.CTkFrame(search_frame, fg_color="transparent")
+        search_row.pack(fill="x", padx=5, pady=5)
+        
+        ctk.CTkLabel(
+            search_row,
+            text="🔍 Search Question Bank",
+            font=("Arial", 14, "bold")
+        ).pack(side="left", padx=5)
+        
+        self.search_entry = ctk.CTkEntry(search_row, placeholder_text="e.g. tcp hand", width=250)
+        self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<Return>", lambda e: self._handle_search_questions(0))
+        
+        self.search_mine_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(search_row, text="My rooms only", variable=self.search_mine_var).pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            search_row,
+            text="Search",
+            command=lambda: self._handle_search_questions(0),
+            width=80,
+            height=30
+        ).pack(side="left", padx=5)
+        
+        self.search_results_text = ctk.CTkTextbox(search_frame, font=("Consolas", 10), height=150, wrap="word")
+        self.search_results_text.pack(fill="x", padx=5, pady=5)
+        self.search_results_text.configure(state="disabled")
+        
+        nav_row = ctk.CTkFrame(search_frame, fg_color="transparent")
+        nav_row.pack(fill="x", padx=5, pady=5)
+        
+        self.search_prev_button = ctk.CTkButton(
+            nav_row, text="◀ Prev", width=70, height=28, state="disabled",
+            command=lambda: self._handle_search_questions(max(0, self.search_offset - self.SEARCH_PAGE_SIZE))
+        )
+        self.search_prev_button.pack(side="left", padx=5)
+        
+        self.search_next_button = ctk.CTkButton(
+            nav_row, text="Next ▶", width=70, height=28, state="disabled",
+            command=lambda: self._handle_search_questions(self.search_offset + self.SEARCH_PAGE_SIZE)
+        )
+        self.search_next_button.pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            nav_row,
+            text="➕ Add to Room",
+            command=self._handle_add_bank_question,
+            fg_color="#00AA00",
+            hover_color="#008800",
+            width=120,
+            height=28
+        ).pack(side="right", padx=5)
+        
+        self.bank_id_entry = ctk.CTkEntry(nav_row, width=80, placeholder_text="Bank #")
+        self.bank_id_entry.pack(side="right", padx=5)
+        
+        self.search_offset = 0
+        
         # Question list - IMPROVED with better styling
         list_frame = ctk.CTkFrame(scrollable_frame)
         list_frame.pack(fill="x", padx=10, pady=(5, 10))
@@ -517,6 +612,14 @@ class TeacherWindow:
             font=("Arial", 14, "bold")
         ).pack(side="left")
         
+        ctk.CTkButton(
+            header_frame,
+            text="📂 Import CSV/JSON",
+            command=self._handle_import_questions,
+            width=140,
+            height=28
+        ).pack(side="right", padx=5)
+        
         ctk.CTkButton(
             header_frame,
             text="🗑️ Clear Form",
@@ -726,6 +829,64 @@ class TeacherWindow:
                 correct_answer_num
             )
     
+    def _handle_import_questions(self):
+        """Handle import questions button"""
+        if not self.current_room_id:
+            messagebox.showwarning("No Room Selected", "Please select a room first!")
+            return
+        
+        from tkinter import filedialog
+        file_path = filedialog.askopenfilename(
+            title="Import Questions",
+            filetypes=[("Question files", "*.csv *.json"), ("CSV", "*.csv"), ("JSON", "*.json")]
+        )
+        if not file_path:
+            return
+        
+        if self.callbacks.get('on_import_questions'):
+            self.callbacks['on_import_questions'](self.current_room_id, file_path)
+    
+    def _handle_search_questions(self, offset):
+        """Handle question bank search (server returns one page at a time)"""
+        query = self.search_entry.get().strip()
+        if not query:
+            return
+        
+        if self.callbacks.get('on_search_questions'):
+            self.callbacks['on_search_questions'](query, offset, self.search_mine_var.get())
+    
+    def update_search_results(self, results, offset, has_more):
+        """Update search results display"""
+        self.search_offset = offset
+        self.search_prev_button.configure(state="normal" if offset > 0 else "disabled")
+        self.search_next_button.configure(state="normal" if has_more else "disabled")
+        
+        self.search_results_text.configure(state="normal")
+        self.search_results_text.delete("1.0", "end")
+        
+        if results:
+            for r in results:
+                correct_letter = chr(ord('A') + r['correct_answer'])
+                self.search_results_text.insert("end", f"#{r['bank_id']}  {r['snippet']}  (✓ {correct_letter})\n")
+        else:
+            self.search_results_text.insert("end", "No matching questions.\n")
+        
+        self.search_results_text.configure(state="disabled")
+    
+    def _handle_add_bank_question(self):
+        """Handle adding a bank question (by #id from search results) to the selected room"""
+        if not self.current_room_id:
+            messagebox.showwarning("No Room Selected", "Please select a room first!")
+            return
+        
+        bank_id = self.bank_id_entry.get().strip().lstrip('#')
+        if not bank_id.isdigit():
+            messagebox.showwarning("Invalid Input", "Enter a bank # from the search results!")
+            return
+        
+        if self.callbacks.get('on_add_bank_question'):
+            self.callbacks['on_add_bank_question'](self.current_room_id, int(bank_id))
+    
     def _clear_question_form(self):
         """Clear question form"""
         self.question_entry.delete(0, 'end')
@@ -828,6 +989,22 @@ class TeacherWindow:
         if self.callbacks.get('on_end_room'):
             self.callbacks['on_end_room'](room_id)
     
+    def _handle_clone_room(self):
+        """Handle clone room button"""
+        room_code = self.control_room_code_entry.get().strip()
+        
+        if not room_code:
+            messagebox.showwarning("No Room Code", "Please enter a room code!")
+            return
+        
+        room = next((r for r in self.rooms_data if r['room_code'] == room_code), None)
+        if not room:
+            messagebox.showerror("Room Not Found", f"No room with code '{room_code}' found!")
+            return
+        
+        if self.callbacks.get('on_clone_room'):
+            self.callbacks['on_clone_room'](room['id'])
+    
     def _handle_logout(self):
         """Handle logout button"""
         if self.callbacks.get('on_logout'):